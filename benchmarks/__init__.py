@@ -0,0 +1,2 @@
+# Benchmarks package
+# Run from the project root, e.g.: python -m benchmarks.bench_fsm_storage
@@ -0,0 +1,118 @@
+"""
+Applications database benchmark: typical HR queries over a large table.
+
+Fills a temporary database with random applications and times
+"all <position> applicants at <branch> this month", a few other lookups,
+full-text /search queries and a full CSV/XLSX export (with the longest
+event loop stall seen while it runs).
+
+Run from the project root:
+    python -m benchmarks.bench_applications_db --rows 100000
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bot.config import BRANCHES, POSITIONS, EDUCATION_LEVELS, LANGUAGE_LEVELS
+from bot.models.application_draft import ApplicationDraft
+from bot.services.export import export_applications
+from bot.storage.applications import ApplicationStore
+
+FIRST_NAMES = ["Ali", "Vali", "Sardor", "Jasur", "Dilnoza", "Madina", "Bekzod", "Zebiniso", "Aziza", "Otabek"]
+LAST_NAMES = ["Karimov", "Aliyev", "Rahimova", "Tursunov", "Yusupova", "Qodirov", "Ergasheva"]
+STREETS = ["Navoiy", "Bobur shoh", "Fitrat", "Cho'lpon", "Amir Temur", "Alisher Navoiy"]
+WORKPLACES = ["Cambridge school", "Westminster", "Najot Ta'lim", "freelance", "Akfa", "Korzinka", None]
+SOURCES = ["Instagram", "Telegram channel", "friend told me", "hh.uz", "OLX"]
+
+
+def _random_draft(user_id: int, now: datetime) -> ApplicationDraft:
+    department = random.choice(list(POSITIONS))
+    draft = ApplicationDraft.from_dict({
+        "department_key": department,
+        "position": random.choice(POSITIONS[department]),
+        "branch_key": random.choice(list(BRANCHES)),
+        "passport_name": random.choice(FIRST_NAMES),
+        "passport_surname": random.choice(LAST_NAMES),
+        "address": f"Andijon, {random.choice(STREETS)} ko'chasi {random.randint(1, 200)}",
+        "last_workplace": random.choice(WORKPLACES),
+        "hear_about": random.choice(SOURCES),
+        "phone": f"+99890{user_id:07d}",
+        "education": random.choice(EDUCATION_LEVELS),
+        "russian_level": random.choice(LANGUAGE_LEVELS),
+        "english_level": random.choice(LANGUAGE_LEVELS),
+        "submission_date": (now - timedelta(minutes=random.randrange(2 * 365 * 24 * 60))).strftime("%d.%m.%Y %H:%M"),
+        "photo": f"photo-{user_id}",
+    })
+    draft.user_id = user_id
+    return draft
+
+
+async def _timed(label: str, query, repeat: int = 20) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await query()
+    elapsed = (time.perf_counter() - started) / repeat
+    if isinstance(result, tuple):  # search(): (matches, page)
+        size = f"{len(result[1])} of {result[0]} matches"
+    else:
+        size = f"{result if isinstance(result, int) else len(result)} rows"
+    print(f"{label:<45}: {elapsed * 1000:>8.2f} ms ({size})")
+
+
+async def _timed_export(store: ApplicationStore, path: Path, fmt: str) -> None:
+    loop = asyncio.get_running_loop()
+    max_stall = 0.0
+
+    async def ticker():
+        nonlocal max_stall
+        while True:
+            before = loop.time()
+            await asyncio.sleep(0.01)
+            max_stall = max(max_stall, loop.time() - before - 0.01)
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    count = await export_applications(store, path, fmt)
+    elapsed = time.perf_counter() - started
+    ticking.cancel()
+    print(f"export {fmt:<4} {count:,} rows{'':<25}: {elapsed:>8.2f} s "
+          f"({path.stat().st_size / 1e6:.1f} MB, max loop stall {max_stall * 1000:.1f} ms)")
+
+
+async def main(rows: int, batch: int) -> None:
+    now = datetime.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ApplicationStore(Path(tmp) / "applications.sqlite3")
+        started = time.perf_counter()
+        for first in range(0, rows, batch):
+            await store.add_many(_random_draft(user_id, now) for user_id in range(first, min(first + batch, rows)))
+        elapsed = time.perf_counter() - started
+        print(f"inserted {rows:,} applications in {elapsed:.1f}s ({rows / elapsed:,.0f}/s)")
+
+        await _timed("IELTS Instructor at Clara this month",
+                     lambda: store.find(position="IELTS Instructor", branch="Clara", since=month_start, limit=None))
+        await _timed("count IELTS Instructor at Clara this month",
+                     lambda: store.count(position="IELTS Instructor", branch="Clara", since=month_start))
+        await _timed("latest 100 at Severniy",
+                     lambda: store.find(branch="severniy"))
+        await _timed("by phone", lambda: store.find(phone=f"+99890{rows // 2:07d}"))
+        await _timed("by user_id", lambda: store.find(user_id=rows // 3))
+        await _timed("search 'zebiniso karimov' (page 1)", lambda: store.search("zebiniso karimov"))
+        await _timed("search 'cambridge navoiy' (page 10)", lambda: store.search("cambridge navoiy", offset=90))
+        await _timed("search 'telegr' (prefix, common)", lambda: store.search("telegr"))
+        await _timed_export(store, Path(tmp) / "export.csv", "csv")
+        await _timed_export(store, Path(tmp) / "export.xlsx", "xlsx")
+        await store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch))
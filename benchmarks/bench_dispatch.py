@@ -0,0 +1,410 @@
+"""
+Dispatcher microbenchmarks: per-update cost of every handler, plus the hot helpers.
+
+Synthetic updates are fed straight into run.py's create_dispatcher() with
+Dispatcher.feed_update and a bot session that answers every API call locally,
+so only the bot's own code is timed: middlewares, filters, the FSM storage
+and the handler. Before each timed update the applicant's FSM state and data
+are restored to what they were at that step of a reference walk through the
+whole application, so every iteration takes the same path. All three routers
+are covered (main_handlers, application_handlers, hr_handlers), as are
+validate_phone, format_phone, validate_date, format_application_summary,
+get_text and every keyboard factory.
+
+Results are compared with a JSON baseline (benchmarks/baselines/dispatch.json):
+a case slower than its baseline by more than the allowed regression fails
+the run with exit code 1. Baselines only mean something on the machine that
+recorded them; re-record with --save after an intended change or on a new
+machine.
+
+Run from the project root:
+    python -m benchmarks.bench_dispatch            # compare with the baseline
+    python -m benchmarks.bench_dispatch --save     # record a new baseline
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import typing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, Update, User
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "dispatch.json"
+DEFAULT_MAX_REGRESSION = 0.5  # fail when 50% slower than the baseline
+
+USER_ID = 5005
+HR_GROUP = -1005005
+HR_USER = 6006
+
+# Arguments of the keyboard factories that take any
+KEYBOARD_ARGUMENTS = {"department_key": "akademik", "language": "russian", "user_id": USER_ID, "lang": "uz"}
+
+_ids = itertools.count(1)
+
+
+# ---------- synthetic updates ----------
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": "Bench", "username": "bench"}
+
+
+def _message(text: Optional[str] = None, chat_id: int = USER_ID, user_id: int = USER_ID, **content: Any) -> dict:
+    message = {
+        "message_id": next(_ids), "date": 0,
+        "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"}, "from": _user(user_id),
+    }
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    message.update(content)
+    return {"update_id": next(_ids), "message": message}
+
+
+def _callback(data: str, chat_id: int = USER_ID, user_id: int = USER_ID) -> dict:
+    return {"update_id": next(_ids), "callback_query": {
+        "id": str(next(_ids)), "chat_instance": "ci", "data": data, "from": _user(user_id),
+        "message": {
+            "message_id": 1, "date": 0, "text": "prompt",
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+        },
+    }}
+
+
+def scripted_updates() -> List[dict]:
+    """Updates of the reference walk: menus, the whole application, then the HR group"""
+    from bot.keyboards.callback_data import encode_callback as cb
+
+    return [
+        # main_handlers
+        _message("/start"),
+        _message("🏢 Kompaniya haqida"),
+        _message("⬅️ Orqaga"),
+        _message("☎️ Kontaktlar"),
+        _message("💬 Fikr-mulohazalar"),
+        _message("🌐 Tilni o'zgartirish"),
+        _callback(cb("lang", "uz")),
+        _message("▶️ Start"),
+        _message("🧳 Bo'sh ish o'rinlari"),
+        # application_handlers
+        _message("Clara"),
+        _message("🧠 Akademik bo'lim"),
+        _callback(cb("position", "IELTS Instructor")),
+        _message("Ali"),
+        _message("Valiyev"),
+        _message("Vali"),
+        _message("01.01.2000"),
+        _message("Andijon, Navoiy ko'chasi 1"),
+        _message("+998901234567"),
+        _message("yes"),
+        _callback(cb("phone_confirm", "yes")),
+        _message("Ha"),
+        _callback(cb("education", "Oliy")),
+        _callback(cb("gender", "Erkak")),
+        _callback(cb("russian_level", "O'rtacha")),
+        _message("no voice"),
+        _message(voice={"file_id": "voice-1", "file_unique_id": "v1", "duration": 15}),
+        _callback(cb("english_level", "Ilg'or")),
+        _message("no media"),
+        _message(video={"file_id": "video-1", "file_unique_id": "e1", "width": 1, "height": 1, "duration": 30}),
+        _message("no certificate"),
+        _message(document={"file_id": "pdf-1", "file_unique_id": "p1", "mime_type": "application/pdf"}),
+        _message("1-3 years"),
+        _message("Proper, relocation"),
+        _message("no photo"),
+        _message(photo=[{"file_id": "photo-1", "file_unique_id": "ph1", "width": 1, "height": 1}]),
+        _message("Instagram"),
+        _callback(cb("confirm", "yes")),
+        # HR group: decisions (application_handlers) and hr_handlers
+        _callback(cb("approve", id=USER_ID), chat_id=HR_GROUP, user_id=HR_USER),
+        _callback(cb("interview", id=USER_ID), chat_id=HR_GROUP, user_id=HR_USER),
+        _callback(cb("reject", id=USER_ID), chat_id=HR_GROUP, user_id=HR_USER),
+        _message("/search Valiyev", chat_id=HR_GROUP, user_id=HR_USER),
+        _message("/funnel", chat_id=HR_GROUP, user_id=HR_USER),
+    ]
+
+
+# ---------- timing ----------
+
+class NullSession(BaseSession):
+    """Bot session whose API calls all succeed at once without leaving the process"""
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        returning = method.__returning__
+        message = Message(message_id=next(_ids), date=datetime.now(), chat=Chat(
+            id=int(getattr(method, "chat_id", None) or USER_ID), type="private",
+        ))
+        if returning is Message or returning == typing.Union[Message, bool]:
+            return message
+        if typing.get_origin(returning) is list:
+            return [message for _ in getattr(method, "media", [])]
+        if returning is User:
+            return User(id=42, is_bot=True, first_name="Bench bot")
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):  # pragma: no cover
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def time_function(function: Callable[[], Any], iterations: int, rounds: int) -> float:
+    """Seconds per call, from the fastest of several rounds (the least disturbed by the rest of the machine)"""
+    def run_round() -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - started) / iterations
+
+    function()  # warm-up
+    return min(run_round() for _ in range(rounds))
+
+
+def function_cases() -> Dict[str, Callable[[], Any]]:
+    # bot.* reads the environment at import, so only import it once main() has set it up
+    from bot.keyboards import inline_keyboards, reply_keyboards
+    from bot.models.application_draft import ApplicationDraft
+    from bot.utils.formatters import format_application_summary
+    from bot.utils.texts import get_text
+    from bot.utils.validators import format_phone, validate_date, validate_phone
+
+    draft = ApplicationDraft.from_dict({
+        "branch": "Clara", "department_key": "akademik", "position": "IELTS Instructor",
+        "passport_name": "Ali", "passport_surname": "Valiyev", "date_of_birth": "01.01.2000",
+        "address": "Andijon, Navoiy ko'chasi 1", "phone": "+998901234567", "education": "Oliy",
+        "russian_level": "O'rtacha", "english_level": "Ilg'or", "last_workplace": "Proper",
+        "submission_date": "01.03.2026 10:00",
+    })
+    cases: Dict[str, Callable[[], Any]] = {
+        "validators.validate_phone": lambda: validate_phone("+998 90 123 45 67"),
+        "validators.format_phone": lambda: format_phone("90 123 45 67"),
+        "validators.validate_date": lambda: validate_date("01.01.2000"),
+        "formatters.format_application_summary": lambda: format_application_summary(draft),
+        "texts.get_text": lambda: get_text("ask_passport_name", lang="ru"),
+    }
+    for module in (inline_keyboards, reply_keyboards):
+        for name, factory in inspect.getmembers(module, inspect.isfunction):
+            if factory.__module__ != module.__name__ or "keyboard" not in name:
+                continue
+            arguments = {parameter: KEYBOARD_ARGUMENTS[parameter] for parameter in inspect.signature(factory).parameters}
+            cases[f"keyboards.{name}"] = lambda factory=factory, arguments=arguments: factory(**arguments)
+    return cases
+
+
+def _handler_name(callback: Callable) -> str:
+    return f"{callback.__module__.rpartition('.')[2]}.{callback.__name__}"
+
+
+class HandlerBench:
+    """run.py's dispatcher with a reference walk recorded: one case per handler it reached"""
+
+    def __init__(self, iterations: int, rounds: int):
+        self.iterations = iterations
+        self.rounds = rounds
+        self.cases: Dict[str, Tuple[StorageKey, Tuple[Optional[str], Dict[str, Any]], Update]] = {}
+        self.missed: List[str] = []  # handlers no scripted update reached
+
+    async def start(self) -> None:
+        import run
+
+        self.bot = Bot("42:BENCH", session=NullSession())
+        self.dp = run.create_dispatcher()
+        reached: List[Callable] = []
+
+        async def record_handler(handler, event, data):
+            reached.append(data["handler"].callback)
+            return await handler(event, data)
+
+        self.dp.message.middleware(record_handler)
+        self.dp.callback_query.middleware(record_handler)
+        await self.dp.emit_startup(bot=self.bot)
+
+        # FSM snapshot before each update and the handler that took it
+        storage = self.dp.storage
+        for raw in scripted_updates():
+            event = raw.get("message") or raw["callback_query"]
+            chat = (raw.get("message") or event["message"])["chat"]
+            key = StorageKey(bot_id=self.bot.id, chat_id=chat["id"], user_id=event["from"]["id"])
+            snapshot = (await storage.get_state(key), dict(await storage.get_data(key)))
+            update = Update.model_validate(raw, context={"bot": self.bot})
+            reached.clear()
+            await self.dp.feed_update(self.bot, update)
+            if not reached:
+                raise RuntimeError(f"No handler took scripted update {raw}")
+            self.cases[_handler_name(reached[-1])] = (key, snapshot, update)
+
+        for router in self.dp.sub_routers:
+            for observer in (router.message, router.callback_query):
+                self.missed.extend(
+                    _handler_name(handler.callback) for handler in observer.handlers
+                    if _handler_name(handler.callback) not in self.cases
+                )
+
+    async def measure(self, name: str) -> float:
+        """Seconds per update; the FSM is restored before each one, outside the timed part"""
+        key, (state, data), update = self.cases[name]
+        storage = self.dp.storage
+
+        async def feed() -> float:
+            await storage.set_state(key, state)
+            await storage.set_data(key, data)
+            started = time.perf_counter()
+            await self.dp.feed_update(self.bot, update)
+            return time.perf_counter() - started
+
+        await feed()  # warm-up
+        rounds = []
+        for _ in range(self.rounds):
+            rounds.append(sum([await feed() for _ in range(self.iterations)]) / self.iterations)
+        return min(rounds)
+
+    async def close(self) -> None:
+        await self.dp["outbox"].join()
+        await self.dp.emit_shutdown(bot=self.bot)
+
+
+# ---------- baseline ----------
+
+def allowed_seconds(name: str, baseline: Dict[str, Any]) -> Optional[float]:
+    """Slowest acceptable time of a case, None if the baseline does not have it"""
+    recorded = baseline["cases"].get(name)
+    if recorded is None:
+        return None
+    max_regression = recorded.get("max_regression", baseline.get("max_regression", DEFAULT_MAX_REGRESSION))
+    return recorded["us_per_op"] / 1e6 * (1 + max_regression)
+
+
+def regressions(results: Dict[str, float], baseline: Dict[str, Any]) -> List[str]:
+    """Cases that got slower than the baseline allows"""
+    return [
+        name for name, seconds in results.items()
+        if allowed_seconds(name, baseline) is not None and seconds > allowed_seconds(name, baseline)
+    ]
+
+
+def save_baseline(path: Path, results: Dict[str, float], old: Optional[Dict[str, Any]]) -> None:
+    """Write results over the old baseline, keeping its cases not run now and its max_regression settings"""
+    cases = dict(old["cases"]) if old else {}
+    for name, seconds in results.items():
+        case = {"us_per_op": round(seconds * 1e6, 2)}
+        if "max_regression" in cases.get(name, {}):
+            case["max_regression"] = cases[name]["max_regression"]
+        cases[name] = case
+    baseline = {
+        "recorded": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        "max_regression": old.get("max_regression", DEFAULT_MAX_REGRESSION) if old else DEFAULT_MAX_REGRESSION,
+        "cases": dict(sorted(cases.items())),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+async def run_benchmarks(args: argparse.Namespace, baseline: Optional[Dict[str, Any]]) -> Tuple[Dict[str, float], List[str]]:
+    functions = function_cases()
+    handlers = HandlerBench(args.iterations, args.rounds)
+    await handlers.start()
+    try:
+        async def measure(name: str) -> float:
+            if name in functions:
+                return time_function(functions[name], args.function_iterations, args.rounds)
+            return await handlers.measure(name)
+
+        names = [name for name in [*functions, *handlers.cases] if args.filter in name]
+        if args.save:
+            # Baseline: the typical time (median of several runs), not a lucky one
+            results = {}
+            for name in names:
+                runs = sorted([await measure(name) for _ in range(1 + args.retries)])
+                results[name] = runs[len(runs) // 2]
+            return results, handlers.missed
+
+        results = {name: await measure(name) for name in names}
+        # A slow run may be noise: measure regressed cases again and keep their best time
+        for _ in range(args.retries if baseline else 0):
+            slower = regressions(results, baseline)
+            if not slower:
+                break
+            for name in slower:
+                results[name] = min(results[name], await measure(name))
+        return results, handlers.missed
+    finally:
+        await handlers.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--iterations", type=int, default=100, help="updates per round of each handler")
+    parser.add_argument("--function-iterations", type=int, default=20_000, help="calls per round of each helper")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds per case; the fastest one counts")
+    parser.add_argument("--retries", type=int, default=3, help="re-measure cases that look slower this many times (runs per case with --save: 1 + retries)")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    with tempfile.TemporaryDirectory(prefix="hr-bench-") as data_dir:
+        # Read by bot.config when run.py is imported
+        os.environ.update({
+            "BOT_TOKEN": "42:BENCH",
+            "HR_GROUP_ID": str(HR_GROUP),
+            "FSM_STORAGE": "memory",
+            "OUTBOX_PATH": os.path.join(data_dir, "outbox.jsonl"),
+            "APPLICATIONS_DB_PATH": os.path.join(data_dir, "applications.sqlite3"),
+            "DEDUP_DB_PATH": os.path.join(data_dir, "dedup.sqlite3"),
+            "FUNNEL_DB_PATH": os.path.join(data_dir, "funnel.sqlite3"),
+            "TRACE_PATH": os.path.join(data_dir, "traces.jsonl"),
+            "PROFILE_DIR": os.path.join(data_dir, "profiles"),
+            "METRICS_ENABLED": "false",
+        })
+        import run  # noqa: F401  (configures logging)
+        logging.getLogger().setLevel(logging.WARNING)
+        results, missed = asyncio.run(run_benchmarks(args, baseline))
+
+    recorded = baseline["cases"] if baseline else {}
+    print(f"{'case':<58}{'us/op':>10}{'baseline':>10}{'change':>9}")
+    for name, seconds in results.items():
+        line = f"{name:<58}{seconds * 1e6:>10.1f}"
+        if name in recorded:
+            before = recorded[name]["us_per_op"]
+            line += f"{before:>10.1f}{seconds * 1e6 / before - 1:>+9.0%}"
+        print(line)
+    if missed:
+        print(f"\nHandlers without a scripted update: {', '.join(missed)}")
+
+    if args.save:
+        save_baseline(args.baseline, results, baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; record one with --save")
+        return 0
+    slower = regressions(results, baseline)
+    if slower:
+        print("\nREGRESSIONS:")
+        for name in slower:
+            print(f"  {name}: {results[name] * 1e6:.1f} us, allowed {allowed_seconds(name, baseline) * 1e6:.1f} us")
+        return 1
+    print(f"\nNo case slower than its baseline allows (recorded {baseline['recorded']} on {baseline['machine']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+FSM storage benchmark: updates/second of MemoryStorage vs SQLiteStorage.
+
+Every simulated update does what a typical handler in
+application_handlers.py does to the storage:
+get_state (FSM filter), get_data, update_data(...), set_state(...).
+
+Run from the project root:
+    python -m benchmarks.bench_fsm_storage --users 2000 --steps 20
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.states.application_states import ApplicationStates
+from bot.storage.sqlite_storage import SQLiteStorage
+
+STATES = [state for state in ApplicationStates.__all_states__]
+
+
+async def _simulate_user(storage: BaseStorage, user_id: int, steps: int) -> None:
+    key = StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+    for step in range(steps):
+        await storage.get_state(key)
+        data = await storage.get_data(key)
+        user_lang = data.get("user_language", "uz")
+        await storage.update_data(key, {f"field_{step}": "x" * 16, "user_language": user_lang})
+        await storage.set_state(key, STATES[step % len(STATES)])
+
+
+async def run_benchmark(storage: BaseStorage, users: int, steps: int, concurrency: int) -> float:
+    """Return processed updates per second"""
+    started = time.perf_counter()
+    for first in range(0, users, concurrency):
+        await asyncio.gather(*(
+            _simulate_user(storage, user_id, steps)
+            for user_id in range(first, min(first + concurrency, users))
+        ))
+    await storage.close()  # includes final flush for SQLite
+    elapsed = time.perf_counter() - started
+    return users * steps / elapsed
+
+
+async def main(users: int, steps: int, concurrency: int) -> None:
+    print(f"users={users} steps={steps} concurrency={concurrency}")
+    memory_rate = await run_benchmark(MemoryStorage(), users, steps, concurrency)
+    print(f"MemoryStorage      : {memory_rate:>10,.0f} updates/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(Path(tmp) / "fsm.sqlite3")
+        sqlite_rate = await run_benchmark(storage, users, steps, concurrency)
+    print(f"SQLiteStorage      : {sqlite_rate:>10,.0f} updates/s "
+          f"({sqlite_rate / memory_rate:.0%} of MemoryStorage)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.steps, args.concurrency))
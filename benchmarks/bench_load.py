@@ -0,0 +1,363 @@
+"""
+End-to-end load test: virtual applicants against the real dispatcher.
+
+A local aiohttp server stands in for the Telegram Bot API (getUpdates,
+sendMessage, sendPhoto, sendMediaGroup, answerCallbackQuery,
+editMessageText, ...). The bot is run.py's create_dispatcher() polling that
+server through an ordinary aiohttp session, so every update goes through
+the same middlewares, storage, outbox and handlers as in production.
+
+Each virtual applicant walks the whole ApplicationStates flow (including
+the voice, video, PDF and photo steps), waits for the HR group post of its
+application and then gets an HR decision click (approve / interview /
+reject). A step's latency is the time from the update being offered by
+getUpdates until the dispatcher finished handling it.
+
+Run from the project root:
+    python -m benchmarks.bench_load --applicants 100 1000 10000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+BOT_ID = 123456
+TOKEN = f"{BOT_ID}:LOAD-TEST"
+HR_GROUP = -1001234567890
+HR_USER = 777
+
+_DECISIONS = ("approve", "interview", "reject")
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# ---------- fake Bot API ----------
+
+class FakeBotAPI:
+    """Just enough of the Bot API for the bot to run; records what it was asked to send"""
+
+    def __init__(self):
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.offered: Dict[int, float] = {}  # update_id -> time offered by getUpdates
+        self.calls: Counter = Counter()
+        self.hr_posts: Dict[int, asyncio.Future] = {}  # applicant id -> HR post seen
+        self._has_updates = asyncio.Event()
+        self._message_ids = itertools.count(1)
+
+    def push(self, update: Dict[str, Any]) -> None:
+        self.pending.append(update)
+        self._has_updates.set()
+
+    def _message(self, chat_id: Any, **content: Any) -> Dict[str, Any]:
+        chat_id = int(chat_id)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "HR bot"},
+        }
+        message.update(content)
+        return message
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not self.pending:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout=float(params.get("timeout") or 0) or 0.5)
+            except asyncio.TimeoutError:
+                return []
+        limit = int(params.get("limit") or 100)
+        batch = []
+        now = time.perf_counter()
+        while self.pending and len(batch) < limit:
+            update = self.pending.popleft()
+            self.offered[update["update_id"]] = now
+            batch.append(update)
+        return batch
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+        chat_id = params.get("chat_id", 0)
+
+        if method == "getUpdates":
+            result: Any = await self._get_updates(params)
+        elif method == "getMe":
+            result = {"id": BOT_ID, "is_bot": True, "first_name": "HR bot", "username": "hr_load_bot"}
+        elif method == "sendMediaGroup":
+            result = [self._message(chat_id) for _ in json.loads(params.get("media", "[]"))]
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(chat_id, text=params.get("text", ""))
+        elif method.startswith("send") or method.startswith("edit"):
+            result = self._message(chat_id)
+        else:  # answerCallbackQuery, deleteWebhook, ...
+            result = True
+
+        if int(chat_id or 0) == HR_GROUP and "reply_markup" in params:
+            self._hr_post_seen(json.loads(params["reply_markup"]), result["message_id"])
+        return web.json_response({"ok": True, "result": result})
+
+    def _hr_post_seen(self, markup: Dict[str, Any], message_id: int) -> None:
+        """Wake the applicant whose decision buttons were just posted to the HR group"""
+        from bot.keyboards.callback_data import decode_callback
+
+        for row in markup.get("inline_keyboard", []):
+            for button in row:
+                payload = decode_callback(button.get("callback_data"))
+                if payload is not None and payload.kind == "approve":
+                    waiter = self.hr_posts.get(payload.id)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(message_id)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+# ---------- virtual applicants ----------
+
+class Harness:
+    """Feeds scripted updates and measures how long the dispatcher takes for each"""
+
+    def __init__(self, api: FakeBotAPI, timeout: float):
+        self.api = api
+        self.timeout = timeout
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Counter = Counter()
+        self._done: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    async def track_updates(self, handler, event, data):
+        """Outer update middleware: resolves the waiter of each handled update"""
+        try:
+            return await handler(event, data)
+        finally:
+            waiter = self._done.pop(event.update_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    def message(self, user_id: int, text: Optional[str] = None, **content: Any) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._ids), "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id),
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        message.update(content)
+        return {"update_id": next(self._ids), "message": message}
+
+    def callback(self, user_id: int, data: str, chat_id: Optional[int] = None, message_id: int = 1) -> Dict[str, Any]:
+        chat_id = chat_id if chat_id is not None else user_id
+        return {"update_id": next(self._ids), "callback_query": {
+            "id": str(next(self._ids)), "chat_instance": "ci", "data": data, "from": self._user(user_id),
+            "message": {
+                "message_id": message_id, "date": int(time.time()), "text": "prompt",
+                "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            },
+        }}
+
+    async def step(self, name: str, update: Dict[str, Any]) -> bool:
+        waiter = asyncio.get_running_loop().create_future()
+        self._done[update["update_id"]] = waiter
+        self.api.push(update)
+        try:
+            finished = await asyncio.wait_for(waiter, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._done.pop(update["update_id"], None)
+            self.failures[name] += 1
+            return False
+        offered = self.api.offered.pop(update["update_id"], finished)
+        self.latencies[name].append(finished - offered)
+        return True
+
+    def script(self, user_id: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """(step name, update) of one applicant walking the whole flow"""
+        from bot.keyboards.callback_data import encode_callback as cb
+
+        m, c = self.message, self.callback
+        dob = f"{1 + user_id % 28:02d}.{1 + user_id // 28 % 12:02d}.{1970 + user_id // 336 % 35}"
+        return [
+            ("start", m(user_id, "/start")),
+            ("language", m(user_id, "▶️ Start")),
+            ("vacancies", m(user_id, "🧳 Bo'sh ish o'rinlari")),
+            ("branch", m(user_id, "Clara")),
+            ("department", m(user_id, "🧠 Akademik bo'lim")),
+            ("position", c(user_id, cb("position", "IELTS Instructor"))),
+            ("passport_name", m(user_id, "Ali")),
+            ("passport_surname", m(user_id, "Valiyev")),
+            ("father_name", m(user_id, "Vali")),
+            ("date_of_birth", m(user_id, dob)),
+            ("address", m(user_id, "Andijon, Navoiy ko'chasi 1")),
+            ("phone", m(user_id, f"+99890{1_000_000 + user_id % 9_000_000:07d}")),
+            ("phone_confirmation", c(user_id, cb("phone_confirm", "yes"))),
+            ("is_student", m(user_id, "Ha")),
+            ("education", c(user_id, cb("education", "Oliy"))),
+            ("gender", c(user_id, cb("gender", "Erkak"))),
+            ("russian_level", c(user_id, cb("russian_level", "O'rtacha"))),
+            ("russian_voice", m(user_id, voice={"file_id": f"voice-{user_id}", "file_unique_id": "v", "duration": 15})),
+            ("english_level", c(user_id, cb("english_level", "Ilg'or"))),
+            ("english_media", m(user_id, video={
+                "file_id": f"video-{user_id}", "file_unique_id": "e", "width": 1, "height": 1, "duration": 30,
+            })),
+            ("ielts_certificate", m(user_id, document={
+                "file_id": f"pdf-{user_id}", "file_unique_id": "p", "mime_type": "application/pdf",
+            })),
+            ("work_experience", m(user_id, "1-3 years")),
+            ("last_workplace", m(user_id, "Proper, relocation")),
+            ("photo", m(user_id, photo=[{"file_id": f"photo-{user_id}", "file_unique_id": "ph", "width": 1, "height": 1}])),
+            ("hear_about", m(user_id, "Instagram")),
+            ("confirmation", c(user_id, cb("confirm", "yes"))),
+        ]
+
+    async def applicant(self, user_id: int) -> bool:
+        from bot.keyboards.callback_data import encode_callback
+
+        hr_post = asyncio.get_running_loop().create_future()
+        self.api.hr_posts[user_id] = hr_post
+        try:
+            for name, update in self.script(user_id):
+                if not await self.step(name, update):
+                    return False
+            # The outbox posts to the HR group in background; HR clicks a decision on that post
+            started = time.perf_counter()
+            try:
+                message_id = await asyncio.wait_for(hr_post, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.failures["hr_post"] += 1
+                return False
+            self.latencies["hr_post"].append(time.perf_counter() - started)
+            decision = _DECISIONS[user_id % len(_DECISIONS)]
+            return await self.step(
+                f"hr_{decision}", self.callback(
+                    HR_USER, encode_callback(decision, id=user_id), chat_id=HR_GROUP, message_id=message_id
+                )
+            )
+        finally:
+            self.api.hr_posts.pop(user_id, None)
+
+
+# ---------- runner ----------
+
+def _configure_environment(data_dir: str, storage: str) -> None:
+    """Settings read by bot.config at import: must run before run.py is imported"""
+    os.environ.update({
+        "BOT_TOKEN": TOKEN,
+        "HR_GROUP_ID": str(HR_GROUP),
+        "FSM_STORAGE": storage,
+        "FSM_DB_PATH": os.path.join(data_dir, "fsm.sqlite3"),
+        "FSM_SPILL_PATH": os.path.join(data_dir, "fsm_spill.sqlite3"),
+        "OUTBOX_PATH": os.path.join(data_dir, "outbox.jsonl"),
+        "APPLICATIONS_DB_PATH": os.path.join(data_dir, "applications.sqlite3"),
+        "DEDUP_DB_PATH": os.path.join(data_dir, "dedup.sqlite3"),
+        "FUNNEL_DB_PATH": os.path.join(data_dir, "funnel.sqlite3"),
+        "TRACE_PATH": os.path.join(data_dir, "traces.jsonl"),
+        "PROFILE_DIR": os.path.join(data_dir, "profiles"),
+        "METRICS_ENABLED": "false",
+    })
+
+
+def _report(label: str, harness: Harness, elapsed: float, completed: int, applicants: int) -> None:
+    updates = sum(len(values) for values in harness.latencies.values() if values) - len(harness.latencies["hr_post"])
+    everything = [value for name, values in harness.latencies.items() if name != "hr_post" for value in values]
+    print(f"\n=== {label}: {completed}/{applicants} applicants finished in {elapsed:.1f}s ===")
+    print(f"throughput: {updates / elapsed:,.0f} updates/s, {completed / elapsed:,.1f} applications/s")
+    print(
+        f"all steps: p50 {_percentile(everything, 0.5) * 1000:.1f} ms, "
+        f"p95 {_percentile(everything, 0.95) * 1000:.1f} ms, p99 {_percentile(everything, 0.99) * 1000:.1f} ms"
+    )
+    print(f"{'step':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in harness.latencies.items():
+        print(
+            f"{name:<20}{len(values):>8}{_percentile(values, 0.5) * 1000:>10.1f}"
+            f"{_percentile(values, 0.95) * 1000:>10.1f}{_percentile(values, 0.99) * 1000:>10.1f}"
+        )
+    if harness.failures:
+        print(f"timed out: {dict(harness.failures)}")
+
+
+async def run_load_test(
+    levels: List[int], port: int, timeout: float, connections: int, rate_limit: bool, log_level: str
+) -> None:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import run
+    from bot.middlewares.rate_limiter import RateLimiter
+
+    logging.getLogger().setLevel(log_level)
+
+    api = FakeBotAPI()
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"), limit=connections)
+    bot = Bot(TOKEN, session=session)
+    if rate_limit:
+        bot.session.middleware(RateLimiter())
+    dp = run.create_dispatcher()
+    harness = Harness(api, timeout)
+    dp.update.outer_middleware(harness.track_updates)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+    first_user = 10_000_000
+    try:
+        for applicants in levels:
+            harness.latencies.clear()
+            harness.failures.clear()
+            users = range(first_user, first_user + applicants)
+            first_user += applicants
+            started = time.perf_counter()
+            results = await asyncio.gather(*(harness.applicant(user_id) for user_id in users))
+            _report(f"{applicants} concurrent applicants", harness, time.perf_counter() - started, sum(results), applicants)
+        print(f"\nBot API calls: {dict(api.calls.most_common())}")
+    finally:
+        await dp.stop_polling()
+        await polling
+        await bot.session.close()
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the bot against a fake Telegram Bot API")
+    parser.add_argument("--applicants", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="concurrent applicants per round")
+    parser.add_argument("--storage", choices=["memory", "sqlite", "evicting"], default="memory")
+    parser.add_argument("--port", type=int, default=8089, help="port of the fake Bot API")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for one step")
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connections of the bot session")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep Telegram's per-chat limits (steps then take ~1s each)")
+    parser.add_argument("--log-level", default="WARNING", help="bot log level (INFO logs every update)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hr-load-") as data_dir:
+        _configure_environment(data_dir, args.storage)
+        asyncio.run(run_load_test(
+            args.applicants, args.port, args.timeout, args.connections, args.rate_limit, args.log_level.upper()
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -13,6 +14,41 @@ load_dotenv(dotenv_path=ENV_FILE, override=False)
 
 logger = logging.getLogger(__name__)
 
+
+def _get_int_env(name: str, default: int) -> int:
+    """Read an integer from the environment, falling back to default on bad values"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        logger.error(f"Invalid {name} value: {value}. Must be an integer.")
+        return default
+
+
+def _get_bool_env(name: str, default: bool) -> bool:
+    """Read a boolean flag (1/0, true/false, yes/no) from the environment"""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_int_mapping(value: str, setting: str) -> dict:
+    """Parse "waiting_for_photo=600,waiting_for_english_media=600" into {name: int}"""
+    mapping = {}
+    for item in value.split(","):
+        name, _, number = item.strip().partition("=")
+        if not name:
+            continue
+        try:
+            mapping[name.strip()] = int(number)
+        except ValueError:
+            logger.error(f"Invalid {setting} entry '{item}', ignoring")
+    return mapping
+
+
 # Bot configuration - try .env first, then OS environment as fallback
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 # Telegram group ID where applications will be sent
@@ -29,6 +65,119 @@ if _hr_group_id_str:
 else:
     HR_GROUP_ID = None
 
+# Update ingestion mode: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+
+# Webhook settings (only used when BOT_MODE=webhook)
+# Public HTTPS base URL Telegram will POST updates to, e.g. https://hr.example.com
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Local address the embedded aiohttp server listens on
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = _get_int_env("WEBHOOK_PORT", 8080)
+# Secret checked against X-Telegram-Bot-Api-Secret-Token
+# If empty, a random secret is generated on every start
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+# Answer simple replies inside the webhook HTTP response (saves one API call).
+# Off by default: every handler then runs while Telegram's request is open, and
+# a handler error becomes a 500 that Telegram redelivers
+WEBHOOK_REPLY_IN_RESPONSE = _get_bool_env("WEBHOOK_REPLY_IN_RESPONSE", False)
+
+# Worker processes for handling updates (0 or 1 = single process)
+# With N > 1 this process only receives updates and shards them by user id
+WORKER_PROCESSES = _get_int_env("WORKER_PROCESSES", 0)
+
+# FSM storage backend: "memory" (default), "sqlite" (survives restarts)
+# or "evicting" (memory, idle drafts spilled to disk)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory").strip().lower()
+FSM_DB_PATH = Path(os.getenv("FSM_DB_PATH", str(PROJECT_ROOT / "data" / "fsm.sqlite3")))
+# Write-behind batching: flush dirty states every N ms or at N dirty records
+FSM_FLUSH_INTERVAL_MS = _get_int_env("FSM_FLUSH_INTERVAL_MS", 500)
+FSM_FLUSH_THRESHOLD = _get_int_env("FSM_FLUSH_THRESHOLD", 500)
+FSM_CACHE_SIZE = _get_int_env("FSM_CACHE_SIZE", 10000)
+# Evicting storage: idle drafts are moved from RAM to FSM_SPILL_PATH
+FSM_SPILL_PATH = Path(os.getenv("FSM_SPILL_PATH", str(PROJECT_ROOT / "data" / "fsm_spill.sqlite3")))
+FSM_IDLE_TTL_SECONDS = _get_int_env("FSM_IDLE_TTL_SECONDS", 1800)
+FSM_MEMORY_BUDGET_MB = _get_int_env("FSM_MEMORY_BUDGET_MB", 64)
+# Spilled drafts untouched for this many days are deleted (0 = keep forever)
+FSM_SPILL_MAX_AGE_DAYS = _get_int_env("FSM_SPILL_MAX_AGE_DAYS", 30)
+
+
+# Per-state idle TTL overrides (seconds), e.g. abandoned media steps can go to disk sooner
+FSM_STATE_IDLE_TTL = _parse_int_mapping(os.getenv("FSM_STATE_IDLE_TTL", ""), "FSM_STATE_IDLE_TTL")
+
+# Zero-downtime restart: a new instance takes FSM state and polling offset
+# from the running one over this Unix socket (not available on Windows)
+HANDOFF_ENABLED = _get_bool_env("HANDOFF_ENABLED", sys.platform != "win32")
+HANDOFF_SOCKET = Path(os.getenv("HANDOFF_SOCKET", str(PROJECT_ROOT / ".bot_handoff.sock")))
+# Max seconds the old instance waits for in-flight handlers before handing over
+HANDOFF_DRAIN_TIMEOUT = _get_int_env("HANDOFF_DRAIN_TIMEOUT", 30)
+
+# Outbox: confirmed applications are journaled here and delivered to HR in background
+OUTBOX_PATH = Path(os.getenv("OUTBOX_PATH", str(PROJECT_ROOT / "data" / "outbox.jsonl")))
+OUTBOX_WORKERS = _get_int_env("OUTBOX_WORKERS", 2)
+# Failed deliveries are retried with exponential backoff, at most this many times
+OUTBOX_MAX_ATTEMPTS = _get_int_env("OUTBOX_MAX_ATTEMPTS", 12)
+
+# Database of submitted applications (queried by HR commands and exports)
+APPLICATIONS_DB_PATH = Path(os.getenv("APPLICATIONS_DB_PATH", str(PROJECT_ROOT / "data" / "applications.sqlite3")))
+
+# Repeat applications (same phone, Telegram user or name + birth date for the same position):
+# "flag" posts them with a warning, "merge" keeps them out of the HR group, "off" disables the check
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag").strip().lower()
+DEDUP_DB_PATH = Path(os.getenv("DEDUP_DB_PATH", str(PROJECT_ROOT / "data" / "dedup.sqlite3")))
+# Days after an application during which another one for the same position is a repeat
+DEDUP_COOLDOWN_DAYS = _get_int_env("DEDUP_COOLDOWN_DAYS", 30)
+# Per-position overrides, e.g. "IELTS Instructor=14,Branch Manager=90"
+DEDUP_POSITION_COOLDOWN_DAYS = _parse_int_mapping(
+    os.getenv("DEDUP_POSITION_COOLDOWN_DAYS", ""), "DEDUP_POSITION_COOLDOWN_DAYS"
+)
+# Expected number of recent applications; sizes the in-memory prefilter
+DEDUP_BLOOM_CAPACITY = _get_int_env("DEDUP_BLOOM_CAPACITY", 200_000)
+
+# Funnel analytics: per-step conversion and dwell time of the application flow (HR /funnel)
+FUNNEL_ENABLED = _get_bool_env("FUNNEL_ENABLED", True)
+FUNNEL_DB_PATH = Path(os.getenv("FUNNEL_DB_PATH", str(PROJECT_ROOT / "data" / "funnel.sqlite3")))
+# Seconds between writes of in-memory counters to FUNNEL_DB_PATH
+FUNNEL_FLUSH_INTERVAL = _get_int_env("FUNNEL_FLUSH_INTERVAL", 60)
+# Time resolution of the stored rollups
+FUNNEL_BUCKET_SECONDS = _get_int_env("FUNNEL_BUCKET_SECONDS", 3600)
+
+# Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics
+# (with WORKER_PROCESSES, worker N listens on METRICS_PORT + N)
+METRICS_ENABLED = _get_bool_env("METRICS_ENABLED", False)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _get_int_env("METRICS_PORT", 9100)
+# Drafts per FSM state (hrbot_fsm_drafts) are recounted at most this often
+METRICS_FSM_COUNT_SECONDS = _get_int_env("METRICS_FSM_COUNT_SECONDS", 60)
+
+# Sampling profiler of the event loop (HR /profile, or SIGUSR2 writing to PROFILE_DIR)
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(PROJECT_ROOT / "data" / "profiles")))
+PROFILE_SAMPLE_INTERVAL_MS = _get_int_env("PROFILE_SAMPLE_INTERVAL_MS", 5)
+# Length of a profile started by SIGUSR2
+PROFILE_SIGNAL_SECONDS = _get_int_env("PROFILE_SIGNAL_SECONDS", 30)
+
+# Per-update tracing: slow or failed updates are written in full to TRACE_PATH (JSON lines)
+TRACE_ENABLED = _get_bool_env("TRACE_ENABLED", True)
+TRACE_PATH = Path(os.getenv("TRACE_PATH", str(PROJECT_ROOT / "data" / "traces.jsonl")))
+# Updates taking at least this long are kept
+TRACE_SLOW_MS = _get_int_env("TRACE_SLOW_MS", 1000)
+# Percent of fast, successful updates kept anyway (0 = none)
+TRACE_SAMPLE_PERCENT = _get_int_env("TRACE_SAMPLE_PERCENT", 0)
+
+# Bot texts: bot/locales/<language>.json, compiled at startup (see bot/utils/texts.py)
+TEXTS_DIR = Path(os.getenv("TEXTS_DIR", str(PROJECT_ROOT / "bot" / "locales")))
+# Seconds between checks for edited translation files (0 = no hot reload)
+TEXTS_RELOAD_INTERVAL = _get_int_env("TEXTS_RELOAD_INTERVAL", 5)
+
+# Outbound rate limits (Telegram: ~30 msg/s overall, ~1 msg/s per chat, ~20 msg/min per group)
+RATE_LIMIT_ENABLED = _get_bool_env("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_GLOBAL_PER_SECOND = _get_int_env("RATE_LIMIT_GLOBAL_PER_SECOND", 30)
+RATE_LIMIT_CHAT_PER_SECOND = _get_int_env("RATE_LIMIT_CHAT_PER_SECOND", 1)
+RATE_LIMIT_GROUP_PER_MINUTE = _get_int_env("RATE_LIMIT_GROUP_PER_MINUTE", 20)
+# Requests hitting a 429 are retried automatically if retry_after is at most this many seconds
+RATE_LIMIT_MAX_RETRY_WAIT = _get_int_env("RATE_LIMIT_MAX_RETRY_WAIT", 30)
+
 # Bot information
 BOT_NAME = "Work at Proper"
 COMPANY_NAME = "Proper English School"
@@ -95,6 +244,16 @@ WORK_EXPERIENCE = [
     "5+ years",
 ]
 
+# Other ways applicants type catalog entries instead of pressing the button (see bot/utils/fuzzy.py)
+CATALOG_ALIASES = {
+    "Business Center": ["Biznes markaz", "Бизнес центр"],
+    "No experience": ["Tajriba yo'q", "Tajribasiz", "Нет опыта"],
+    "1 year": ["1 yil", "1 год"],
+    "1-3 years": ["1-3 yil", "1-3 года"],
+    "3-5 years": ["3-5 yil", "3-5 лет"],
+    "5+ years": ["5+ yil", "5 yildan ko'p", "Более 5 лет"],
+}
+
 # Where did you hear about us options (will be text input)
 # But we can provide common options as buttons if needed
 
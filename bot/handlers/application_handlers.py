@@ -1,9 +1,10 @@
 """Application handlers - Step-by-step FSM flow"""
 import logging
 from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, TelegramObject
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
+from typing import Optional
 
 from bot.states.application_states import ApplicationStates
 from bot.keyboards.reply_keyboards import (
@@ -11,160 +12,202 @@ from bot.keyboards.reply_keyboards import (
     get_yes_no_keyboard, get_back_keyboard, get_work_experience_keyboard_reply,
     get_phone_keyboard
 )
+from bot.keyboards.buttons import BACK, buttons
+from bot.keyboards.callback_data import CallbackKind, CallbackPayload
 from bot.keyboards.inline_keyboards import (
     get_position_keyboard, get_education_keyboard, get_gender_keyboard,
     get_language_level_keyboard, get_confirmation_keyboard, get_skip_keyboard,
-    get_phone_confirmation_keyboard, get_hr_decision_keyboard
+    get_phone_confirmation_keyboard
 )
 from bot.config import (
     BRANCHES, DEPARTMENTS, POSITIONS, HR_GROUP_ID, MIN_AUDIO_DURATION,
-    COMPANY_NAME, REGION
+    COMPANY_NAME
 )
 from bot.utils.validators import validate_phone, validate_date, format_phone
-from bot.utils.formatters import format_application_summary
-from bot.utils.file_handlers import send_media_to_group
+from bot.utils.formatters import format_application_summary, format_duplicate_note
 from bot.utils.texts import get_text
+from bot.models.application_draft import ApplicationDraft
+from bot.services.dedup import DuplicateDetector, DuplicateMatch
+from bot.services.outbox import Outbox
+from bot.services.tracing import span
+from bot.storage.applications import ApplicationStore
+from bot.middlewares.rate_limiter import Priority, request_priority
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Simple retry prompts are *returned* instead of awaited so that webhook mode
+# can deliver them inside the HTTP response if enabled (see main_handlers.py).
+
+
+# ============================================
+# DRAFTS SAVED WITH OLDER CATALOGS
+# ============================================
+
+# Catalog answer -> step that asks it, its question and keyboard
+_ANSWER_STEPS = {
+    "branch": (ApplicationStates.waiting_for_branch, "select_branch", lambda draft, lang: get_branch_keyboard(lang=lang)),
+    "department": (ApplicationStates.waiting_for_department, "select_department", lambda draft, lang: get_department_keyboard(lang=lang)),
+    "position": (ApplicationStates.waiting_for_position, "select_position", lambda draft, lang: get_position_keyboard(draft.department_key)),
+    "is_student": (ApplicationStates.waiting_for_is_student, "ask_is_student", lambda draft, lang: get_yes_no_keyboard(lang=lang)),
+    "education": (ApplicationStates.waiting_for_education, "ask_education", lambda draft, lang: get_education_keyboard()),
+    "gender": (ApplicationStates.waiting_for_gender, "ask_gender", lambda draft, lang: get_gender_keyboard()),
+    "russian_level": (ApplicationStates.waiting_for_russian_level, "ask_russian_level", lambda draft, lang: get_language_level_keyboard("russian")),
+    "english_level": (ApplicationStates.waiting_for_english_level, "ask_english_level", lambda draft, lang: get_language_level_keyboard("english")),
+    "english_media_type": (ApplicationStates.waiting_for_english_media, "ask_english_media", lambda draft, lang: get_skip_keyboard()),
+    "work_experience": (ApplicationStates.waiting_for_work_experience, "ask_work_experience", lambda draft, lang: get_work_experience_keyboard_reply(lang=lang)),
+}
+_STEP_ORDER = {state.state: index for index, state in enumerate(ApplicationStates.__all_states__)}
+
+
+async def ask_again(event: TelegramObject, state: FSMContext, draft: ApplicationDraft) -> bool:
+    """
+    Go back to the first step whose answer was dropped from the draft (draft.stale)
+    and ask it again; False if the applicant has not got past that step yet.
+    Called by StateCacheMiddleware instead of the handler.
+    """
+    current = await state.get_state()
+    steps = [_ANSWER_STEPS[name] for name in draft.stale if name in _ANSWER_STEPS]
+    if current not in _STEP_ORDER or not steps:
+        return False
+    step, question, keyboard = min(steps, key=lambda step: _STEP_ORDER[step[0].state])
+    if _STEP_ORDER[current] <= _STEP_ORDER[step.state]:
+        return False
+    
+    user_lang = draft.user_language
+    logger.info(f"Catalog of {', '.join(draft.stale)} changed, user {state.key.user_id} goes back to {step.state}")
+    if isinstance(event, CallbackQuery):
+        await event.answer()
+        event = event.message
+    await event.answer(get_text("catalog_changed", lang=user_lang))
+    await event.answer(get_text(question, lang=user_lang), reply_markup=keyboard(draft, user_lang))
+    await state.set_state(step)
+    return True
+
 
 # ============================================
 # STEP 1: VACANCY SELECTION
 # ============================================
 
 @router.message(ApplicationStates.waiting_for_branch)
-async def process_branch(message: Message, state: FSMContext):
+async def process_branch(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process branch selection (REPLY BUTTONS)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
+    # A branch button, or typed text meaning one (see bot/keyboards/buttons.py)
+    button = buttons.match(message.text, ("back", "branch"))
+    if button == BACK:
         # Preserve user language and return to main menu
-        await state.clear()
-        await state.update_data(user_language=user_lang)
+        await state.set_state(None)
+        draft.reset(user_language=user_lang)
         await message.answer(
             get_text("main_menu", lang=user_lang) + ":",
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=get_main_menu_keyboard(lang=user_lang)
         )
         return
     
-    # Check if selected branch is valid
-    branch_name = None
-    for key, name in BRANCHES.items():
-        if message.text == name:
-            branch_name = name
-            break
-    
-    if not branch_name:
+    if button is None:
         error_text = get_text("invalid_selection", lang=user_lang)
-        if error_text == "invalid_selection":
-            error_text = "❌ Iltimos, tugmalardan birini tanlang:"
         await message.answer(error_text)
         return
     
-    # Update state with branch selection, preserve language
-    await state.update_data(branch=branch_name, city=REGION, user_language=user_lang)
-    confirmation_text = get_text("branch_selected", lang=user_lang)
-    if confirmation_text == "branch_selected":
-        confirmation_text = f"✅ Filial: {branch_name}\n\n📋 Endi bo'limni tanlang:"
+    # Update state with branch selection
+    branch_name = BRANCHES[button.id]
+    draft.branch = branch_name
+    confirmation_text = get_text("branch_selected", lang=user_lang, branch=branch_name)
     await message.answer(confirmation_text)
-    await message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard())
+    await message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_department)
 
 
 @router.message(ApplicationStates.waiting_for_department)
-async def process_department(message: Message, state: FSMContext):
+async def process_department(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process department selection (REPLY BUTTONS)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("select_branch", lang=user_lang), reply_markup=get_branch_keyboard())
+    button = buttons.match(message.text, ("back", "department"))
+    if button == BACK:
+        await message.answer(get_text("select_branch", lang=user_lang), reply_markup=get_branch_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_branch)
         return
     
-    # Check if selected department is valid
-    dept_key = None
-    dept_name = None
-    for key, name in DEPARTMENTS.items():
-        if message.text == name:
-            dept_key = key
-            dept_name = name
-            break
-    
-    if not dept_key:
+    if button is None:
         error_text = get_text("invalid_selection", lang=user_lang)
-        if error_text == "invalid_selection":
-            error_text = "❌ Iltimos, tugmalardan birini tanlang:"
         await message.answer(error_text)
         return
     
-    # Update state with department, preserve language
-    await state.update_data(department=dept_name, department_key=dept_key, user_language=user_lang)
-    confirmation_text = get_text("department_selected", lang=user_lang)
-    if confirmation_text == "department_selected":
-        confirmation_text = f"✅ Bo'lim: {dept_name}\n\n💼 Endi lavozimni tanlang (inline tugmalar):"
+    # Update state with department
+    dept_key = button.id
+    dept_name = DEPARTMENTS[dept_key]
+    draft.department_key = dept_key
+    confirmation_text = get_text("department_selected", lang=user_lang, department=dept_name)
     await message.answer(confirmation_text)
     await message.answer(get_text("select_position", lang=user_lang), reply_markup=get_position_keyboard(dept_key))
     await state.set_state(ApplicationStates.waiting_for_position)
 
 
-@router.callback_query(F.data.startswith("position:"), ApplicationStates.waiting_for_position)
-async def process_position(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("position"), ApplicationStates.waiting_for_position)
+async def process_position(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process position selection (INLINE BUTTONS)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    position = callback.data.split(":", 1)[1]
+    position = payload.value
     
     # Handle back button
     if position == "back":
         back_text = get_text("back", lang=user_lang)
-        if back_text == "back":
-            back_text = "Orqaga"
         await callback.answer(back_text)
         await callback.message.edit_text(get_text("select_department", lang=user_lang))
-        await callback.message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard())
+        await callback.message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_department)
         return
     
-    # Update state with position, preserve language
-    await state.update_data(position=position, user_language=user_lang)
-    answer_text = get_text("position_selected", lang=user_lang)
-    if answer_text == "position_selected":
-        answer_text = f"Lavozim tanlandi: {position}"
+    # Update state with position (must belong to the selected department)
+    try:
+        draft.position = position
+    except ValueError:
+        error_text = get_text("invalid_selection", lang=user_lang)
+        await callback.answer(error_text)
+        return
+    answer_text = get_text("position_selected", lang=user_lang, position=position)
     await callback.answer(answer_text)
     
     # Start personal information collection
-    position_confirmation = get_text("position_confirmed", lang=user_lang)
-    if position_confirmation == "position_confirmed":
-        position_confirmation = f"✅ Lavozim: {position}"
+    position_confirmation = get_text("position_confirmed", lang=user_lang, position=position)
     await callback.message.edit_text(position_confirmation)
     await callback.message.answer(get_text("personal_info", lang=user_lang))
-    await callback.message.answer(get_text("ask_passport_name", lang=user_lang), reply_markup=get_back_keyboard())
+    await callback.message.answer(get_text("ask_passport_name", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_passport_name)
 
 
 @router.message(ApplicationStates.waiting_for_position)
-async def process_position_text(message: Message, state: FSMContext):
-    """Handle text messages during position selection (show keyboard again)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
-    
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard())
+async def process_position_text(message: Message, state: FSMContext, draft: ApplicationDraft):
+    """Handle text messages during position selection (typed position, or show keyboard again)"""
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
+    dept_key = draft.department_key
+    
+    button = buttons.match(message.text, ("back", "position"), ids=POSITIONS.get(dept_key, ()))
+    if button == BACK:
+        await message.answer(get_text("select_department", lang=user_lang), reply_markup=get_department_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_department)
         return
     
-    dept_key = data.get("department_key")
+    if button is not None:
+        # A typed position of the selected department: same as pressing its button
+        draft.position = button.id
+        await message.answer(get_text("position_confirmed", lang=user_lang, position=button.id))
+        await message.answer(get_text("personal_info", lang=user_lang))
+        await message.answer(get_text("ask_passport_name", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
+        await state.set_state(ApplicationStates.waiting_for_passport_name)
+        return
+    
     prompt_text = get_text("select_position_prompt", lang=user_lang)
-    if prompt_text == "select_position_prompt":
-        prompt_text = "Iltimos, lavozimni inline tugmalardan tanlang:"
     await message.answer(prompt_text, reply_markup=get_position_keyboard(dept_key))
 
 
@@ -173,112 +216,100 @@ async def process_position_text(message: Message, state: FSMContext):
 # ============================================
 
 @router.message(ApplicationStates.waiting_for_passport_name)
-async def process_passport_name(message: Message, state: FSMContext):
+async def process_passport_name(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process passport name"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        dept_key = data.get("department_key")
+    if buttons.resolve(message.text) == BACK:
+        dept_key = draft.department_key
         position_prompt = get_text("select_position", lang=user_lang)
         await message.answer(position_prompt, reply_markup=get_position_keyboard(dept_key))
         await state.set_state(ApplicationStates.waiting_for_position)
         return
     
-    # Preserve language when updating data
-    await state.update_data(passport_name=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_passport_surname", lang=user_lang), reply_markup=get_back_keyboard())
+    draft.passport_name = message.text
+    await message.answer(get_text("ask_passport_surname", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_passport_surname)
 
 
 @router.message(ApplicationStates.waiting_for_passport_surname)
-async def process_passport_surname(message: Message, state: FSMContext):
+async def process_passport_surname(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process passport surname"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_passport_name", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_passport_name", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_passport_name)
         return
     
-    # Preserve language when updating data
-    await state.update_data(passport_surname=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_father_name", lang=user_lang), reply_markup=get_back_keyboard())
+    draft.passport_surname = message.text
+    await message.answer(get_text("ask_father_name", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_father_name)
 
 
 @router.message(ApplicationStates.waiting_for_father_name)
-async def process_father_name(message: Message, state: FSMContext):
+async def process_father_name(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process father's name"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_passport_surname", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_passport_surname", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_passport_surname)
         return
     
-    # Preserve language when updating data
-    await state.update_data(father_name=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_date_of_birth", lang=user_lang), reply_markup=get_back_keyboard())
+    draft.father_name = message.text
+    await message.answer(get_text("ask_date_of_birth", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_date_of_birth)
 
 
 @router.message(ApplicationStates.waiting_for_date_of_birth)
-async def process_date_of_birth(message: Message, state: FSMContext):
+async def process_date_of_birth(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process date of birth"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_father_name", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_father_name", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_father_name)
         return
     
     if not validate_date(message.text):
-        await message.answer(get_text("invalid_date", lang=user_lang))
-        return
+        return message.answer(get_text("invalid_date", lang=user_lang))
     
-    # Preserve language when updating data
-    await state.update_data(date_of_birth=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_address", lang=user_lang), reply_markup=get_back_keyboard())
+    draft.date_of_birth = message.text
+    await message.answer(get_text("ask_address", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_address)
 
 
 @router.message(ApplicationStates.waiting_for_address)
-async def process_address(message: Message, state: FSMContext):
+async def process_address(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process address"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_date_of_birth", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_date_of_birth", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_date_of_birth)
         return
     
-    # Preserve language when updating data
-    await state.update_data(address=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard())
+    draft.address = message.text
+    await message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_phone)
 
 
 @router.message(ApplicationStates.waiting_for_phone, F.contact)
-async def process_phone_contact(message: Message, state: FSMContext):
+async def process_phone_contact(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process phone number from contact sharing (PRIMARY METHOD)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     # Extract phone from contact
     if not message.contact or not message.contact.phone_number:
         error_text = get_text("invalid_phone", lang=user_lang)
-        await message.answer(error_text, reply_markup=get_phone_keyboard())
+        await message.answer(error_text, reply_markup=get_phone_keyboard(lang=user_lang))
         return
     
     contact_phone = message.contact.phone_number
@@ -287,21 +318,15 @@ async def process_phone_contact(message: Message, state: FSMContext):
     formatted_phone = format_phone(contact_phone)
     if not validate_phone(formatted_phone):
         error_text = get_text("invalid_phone", lang=user_lang)
-        await message.answer(error_text, reply_markup=get_phone_keyboard())
+        await message.answer(error_text, reply_markup=get_phone_keyboard(lang=user_lang))
         return
     
     # Store phone temporarily (will be confirmed in next step)
-    await state.update_data(phone=formatted_phone, user_language=user_lang)
+    draft.phone = formatted_phone
     
     # Show confirmation step
     confirmation_text = get_text("phone_confirmation_question", lang=user_lang)
-    if confirmation_text == "phone_confirmation_question":
-        confirmation_text = "Telefon raqamingiz to'g'rimi?"
-    
     phone_display = get_text("phone_formatted_display", lang=user_lang)
-    if phone_display == "phone_formatted_display":
-        phone_display = "📱 Telefon raqami:"
-    
     await message.answer(
         f"{phone_display}\n`{formatted_phone}`\n\n{confirmation_text}",
         parse_mode="Markdown",
@@ -311,31 +336,30 @@ async def process_phone_contact(message: Message, state: FSMContext):
 
 
 @router.message(ApplicationStates.waiting_for_phone)
-async def process_phone(message: Message, state: FSMContext):
+async def process_phone(message: Message, state: FSMContext, draft: ApplicationDraft):
     """
     Process phone number from manual text input (SECONDARY METHOD).
     Only accepts if user types the number manually.
     """
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     # Handle back button
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_address", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_address", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_address)
         return
     
     # Reject contact button text if sent as text (not actual contact)
     if message.text and ("kontakt" in message.text.lower() or "contact" in message.text.lower()):
         error_text = get_text("invalid_phone", lang=user_lang)
-        await message.answer(error_text, reply_markup=get_phone_keyboard())
+        await message.answer(error_text, reply_markup=get_phone_keyboard(lang=user_lang))
         return
     
     # Reject empty or non-text input
     if not message.text or not message.text.strip():
         error_text = get_text("invalid_phone", lang=user_lang)
-        await message.answer(error_text, reply_markup=get_phone_keyboard())
+        await message.answer(error_text, reply_markup=get_phone_keyboard(lang=user_lang))
         return
     
     # Format the phone number
@@ -344,21 +368,15 @@ async def process_phone(message: Message, state: FSMContext):
     # Strict validation
     if not formatted_phone or not validate_phone(formatted_phone):
         error_text = get_text("invalid_phone", lang=user_lang)
-        await message.answer(error_text, reply_markup=get_phone_keyboard())
+        await message.answer(error_text, reply_markup=get_phone_keyboard(lang=user_lang))
         return
     
     # Store phone temporarily (will be confirmed in next step)
-    await state.update_data(phone=formatted_phone, user_language=user_lang)
+    draft.phone = formatted_phone
     
     # Show confirmation step
     confirmation_text = get_text("phone_confirmation_question", lang=user_lang)
-    if confirmation_text == "phone_confirmation_question":
-        confirmation_text = "Telefon raqamingiz to'g'rimi?"
-    
     phone_display = get_text("phone_formatted_display", lang=user_lang)
-    if phone_display == "phone_formatted_display":
-        phone_display = "📱 Telefon raqami:"
-    
     await message.answer(
         f"{phone_display}\n`{formatted_phone}`\n\n{confirmation_text}",
         parse_mode="Markdown",
@@ -367,76 +385,62 @@ async def process_phone(message: Message, state: FSMContext):
     await state.set_state(ApplicationStates.waiting_for_phone_confirmation)
 
 
-@router.callback_query(F.data.startswith("phone_confirm:"), ApplicationStates.waiting_for_phone_confirmation)
-async def process_phone_confirmation(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("phone_confirm"), ApplicationStates.waiting_for_phone_confirmation)
+async def process_phone_confirmation(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process phone number confirmation"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    action = callback.data.split(":", 1)[1]
+    action = payload.value
     
     if action == "yes":
         # Confirm - proceed to next step
-        phone = data.get("phone")
+        phone = draft.phone
         
         # Double-check phone is valid before proceeding
         if not phone or not validate_phone(phone):
             error_text = get_text("invalid_phone", lang=user_lang)
             await callback.answer(error_text)
             await callback.message.edit_text(error_text)
-            await callback.message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard())
+            await callback.message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard(lang=user_lang))
             await state.set_state(ApplicationStates.waiting_for_phone)
             return
         
         # Phone is confirmed and valid - proceed
         confirm_text = get_text("phone_received", lang=user_lang)
-        if confirm_text == "phone_received":
-            confirm_text = "✅ Telefon raqami tasdiqlandi!"
-        
         await callback.answer(confirm_text)
         await callback.message.edit_text(confirm_text)
-        await callback.message.answer(get_text("ask_is_student", lang=user_lang), reply_markup=get_yes_no_keyboard())
+        await callback.message.answer(get_text("ask_is_student", lang=user_lang), reply_markup=get_yes_no_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_is_student)
         
     elif action == "edit":
         # Edit - go back to phone input (EXACTLY one step back)
         edit_text = get_text("ask_phone", lang=user_lang)
-        if edit_text == "ask_phone":
-            edit_text = "6️⃣ Telefon raqamingizni kiriting:\n\n📱 Kontakt tugmasini bosing yoki raqamni qo'lda kiriting (+998XXXXXXXXX formatida):"
-        
         await callback.answer("✏️ Telefon raqamni o'zgartirish")
         await callback.message.edit_text(edit_text)
-        await callback.message.answer(edit_text, reply_markup=get_phone_keyboard())
+        await callback.message.answer(edit_text, reply_markup=get_phone_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_phone)
 
 
 @router.message(ApplicationStates.waiting_for_phone_confirmation)
-async def process_phone_confirmation_invalid(message: Message, state: FSMContext):
+async def process_phone_confirmation_invalid(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle invalid input during phone confirmation (user should use buttons)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     # If back button, go to phone input
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_phone", lang=user_lang), reply_markup=get_phone_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_phone)
         return
     
     # Show confirmation again
-    phone = data.get("phone", "")
+    phone = draft.phone or ""
     confirmation_text = get_text("phone_confirmation_question", lang=user_lang)
-    if confirmation_text == "phone_confirmation_question":
-        confirmation_text = "Telefon raqamingiz to'g'rimi?"
-    
     phone_display = get_text("phone_formatted_display", lang=user_lang)
-    if phone_display == "phone_formatted_display":
-        phone_display = "📱 Telefon raqami:"
-    
-    prompt_text = "Iltimos, quyidagi tugmalardan foydalaning:"
-    if user_lang != "uz":
-        prompt_text = "Please use the buttons below:"
+    prompt_text = get_text("use_buttons_below", lang=user_lang)
     
     await message.answer(
         f"{prompt_text}\n\n{phone_display}\n`{phone}`\n\n{confirmation_text}",
@@ -446,23 +450,17 @@ async def process_phone_confirmation_invalid(message: Message, state: FSMContext
 
 
 @router.message(ApplicationStates.waiting_for_is_student)
-async def process_is_student(message: Message, state: FSMContext):
+async def process_is_student(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process is student question"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
+    button = buttons.match(message.text, ("back", "yes", "no"))
+    if button == BACK:
         # Go back to phone confirmation (not phone input)
-        phone = data.get("phone", "")
+        phone = draft.phone or ""
         confirmation_text = get_text("phone_confirmation_question", lang=user_lang)
-        if confirmation_text == "phone_confirmation_question":
-            confirmation_text = "Telefon raqamingiz to'g'rimi?"
-        
         phone_display = get_text("phone_formatted_display", lang=user_lang)
-        if phone_display == "phone_formatted_display":
-            phone_display = "📱 Telefon raqami:"
-        
         await message.answer(
             f"{phone_display}\n`{phone}`\n\n{confirmation_text}",
             parse_mode="Markdown",
@@ -471,60 +469,50 @@ async def process_is_student(message: Message, state: FSMContext):
         await state.set_state(ApplicationStates.waiting_for_phone_confirmation)
         return
     
-    if message.text.lower() not in ["ha", "yo'q"]:
-        await message.answer(get_text("invalid_yes_no", lang=user_lang))
-        return
+    if button is None:
+        return message.answer(get_text("invalid_yes_no", lang=user_lang))
     
-    is_student = "Ha" if message.text.lower() == "ha" else "Yo'q"
-    # Preserve language when updating data
-    await state.update_data(is_student=is_student, user_language=user_lang)
+    is_student = "Ha" if button.action == "yes" else "Yo'q"
+    draft.is_student = is_student
     await message.answer(get_text("ask_education", lang=user_lang), reply_markup=get_education_keyboard())
     await state.set_state(ApplicationStates.waiting_for_education)
 
 
-@router.callback_query(F.data.startswith("education:"), ApplicationStates.waiting_for_education)
-async def process_education(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("education"), ApplicationStates.waiting_for_education)
+async def process_education(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process education level"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    education = callback.data.split(":", 1)[1]
-    # Preserve language when updating data
-    await state.update_data(education=education, user_language=user_lang)
+    education = payload.value
+    draft.education = education
     
-    answer_text = get_text("education_selected", lang=user_lang)
-    if answer_text == "education_selected":
-        answer_text = f"Ma'lumot: {education}"
+    answer_text = get_text("education_selected", lang=user_lang, education=education)
     await callback.answer(answer_text)
     
-    confirmation_text = get_text("education_confirmed", lang=user_lang)
-    if confirmation_text == "education_confirmed":
-        confirmation_text = f"✅ Ma'lumot: {education}"
+    confirmation_text = get_text("education_confirmed", lang=user_lang, education=education)
     await callback.message.edit_text(confirmation_text)
     await callback.message.answer(get_text("ask_gender", lang=user_lang), reply_markup=get_gender_keyboard())
     await state.set_state(ApplicationStates.waiting_for_gender)
 
 
-@router.callback_query(F.data.startswith("gender:"), ApplicationStates.waiting_for_gender)
-async def process_gender(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("gender"), ApplicationStates.waiting_for_gender)
+async def process_gender(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process gender"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    gender = callback.data.split(":", 1)[1]
-    # Preserve language when updating data
-    await state.update_data(gender=gender, user_language=user_lang)
+    gender = payload.value
+    draft.gender = gender
     
-    answer_text = get_text("gender_selected", lang=user_lang)
-    if answer_text == "gender_selected":
-        answer_text = f"Jins: {gender}"
+    answer_text = get_text("gender_selected", lang=user_lang, gender=gender)
     await callback.answer(answer_text)
     
-    confirmation_text = get_text("gender_confirmed", lang=user_lang)
-    if confirmation_text == "gender_confirmed":
-        confirmation_text = f"✅ Jins: {gender}"
+    confirmation_text = get_text("gender_confirmed", lang=user_lang, gender=gender)
     await callback.message.edit_text(confirmation_text)
     # Move to language skills
     await callback.message.answer(get_text("ask_russian_level", lang=user_lang), reply_markup=get_language_level_keyboard("russian"))
@@ -535,30 +523,26 @@ async def process_gender(callback: CallbackQuery, state: FSMContext):
 # STEP 3: LANGUAGE SKILLS
 # ============================================
 
-@router.callback_query(F.data.startswith("russian_level:"), ApplicationStates.waiting_for_russian_level)
-async def process_russian_level(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("russian_level"), ApplicationStates.waiting_for_russian_level)
+async def process_russian_level(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process Russian language level"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    level = callback.data.split(":", 1)[1]
-    # Preserve language when updating data
-    await state.update_data(russian_level=level, user_language=user_lang)
+    level = payload.value
+    draft.russian_level = level
     
-    answer_text = get_text("russian_level_selected", lang=user_lang)
-    if answer_text == "russian_level_selected":
-        answer_text = f"Rus tili: {level}"
+    answer_text = get_text("russian_level_selected", lang=user_lang, level=level)
     await callback.answer(answer_text)
     
-    confirmation_text = get_text("russian_level_confirmed", lang=user_lang)
-    if confirmation_text == "russian_level_confirmed":
-        confirmation_text = f"✅ Rus tili: {level}"
+    confirmation_text = get_text("russian_level_confirmed", lang=user_lang, level=level)
     await callback.message.edit_text(confirmation_text)
     
     # If O'rtacha or Ilg'or, ask for voice message
     if level in ["O'rtacha", "Ilg'or"]:
-        await callback.message.answer(get_text("ask_russian_voice", lang=user_lang), reply_markup=get_back_keyboard())
+        await callback.message.answer(get_text("ask_russian_voice", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_russian_voice)
     else:
         # Skip to English level
@@ -567,13 +551,12 @@ async def process_russian_level(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(ApplicationStates.waiting_for_russian_voice, F.voice)
-async def process_russian_voice(message: Message, state: FSMContext):
+async def process_russian_voice(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process Russian voice message (≈10 seconds)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
+    if buttons.resolve(message.text) == BACK:
         await message.answer(get_text("ask_russian_level", lang=user_lang), reply_markup=get_language_level_keyboard("russian"))
         await state.set_state(ApplicationStates.waiting_for_russian_level)
         return
@@ -585,50 +568,42 @@ async def process_russian_voice(message: Message, state: FSMContext):
         return
     
     file_id = message.voice.file_id
-    # Preserve language when updating data
-    await state.update_data(russian_voice=file_id, user_language=user_lang)
+    draft.russian_voice = file_id
     
     success_text = get_text("russian_voice_received", lang=user_lang)
-    if success_text == "russian_voice_received":
-        success_text = "✅ Rus tili audio qabul qilindi!"
     await message.answer(success_text)
     await message.answer(get_text("ask_english_level", lang=user_lang), reply_markup=get_language_level_keyboard("english"))
     await state.set_state(ApplicationStates.waiting_for_english_level)
 
 
 @router.message(ApplicationStates.waiting_for_russian_voice)
-async def process_russian_voice_invalid(message: Message, state: FSMContext):
+async def process_russian_voice_invalid(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle invalid input for Russian voice"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
+    if buttons.resolve(message.text) == BACK:
         await message.answer(get_text("ask_russian_level", lang=user_lang), reply_markup=get_language_level_keyboard("russian"))
         await state.set_state(ApplicationStates.waiting_for_russian_level)
         return
-    await message.answer(get_text("require_audio", lang=user_lang))
+    return message.answer(get_text("require_audio", lang=user_lang))
 
 
-@router.callback_query(F.data.startswith("english_level:"), ApplicationStates.waiting_for_english_level)
-async def process_english_level(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("english_level"), ApplicationStates.waiting_for_english_level)
+async def process_english_level(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process English language level"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    level = callback.data.split(":", 1)[1]
-    # Preserve language when updating data
-    await state.update_data(english_level=level, user_language=user_lang)
+    level = payload.value
+    draft.english_level = level
     
-    answer_text = get_text("english_level_selected", lang=user_lang)
-    if answer_text == "english_level_selected":
-        answer_text = f"Ingliz tili: {level}"
+    answer_text = get_text("english_level_selected", lang=user_lang, level=level)
     await callback.answer(answer_text)
     
-    confirmation_text = get_text("english_level_confirmed", lang=user_lang)
-    if confirmation_text == "english_level_confirmed":
-        confirmation_text = f"✅ Ingliz tili: {level}"
+    confirmation_text = get_text("english_level_confirmed", lang=user_lang, level=level)
     await callback.message.edit_text(confirmation_text)
     
     # If O'rtacha or Ilg'or, ask for voice or video message
@@ -642,11 +617,10 @@ async def process_english_level(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(ApplicationStates.waiting_for_english_media, F.voice | F.audio | F.video)
-async def process_english_media(message: Message, state: FSMContext):
+async def process_english_media(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process English voice/video message"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     if message.voice:
         file_id = message.voice.file_id
@@ -661,48 +635,40 @@ async def process_english_media(message: Message, state: FSMContext):
         await message.answer(get_text("require_media", lang=user_lang))
         return
     
-    # Preserve language when updating data
-    await state.update_data(english_media=file_id, english_media_type=media_type, user_language=user_lang)
+    draft.english_media = file_id
+    draft.english_media_type = media_type
     
     success_text = get_text("english_media_received", lang=user_lang)
-    if success_text == "english_media_received":
-        success_text = "✅ Ingliz tili media qabul qilindi!"
     await message.answer(success_text)
     await message.answer(get_text("ask_ielts", lang=user_lang), reply_markup=get_skip_keyboard())
     await state.set_state(ApplicationStates.waiting_for_ielts_certificate)
 
 
-@router.callback_query(F.data == "skip", ApplicationStates.waiting_for_english_media)
-async def skip_english_media(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("skip"), ApplicationStates.waiting_for_english_media)
+async def skip_english_media(callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft):
     """Skip English media"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    # Preserve language when updating data
-    await state.update_data(english_media=None, english_media_type=None, user_language=user_lang)
+    draft.english_media = None
+    draft.english_media_type = None
     
     skip_text = get_text("skipped", lang=user_lang)
-    if skip_text == "skipped":
-        skip_text = "O'tkazib yuborildi"
     await callback.answer(skip_text)
     
     confirmation_text = get_text("skipped_confirmed", lang=user_lang)
-    if confirmation_text == "skipped_confirmed":
-        confirmation_text = "✅ O'tkazib yuborildi"
     await callback.message.edit_text(confirmation_text)
     await callback.message.answer(get_text("ask_ielts", lang=user_lang), reply_markup=get_skip_keyboard())
     await state.set_state(ApplicationStates.waiting_for_ielts_certificate)
 
 
 @router.message(ApplicationStates.waiting_for_english_media)
-async def process_english_media_invalid(message: Message, state: FSMContext):
+async def process_english_media_invalid(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle invalid input for English media"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    await message.answer(get_text("require_media", lang=user_lang))
+    return message.answer(get_text("require_media", lang=user_lang))
 
 
 # ============================================
@@ -710,168 +676,138 @@ async def process_english_media_invalid(message: Message, state: FSMContext):
 # ============================================
 
 @router.message(ApplicationStates.waiting_for_ielts_certificate, F.document)
-async def process_ielts_certificate(message: Message, state: FSMContext):
+async def process_ielts_certificate(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process IELTS certificate (PDF, optional)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     if message.document.mime_type != "application/pdf":
         await message.answer(get_text("require_pdf", lang=user_lang))
         return
     
-    # Preserve language when updating data
-    await state.update_data(ielts_certificate=message.document.file_id, user_language=user_lang)
+    draft.ielts_certificate = message.document.file_id
     
     success_text = get_text("ielts_received", lang=user_lang)
-    if success_text == "ielts_received":
-        success_text = "✅ IELTS sertifikati qabul qilindi!"
     await message.answer(success_text)
-    await message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply())
+    await message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_work_experience)
 
 
-@router.callback_query(F.data == "skip", ApplicationStates.waiting_for_ielts_certificate)
-async def skip_ielts_certificate(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("skip"), ApplicationStates.waiting_for_ielts_certificate)
+async def skip_ielts_certificate(callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft):
     """Skip IELTS certificate"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    # Preserve language when updating data
-    await state.update_data(ielts_certificate=None, user_language=user_lang)
+    draft.ielts_certificate = None
     
     skip_text = get_text("skipped", lang=user_lang)
-    if skip_text == "skipped":
-        skip_text = "O'tkazib yuborildi"
     await callback.answer(skip_text)
     
     confirmation_text = get_text("skipped_confirmed", lang=user_lang)
-    if confirmation_text == "skipped_confirmed":
-        confirmation_text = "✅ O'tkazib yuborildi"
     await callback.message.edit_text(confirmation_text)
-    await callback.message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply())
+    await callback.message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_work_experience)
 
 
 @router.message(ApplicationStates.waiting_for_ielts_certificate)
-async def process_ielts_certificate_invalid(message: Message, state: FSMContext):
+async def process_ielts_certificate_invalid(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle invalid input for IELTS certificate"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     error_text = get_text("invalid_ielts_input", lang=user_lang)
-    if error_text == "invalid_ielts_input":
-        error_text = "❌ Iltimos, PDF fayl yuboring yoki 'O'tkazib yuborish' tugmasini bosing:"
-    await message.answer(error_text, reply_markup=get_skip_keyboard())
+    return message.answer(error_text, reply_markup=get_skip_keyboard())
 
 
 @router.message(ApplicationStates.waiting_for_work_experience)
-async def process_work_experience(message: Message, state: FSMContext):
+async def process_work_experience(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process work experience"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
+    button = buttons.match(message.text, ("back", "work_experience"))
+    if button == BACK:
         await message.answer(get_text("ask_ielts", lang=user_lang), reply_markup=get_skip_keyboard())
         await state.set_state(ApplicationStates.waiting_for_ielts_certificate)
         return
     
-    # Check if valid experience option
-    from bot.config import WORK_EXPERIENCE
-    if message.text not in WORK_EXPERIENCE:
+    if button is None:
         error_text = get_text("invalid_selection", lang=user_lang)
-        if error_text == "invalid_selection":
-            error_text = "❌ Iltimos, tugmalardan birini tanlang:"
         await message.answer(error_text)
         return
     
-    # Preserve language when updating data
-    await state.update_data(work_experience=message.text, user_language=user_lang)
+    draft.work_experience = button.id
     
-    confirmation_text = get_text("work_experience_selected", lang=user_lang)
-    if confirmation_text == "work_experience_selected":
-        confirmation_text = f"✅ Tajriba: {message.text}"
+    confirmation_text = get_text("work_experience_selected", lang=user_lang, experience=button.id)
     await message.answer(confirmation_text)
-    await message.answer(get_text("ask_last_workplace", lang=user_lang), reply_markup=get_back_keyboard())
+    await message.answer(get_text("ask_last_workplace", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_last_workplace)
 
 
 @router.message(ApplicationStates.waiting_for_last_workplace)
-async def process_last_workplace(message: Message, state: FSMContext):
+async def process_last_workplace(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process last workplace and reason for leaving"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_work_experience", lang=user_lang), reply_markup=get_work_experience_keyboard_reply(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_work_experience)
         return
     
-    # Preserve language when updating data
-    await state.update_data(last_workplace=message.text, user_language=user_lang)
-    await message.answer(get_text("ask_photo", lang=user_lang), reply_markup=get_back_keyboard())
+    draft.last_workplace = message.text
+    await message.answer(get_text("ask_photo", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_photo)
 
 
 @router.message(ApplicationStates.waiting_for_photo, F.photo)
-async def process_photo(message: Message, state: FSMContext):
+async def process_photo(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process photo (selfie allowed)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
     photo_id = message.photo[-1].file_id  # Get highest resolution
-    # Preserve language when updating data
-    await state.update_data(photo=photo_id, user_language=user_lang)
+    draft.photo = photo_id
     
     success_text = get_text("photo_received", lang=user_lang)
-    if success_text == "photo_received":
-        success_text = "✅ Rasm qabul qilindi!"
     await message.answer(success_text)
-    await message.answer(get_text("ask_hear_about", lang=user_lang), reply_markup=get_back_keyboard())
+    await message.answer(get_text("ask_hear_about", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
     await state.set_state(ApplicationStates.waiting_for_hear_about)
 
 
 @router.message(ApplicationStates.waiting_for_photo)
-async def process_photo_invalid(message: Message, state: FSMContext):
+async def process_photo_invalid(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle invalid input for photo"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_last_workplace", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_last_workplace", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_last_workplace)
         return
-    await message.answer(get_text("require_photo", lang=user_lang))
+    return message.answer(get_text("require_photo", lang=user_lang))
 
 
 @router.message(ApplicationStates.waiting_for_hear_about)
-async def process_hear_about(message: Message, state: FSMContext):
+async def process_hear_about(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process 'How did you hear about vacancy?' (text input)"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    if message.text == "🔙 Orqaga":
-        await message.answer(get_text("ask_photo", lang=user_lang), reply_markup=get_back_keyboard())
+    if buttons.resolve(message.text) == BACK:
+        await message.answer(get_text("ask_photo", lang=user_lang), reply_markup=get_back_keyboard(lang=user_lang))
         await state.set_state(ApplicationStates.waiting_for_photo)
         return
     
-    # Preserve language when updating data
-    await state.update_data(hear_about=message.text, user_language=user_lang)
+    draft.hear_about = message.text
     
     # Show final review
-    data = await state.get_data()
-    data['username'] = message.from_user.username or "N/A"
-    data['user_id'] = message.from_user.id
-    data['submission_date'] = datetime.now().strftime("%d.%m.%Y %H:%M")
+    draft.username = message.from_user.username or "N/A"
+    draft.user_id = message.from_user.id
+    draft.submission_date = datetime.now().strftime("%d.%m.%Y %H:%M")
     
-    summary = format_application_summary(data)
+    summary = format_application_summary(draft)
     await message.answer(get_text("review_title", lang=user_lang), parse_mode="Markdown")
     await message.answer(summary)
     await message.answer(get_text("confirm_question", lang=user_lang), reply_markup=get_confirmation_keyboard())
@@ -882,146 +818,160 @@ async def process_hear_about(message: Message, state: FSMContext):
 # STEP 5: FINAL REVIEW & CONFIRMATION
 # ============================================
 
-@router.callback_query(F.data.startswith("confirm:"), ApplicationStates.waiting_for_confirmation)
-async def process_confirmation(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def _check_duplicate(duplicates: DuplicateDetector, draft: ApplicationDraft) -> Optional[DuplicateMatch]:
+    try:
+        with span("dedup.check", mode=duplicates.mode):
+            return await duplicates.check(draft)
+    except Exception as e:
+        # A broken dedup index must not stop applications
+        logger.error(f"Duplicate check failed for user {draft.user_id}: {type(e).__name__}: {e}")
+        return None
+
+
+async def _record_application(
+    duplicates: DuplicateDetector, draft: ApplicationDraft, duplicate: Optional[DuplicateMatch]
+) -> None:
+    try:
+        with span("dedup.record", mode=duplicates.mode):
+            await duplicates.record(draft, duplicate)
+    except Exception as e:
+        # The application is already queued; it just will not be matched by later ones
+        logger.error(f"Failed to record application of user {draft.user_id} for dedup: {type(e).__name__}: {e}")
+
+
+async def _store_application(applications: ApplicationStore, draft: ApplicationDraft) -> None:
+    try:
+        with span("applications.add"):
+            application_id = await applications.add(draft)
+        logger.info(f"Application of user {draft.user_id} stored as #{application_id}")
+    except Exception as e:
+        # The outbox already has it; a missing DB row must not fail the submission
+        logger.error(f"Failed to store application of user {draft.user_id}: {type(e).__name__}: {e}")
+
+
+async def _acknowledge_submission(callback: CallbackQuery, bot: Bot, user_id: int, user_lang: str) -> None:
+    try:
+        success_answer = get_text("application_submitted", lang=user_lang)
+        await callback.answer(success_answer)
+        await callback.message.edit_text(success_answer)
+        await callback.message.answer(get_text("thank_you", lang=user_lang), parse_mode="Markdown")
+        
+        # Send auto reply to applicant
+        await bot.send_message(user_id, get_text("application_auto_reply", lang=user_lang))
+        
+        menu_text = get_text("return_to_main_menu", lang=user_lang)
+        await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard(lang=user_lang))
+    except Exception as e:
+        # The application is queued and reaches HR anyway (e.g. the applicant blocked the bot)
+        logger.warning(f"Failed to acknowledge application of user {user_id}: {type(e).__name__}: {e}")
+
+
+@router.callback_query(CallbackKind("confirm"), ApplicationStates.waiting_for_confirmation)
+async def process_confirmation(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, bot: Bot, payload: CallbackPayload,
+    outbox: Outbox, applications: ApplicationStore, duplicates: DuplicateDetector,
+):
     """Process final confirmation"""
-    # Get user language from state
-    data = await state.get_data()
-    user_lang = data.get("user_language", "uz")
+    # Get user language from the request-scoped FSM draft
+    user_lang = draft.user_language
     
-    action = callback.data.split(":")[1]
+    action = payload.value
     
     if action == "yes":
         # Submit application to HR group
-        data['username'] = callback.from_user.username or "N/A"
-        data['user_id'] = callback.from_user.id
-        data['submission_date'] = datetime.now().strftime("%d.%m.%Y %H:%M")
+        draft.username = callback.from_user.username or "N/A"
+        draft.user_id = callback.from_user.id
+        draft.submission_date = datetime.now().strftime("%d.%m.%Y %H:%M")
         
-        summary = format_application_summary(data)
+        summary = format_application_summary(draft)
         
         # Validate HR_GROUP_ID before sending
         if HR_GROUP_ID is None:
             logger.error("HR_GROUP_ID is not set or invalid. Cannot send application to HR group.")
             error_answer = get_text("submission_error", lang=user_lang)
-            if error_answer == "submission_error":
-                error_answer = "❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring."
             await callback.answer(error_answer)
-            error_message = get_text("error_occurred", lang=user_lang)
-            if error_message == "error_occurred":
-                error_message = "❌ HR guruhi sozlanmagan. Iltimos, administrator bilan bog'laning."
+            error_message = get_text("hr_group_not_configured", lang=user_lang)
             await callback.message.answer(error_message)
             menu_text = get_text("return_to_main_menu", lang=user_lang)
-            if menu_text == "return_to_main_menu":
-                menu_text = "Bosh menyuga qaytish:"
-            await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard())
-            saved_lang = user_lang
-            await state.clear()
-            await state.update_data(user_language=saved_lang)
+            await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard(lang=user_lang))
+            await state.set_state(None)
+            draft.reset(user_language=user_lang)
             return
         
-        try:
-            # Log the exact chat_id being used
-            logger.info(f"Sending application to HR group (chat_id: {HR_GROUP_ID}, type: {type(HR_GROUP_ID).__name__})")
-            
-            # If photo exists, send photo with short caption, then send full summary as text with keyboard
-            # Otherwise, send summary as text message with keyboard
-            hr_keyboard = get_hr_decision_keyboard(data['user_id'])
-            if data.get('photo'):
-                # Send photo with short caption
-                short_caption = "📄 New Job Application\n⬇️ Full details below"
-                await bot.send_photo(HR_GROUP_ID, data['photo'], caption=short_caption, disable_notification=True)
-                # Send full summary as text message with inline keyboard immediately after photo
-                await bot.send_message(HR_GROUP_ID, summary, reply_markup=hr_keyboard, disable_notification=True)
-            else:
-                # Send summary to HR group (silently) with inline keyboard - no photo case
-                # IMPORTANT: Use HR_GROUP_ID directly from config (already int), not from state/message
-                await bot.send_message(HR_GROUP_ID, summary, reply_markup=hr_keyboard, disable_notification=True)
-            
-            # Send files if available (these remain as separate messages)
-            if data.get('russian_voice'):
-                await send_media_to_group(bot, HR_GROUP_ID, data['russian_voice'], "voice", "Rus tili audio (≈10s)")
-            
-            if data.get('english_media'):
-                media_type = data.get('english_media_type', 'audio')
-                await send_media_to_group(bot, HR_GROUP_ID, data['english_media'], media_type, "Ingliz tili media")
-            
-            if data.get('ielts_certificate'):
-                await send_media_to_group(bot, HR_GROUP_ID, data['ielts_certificate'], "document", "IELTS sertifikati")
-            
-            success_answer = get_text("application_submitted", lang=user_lang)
-            if success_answer == "application_submitted":
-                success_answer = "✅ Arizangiz muvaffaqiyatli yuborildi!"
-            await callback.answer(success_answer)
-            await callback.message.edit_text(success_answer)
-            await callback.message.answer(get_text("thank_you", lang=user_lang), parse_mode="Markdown")
-            
-            # Send auto reply to applicant
-            auto_reply_text = "✅ Arizangiz qabul qilindi!\n\n📅 Arizangiz 3 kun ichida ko'rib chiqiladi.\n🤖 Javob sizga shu bot orqali yuboriladi.\n\nIltimos, kuting."
-            await bot.send_message(data['user_id'], auto_reply_text)
-            
+        duplicate = await _check_duplicate(duplicates, draft)
+        if duplicate is not None and duplicates.mode == "merge":
+            # HR already has this candidate's application for the position: keep it out of the group
+            await _record_application(duplicates, draft, duplicate)
+            await _store_application(applications, draft)
+            already_text = get_text("already_applied", lang=user_lang)
+            await callback.answer()
+            await callback.message.edit_text(already_text)
             menu_text = get_text("return_to_main_menu", lang=user_lang)
-            if menu_text == "return_to_main_menu":
-                menu_text = "Bosh menyuga qaytish:"
-            await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard())
-            
+            await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard(lang=user_lang))
+            await state.set_state(None)
+            draft.reset(user_language=user_lang)
+            return
+        if duplicate is not None:
+            summary = f"{format_duplicate_note(duplicate)}\n\n{summary}"
+        
+        try:
+            # Journal the application; the outbox delivers it to the HR group
+            # in background and retries until Telegram accepts it
+            with span("outbox.enqueue"):
+                await outbox.enqueue(HR_GROUP_ID, draft, summary)
         except Exception as e:
+            logger.error(f"Failed to queue application of user {draft.user_id}: {type(e).__name__}: {e}")
             error_answer = get_text("submission_error", lang=user_lang)
-            if error_answer == "submission_error":
-                error_answer = "❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring."
             await callback.answer(error_answer)
             
-            error_message = get_text("error_occurred", lang=user_lang)
-            if error_message == "error_occurred":
-                error_message = f"❌ Xatolik: {str(e)}"
+            error_message = get_text("error_occurred", lang=user_lang, error=e)
             await callback.message.answer(error_message)
             
-            menu_text = get_text("return_to_main_menu", lang=user_lang)
-            if menu_text == "return_to_main_menu":
-                menu_text = "Bosh menyuga qaytish:"
-            await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard())
-        
-        # Preserve language when clearing state
-        saved_lang = user_lang
-        await state.clear()
-        await state.update_data(user_language=saved_lang)
+            # Keep the state and the draft: pressing "yes" again retries the enqueue
+            confirm_text = get_text("confirm_question", lang=user_lang)
+            await callback.message.answer(confirm_text, reply_markup=get_confirmation_keyboard())
+        else:
+            logger.info(f"Application of user {draft.user_id} queued for HR group (chat_id: {HR_GROUP_ID})")
+            # Only a queued application counts for later repeats: a failed one is retried as new
+            await _record_application(duplicates, draft, duplicate)
+            await _store_application(applications, draft)
+            await _acknowledge_submission(callback, bot, draft.user_id, user_lang)
+            
+            # Preserve language when clearing state
+            await state.set_state(None)
+            draft.reset(user_language=user_lang)
         
     elif action == "back":
         # Go back - restart application (preserve language)
         back_text = get_text("going_back", lang=user_lang)
-        if back_text == "going_back":
-            back_text = "Orqaga qaytish"
         await callback.answer(back_text)
         
         restart_text = get_text("restart_application", lang=user_lang)
-        if restart_text == "restart_application":
-            restart_text = "Arizani qayta boshlash uchun '🧳 Bo'sh ish o'rinlari' tugmasini bosing."
         await callback.message.edit_text(restart_text)
         
         menu_text = get_text("main_menu", lang=user_lang)
-        if menu_text == "main_menu":
-            menu_text = "Bosh menyu:"
-        await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard())
+        await callback.message.answer(menu_text, reply_markup=get_main_menu_keyboard(lang=user_lang))
         
         # Preserve language when clearing state
-        saved_lang = user_lang
-        await state.clear()
-        await state.update_data(user_language=saved_lang)
+        await state.set_state(None)
+        draft.reset(user_language=user_lang)
 
 
 # ============================================
 # HR DECISION HANDLERS
 # ============================================
 
-@router.callback_query(F.data.startswith("approve_"))
-async def handle_approve_application(callback: CallbackQuery, bot: Bot):
+@router.callback_query(CallbackKind("approve"))
+async def handle_approve_application(callback: CallbackQuery, bot: Bot, payload: CallbackPayload):
     """Handle approve application callback from HR"""
     try:
-        # Extract user_id from callback_data (format: approve_{user_id})
-        user_id = int(callback.data.split("_", 1)[1])
+        # Applicant's user_id, decoded by CallbackKind
+        user_id = payload.id
         
         # Send message to applicant
         message_text = "🎉 Tabriklaymiz!\n\nSiz ishga qabul qilindingiz.\nBatafsil ma'lumot tez orada siz bilan bog'laniladi."
-        await bot.send_message(user_id, message_text)
+        with request_priority(Priority.NOTIFY):
+            await bot.send_message(user_id, message_text)
         
         # Answer callback
         await callback.answer("✅ Xabar yuborildi", show_alert=False)
@@ -1029,24 +979,22 @@ async def handle_approve_application(callback: CallbackQuery, bot: Bot):
         # Edit message to show it was processed
         await callback.message.edit_reply_markup(reply_markup=None)
         
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing user_id from approve callback: {e}")
-        await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
     except Exception as e:
         logger.error(f"Error sending approve message: {e}")
         await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("interview_"))
-async def handle_interview_application(callback: CallbackQuery, bot: Bot):
+@router.callback_query(CallbackKind("interview"))
+async def handle_interview_application(callback: CallbackQuery, bot: Bot, payload: CallbackPayload):
     """Handle interview invitation callback from HR"""
     try:
-        # Extract user_id from callback_data (format: interview_{user_id})
-        user_id = int(callback.data.split("_", 1)[1])
+        # Applicant's user_id, decoded by CallbackKind
+        user_id = payload.id
         
         # Send message to applicant
         message_text = "📢 Siz suhbat bosqichiga qabul qilindingiz!\n\n📅 Suhbat vaqti va joyi 2 kun ichida sizga yuboriladi.\nIltimos, telefoningiz ochiq bo'lsin."
-        await bot.send_message(user_id, message_text)
+        with request_priority(Priority.NOTIFY):
+            await bot.send_message(user_id, message_text)
         
         # Answer callback
         await callback.answer("✅ Xabar yuborildi", show_alert=False)
@@ -1054,24 +1002,22 @@ async def handle_interview_application(callback: CallbackQuery, bot: Bot):
         # Edit message to show it was processed
         await callback.message.edit_reply_markup(reply_markup=None)
         
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing user_id from interview callback: {e}")
-        await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
     except Exception as e:
         logger.error(f"Error sending interview message: {e}")
         await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("reject_"))
-async def handle_reject_application(callback: CallbackQuery, bot: Bot):
+@router.callback_query(CallbackKind("reject"))
+async def handle_reject_application(callback: CallbackQuery, bot: Bot, payload: CallbackPayload):
     """Handle reject application callback from HR"""
     try:
-        # Extract user_id from callback_data (format: reject_{user_id})
-        user_id = int(callback.data.split("_", 1)[1])
+        # Applicant's user_id, decoded by CallbackKind
+        user_id = payload.id
         
         # Send message to applicant
         message_text = "Rahmat.\n\nAfsuski, hozircha sizning arizangiz tasdiqlanmadi.\nKeyingi imkoniyatlarda yana urinib ko'rishingiz mumkin."
-        await bot.send_message(user_id, message_text)
+        with request_priority(Priority.NOTIFY):
+            await bot.send_message(user_id, message_text)
         
         # Answer callback
         await callback.answer("✅ Xabar yuborildi", show_alert=False)
@@ -1079,9 +1025,6 @@ async def handle_reject_application(callback: CallbackQuery, bot: Bot):
         # Edit message to show it was processed
         await callback.message.edit_reply_markup(reply_markup=None)
         
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing user_id from reject callback: {e}")
-        await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
     except Exception as e:
         logger.error(f"Error sending reject message: {e}")
         await callback.answer("❌ Xatolik yuz berdi", show_alert=True)
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""HR group commands: search and export of submitted applications, funnel report, profiling"""
+import asyncio
+import logging
+import shlex
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (
+    CallbackQuery, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup, Message, TelegramObject
+)
+
+from bot.config import HR_GROUP_ID, BRANCHES, DEPARTMENTS, POSITIONS
+from bot.keyboards.callback_data import CallbackKind, CallbackPayload, encode_callback
+from bot.middlewares.funnel import FunnelTracker, StepStats
+from bot.services.profiler import SamplingProfiler
+from bot.services.export import FORMATS, export_applications, parse_date_range
+from bot.storage.applications import ApplicationStore
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Results per page of /search
+PAGE_SIZE = 5
+
+# Bounds of /profile <seconds>
+PROFILE_DEFAULT_SECONDS = 30
+PROFILE_MAX_SECONDS = 300
+
+# Running /profile tasks (a reference keeps them from being garbage-collected)
+_background_tasks = set()
+
+
+def is_hr_chat(event: TelegramObject) -> bool:
+    """Only the HR group may use these commands"""
+    if HR_GROUP_ID is None:
+        return False
+    if isinstance(event, CallbackQuery):
+        return event.message is not None and event.message.chat.id == HR_GROUP_ID
+    return event.chat.id == HR_GROUP_ID
+
+
+router.message.filter(F.func(is_hr_chat))
+router.callback_query.filter(F.func(is_hr_chat))
+
+
+def _format_result(row: Dict[str, Any]) -> str:
+    name = " ".join(part for part in (row["passport_name"], row["passport_surname"]) if part) or "N/A"
+    details = ", ".join(part for part in (row["position"], row["branch"], row["submission_date"]) if part)
+    lines = [f"#{row['id']} {name} — {details}"]
+    lines.append(f"   📞 {row['phone'] or 'N/A'}  👤 @{row['username'] or 'N/A'}  🆔 {row['user_id']}")
+    if row["last_workplace"]:
+        lines.append(f"   💼 {row['last_workplace']}")
+    return "\n".join(lines)
+
+
+def format_search_page(text: str, total: int, rows: List[Dict[str, Any]], offset: int) -> str:
+    if not rows:
+        return f"🔎 \"{text}\" bo'yicha hech narsa topilmadi."
+    header = f"🔎 \"{text}\": {total} ta natija ({offset + 1}-{offset + len(rows)})"
+    return "\n\n".join([header] + [_format_result(row) for row in rows])
+
+
+def get_search_pages_keyboard(total: int, offset: int) -> Optional[InlineKeyboardMarkup]:
+    """Previous/next buttons; the query itself is read from the /search message the results reply to"""
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton(text="⬅️", callback_data=encode_callback("hr_search", id=max(0, offset - PAGE_SIZE))))
+    if offset + PAGE_SIZE < total:
+        buttons.append(InlineKeyboardButton(text="➡️", callback_data=encode_callback("hr_search", id=offset + PAGE_SIZE)))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, applications: ApplicationStore):
+    """/search <text> - full-text search over submitted applications"""
+    text = (command.args or "").strip()
+    if not text:
+        return message.reply("Foydalanish: /search <ism, manzil, ish joyi...>")
+    total, rows = await applications.search(text, limit=PAGE_SIZE)
+    return message.reply(
+        format_search_page(text, total, rows, 0),
+        reply_markup=get_search_pages_keyboard(total, 0),
+    )
+
+
+@router.callback_query(CallbackKind("hr_search"))
+async def process_search_page(callback: CallbackQuery, applications: ApplicationStore, payload: CallbackPayload):
+    """Show another page of /search results"""
+    command_message = callback.message.reply_to_message
+    parts = (command_message.text or "").split(maxsplit=1) if command_message else []
+    if len(parts) < 2:
+        # The /search message was deleted, nothing to page through
+        await callback.answer("❌ Qidiruv eskirgan, /search ni qayta yuboring", show_alert=True)
+        return
+    text = parts[1].strip()
+    offset = payload.id
+    total, rows = await applications.search(text, limit=PAGE_SIZE, offset=offset)
+    await callback.message.edit_text(
+        format_search_page(text, total, rows, offset),
+        reply_markup=get_search_pages_keyboard(total, offset),
+    )
+    await callback.answer()
+
+
+EXPORT_USAGE = (
+    "Foydalanish: /export [csv|xlsx] [branch=clara] [department=akademik] "
+    "[position=\"IELTS Instructor\"] [from=2026-03-01] [to=2026-03-31]"
+)
+
+
+def parse_export_args(args: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Parse /export arguments into (format, store filters).
+    Raises ValueError with a message for HR on bad input.
+    """
+    text = (args or "").replace("“", '"').replace("”", '"')
+    fmt, filters, dates = "xlsx", {}, {}
+    try:
+        tokens = shlex.split(text)
+    except ValueError:  # unbalanced quotes
+        raise ValueError(EXPORT_USAGE) from None
+    for token in tokens:
+        if token.lower() in FORMATS:
+            fmt = token.lower()
+            continue
+        name, _, value = token.partition("=")
+        name = name.lower()
+        if name == "branch" and value in BRANCHES:
+            filters["branch"] = value
+        elif name == "department" and value in DEPARTMENTS:
+            filters["department"] = value
+        elif name == "position" and any(value in positions for positions in POSITIONS.values()):
+            filters["position"] = value
+        elif name in ("from", "to") and value:
+            dates[name] = value
+        else:
+            raise ValueError(f"❌ Noto'g'ri parametr: {token}\n{EXPORT_USAGE}")
+    try:
+        filters.update(parse_date_range(dates.get("from"), dates.get("to")))
+    except ValueError:
+        raise ValueError(f"❌ Sana formati: YYYY-MM-DD\n{EXPORT_USAGE}") from None
+    return fmt, filters
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject, applications: ApplicationStore):
+    """/export - spreadsheet of applications, uploaded as a document"""
+    try:
+        fmt, filters = parse_export_args(command.args)
+    except ValueError as e:
+        return message.reply(str(e))
+
+    filename = f"applications_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+    with tempfile.TemporaryDirectory(prefix="hr-export-") as tmp:
+        path = Path(tmp) / filename
+        try:
+            count = await export_applications(applications, path, fmt, **filters)
+        except Exception as e:
+            logger.error(f"Export failed: {type(e).__name__}: {e}")
+            return message.reply("❌ Eksportda xatolik yuz berdi")
+        if count == 0:
+            return message.reply("Tanlangan filtrlar bo'yicha arizalar topilmadi.")
+        await message.reply_document(FSInputFile(path, filename=filename), caption=f"📊 {count} ta ariza")
+
+
+FUNNEL_USAGE = "Foydalanish: /funnel [days=7] [branch=clara] [position=\"IELTS Instructor\"]"
+
+
+def parse_funnel_args(args: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Parse /funnel arguments into (days, report filters).
+    Raises ValueError with a message for HR on bad input.
+    """
+    text = (args or "").replace("“", '"').replace("”", '"')
+    days, filters = 7, {}
+    try:
+        tokens = shlex.split(text)
+    except ValueError:  # unbalanced quotes
+        raise ValueError(FUNNEL_USAGE) from None
+    for token in tokens:
+        name, _, value = token.partition("=")
+        name = name.lower()
+        if name == "days" and value.isdigit() and int(value) > 0:
+            days = int(value)
+        elif name == "branch" and value in BRANCHES:
+            filters["branch"] = value
+        elif name == "position" and any(value in positions for positions in POSITIONS.values()):
+            filters["position"] = value
+        else:
+            raise ValueError(f"❌ Noto'g'ri parametr: {token}\n{FUNNEL_USAGE}")
+    return days, filters
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "—"
+    if seconds == float("inf"):
+        return ">1h"
+    return f"≤{seconds // 60}m" if seconds >= 60 else f"≤{seconds}s"
+
+
+def format_funnel(stats: List[StepStats], days: int, filters: Dict[str, Any]) -> str:
+    """
+    One line per step: reached, % of the first step, % of the previous one, median dwell.
+    With filters the funnel starts at the first step where the branch / position is known.
+    """
+    scope = ", ".join(f"{name}={value}" for name, value in filters.items())
+    lines = [f"📉 Voronka, oxirgi {days} kun" + (f" ({scope})" if scope else "")]
+    first = next((index for index, step in enumerate(stats) if step.entries), None)
+    if first is None:
+        return lines[0] + "\nMa'lumot yo'q."
+    start = previous = stats[first].entries
+    for step in stats[first:]:
+        of_start = step.entries * 100 / start
+        of_previous = step.entries * 100 / previous if previous else 0
+        name = step.step.replace("waiting_for_", "")
+        lines.append(
+            f"{name}: {step.entries} ({of_start:.0f}% / {of_previous:.0f}%), "
+            f"median {_format_seconds(step.dwell_percentile(0.5))}"
+        )
+        previous = step.entries
+    return "\n".join(lines)
+
+
+@router.message(Command("funnel"))
+async def cmd_funnel(message: Message, command: CommandObject, funnel: FunnelTracker):
+    """/funnel - conversion and time spent per application step"""
+    try:
+        days, filters = parse_funnel_args(command.args)
+    except ValueError as e:
+        return message.reply(str(e))
+    stats = await funnel.report(time.time() - days * 86400, **filters)
+    return message.reply(format_funnel(stats, days, filters))
+
+
+async def _send_profile(bot: Bot, chat_id: int, reply_to: int, profiler: SamplingProfiler, seconds: int) -> None:
+    try:
+        result = await profiler.profile(seconds)
+        collapsed, svg = await asyncio.to_thread(result.save, profiler.directory)
+        await bot.send_message(chat_id, result.summary(), reply_to_message_id=reply_to)
+        await bot.send_document(chat_id, FSInputFile(svg), reply_to_message_id=reply_to)
+        await bot.send_document(chat_id, FSInputFile(collapsed), reply_to_message_id=reply_to)
+    except Exception as e:
+        logger.error(f"Profiling failed: {type(e).__name__}: {e}")
+        await bot.send_message(chat_id, "❌ Profil olishda xatolik yuz berdi", reply_to_message_id=reply_to)
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message, command: CommandObject, bot: Bot, profiler: SamplingProfiler):
+    """/profile [seconds] - sample the event loop, then send a flamegraph and the slowest handlers"""
+    args = (command.args or "").strip()
+    if args and not (args.isdigit() and 1 <= int(args) <= PROFILE_MAX_SECONDS):
+        return message.reply(f"Foydalanish: /profile [1-{PROFILE_MAX_SECONDS} soniya]")
+    if profiler.running:
+        return message.reply("⏳ Profil allaqachon olinmoqda")
+    seconds = int(args) if args else PROFILE_DEFAULT_SECONDS
+    # In the background: the handler must not hold the update (webhook) for the whole run
+    task = asyncio.create_task(_send_profile(bot, message.chat.id, message.message_id, profiler, seconds))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return message.reply(f"⏱ {seconds} soniya davomida profil olinmoqda...")
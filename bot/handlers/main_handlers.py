@@ -1,67 +1,62 @@
 """Main handlers for start command and menu"""
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 from bot.keyboards.reply_keyboards import get_main_menu_keyboard, get_start_keyboard, get_main_menu_back_keyboard
+from bot.keyboards.buttons import ReplyButton
+from bot.keyboards.callback_data import CallbackKind, CallbackPayload
 from bot.keyboards.inline_keyboards import get_language_selection_keyboard
 from bot.utils.texts import get_text
-from bot.config import COMPANY_NAME, BOT_NAME, DEFAULT_LANGUAGE
+from bot.config import COMPANY_NAME, BOT_NAME
+from bot.models.application_draft import ApplicationDraft
 
 router = Router()
 
+# Handlers that end with a single reply *return* the method instead of awaiting it.
+# In webhook mode with WEBHOOK_REPLY_IN_RESPONSE=1 the reply is sent inside the HTTP
+# response (no extra API call); otherwise aiogram executes the returned method itself.
+
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle /start command - Welcome message and Start button"""
-    # Preserve user language before clearing
-    data = await state.get_data()
-    saved_lang = data.get("user_language", DEFAULT_LANGUAGE)
-    
-    await state.clear()  # Clear any previous state
-    
-    # Restore user language
-    await state.update_data(user_language=saved_lang)
+    # Preserve user language while clearing any previous state
+    saved_lang = draft.user_language
+    await state.set_state(None)
+    draft.reset(user_language=saved_lang)
     
     welcome_text = get_text("start_welcome", lang=saved_lang)
     
-    await message.answer(
+    return message.answer(
         welcome_text,
         parse_mode="Markdown",
-        reply_markup=get_start_keyboard()
+        reply_markup=get_start_keyboard(lang=saved_lang)
     )
 
 
-@router.message(F.text == "▶️ Start")
-async def process_start(message: Message, state: FSMContext):
+@router.message(ReplyButton("start"))
+async def process_start(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Process Start button - Show main menu"""
-    # Preserve user language before clearing
-    data = await state.get_data()
-    saved_lang = data.get("user_language", DEFAULT_LANGUAGE)
+    # Preserve user language while clearing any previous state
+    saved_lang = draft.user_language
+    await state.set_state(None)
+    draft.reset(user_language=saved_lang)
     
-    await state.clear()
-    
-    # Restore user language
-    await state.update_data(user_language=saved_lang)
-    
-    await message.answer(
+    return message.answer(
         get_text("main_menu", lang=saved_lang),
-        reply_markup=get_main_menu_keyboard()
+        reply_markup=get_main_menu_keyboard(lang=saved_lang)
     )
 
 
-@router.message(F.text == "🧳 Bo'sh ish o'rinlari")
-async def show_vacancies(message: Message, state: FSMContext):
+@router.message(ReplyButton("vacancies"))
+async def show_vacancies(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Show vacancies and start application process"""
-    # Preserve user language before clearing
-    data = await state.get_data()
-    saved_lang = data.get("user_language", DEFAULT_LANGUAGE)
-    
-    await state.clear()
-    
-    # Restore user language and store previous menu for back button
-    await state.update_data(user_language=saved_lang, previous_menu="main_menu")
+    # Preserve user language while clearing any previous data,
+    # and store previous menu for back button (state is set below)
+    saved_lang = draft.user_language
+    draft.reset(user_language=saved_lang, previous_menu="main_menu")
     
     text = get_text("vacancy_start", lang=saved_lang)
     await message.answer(text, parse_mode="Markdown")
@@ -72,84 +67,78 @@ async def show_vacancies(message: Message, state: FSMContext):
     
     await message.answer(
         get_text("select_branch", lang=saved_lang),
-        reply_markup=get_branch_keyboard()
+        reply_markup=get_branch_keyboard(lang=saved_lang)
     )
     await state.set_state(ApplicationStates.waiting_for_branch)
 
 
-@router.message(F.text == "🏢 Kompaniya haqida")
-async def show_about(message: Message, state: FSMContext):
+@router.message(ReplyButton("about"))
+async def show_about(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Show company information"""
     # Get user language
-    data = await state.get_data()
-    user_lang = data.get("user_language", DEFAULT_LANGUAGE)
+    user_lang = draft.user_language
     
     # Store that we're in a menu action (for back button)
-    await state.update_data(previous_menu="main_menu")
+    draft.previous_menu = "main_menu"
     
     text = get_text("about_company", lang=user_lang)
-    await message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard())
+    return message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard(lang=user_lang))
 
 
-@router.message(F.text == "☎️ Kontaktlar")
-async def show_contacts(message: Message, state: FSMContext):
+@router.message(ReplyButton("contacts"))
+async def show_contacts(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Show contact information"""
     # Get user language
-    data = await state.get_data()
-    user_lang = data.get("user_language", DEFAULT_LANGUAGE)
+    user_lang = draft.user_language
     
     # Store that we're in a menu action (for back button)
-    await state.update_data(previous_menu="main_menu")
+    draft.previous_menu = "main_menu"
     
     text = get_text("contacts", lang=user_lang)
-    await message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard())
+    return message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard(lang=user_lang))
 
 
-@router.message(F.text == "💬 Fikr-mulohazalar")
-async def show_feedback(message: Message, state: FSMContext):
+@router.message(ReplyButton("feedback"))
+async def show_feedback(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Show feedback form"""
     # Get user language
-    data = await state.get_data()
-    user_lang = data.get("user_language", DEFAULT_LANGUAGE)
+    user_lang = draft.user_language
     
     # Store that we're in a menu action (for back button)
-    await state.update_data(previous_menu="main_menu")
+    draft.previous_menu = "main_menu"
     
     text = get_text("feedback", lang=user_lang)
-    await message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard())
+    return message.answer(text, parse_mode="Markdown", reply_markup=get_main_menu_back_keyboard(lang=user_lang))
 
 
-@router.message(F.text == "🌐 Tilni o'zgartirish")
-async def change_language(message: Message, state: FSMContext):
+@router.message(ReplyButton("change_language"))
+async def change_language(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Change language - show language selection keyboard"""
     # Get user language
-    data = await state.get_data()
-    user_lang = data.get("user_language", DEFAULT_LANGUAGE)
+    user_lang = draft.user_language
     
     # Store that we're in a menu action (for back button)
-    await state.update_data(previous_menu="main_menu")
+    draft.previous_menu = "main_menu"
     
     text = get_text("language_change", lang=user_lang)
-    await message.answer(
+    return message.answer(
         text, 
         parse_mode="Markdown", 
         reply_markup=get_language_selection_keyboard()
     )
 
 
-@router.callback_query(F.data.startswith("lang:"))
-async def process_language_selection(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CallbackKind("lang"))
+async def process_language_selection(
+    callback: CallbackQuery, state: FSMContext, draft: ApplicationDraft, payload: CallbackPayload
+):
     """Process language selection"""
-    lang_code = callback.data.split(":", 1)[1]
-    
-    # Validate language code
+    # One of SUPPORTED_LANGUAGES: CallbackKind only lets known codes through
+    lang_code = payload.value
     from bot.config import SUPPORTED_LANGUAGES
-    if lang_code not in SUPPORTED_LANGUAGES:
-        await callback.answer("❌ Invalid language selection")
-        return
     
     # Store language preference in FSM state
-    await state.update_data(user_language=lang_code)
+    draft.user_language = lang_code
     
     # Get language label
     lang_label = SUPPORTED_LANGUAGES[lang_code]
@@ -159,24 +148,20 @@ async def process_language_selection(callback: CallbackQuery, state: FSMContext)
     
     # Get success message in selected language
     success_text = get_text("language_changed", lang=lang_code)
-    if success_text == "language_changed":  # Fallback if not translated
-        success_text = f"✅ {lang_label} tanlandi!"
-    
     await callback.message.edit_text(success_text)
     
     # Show main menu with back button
     await callback.message.answer(
         get_text("main_menu", lang=lang_code),
-        reply_markup=get_main_menu_back_keyboard()
+        reply_markup=get_main_menu_back_keyboard(lang=lang_code)
     )
 
 
-@router.message(F.text == "⬅️ Orqaga")
-async def handle_main_menu_back_button(message: Message, state: FSMContext):
+@router.message(ReplyButton("menu_back"))
+async def handle_main_menu_back_button(message: Message, state: FSMContext, draft: ApplicationDraft):
     """Handle back button for main menu actions - go back to main menu"""
-    data = await state.get_data()
-    user_lang = data.get("user_language", DEFAULT_LANGUAGE)
-    previous_menu = data.get("previous_menu")
+    user_lang = draft.user_language
+    previous_menu = draft.previous_menu
     current_state = await state.get_state()
     
     # If we're in application flow (FSM state is set), don't handle here
@@ -186,16 +171,15 @@ async def handle_main_menu_back_button(message: Message, state: FSMContext):
     
     # If we're in a menu action (Company, Contacts, Feedback, Language), go back to main menu
     if previous_menu == "main_menu":
-        await state.update_data(previous_menu=None)
-        await message.answer(
+        draft.previous_menu = None
+        return message.answer(
             get_text("main_menu", lang=user_lang),
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=get_main_menu_keyboard(lang=user_lang)
         )
-        return
     
     # Default: go to main menu (fallback)
-    await state.update_data(previous_menu=None)
-    await message.answer(
+    draft.previous_menu = None
+    return message.answer(
         get_text("main_menu", lang=user_lang),
-        reply_markup=get_main_menu_keyboard()
+        reply_markup=get_main_menu_keyboard(lang=user_lang)
     )
@@ -0,0 +1,146 @@
+"""
+Reply-button text to action, resolved with one dict lookup.
+
+A reply button sends its label as a plain message. The index maps the label
+of every button in every language to what it means:
+
+* the catalog texts "button_<action>" (bot/locales) -> Button("<action>"),
+  e.g. "🔙 Orqaga" -> Button("back");
+* BRANCHES, DEPARTMENTS, POSITIONS, WORK_EXPERIENCE -> Button("branch", "clara"),
+  Button("department", "sotuv"), Button("position", "HR"),
+  Button("work_experience", "1 year").
+
+Keys are normalized (case, spacing, apostrophe variants), so "🔙 orqaga"
+finds the same button. Main-menu handlers select their button with the
+ReplyButton filter:
+
+    @router.message(ReplyButton("vacancies"))
+
+Steps offering a choice resolve it with match(text, actions), which also
+accepts typed text that is not a button label: "clara", "Сотув", "akademk"
+(bot/utils/fuzzy.py, over the labels and CATALOG_ALIASES). The match must be
+one of the step's actions, and the only one the text could mean.
+
+The index is rebuilt when the texts are reloaded.
+"""
+import logging
+import unicodedata
+from typing import Any, Collection, Dict, FrozenSet, NamedTuple, Optional, Union
+
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+from bot.config import BRANCHES, CATALOG_ALIASES, DEPARTMENTS, POSITIONS, SUPPORTED_LANGUAGES, WORK_EXPERIENCE
+from bot.utils.fuzzy import FuzzyMatcher
+from bot.utils.texts import texts
+
+logger = logging.getLogger(__name__)
+
+# Catalog texts whose key starts with this are reply-button labels
+BUTTON_PREFIX = "button_"
+
+_APOSTROPHES = str.maketrans({"ʻ": "'", "ʼ": "'", "’": "'", "‘": "'", "`": "'", "´": "'"})
+
+
+class Button(NamedTuple):
+    """What a reply button means: an action, plus the catalog id for catalog buttons"""
+
+    action: str
+    id: Optional[str] = None
+
+
+BACK = Button("back")
+
+
+def normalize(text: str) -> str:
+    """Case-, spacing- and apostrophe-insensitive form of a text"""
+    return " ".join(unicodedata.normalize("NFC", text).translate(_APOSTROPHES).casefold().split())
+
+
+def catalog_buttons() -> Dict[Button, str]:
+    """Labels of the catalog buttons (the same in every language)"""
+    labels = {Button("branch", key): name for key, name in BRANCHES.items()}
+    labels.update({Button("department", key): name for key, name in DEPARTMENTS.items()})
+    labels.update({Button("position", name): name for positions in POSITIONS.values() for name in positions})
+    labels.update({Button("work_experience", option): option for option in WORK_EXPERIENCE})
+    return labels
+
+
+class ButtonIndex:
+    """Normalized label in any language -> Button, plus a fuzzy matcher for typed text"""
+
+    def __init__(self):
+        self._exact: Dict[str, Button] = {}
+        self._fuzzy: FuzzyMatcher[Button] = FuzzyMatcher(())
+        self.actions: FrozenSet[str] = frozenset()
+
+        # Counters (exported as metrics)
+        self.typed_matches = 0
+
+    def build(self) -> int:
+        """(Re)build from the texts and catalogs; returns how many labels there are"""
+        labels = []
+        for lang in SUPPORTED_LANGUAGES:
+            for key, text in texts.table(lang).items():
+                if key.startswith(BUTTON_PREFIX) and isinstance(text, str):
+                    labels.append((Button(key[len(BUTTON_PREFIX):]), text))
+        labels.extend((button, label) for button, label in catalog_buttons().items())
+
+        exact: Dict[str, Button] = {}
+        for button, label in labels:
+            for key in (label, normalize(label)):
+                if exact.setdefault(key, button) != button:
+                    logger.warning(f"Button label {label!r} is used by both {exact[key]} and {button}")
+        aliases = [
+            (button, alias) for button, label in labels for alias in CATALOG_ALIASES.get(label, ()) if button.id
+        ]
+        self._exact = exact
+        self._fuzzy = FuzzyMatcher(labels + aliases)
+        self.actions = frozenset(button.action for button, _ in labels)
+        return len(labels)
+
+    def resolve(self, text: Optional[str]) -> Optional[Button]:
+        """The button `text` is the label of; None for anything else"""
+        if not text:
+            return None
+        button = self._exact.get(text)
+        return button if button is not None else self._exact.get(normalize(text))
+
+    def match(
+        self, text: Optional[str], actions: Collection[str], ids: Optional[Collection[str]] = None,
+    ) -> Optional[Button]:
+        """Button of one of `actions` (catalog ones among `ids`) meant by `text`: its label or a typed answer"""
+        def accept(button: Button) -> bool:
+            return button.action in actions and (ids is None or button.id is None or button.id in ids)
+
+        button = self.resolve(text)
+        if button is not None:
+            return button if accept(button) else None
+        if not text:
+            return None
+        button = self._fuzzy.match(text, accept)
+        if button is not None:
+            self.typed_matches += 1
+            logger.debug(f"Typed {text!r} matched {button}")
+        return button
+
+
+buttons = ButtonIndex()
+buttons.build()
+texts.listeners.append(buttons.build)
+
+
+class ReplyButton(Filter):
+    """Matches messages that are the label of one of `actions`; passes the Button as `button`"""
+
+    def __init__(self, *actions: str):
+        unknown = set(actions) - buttons.actions
+        if unknown:
+            raise ValueError(f"Unknown reply button actions {sorted(unknown)}")
+        self.actions = frozenset(actions)
+
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        button = buttons.resolve(message.text)
+        if button is None or button.action not in self.actions:
+            return False
+        return {"button": button}
@@ -0,0 +1,180 @@
+"""
+Compact callback_data for inline buttons, decoded in one place.
+
+A button's callback_data is one letter for the kind of button followed by a
+base-36 number: an index into the kind's catalog from bot/config.py plus a
+one-character checksum of that catalog, or an id (a Telegram user id, a page
+offset):
+
+    encode_callback("position", "Videographer / Editor")  ->  "p8g"
+    encode_callback("approve", id=123456789)              ->  "a21i3v9"
+
+instead of "position:Videographer / Editor" and "approve_123456789". After a
+catalog in config.py changes, its old buttons fail the checksum and decode to
+None instead of to a different choice.
+
+decode_callback() finds the kind by a single dict lookup and returns a
+validated CallbackPayload (or None). Handlers select their kind with the
+CallbackKind filter, which passes the decoded payload on as `payload`:
+
+    @router.callback_query(CallbackKind("position"), ApplicationStates.waiting_for_position)
+    async def process_position(callback: CallbackQuery, payload: CallbackPayload, ...):
+        payload.value  # "Videographer / Editor"
+
+The old "<prefix>:<value>" and "<prefix>_<id>" strings are still decoded, so
+buttons sent before the switch (HR group posts especially) keep working.
+"""
+import logging
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Union
+
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+from bot.config import EDUCATION_LEVELS, GENDERS, LANGUAGE_LEVELS, POSITIONS, SUPPORTED_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit for callback_data
+MAX_CALLBACK_BYTES = 64
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_DIGIT_SET = frozenset(_DIGITS)
+
+
+class CallbackPayload(NamedTuple):
+    """Decoded callback_data: `value` for catalog kinds, `id` for id kinds, neither for plain buttons"""
+
+    kind: str
+    value: Optional[str] = None
+    id: Optional[int] = None
+
+
+class _Kind(NamedTuple):
+    name: str
+    code: str  # one letter, unique
+    legacy: str  # "position:", "approve_", "skip"
+    values: Optional[Sequence[str]] = None  # catalog kinds
+    has_id: bool = False  # id kinds
+
+    @property
+    def checksum(self) -> str:
+        return _DIGITS[zlib.crc32(repr(list(self.values)).encode("utf-8")) % 36]
+
+
+_ALL_POSITIONS = list(dict.fromkeys(position for positions in POSITIONS.values() for position in positions))
+
+_KINDS = (
+    _Kind("position", "p", "position:", [*_ALL_POSITIONS, "back"]),
+    _Kind("education", "e", "education:", EDUCATION_LEVELS),
+    _Kind("gender", "g", "gender:", GENDERS),
+    _Kind("russian_level", "r", "russian_level:", LANGUAGE_LEVELS),
+    _Kind("english_level", "n", "english_level:", LANGUAGE_LEVELS),
+    _Kind("phone_confirm", "f", "phone_confirm:", ["yes", "edit"]),
+    _Kind("confirm", "c", "confirm:", ["yes", "back"]),
+    _Kind("lang", "l", "lang:", list(SUPPORTED_LANGUAGES)),
+    _Kind("skip", "s", "skip"),
+    _Kind("approve", "a", "approve_", has_id=True),
+    _Kind("interview", "i", "interview_", has_id=True),
+    _Kind("reject", "x", "reject_", has_id=True),
+    _Kind("hr_search", "h", "hr_search:", has_id=True),
+)
+
+# The lookup tables: by name (encoding), by code letter and by legacy prefix (decoding)
+_BY_NAME: Dict[str, _Kind] = {kind.name: kind for kind in _KINDS}
+_BY_CODE: Dict[str, _Kind] = {kind.code: kind for kind in _KINDS}
+_BY_LEGACY: Dict[str, _Kind] = {kind.legacy: kind for kind in _KINDS}
+_CHECKSUMS: Dict[str, str] = {kind.name: kind.checksum for kind in _KINDS if kind.values is not None}
+_INDEXES: Dict[str, Dict[str, int]] = {
+    kind.name: {value: index for index, value in enumerate(kind.values)} for kind in _KINDS if kind.values is not None
+}
+assert len(_BY_CODE) == len(_KINDS), "callback kind codes must be unique"
+
+
+def to_base36(number: int) -> str:
+    if number == 0:
+        return "0"
+    digits = []
+    while number:
+        number, digit = divmod(number, 36)
+        digits.append(_DIGITS[digit])
+    return "".join(reversed(digits))
+
+
+def encode_callback(kind: str, value: Optional[str] = None, id: Optional[int] = None) -> str:
+    """callback_data of a button; raises ValueError for values the kind does not have"""
+    spec = _BY_NAME[kind]
+    if spec.values is not None:
+        try:
+            data = f"{spec.code}{to_base36(_INDEXES[kind][value])}{_CHECKSUMS[kind]}"
+        except KeyError:
+            raise ValueError(f"{value!r} is not a {kind} choice") from None
+    elif spec.has_id:
+        if id is None or id < 0:
+            raise ValueError(f"{kind} buttons need a non-negative id, got {id!r}")
+        data = f"{spec.code}{to_base36(id)}"
+    else:
+        data = spec.code
+    if len(data.encode("utf-8")) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data {data!r} is longer than {MAX_CALLBACK_BYTES} bytes")
+    return data
+
+
+def _payload(kind: _Kind, value: Optional[str], id: Optional[int]) -> Optional[CallbackPayload]:
+    """Validated payload; None when the value or id does not fit the kind"""
+    if kind.values is not None:
+        return CallbackPayload(kind.name, value=value) if value in _INDEXES[kind.name] else None
+    if kind.has_id:
+        return CallbackPayload(kind.name, id=id) if id is not None and id >= 0 else None
+    return CallbackPayload(kind.name)
+
+
+def _decode_legacy(data: str) -> Optional[CallbackPayload]:
+    """"<prefix>:<value>", "<prefix>_<id>" and "skip" of buttons sent before the compact format"""
+    if data in _BY_LEGACY:
+        return _payload(_BY_LEGACY[data], None, None)
+    separator = ":" if ":" in data else "_"
+    prefix, _, rest = data.partition(separator)
+    kind = _BY_LEGACY.get(prefix + separator)
+    if kind is None:
+        return None
+    if kind.has_id:
+        try:
+            return _payload(kind, None, int(rest))
+        except ValueError:
+            return None
+    return _payload(kind, rest, None)
+
+
+@lru_cache(maxsize=4096)
+def decode_callback(data: Optional[str]) -> Optional[CallbackPayload]:
+    """Payload of a button's callback_data, None if it is not one of ours (or is outdated)"""
+    if not data:
+        return None
+    kind = _BY_CODE.get(data[0])
+    if kind is None or not _DIGIT_SET.issuperset(data[1:]):
+        return _decode_legacy(data)
+    if kind.values is not None:
+        if len(data) < 3 or data[-1] != _CHECKSUMS[kind.name]:
+            return _decode_legacy(data)
+        index = int(data[1:-1], 36)
+        return CallbackPayload(kind.name, value=kind.values[index]) if index < len(kind.values) else None
+    if kind.has_id:
+        return CallbackPayload(kind.name, id=int(data[1:], 36)) if len(data) > 1 else None
+    return CallbackPayload(kind.name) if len(data) == 1 else _decode_legacy(data)
+
+
+class CallbackKind(Filter):
+    """Matches callback queries of one kind and passes the decoded payload as `payload`"""
+
+    def __init__(self, kind: str):
+        if kind not in _BY_NAME:
+            raise ValueError(f"Unknown callback kind {kind!r}")
+        self.kind = kind
+
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        payload = decode_callback(callback.data)
+        if payload is None or payload.kind != self.kind:
+            return False
+        return {"payload": payload}
@@ -1,110 +1,121 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot.config import POSITIONS, EDUCATION_LEVELS, GENDERS, LANGUAGE_LEVELS, SUPPORTED_LANGUAGES
+from bot.keyboards.callback_data import encode_callback
+from bot.keyboards.registry import keyboard, keyboard_template
 
 
+@keyboard("position", variants=lambda: [(department_key,) for department_key in POSITIONS])
 def get_position_keyboard(department_key: str):
     """Position selection keyboard (INLINE buttons only) based on department"""
     positions = POSITIONS.get(department_key, [])
     buttons = []
     for pos in positions:
-        buttons.append([InlineKeyboardButton(text=pos, callback_data=f"position:{pos}")])
+        buttons.append([InlineKeyboardButton(text=pos, callback_data=encode_callback("position", pos))])
     
     # Add back button
-    buttons.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="position:back")])
+    buttons.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=encode_callback("position", "back"))])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
 
 
+@keyboard("education")
 def get_education_keyboard():
     """Education level keyboard (inline)"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text=level, callback_data=f"education:{level}")]
+            [InlineKeyboardButton(text=level, callback_data=encode_callback("education", level))]
             for level in EDUCATION_LEVELS
         ]
     )
     return keyboard
 
 
+@keyboard("gender")
 def get_gender_keyboard():
     """Gender selection keyboard (inline)"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text=gender, callback_data=f"gender:{gender}")]
+            [InlineKeyboardButton(text=gender, callback_data=encode_callback("gender", gender))]
             for gender in GENDERS
         ]
     )
     return keyboard
 
 
+@keyboard("language_level", variants=lambda: [("russian",), ("english",)])
 def get_language_level_keyboard(language: str):
     """Language level keyboard (Russian or English) - inline"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text=level, callback_data=f"{language}_level:{level}")]
+            [InlineKeyboardButton(text=level, callback_data=encode_callback(f"{language}_level", level))]
             for level in LANGUAGE_LEVELS
         ]
     )
     return keyboard
 
 
+@keyboard("confirmation")
 def get_confirmation_keyboard():
     """Final confirmation keyboard (inline)"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="Tasdiqlash", callback_data="confirm:yes"),
-                InlineKeyboardButton(text="Orqaga", callback_data="confirm:back")
+                InlineKeyboardButton(text="Tasdiqlash", callback_data=encode_callback("confirm", "yes")),
+                InlineKeyboardButton(text="Orqaga", callback_data=encode_callback("confirm", "back"))
             ]
         ]
     )
     return keyboard
 
 
+@keyboard("skip")
 def get_skip_keyboard():
     """Skip button keyboard (inline)"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="⏭️ O'tkazib yuborish", callback_data="skip")]
+            [InlineKeyboardButton(text="⏭️ O'tkazib yuborish", callback_data=encode_callback("skip"))]
         ]
     )
     return keyboard
 
 
+@keyboard("language_selection")
 def get_language_selection_keyboard():
     """Language selection keyboard (inline)"""
     buttons = []
     for lang_code, lang_label in SUPPORTED_LANGUAGES.items():
-        buttons.append([InlineKeyboardButton(text=lang_label, callback_data=f"lang:{lang_code}")])
+        buttons.append([InlineKeyboardButton(text=lang_label, callback_data=encode_callback("lang", lang_code))])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
 
 
+@keyboard("phone_confirmation")
 def get_phone_confirmation_keyboard():
     """Phone number confirmation keyboard (inline)"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Tasdiqlash", callback_data="phone_confirm:yes"),
-                InlineKeyboardButton(text="✏️ O'zgartirish", callback_data="phone_confirm:edit")
+                InlineKeyboardButton(text="✅ Tasdiqlash", callback_data=encode_callback("phone_confirm", "yes")),
+                InlineKeyboardButton(text="✏️ O'zgartirish", callback_data=encode_callback("phone_confirm", "edit"))
             ]
         ]
     )
     return keyboard
 
 
+@keyboard_template("hr_decision")
 def get_hr_decision_keyboard(user_id: int):
     """HR decision keyboard with approve/interview/reject buttons"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Qabul qilindi", callback_data=f"approve_{user_id}"),
-                InlineKeyboardButton(text="🎤 Suhbatga chaqirish", callback_data=f"interview_{user_id}")
+                InlineKeyboardButton(text="✅ Qabul qilindi", callback_data=encode_callback("approve", id=user_id)),
+                InlineKeyboardButton(text="🎤 Suhbatga chaqirish", callback_data=encode_callback("interview", id=user_id))
             ],
             [
-                InlineKeyboardButton(text="❌ Rad etildi", callback_data=f"reject_{user_id}")
+                InlineKeyboardButton(text="❌ Rad etildi", callback_data=encode_callback("reject", id=user_id))
             ]
         ]
     )
@@ -0,0 +1,249 @@
+"""
+Keyboards built once and reused for every update.
+
+The factories in inline_keyboards.py and reply_keyboards.py are registered
+with @keyboard(name). Calling one returns a markup from the registry instead
+of a freshly validated pydantic tree:
+
+    @keyboard("position", variants=lambda: [(key,) for key in POSITIONS])
+    def get_position_keyboard(department_key: str): ...
+
+    get_position_keyboard("akademik")             # same object every time
+    get_position_keyboard("akademik", lang="ru")  # one variant per language
+
+The registry builds every variant for every language in SUPPORTED_LANGUAGES
+(a factory with a `lang` parameter is called per language; the others are
+shared by all languages) and keeps the JSON of each markup next to it.
+install_prebuilt_markups() lets the bot session send that JSON as is instead
+of dumping and serializing the keyboard on every request.
+
+Keyboards that differ per user are templates (@keyboard_template): built
+once with a placeholder id, then rendered per id by substituting it into the
+prebuilt buttons and JSON.
+
+The registry is rebuilt only when the catalogs in bot/config.py or the texts
+in bot/locales change (refresh(), a dispatcher startup hook and texts reload
+listener, compares their fingerprint).
+"""
+import functools
+import inspect
+import json
+import logging
+import zlib
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+from pydantic import PrivateAttr
+
+from bot.config import (
+    BRANCHES, DEFAULT_LANGUAGE, DEPARTMENTS, EDUCATION_LEVELS, GENDERS, LANGUAGE_LEVELS, POSITIONS,
+    SUPPORTED_LANGUAGES, WORK_EXPERIENCE,
+)
+from bot.keyboards.callback_data import to_base36
+from bot.utils.texts import texts
+
+logger = logging.getLogger(__name__)
+
+# Id a template is built with; its base-36 digits are replaced by the real id's
+TEMPLATE_ID = 36 ** 12 - 1
+_TEMPLATE_DIGITS = to_base36(TEMPLATE_ID)
+
+
+class PrebuiltInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """InlineKeyboardMarkup carrying its serialized JSON"""
+
+    _json: str = PrivateAttr(default="")
+
+
+class PrebuiltReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    """ReplyKeyboardMarkup carrying its serialized JSON"""
+
+    _json: str = PrivateAttr(default="")
+
+
+Markup = Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]
+_PREBUILT = {InlineKeyboardMarkup: PrebuiltInlineKeyboardMarkup, ReplyKeyboardMarkup: PrebuiltReplyKeyboardMarkup}
+
+
+def _without_none(value: Any) -> Any:
+    """What the session would send: None fields left out (see BaseSession.prepare_value)"""
+    if isinstance(value, dict):
+        return {key: _without_none(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_without_none(item) for item in value]
+    return value
+
+
+def to_json(markup: Markup) -> str:
+    return json.dumps(_without_none(markup.model_dump(warnings=False)), ensure_ascii=False, separators=(",", ":"))
+
+
+def prebuild(markup: Markup) -> Markup:
+    """Copy of `markup` with its JSON attached"""
+    prebuilt = _PREBUILT[type(markup)].model_construct(**markup.__dict__)
+    prebuilt._json = to_json(markup)
+    return prebuilt
+
+
+def catalog_version() -> int:
+    """Fingerprint of the catalogs and texts keyboards are built from"""
+    catalogs = (
+        BRANCHES, DEPARTMENTS, POSITIONS, EDUCATION_LEVELS, GENDERS, LANGUAGE_LEVELS, WORK_EXPERIENCE,
+        SUPPORTED_LANGUAGES, texts.version,
+    )
+    return zlib.crc32(repr(catalogs).encode("utf-8"))
+
+
+class _Factory:
+    __slots__ = ("builder", "variants", "signature", "per_language")
+
+    def __init__(self, builder: Callable[..., Markup], variants: Callable[[], Iterable[Tuple[Any, ...]]]):
+        self.builder = builder
+        self.variants = variants
+        self.signature = inspect.signature(builder)
+        self.per_language = "lang" in self.signature.parameters
+
+    def build(self, args: Tuple[Any, ...], lang: str) -> Markup:
+        markup = self.builder(*args, lang=lang) if self.per_language else self.builder(*args)
+        return prebuild(markup)
+
+
+class KeyboardRegistry:
+    """Prebuilt keyboards by (name, arguments, language) and per-id templates by name"""
+
+    def __init__(self):
+        self._factories: Dict[str, _Factory] = {}
+        self._templates: Dict[str, Callable[[int], Markup]] = {}
+        self._keyboards: Dict[Tuple[str, Tuple[Any, ...], str], Markup] = {}
+        self._rendered: Dict[str, Markup] = {}  # template name -> markup built with TEMPLATE_ID
+        self.version: Optional[int] = None
+
+        # Counters (exported as metrics)
+        self.builds = 0
+
+    def register(
+        self, name: str, builder: Callable[..., Markup],
+        variants: Optional[Callable[[], Iterable[Tuple[Any, ...]]]] = None,
+    ) -> None:
+        self._check_name(name)
+        self._factories[name] = _Factory(builder, variants or (lambda: [()]))
+
+    def register_template(self, name: str, builder: Callable[[int], Markup]) -> None:
+        self._check_name(name)
+        self._templates[name] = builder
+
+    def _check_name(self, name: str) -> None:
+        if name in self._factories or name in self._templates:
+            raise ValueError(f"Keyboard {name!r} is already registered")
+
+    # ---------- building ----------
+
+    def build(self) -> int:
+        """Build every keyboard for every language; returns how many markups there are"""
+        keyboards: Dict[Tuple[str, Tuple[Any, ...], str], Markup] = {}
+        for name, factory in self._factories.items():
+            for args in factory.variants():
+                shared = None if factory.per_language else factory.build(args, DEFAULT_LANGUAGE)
+                for lang in SUPPORTED_LANGUAGES:
+                    keyboards[(name, args, lang)] = shared if shared is not None else factory.build(args, lang)
+        self._keyboards = keyboards
+        self._rendered = {name: prebuild(builder(TEMPLATE_ID)) for name, builder in self._templates.items()}
+        self.version = catalog_version()
+        self.builds += 1
+        logger.info(f"Built {len(keyboards)} keyboards and {len(self._rendered)} templates")
+        return len(keyboards)
+
+    def refresh(self) -> bool:
+        """Rebuild if the catalogs changed since the last build (dispatcher startup hook). Returns whether it did"""
+        if self.version == catalog_version():
+            return False
+        self.build()
+        return True
+
+    # ---------- lookups ----------
+
+    def get(self, name: str, *args: Any, lang: str = DEFAULT_LANGUAGE) -> Markup:
+        markup = self._keyboards.get((name, args, lang))
+        if markup is None:
+            # Not prebuilt (arguments outside the variants, or before the first build): build and keep it
+            factory = self._factories[name]
+            markup = factory.build(args, lang if lang in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE)
+            self._keyboards[(name, args, lang)] = markup
+        return markup
+
+    def render(self, name: str, id: int) -> Markup:
+        """Template `name` with TEMPLATE_ID replaced by `id` in callback_data and JSON"""
+        template = self._rendered.get(name)
+        if template is None:
+            template = self._rendered[name] = prebuild(self._templates[name](TEMPLATE_ID))
+        digits = to_base36(id)
+        rows = [
+            [
+                button.model_copy(update={"callback_data": button.callback_data.replace(_TEMPLATE_DIGITS, digits)})
+                if button.callback_data and _TEMPLATE_DIGITS in button.callback_data else button
+                for button in row
+            ]
+            for row in template.inline_keyboard
+        ]
+        markup = template.model_copy(update={"inline_keyboard": rows})
+        markup._json = template._json.replace(_TEMPLATE_DIGITS, digits)
+        return markup
+
+
+keyboards = KeyboardRegistry()
+# Button labels are catalog texts: rebuild when they are reloaded
+texts.listeners.append(keyboards.refresh)
+
+
+def keyboard(name: str, variants: Optional[Callable[[], Iterable[Tuple[Any, ...]]]] = None):
+    """Register a keyboard factory; calls return the prebuilt markup (extra keyword: lang)"""
+    def decorator(builder: Callable[..., Markup]) -> Callable[..., Markup]:
+        keyboards.register(name, builder, variants)
+        signature = inspect.signature(builder)
+
+        @functools.wraps(builder)
+        def cached(*args: Any, lang: str = DEFAULT_LANGUAGE, **kwargs: Any) -> Markup:
+            if kwargs:
+                args = signature.bind(*args, **kwargs).args
+            return keyboards.get(name, *args, lang=lang)
+
+        cached.build = builder
+        return cached
+    return decorator
+
+
+def keyboard_template(name: str):
+    """Register a per-id keyboard factory (one int argument); calls render the template"""
+    def decorator(builder: Callable[[int], Markup]) -> Callable[[int], Markup]:
+        keyboards.register_template(name, builder)
+        signature = inspect.signature(builder)
+
+        @functools.wraps(builder)
+        def rendered(*args: Any, **kwargs: Any) -> Markup:
+            (id,) = signature.bind(*args, **kwargs).args if kwargs else args
+            return keyboards.render(name, id)
+
+        rendered.build = builder
+        return rendered
+    return decorator
+
+
+async def install_prebuilt_markups(bot: Bot) -> None:
+    """Send prebuilt keyboards' JSON as is (dispatcher startup hook)"""
+    session = bot.session
+    original = getattr(session, "build_form_data", None)
+    if original is None or getattr(original, "sends_prebuilt_markups", False):
+        return
+
+    @functools.wraps(original)
+    def build_form_data(bot: Bot, method):
+        prebuilt = getattr(getattr(method, "reply_markup", None), "_json", "")
+        if not prebuilt:
+            return original(bot, method)
+        form = original(bot, method.model_copy(update={"reply_markup": None}))
+        form.add_field("reply_markup", prebuilt)
+        return form
+
+    build_form_data.sends_prebuilt_markups = True
+    session.build_form_data = build_form_data
@@ -1,40 +1,50 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from bot.config import BRANCHES, DEPARTMENTS, WORK_EXPERIENCE
+from bot.config import BRANCHES, DEFAULT_LANGUAGE, DEPARTMENTS, WORK_EXPERIENCE
+from bot.keyboards.registry import keyboard
+from bot.utils.texts import get_text
 
 
-def get_main_menu_keyboard():
+def _button(action: str, lang: str, **options) -> KeyboardButton:
+    """Button labelled with the catalog text "button_<action>" (see bot/keyboards/buttons.py)"""
+    return KeyboardButton(text=get_text(f"button_{action}", lang), **options)
+
+
+@keyboard("main_menu")
+def get_main_menu_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Main menu keyboard (bottom only)"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="🧳 Bo'sh ish o'rinlari")],
-            [KeyboardButton(text="🏢 Kompaniya haqida")],
-            [KeyboardButton(text="☎️ Kontaktlar")],
-            [KeyboardButton(text="💬 Fikr-mulohazalar")],
-            [KeyboardButton(text="🌐 Tilni o'zgartirish")]
+            [_button("vacancies", lang)],
+            [_button("about", lang)],
+            [_button("contacts", lang)],
+            [_button("feedback", lang)],
+            [_button("change_language", lang)]
         ],
         resize_keyboard=True,
-        input_field_placeholder="Tanlovni amalga oshiring"
+        input_field_placeholder=get_text("main_menu_placeholder", lang)
     )
     return keyboard
 
 
-def get_start_keyboard():
+@keyboard("start")
+def get_start_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Start button keyboard"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="▶️ Start")]
+            [_button("start", lang)]
         ],
         resize_keyboard=True
     )
     return keyboard
 
 
-def get_branch_keyboard():
+@keyboard("branch")
+def get_branch_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Branch selection keyboard (reply buttons)"""
     buttons = []
     for branch_name in BRANCHES.values():
         buttons.append([KeyboardButton(text=branch_name)])
-    buttons.append([KeyboardButton(text="🔙 Orqaga")])
+    buttons.append([_button("back", lang)])
     
     keyboard = ReplyKeyboardMarkup(
         keyboard=buttons,
@@ -43,12 +53,13 @@ def get_branch_keyboard():
     return keyboard
 
 
-def get_department_keyboard():
+@keyboard("department")
+def get_department_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Department selection keyboard (reply buttons)"""
     buttons = []
     for dept_name in DEPARTMENTS.values():
         buttons.append([KeyboardButton(text=dept_name)])
-    buttons.append([KeyboardButton(text="🔙 Orqaga")])
+    buttons.append([_button("back", lang)])
     
     keyboard = ReplyKeyboardMarkup(
         keyboard=buttons,
@@ -57,57 +68,62 @@ def get_department_keyboard():
     return keyboard
 
 
-def get_yes_no_keyboard():
+@keyboard("yes_no")
+def get_yes_no_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Yes/No keyboard"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="Ha"), KeyboardButton(text="Yo'q")],
-            [KeyboardButton(text="🔙 Orqaga")]
+            [_button("yes", lang), _button("no", lang)],
+            [_button("back", lang)]
         ],
         resize_keyboard=True
     )
     return keyboard
 
 
-def get_back_keyboard():
+@keyboard("back")
+def get_back_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Back button keyboard (for application flow - uses 🔙)"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="🔙 Orqaga")]
+            [_button("back", lang)]
         ],
         resize_keyboard=True
     )
     return keyboard
 
 
-def get_main_menu_back_keyboard():
+@keyboard("main_menu_back")
+def get_main_menu_back_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Back button keyboard for main menu actions (uses ⬅️)"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="⬅️ Orqaga")]
+            [_button("menu_back", lang)]
         ],
         resize_keyboard=True
     )
     return keyboard
 
 
-def get_cancel_keyboard():
+@keyboard("cancel")
+def get_cancel_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Cancel button keyboard"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="❌ Bekor qilish")]
+            [_button("cancel", lang)]
         ],
         resize_keyboard=True
     )
     return keyboard
 
 
-def get_work_experience_keyboard_reply():
+@keyboard("work_experience")
+def get_work_experience_keyboard_reply(lang: str = DEFAULT_LANGUAGE):
     """Work experience keyboard (reply buttons)"""
     buttons = []
     for exp in WORK_EXPERIENCE:
         buttons.append([KeyboardButton(text=exp)])
-    buttons.append([KeyboardButton(text="🔙 Orqaga")])
+    buttons.append([_button("back", lang)])
     
     keyboard = ReplyKeyboardMarkup(
         keyboard=buttons,
@@ -116,14 +132,15 @@ def get_work_experience_keyboard_reply():
     return keyboard
 
 
-def get_phone_keyboard():
+@keyboard("phone")
+def get_phone_keyboard(lang: str = DEFAULT_LANGUAGE):
     """Phone number input keyboard with contact button"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="📱 Kontaktni yuborish", request_contact=True)],
-            [KeyboardButton(text="🔙 Orqaga")]
+            [_button("share_contact", lang, request_contact=True)],
+            [_button("back", lang)]
         ],
         resize_keyboard=True,
-        input_field_placeholder="Telefon raqami yoki kontakt"
+        input_field_placeholder=get_text("phone_placeholder", lang)
     )
-    return keyboard
\ No newline at end of file
+    return keyboard
@@ -0,0 +1,307 @@
+"""
+Funnel analytics: how many applicants reach each ApplicationStates step,
+where they drop off and how long they stay on a step.
+
+The middleware compares the FSM state before and after every handler. On a
+transition it bumps in-memory counters keyed by
+(time bucket, step, branch, position):
+
+    entries      applicants who reached the step moving forward
+                 (going back to an earlier step does not count again)
+    exits        applicants who left it (forward, back or cancel)
+    dwell_*      time spent on the step before leaving it (sum + histogram)
+
+Counters are flushed every `flush_interval` seconds into SQLite rollups, one
+row per key, by adding to what is already there. Several worker processes
+can therefore share one file. Reports (/funnel) only sum rollup rows, so
+their cost depends on the number of buckets, not on the number of updates.
+
+Recording is a few dict operations per state change. The state after the
+handler comes from the TrackedFSMContext of StateCacheMiddleware, so the
+funnel adds no FSM storage reads.
+"""
+import asyncio
+import bisect
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, TelegramObject
+
+from bot.keyboards.callback_data import CallbackPayload, decode_callback
+from bot.middlewares.state_cache import TrackedFSMContext
+from bot.states.application_states import ApplicationStates
+
+logger = logging.getLogger(__name__)
+
+# Funnel steps in flow order: short state names, then the final submission
+STEPS: List[str] = [state.state.rpartition(":")[2] for state in ApplicationStates.__all_states__]
+SUBMITTED = "submitted"
+STEPS.append(SUBMITTED)
+
+_STEP_INDEX = {step: index for index, step in enumerate(STEPS)}
+_CONFIRMATION_STATE = ApplicationStates.waiting_for_confirmation.state
+_CONFIRM_YES = CallbackPayload("confirm", value="yes")
+
+# Upper bounds (seconds) of the dwell-time histogram buckets; the last one is open
+DWELL_BOUNDS = (5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+_HISTOGRAM_SIZE = len(DWELL_BOUNDS) + 1
+
+# Counter layout: entries, exits, dwell_sum, histogram...
+_ENTRIES, _EXITS, _DWELL_SUM, _HISTOGRAM = 0, 1, 2, 3
+_COUNTER_SIZE = _HISTOGRAM + _HISTOGRAM_SIZE
+
+_HISTOGRAM_COLUMNS = [f"h{index}" for index in range(_HISTOGRAM_SIZE)]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS funnel_rollups (
+    bucket INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    position TEXT NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    exits INTEGER NOT NULL DEFAULT 0,
+    dwell_sum REAL NOT NULL DEFAULT 0,
+    {", ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in _HISTOGRAM_COLUMNS)},
+    PRIMARY KEY (bucket, step, branch, position)
+) WITHOUT ROWID
+"""
+
+_VALUE_COLUMNS = ["entries", "exits", "dwell_sum"] + _HISTOGRAM_COLUMNS
+_UPSERT = (
+    f"INSERT INTO funnel_rollups (bucket, step, branch, position, {', '.join(_VALUE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in range(4 + len(_VALUE_COLUMNS)))}) "
+    f"ON CONFLICT(bucket, step, branch, position) DO UPDATE SET "
+    + ", ".join(f"{column} = {column} + excluded.{column}" for column in _VALUE_COLUMNS)
+)
+
+Key = Tuple[int, str, str, str]
+
+
+@dataclass
+class StepStats:
+    """Summed rollups of one funnel step"""
+    step: str
+    entries: int = 0
+    exits: int = 0
+    dwell_sum: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * _HISTOGRAM_SIZE)
+
+    @property
+    def dwell_count(self) -> int:
+        return sum(self.histogram)
+
+    def dwell_percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound (seconds) of the histogram bucket holding the given fraction; None = no data"""
+        total = self.dwell_count
+        if not total:
+            return None
+        running = 0
+        for index, count in enumerate(self.histogram):
+            running += count
+            if running >= total * fraction:
+                return DWELL_BOUNDS[index] if index < len(DWELL_BOUNDS) else float("inf")
+        return float("inf")
+
+
+class FunnelTracker(BaseMiddleware):
+    """
+    Inner middleware recording FSM transitions. Register after StateCacheMiddleware,
+    so the applicant's draft (branch, position) is available:
+        dp.message.middleware(funnel)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        bucket_seconds: int = 3600,
+        flush_interval: float = 60,
+        max_tracked_users: int = 100_000,
+    ):
+        """
+        :param path: SQLite file with the rollups
+        :param bucket_seconds: time resolution of the rollups
+        :param flush_interval: how often in-memory counters are written out, in seconds
+        :param max_tracked_users: step entry times kept for dwell measurement
+        """
+        self.path = Path(path)
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.max_tracked_users = max_tracked_users
+
+        # Counters (exported as metrics)
+        self.transitions = 0
+        self.flushes = 0
+
+        self._counters: Dict[Key, List[float]] = {}
+        # user id -> monotonic time the current step was entered
+        self._entered: Dict[int, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="funnel")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    # ---------- recording (event loop, hot path) ----------
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        state: Optional[FSMContext] = data.get("state")
+        if state is None:
+            return await handler(event, data)
+        before = data.get("raw_state")
+        draft = data.get("draft")
+        # Leaving the flow resets the draft, so remember what it was
+        branch, position = (draft.branch_key, draft.position) if draft else (None, None)
+        try:
+            return await handler(event, data)
+        finally:
+            # Kept by StateCacheMiddleware: no second storage read per update
+            after = state.current if isinstance(state, TrackedFSMContext) else await state.get_state()
+            if after != before:
+                if draft is not None:
+                    branch, position = draft.branch_key or branch, draft.position or position
+                submitted = (
+                    before == _CONFIRMATION_STATE and after is None
+                    and isinstance(event, CallbackQuery) and decode_callback(event.data) == _CONFIRM_YES
+                )
+                self.record(state.key.user_id, before, SUBMITTED if submitted else after, branch, position)
+
+    def record(
+        self, user_id: int, before: Optional[str], after: Optional[str],
+        branch: Optional[str], position: Optional[str],
+    ) -> None:
+        """Count one state change of a user (`after` may be SUBMITTED)"""
+        now = time.monotonic()
+        bucket = int(time.time()) // self.bucket_seconds * self.bucket_seconds
+        branch, position = branch or "", position or ""
+        self.transitions += 1
+
+        entered = self._entered.pop(user_id, None)
+        before_step = before.rpartition(":")[2] if before is not None else None
+        if before_step is not None:
+            counters = self._counter((bucket, before_step, branch, position))
+            counters[_EXITS] += 1
+            if entered is not None:
+                dwell = now - entered
+                counters[_DWELL_SUM] += dwell
+                counters[_HISTOGRAM + bisect.bisect_left(DWELL_BOUNDS, dwell)] += 1
+        if after is not None:
+            after_step = after.rpartition(":")[2]
+            if before_step is None or _STEP_INDEX.get(after_step, 0) > _STEP_INDEX.get(before_step, 0):
+                self._counter((bucket, after_step, branch, position))[_ENTRIES] += 1
+            if after != SUBMITTED:
+                if len(self._entered) >= self.max_tracked_users:
+                    # Oldest entries first: those applicants most likely left for good
+                    del self._entered[next(iter(self._entered))]
+                self._entered[user_id] = now
+
+    def _counter(self, key: Key) -> List[float]:
+        counters = self._counters.get(key)
+        if counters is None:
+            counters = self._counters[key] = [0] * _COUNTER_SIZE
+        return counters
+
+    # ---------- rollups (DB thread) ----------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(_SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        with self._db() as connection:
+            connection.executemany(_UPSERT, rows)
+
+    def _query(self, since: int, branch: Optional[str], position: Optional[str]) -> List[Tuple[Any, ...]]:
+        conditions, params = ["bucket >= ?"], [since]
+        if branch is not None:
+            conditions.append("branch = ?")
+            params.append(branch)
+        if position is not None:
+            conditions.append("position = ?")
+            params.append(position)
+        sums = ", ".join(f"SUM({column})" for column in _VALUE_COLUMNS)
+        return self._db().execute(
+            f"SELECT step, {sums} FROM funnel_rollups WHERE {' AND '.join(conditions)} GROUP BY step",
+            params,
+        ).fetchall()
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # ---------- lifecycle ----------
+
+    async def flush(self) -> int:
+        """Add in-memory counters to the rollups. Returns number of rows written"""
+        if not self._counters:
+            return 0
+        counters, self._counters = self._counters, {}
+        rows = [key + tuple(values) for key, values in counters.items()]
+        try:
+            await self._run(self._write, rows)
+        except Exception:
+            # Keep them for the next flush
+            for key, values in counters.items():
+                merged = self._counter(key)
+                for index, value in enumerate(values):
+                    merged[index] += value
+            raise
+        self.flushes += 1
+        return len(rows)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush funnel counters: {type(e).__name__}: {e}")
+
+    async def start(self) -> None:
+        """Start periodic flushing (dispatcher startup hook)"""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Flush and stop (dispatcher shutdown hook)"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush funnel counters: {type(e).__name__}: {e}")
+        await self._run(self._close_connection)
+
+    # ---------- reports ----------
+
+    async def report(
+        self, since: float, branch: Optional[str] = None, position: Optional[str] = None,
+    ) -> List[StepStats]:
+        """Per-step totals since a unix time, in flow order (current counters included)"""
+        await self.flush()
+        rows = await self._run(self._query, int(since) // self.bucket_seconds * self.bucket_seconds, branch, position)
+        by_step = {}
+        for step, entries, exits, dwell_sum, *histogram in rows:
+            by_step[step] = StepStats(step, int(entries), int(exits), float(dwell_sum), [int(h) for h in histogram])
+        return [by_step.get(step, StepStats(step)) for step in STEPS]
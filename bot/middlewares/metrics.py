@@ -0,0 +1,203 @@
+"""
+Instrumentation feeding bot/services/metrics.py.
+
+    UpdateMetricsMiddleware   outer, on dp.update: updates received / in flight
+    HandlerMetricsMiddleware  inner, on message and callback_query: latency and
+                              errors per handler function (process_phone, ...)
+    ApiMetricsMiddleware      bot session: Bot API call latency and errors per method
+    instrument_storage()      FSM storage get/set latency per operation
+    StateCounts               drafts per FSM state, recounted at most every `max_age` seconds
+
+Each measurement is two perf_counter() calls and one histogram update.
+"""
+import time
+from collections import Counter as TallyCounter
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from bot.middlewares.rate_limiter import RateLimiter
+from bot.services.metrics import Histogram, Registry
+
+_STORAGE_OPERATIONS = ("get_state", "set_state", "get_data", "set_data")
+
+
+class BotMetrics:
+    """Metric families recorded by the bot's own middlewares"""
+
+    def __init__(self, registry: Registry):
+        self.registry = registry
+        self.updates = registry.counter("updates_total", "Updates received, by type", ["type"])
+        self.updates_in_flight = registry.gauge("updates_in_flight", "Updates being processed")
+        self.handler_seconds = registry.histogram(
+            "handler_duration_seconds", "Handler latency, by handler function", ["handler"]
+        )
+        self.handler_errors = registry.counter(
+            "handler_errors_total", "Handlers that raised, by handler function", ["handler"]
+        )
+        self.api_seconds = registry.histogram(
+            "bot_api_duration_seconds", "Bot API call latency, by method", ["method"]
+        )
+        self.api_errors = registry.counter(
+            "bot_api_errors_total", "Failed Bot API calls, by method and error", ["method", "error"]
+        )
+        self.storage_seconds = registry.histogram(
+            "fsm_storage_duration_seconds", "FSM storage operation latency", ["operation"]
+        )
+
+        # The rate limiter lives in the bot session, which is only known at startup
+        self.rate_limiter: Optional[RateLimiter] = None
+        for attribute in ("granted", "delayed", "throttled", "wait_seconds"):
+            registry.collector(
+                f"rate_limiter_{attribute}_total", f"RateLimiter.{attribute}",
+                lambda attribute=attribute: [((), getattr(self.rate_limiter, attribute))] if self.rate_limiter else [],
+                kind="counter",
+            )
+        registry.collector(
+            "rate_limiter_queue_depth", "Requests waiting for a send token, by priority lane",
+            lambda: [((lane,), depth) for lane, depth in self.rate_limiter.queue_depth().items()]
+            if self.rate_limiter else [],
+            labelnames=["lane"],
+        )
+
+    async def instrument_bot(self, bot: Bot) -> None:
+        """Time Bot API calls of `bot` (dispatcher startup hook)"""
+        session_middlewares = list(bot.session.middleware)
+        if any(isinstance(middleware, ApiMetricsMiddleware) for middleware in session_middlewares):
+            return
+        self.rate_limiter = next(
+            (middleware for middleware in session_middlewares if isinstance(middleware, RateLimiter)),
+            self.rate_limiter,
+        )
+        bot.session.middleware(ApiMetricsMiddleware(self))
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer update middleware: dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))"""
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        metrics = self.metrics
+        metrics.updates.inc(event.event_type if isinstance(event, Update) else type(event).__name__)
+        metrics.updates_in_flight.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.updates_in_flight.dec()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware timing the matched handler.
+    Register last so FSM loading/saving of StateCacheMiddleware is not included:
+        dp.message.middleware(HandlerMetricsMiddleware(metrics))
+    """
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.handler_errors.inc(name)
+            raise
+        finally:
+            self.metrics.handler_seconds.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware timing Bot API calls. Register after RateLimiter, so waiting
+    for a token is not counted as API latency and every retried attempt is counted.
+    """
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.metrics.api_seconds.observe(time.perf_counter() - started, name)
+
+
+def instrument_storage(storage: BaseStorage, histogram: Histogram) -> BaseStorage:
+    """Time get/set of state and data on this storage instance (its class is unchanged)"""
+    for operation in _STORAGE_OPERATIONS:
+        original = getattr(storage, operation)
+
+        @wraps(original)
+        async def timed(*args: Any, _original=original, _operation=operation, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await _original(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, _operation)
+
+        setattr(storage, operation, timed)
+    return storage
+
+
+async def count_states(storage: BaseStorage) -> Iterable[Tuple[Tuple[str], int]]:
+    """Drafts per FSM state, as (label values, count) samples"""
+    if hasattr(storage, "state_counts"):
+        counts = await storage.state_counts()
+    elif isinstance(storage, MemoryStorage):
+        counts = TallyCounter(record.state for record in storage.storage.values() if record.state)
+    else:
+        counts = {}
+    return [((state.rpartition(":")[2],), count) for state, count in sorted(counts.items())]
+
+
+class StateCounts:
+    """
+    Collector callback for drafts per FSM state. Counting is a flush plus a
+    GROUP BY on SQLite and a scan of the spill file on the evicting storage,
+    so one count is served to every scrape for `max_age` seconds.
+    """
+
+    def __init__(self, storage: BaseStorage, max_age: float = 60.0):
+        self.storage = storage
+        self.max_age = max_age
+        self._samples: Optional[List[Tuple[Tuple[str], int]]] = None
+        self._counted_at = 0.0
+
+    async def __call__(self) -> List[Tuple[Tuple[str], int]]:
+        now = time.monotonic()
+        if self._samples is None or now - self._counted_at >= self.max_age:
+            self._samples = list(await count_states(self.storage))
+            self._counted_at = now
+        return self._samples
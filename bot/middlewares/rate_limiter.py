@@ -0,0 +1,282 @@
+"""
+Outbound Bot API rate limiter (session request middleware).
+
+Every message-sending request takes a token from the global bucket
+(~30 msg/s) and from the bucket of its chat (~1 msg/s for private chats,
+~20 msg/min for groups such as HR_GROUP_ID). When tokens are missing the
+request waits in one of three priority lanes:
+
+    INTERACTIVE  replies to applicants (default for handler code)
+    NOTIFY       HR decision notifications sent to applicants
+    BULK         HR group fan-out from the outbox
+
+Waiting requests are released strictly by lane, so a burst of HR group
+posts never delays an applicant's next question. A 429 from Telegram pauses
+the bucket of that chat for `retry_after` seconds and the request is retried
+transparently when the wait is short.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from bot.config import (
+    RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_SECOND, RATE_LIMIT_GROUP_PER_MINUTE,
+    RATE_LIMIT_MAX_RETRY_WAIT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lanes of the rate limiter, lower value is served first"""
+    INTERACTIVE = 0
+    NOTIFY = 1
+    BULK = 2
+
+
+_current_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Send Bot API requests made inside the block (and tasks it starts) in `priority` lane"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class TokenBucket:
+    """Classic token bucket; time is passed in so one clock drives all buckets"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available (0 = now)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = now
+
+
+def _is_limited(method: TelegramMethod) -> Optional[int]:
+    """Chat id of a message-sending request, None for requests that are not throttled"""
+    name = method.__api_method__
+    if name == "sendChatAction" or not name.startswith(("send", "copy", "forward")):
+        return None
+    chat_id = getattr(method, "chat_id", None)
+    if isinstance(chat_id, int):
+        return chat_id
+    return 0 if chat_id is None else hash(chat_id)  # @channel usernames
+
+
+class RateLimiter(BaseRequestMiddleware):
+    """Token-bucket scheduler with per-chat and global limits and priority lanes"""
+
+    def __init__(
+        self,
+        global_per_second: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+        chat_per_second: float = RATE_LIMIT_CHAT_PER_SECOND,
+        group_per_minute: float = RATE_LIMIT_GROUP_PER_MINUTE,
+        max_retry_wait: float = RATE_LIMIT_MAX_RETRY_WAIT,
+        max_retries: int = 3,
+    ):
+        """
+        :param global_per_second: messages per second over all chats
+        :param chat_per_second: messages per second into one private chat
+        :param group_per_minute: messages per minute into one group (negative chat id)
+        :param max_retry_wait: a 429 with a longer retry_after is raised to the caller
+        :param max_retries: transparent retries of one request after 429
+        """
+        self.global_per_second = global_per_second
+        self.chat_per_second = chat_per_second
+        self.group_per_minute = group_per_minute
+        self.max_retry_wait = max_retry_wait
+        self.max_retries = max_retries
+
+        # Counters (exported as metrics)
+        self.granted = 0
+        self.delayed = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[int, TokenBucket] = {}
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []  # (priority, seq, chat_id, future)
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+
+    # ---------- buckets ----------
+
+    def _global_bucket(self, now: float) -> TokenBucket:
+        if self._global is None:
+            self._global = TokenBucket(self.global_per_second, self.global_per_second, now)
+        return self._global
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                # Groups: allow a short burst, then the per-minute rate
+                rate = self.group_per_minute / 60
+                capacity = max(1.0, self.group_per_minute / 4)
+            else:
+                rate = self.chat_per_second
+                capacity = max(1.0, self.chat_per_second * 3)
+            bucket = self._chats[chat_id] = TokenBucket(rate, capacity, now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # Forget full, idle chat buckets so the dict does not grow with every applicant
+        if len(self._chats) > 10_000:
+            waiting = {chat_id for _, _, chat_id, _ in self._waiters}
+            for chat_id, bucket in list(self._chats.items()):
+                if chat_id not in waiting and bucket.delay(now) == 0 and bucket.tokens >= bucket.capacity:
+                    del self._chats[chat_id]
+
+    # ---------- scheduling ----------
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Requests currently waiting, per lane"""
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                depth[Priority(priority).name.lower()] += 1
+        return depth
+
+    async def acquire(self, chat_id: int, priority: Priority = Priority.INTERACTIVE) -> None:
+        """Wait until a message may be sent to `chat_id`"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        global_bucket = self._global_bucket(now)
+        chat_bucket = self._chat_bucket(chat_id, now)
+        # Fast path: nobody is queued and both buckets have a token
+        if not self._waiters and global_bucket.delay(now) == 0 and chat_bucket.delay(now) == 0:
+            global_bucket.consume(now)
+            chat_bucket.consume(now)
+            self.granted += 1
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), chat_id, future))
+        self.delayed += 1
+        self._ensure_pump()
+        try:
+            await future
+        finally:
+            self.wait_seconds += loop.time() - now
+
+    def _ensure_pump(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+
+    async def _run_pump(self) -> None:
+        """Release waiting requests in lane order as tokens become available"""
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            self._wakeup.clear()
+            now = loop.time()
+            self._prune(now)
+            sleep_for = self._global_bucket(now).delay(now)
+            if sleep_for == 0:
+                sleep_for = self._release_one(now)
+                if sleep_for == 0:
+                    continue
+            # Also wake up when a new (maybe higher priority) request arrives
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release_one(self, now: float) -> float:
+        """Grant a token to the first ready waiter; returns seconds to sleep if none is ready"""
+        soonest = None
+        for entry in sorted(self._waiters):
+            _, _, chat_id, future = entry
+            if future.done():  # cancelled by the caller
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                return 0.0
+            chat_delay = self._chat_bucket(chat_id, now).delay(now)
+            if chat_delay == 0:
+                self._global_bucket(now).consume(now)
+                self._chat_bucket(chat_id, now).consume(now)
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self.granted += 1
+                future.set_result(None)
+                return 0.0
+            soonest = chat_delay if soonest is None else min(soonest, chat_delay)
+        return soonest or 0.0
+
+    def pause_chat(self, chat_id: int, seconds: float) -> None:
+        """Stop sending into `chat_id` for `seconds` (Telegram answered 429)"""
+        now = asyncio.get_running_loop().time()
+        self._chat_bucket(chat_id, now).pause(now, seconds)
+
+    # ---------- session middleware ----------
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        chat_id = _is_limited(method)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = _current_priority.get()
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.throttled += 1
+                self.pause_chat(chat_id, e.retry_after)
+                attempt += 1
+                if attempt > self.max_retries or e.retry_after > self.max_retry_wait:
+                    raise
+                logger.warning(
+                    f"Flood control on {method.__api_method__} to {chat_id}, retrying in {e.retry_after}s"
+                )
@@ -0,0 +1,72 @@
+"""
+Request-scoped FSM data cache.
+
+Loads the user's FSM data once per update and hands it to handlers as a
+mutable `draft` (ApplicationDraft). Handlers read and change the draft's
+attributes; the middleware writes it back with a single `set_data()` after
+the handler finished, and only if something was actually changed.
+
+A draft saved before a catalog edit comes with its dropped answers in
+`draft.stale`; `on_stale` may then answer the update itself (by asking those
+again) instead of the handler of a later step.
+
+The FSM context handed on is a TrackedFSMContext: inner middlewares (e.g.
+the funnel) read the state after the handler from `state.current` instead
+of asking the storage again.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from bot.models.application_draft import ApplicationDraft
+
+
+class TrackedFSMContext(FSMContext):
+    """FSMContext that remembers the state of its key as of the last set_state()"""
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, current: Optional[str]):
+        super().__init__(storage, key)
+        self.current = current
+
+    async def set_state(self, state: StateType = None) -> None:
+        await super().set_state(state)
+        self.current = state.state if isinstance(state, State) else state
+
+
+class StateCacheMiddleware(BaseMiddleware):
+    """
+    Inner middleware: runs only when a handler matched.
+    Register on the dispatcher so it covers every router:
+        dp.message.middleware(StateCacheMiddleware())
+    """
+
+    def __init__(
+        self, on_stale: Optional[Callable[[TelegramObject, FSMContext, ApplicationDraft], Awaitable[bool]]] = None,
+    ):
+        self.on_stale = on_stale
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        state: FSMContext = data.get("state")
+        if state is None:
+            return await handler(event, data)
+        # raw_state was read by aiogram's FSM middleware before the filters ran
+        state = data["state"] = TrackedFSMContext(state.storage, state.key, data.get("raw_state"))
+
+        draft = ApplicationDraft.from_state_data(await state.get_data())
+        data["draft"] = draft
+        try:
+            if draft.stale and self.on_stale is not None and await self.on_stale(event, state, draft):
+                return None
+            return await handler(event, data)
+        finally:
+            if draft.dirty:
+                await state.set_data(draft.to_state_data())
@@ -0,0 +1,88 @@
+"""
+Middlewares that feed bot/services/tracing.py.
+
+    UpdateTracingMiddleware   outer, on dp.update: one trace per update
+    HandlerTracingMiddleware  inner, on message and callback_query: span per handler
+    ApiTracingMiddleware      bot session: span per outgoing Bot API call
+
+The API middleware finds the trace through the context variable, so calls
+made by the handler (or anything it awaits) land in the update's trace;
+calls made outside an update, e.g. by outbox workers, are not traced.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from bot.services.tracing import Tracer, span
+
+
+class UpdateTracingMiddleware(BaseMiddleware):
+    """Outer update middleware: dp.update.outer_middleware(UpdateTracingMiddleware(tracer))"""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        attributes = {}
+        if isinstance(event, Update):
+            attributes["update_id"] = event.update_id
+            attributes["type"] = event.event_type
+            user = data.get("event_from_user")
+            if user is not None:
+                attributes["user_id"] = user.id
+        root, token = self.tracer.start("update", **attributes)
+        error = None
+        try:
+            return await handler(event, data)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.tracer.finish(root, token, error)
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """Inner middleware: dp.message.middleware(HandlerTracingMiddleware())"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+        state = data.get("raw_state")
+        attributes = {"state": state.rpartition(":")[2]} if state else {}
+        with span(f"handler {name}", **attributes):
+            return await handler(event, data)
+
+
+class ApiTracingMiddleware(BaseRequestMiddleware):
+    """Session middleware: span per Bot API call of a traced update"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ):
+        chat_id = getattr(method, "chat_id", None)
+        attributes = {"chat_id": chat_id} if chat_id is not None else {}
+        with span(f"bot_api {method.__api_method__}", **attributes):
+            return await make_request(bot, method)
+
+
+async def install_api_tracing(bot: Bot) -> None:
+    """Trace Bot API calls of `bot` (dispatcher startup hook)"""
+    if not any(isinstance(middleware, ApiTracingMiddleware) for middleware in bot.session.middleware):
+        bot.session.middleware(ApiTracingMiddleware())
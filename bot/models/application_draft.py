@@ -0,0 +1,294 @@
+"""
+Compact in-progress application (FSM data of one applicant).
+
+Catalog choices (branch, department, position, education, gender, language
+levels, work experience, UI language) are stored as 1-byte codes into the
+catalogs from bot/config.py instead of repeated strings. Free-text answers
+and Telegram file_ids stay strings.
+
+Each code is stored with a fingerprint of its catalog. When a catalog was
+edited since the draft was saved, only the answers into that catalog are
+dropped and listed in `stale`, so the flow can ask them again.
+
+In FSM storage a draft is kept as one small bytes blob:
+    {"draft": ApplicationDraft.to_bytes()}
+which is several times smaller than the old dict of ~25 string keys.
+"""
+import json
+import logging
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from bot.config import (
+    BRANCHES, DEPARTMENTS, POSITIONS, EDUCATION_LEVELS, GENDERS, LANGUAGE_LEVELS,
+    WORK_EXPERIENCE, SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE, REGION
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the binary layout changes
+FORMAT_VERSION = 2
+
+# Key under which the serialized draft is kept in FSM data
+STATE_DATA_KEY = "draft"
+
+_LANGUAGE_CODES = list(SUPPORTED_LANGUAGES)
+_BRANCH_KEYS = list(BRANCHES)
+_BRANCH_NAMES = list(BRANCHES.values())
+_DEPARTMENT_KEYS = list(DEPARTMENTS)
+_DEPARTMENT_NAMES = list(DEPARTMENTS.values())
+_PREVIOUS_MENUS = ["main_menu"]
+_YES_NO = ["Ha", "Yo'q"]
+_MEDIA_TYPES = ["voice", "audio", "video"]
+
+
+def _fingerprint(catalog: Any) -> int:
+    """16-bit hash of a catalog; stored codes are only valid for the same catalog"""
+    return zlib.crc32(repr(catalog).encode("utf-8")) & 0xFFFF
+
+
+class _CodeField:
+    """Catalog choice kept as a 1-byte code in `slot` (0 = not set)"""
+
+    def __init__(self, slot: str, values: Callable[["ApplicationDraft"], Sequence[str]], default: Optional[str] = None):
+        self.slot = slot
+        self.values = values
+        self.default = default
+
+    def __get__(self, draft: Optional["ApplicationDraft"], owner: type) -> Any:
+        if draft is None:
+            return self
+        code = getattr(draft, self.slot)
+        if code == 0:
+            return self.default
+        values = self.values(draft)
+        return values[code - 1] if code <= len(values) else self.default
+
+    def __set__(self, draft: "ApplicationDraft", value: Optional[str]) -> None:
+        if value is None:
+            code = 0
+        else:
+            try:
+                code = list(self.values(draft)).index(value) + 1
+            except ValueError:
+                raise ValueError(f"{value!r} is not a valid choice") from None
+        if getattr(draft, self.slot) != code:
+            object.__setattr__(draft, self.slot, code)
+            object.__setattr__(draft, "dirty", True)
+
+
+def _department_positions(draft: "ApplicationDraft") -> List[str]:
+    return POSITIONS.get(draft.department_key, [])
+
+
+# Order of 1-byte codes in the binary header
+_CODE_SLOTS = (
+    "_user_language", "_previous_menu", "_branch", "_department", "_position",
+    "_is_student", "_education", "_gender", "_russian_level", "_english_level",
+    "_english_media_type", "_work_experience",
+)
+
+# What the codes of each slot index into (all positions: a position's code depends on the department)
+_SLOT_CATALOGS = {
+    "_user_language": _LANGUAGE_CODES,
+    "_previous_menu": _PREVIOUS_MENUS,
+    "_branch": _BRANCH_KEYS,
+    "_department": _DEPARTMENT_KEYS,
+    "_position": POSITIONS,
+    "_is_student": _YES_NO,
+    "_education": EDUCATION_LEVELS,
+    "_gender": GENDERS,
+    "_russian_level": LANGUAGE_LEVELS,
+    "_english_level": LANGUAGE_LEVELS,
+    "_english_media_type": _MEDIA_TYPES,
+    "_work_experience": WORK_EXPERIENCE,
+}
+SLOT_FINGERPRINTS = tuple(_fingerprint(_SLOT_CATALOGS[slot]) for slot in _CODE_SLOTS)
+
+# Free-text answers, file_ids and submission metadata, in binary order
+TEXT_FIELDS = (
+    "passport_name", "passport_surname", "father_name", "date_of_birth", "address",
+    "phone", "russian_voice", "english_media", "ielts_certificate", "last_workplace",
+    "photo", "hear_about", "username", "submission_date",
+)
+
+_HEADER = struct.Struct(f"<B{len(_CODE_SLOTS)}H{len(_CODE_SLOTS)}Bq")
+_LENGTH = struct.Struct("<H")
+
+
+class ApplicationDraft:
+    """In-progress job application with dirty tracking"""
+
+    __slots__ = _CODE_SLOTS + TEXT_FIELDS + ("user_id", "dirty", "stale")
+
+    user_language = _CodeField("_user_language", lambda d: _LANGUAGE_CODES, default=DEFAULT_LANGUAGE)
+    previous_menu = _CodeField("_previous_menu", lambda d: _PREVIOUS_MENUS)
+    branch = _CodeField("_branch", lambda d: _BRANCH_NAMES)
+    branch_key = _CodeField("_branch", lambda d: _BRANCH_KEYS)
+    department = _CodeField("_department", lambda d: _DEPARTMENT_NAMES)
+    department_key = _CodeField("_department", lambda d: _DEPARTMENT_KEYS)
+    position = _CodeField("_position", _department_positions)
+    is_student = _CodeField("_is_student", lambda d: _YES_NO)
+    education = _CodeField("_education", lambda d: EDUCATION_LEVELS)
+    gender = _CodeField("_gender", lambda d: GENDERS)
+    russian_level = _CodeField("_russian_level", lambda d: LANGUAGE_LEVELS)
+    english_level = _CodeField("_english_level", lambda d: LANGUAGE_LEVELS)
+    english_media_type = _CodeField("_english_media_type", lambda d: _MEDIA_TYPES)
+    work_experience = _CodeField("_work_experience", lambda d: WORK_EXPERIENCE)
+
+    def __init__(self):
+        for slot in _CODE_SLOTS:
+            object.__setattr__(self, slot, 0)
+        for name in TEXT_FIELDS:
+            object.__setattr__(self, name, None)
+        object.__setattr__(self, "user_id", 0)
+        object.__setattr__(self, "dirty", False)
+        # Catalog answers dropped on load because their catalog changed, e.g. ("branch",)
+        object.__setattr__(self, "stale", ())
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Plain fields (texts, user_id); catalog fields go through _CodeField
+        if name in _CODE_SLOTS:
+            raise AttributeError(f"Set catalog fields by name, not via {name}")
+        if name not in ("dirty", "stale") and getattr(self, name) != value:
+            object.__setattr__(self, "dirty", True)
+        object.__setattr__(self, name, value)
+
+    @property
+    def city(self) -> Optional[str]:
+        """All branches are in one region"""
+        return REGION if self._branch else None
+
+    def reset(self, **keep: Any) -> None:
+        """Drop all application data, keeping only the given fields (e.g. user_language)"""
+        before, was_dirty = self.to_bytes(), self.dirty
+        self.__init__()
+        for name, value in keep.items():
+            setattr(self, name, value)
+        object.__setattr__(self, "dirty", was_dirty or self.to_bytes() != before)
+
+    # ---------- binary form ----------
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(
+            FORMAT_VERSION, *SLOT_FINGERPRINTS,
+            *(getattr(self, slot) for slot in _CODE_SLOTS),
+            self.user_id or 0,
+        )]
+        for name in TEXT_FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                parts.append(_LENGTH.pack(0))
+            else:
+                encoded = str(value).encode("utf-8")
+                parts.append(_LENGTH.pack(len(encoded) + 1))
+                parts.append(encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "ApplicationDraft":
+        draft = cls()
+        version = blob[0] if blob else None
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported draft format version: {version}")
+        fields = _HEADER.unpack_from(blob, 0)
+        fingerprints, codes = fields[1:1 + len(_CODE_SLOTS)], fields[1 + len(_CODE_SLOTS):-1]
+        stale = []
+        for slot, fingerprint, current, code in zip(_CODE_SLOTS, fingerprints, SLOT_FINGERPRINTS, codes):
+            if fingerprint == current:
+                object.__setattr__(draft, slot, code)
+            elif code:
+                # The catalog in config.py changed since the draft was saved: the code
+                # may point to another entry, so this answer is asked again
+                stale.append(slot[1:])
+        if stale:
+            logger.warning(f"Draft saved with other catalogs, dropping {', '.join(stale)}")
+            object.__setattr__(draft, "stale", tuple(stale))
+            # Written back with the current fingerprints
+            object.__setattr__(draft, "dirty", True)
+        object.__setattr__(draft, "user_id", fields[-1])
+
+        view = memoryview(blob)
+        offset = _HEADER.size
+        for name in TEXT_FIELDS:
+            (length,) = _LENGTH.unpack_from(blob, offset)
+            offset += _LENGTH.size
+            if length:
+                object.__setattr__(draft, name, str(view[offset:offset + length - 1], "utf-8"))
+                offset += length - 1
+        return draft
+
+    # ---------- dict form (readable, for HR tools and legacy FSM data) ----------
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in TEXT_FIELDS}
+        data.update(
+            user_language=self.user_language,
+            previous_menu=self.previous_menu,
+            branch=self.branch,
+            city=self.city,
+            department=self.department,
+            department_key=self.department_key,
+            position=self.position,
+            is_student=self.is_student,
+            education=self.education,
+            gender=self.gender,
+            russian_level=self.russian_level,
+            english_level=self.english_level,
+            english_media_type=self.english_media_type,
+            work_experience=self.work_experience,
+            user_id=self.user_id or None,
+        )
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ApplicationDraft":
+        draft = cls()
+        # Department first: valid positions depend on it
+        ordered = ["department_key"] + [key for key in data if key != "department_key"]
+        for key in ordered:
+            value = data.get(key)
+            if key in ("city", "department") or value is None:
+                continue  # derived from branch / department_key
+            try:
+                setattr(draft, key, value)
+            except (AttributeError, ValueError):
+                logger.debug(f"Ignoring unknown draft field {key}={value!r}")
+        object.__setattr__(draft, "dirty", False)
+        return draft
+
+    # ---------- FSM storage form ----------
+
+    @classmethod
+    def from_state_data(cls, data: Dict[str, Any]) -> "ApplicationDraft":
+        blob = data.get(STATE_DATA_KEY)
+        if isinstance(blob, (bytes, bytearray)):
+            try:
+                return cls.from_bytes(blob)
+            except (ValueError, struct.error) as e:
+                logger.warning(f"Discarding unreadable draft: {e}")
+                return cls()
+        # FSM data written before drafts were introduced
+        return cls.from_dict(data)
+
+    def to_state_data(self) -> Dict[str, Any]:
+        return {STATE_DATA_KEY: self.to_bytes()}
+
+
+def dumps_state_data(data: Dict[str, Any]) -> bytes:
+    """Serializer for persistent FSM storages: raw draft blob, or JSON for other data"""
+    blob = data.get(STATE_DATA_KEY)
+    if len(data) == 1 and isinstance(blob, (bytes, bytearray)):
+        return b"\x01" + bytes(blob)
+    return b"\x00" + json.dumps(data).encode("utf-8")
+
+
+def loads_state_data(raw: Any) -> Dict[str, Any]:
+    """Inverse of dumps_state_data (also reads plain JSON text rows)"""
+    if isinstance(raw, str):
+        return json.loads(raw)
+    raw = bytes(raw)
+    if raw[:1] == b"\x01":
+        return {STATE_DATA_KEY: raw[1:]}
+    return json.loads(raw[1:].decode("utf-8"))
@@ -0,0 +1,246 @@
+"""
+Zero-downtime restart: hand FSM state and the polling offset to a new process.
+
+The running instance listens on a Unix socket (HANDOFF_SOCKET). A freshly
+started instance first starts everything it can share with the old one
+(handlers, storage files, texts, keyboards...), then connects to it:
+
+    new -> old   {"op": "handoff"}
+    old          stops fetching updates, waits for in-flight handlers,
+                 closes its ExclusiveResources (outbox, metrics port,
+                 duplicate prefilter) and its FSM storage (persistent
+                 storages flush here)
+    old -> new   {"op": "state", "pid": ..., "offset": ..., "records": N}
+                 N x {"key": ..., "state": ..., "data": base64}
+                 {"op": "done"}
+    new -> old   {"op": "ack"}
+    old          finishes its shutdown and exits by itself
+    new          loads the records, starts its ExclusiveResources and
+                 continues from `offset`
+
+Only MemoryStorage records are streamed; SQLite-backed storages are already
+on disk once closed. One JSON object per line.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Dispatcher
+from aiogram.dispatcher.event.event import EventObserver
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.models.application_draft import dumps_state_data, loads_state_data
+from bot.storage.sqlite_storage import build_storage_key, parse_storage_key
+
+logger = logging.getLogger(__name__)
+
+# How long the new process waits for the old one to accept the connection,
+# and the old one for the final acknowledgement
+_CONNECT_TIMEOUT = 2.0
+_ACK_TIMEOUT = 10.0
+
+
+@dataclass
+class HandoffSnapshot:
+    """What the old instance hands over"""
+    pid: int
+    offset: Optional[int]
+    records: List[Tuple[str, Optional[str], Dict[str, Any]]] = field(default_factory=list)
+
+
+class ExclusiveResources:
+    """
+    Startup and shutdown hooks of what only one instance may hold at a time:
+    the outbox journal, the metrics port and the duplicate prefilter.
+
+    attach() runs them as the last dispatcher startup hook. With `deferred`
+    set (restart with handoff) startup skips them and start() is called once
+    the previous instance has closed its own.
+    """
+
+    def __init__(self):
+        self.startup = EventObserver()
+        self.shutdown = EventObserver()
+        self.deferred = False
+        self.running = False
+
+    def attach(self, dp: Dispatcher) -> None:
+        dp.startup.register(self._on_startup)
+        dp.shutdown.register(self.close)
+
+    async def _on_startup(self, **kwargs: Any) -> None:
+        if not self.deferred:
+            await self.start(**kwargs)
+
+    async def start(self, **kwargs: Any) -> None:
+        if self.running:
+            return
+        self.running = True
+        await self.startup.trigger(**kwargs)
+
+    async def close(self, **kwargs: Any) -> None:
+        if not self.running:
+            return
+        self.running = False
+        await self.shutdown.trigger(**kwargs)
+
+
+def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    writer.write(json.dumps(message).encode("utf-8") + b"\n")
+
+
+async def _receive(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Handoff peer closed the connection")
+    return json.loads(line)
+
+
+def export_records(storage: BaseStorage) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """FSM records that live only in this process's memory"""
+    if not isinstance(storage, MemoryStorage):
+        return []
+    return [
+        (build_storage_key(key), record.state, record.data)
+        for key, record in storage.storage.items()
+        if record.state is not None or record.data
+    ]
+
+
+async def import_records(storage: BaseStorage, records: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> None:
+    """Load records received from the previous instance"""
+    for db_key, state, data in records:
+        key = parse_storage_key(db_key)
+        await storage.set_state(key, state)
+        await storage.set_data(key, data)
+
+
+class HandoffServer:
+    """Accepts a takeover request from a newer instance of the bot"""
+
+    def __init__(self, path: Path, storage: BaseStorage):
+        self.path = Path(path)
+        self.storage = storage
+        # Called when a takeover starts; the update loop should stop fetching
+        self.on_request: Optional[Callable[[], None]] = None
+        # Set when a new instance asked to take over: stop fetching updates
+        self.requested = asyncio.Event()
+        # Set when the transfer is over and this process may exit
+        self.completed = asyncio.Event()
+        self._released = asyncio.Event()
+        self._offset: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        # A socket file left by a crashed instance would make bind() fail
+        with suppress(FileNotFoundError):
+            self.path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle, path=str(self.path))
+        logger.info(f"Handoff socket listening on {self.path}")
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        # Only remove the socket if a newer instance did not bind it already
+        if not self.completed.is_set():
+            with suppress(FileNotFoundError):
+                self.path.unlink()
+
+    def release(self, offset: Optional[int]) -> None:
+        """Called by the update loop once fetching stopped and handlers drained"""
+        self._offset = offset
+        self._released.set()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await _receive(reader)
+            if request.get("op") != "handoff" or self.requested.is_set():
+                return
+            logger.info("New instance requested handoff, stopping update processing...")
+            self.requested.set()
+            if self.on_request is not None:
+                self.on_request()
+            await self._released.wait()
+
+            records = export_records(self.storage)
+            await self.storage.close()
+            _send(writer, {"op": "state", "pid": os.getpid(), "offset": self._offset, "records": len(records)})
+            for db_key, state, data in records:
+                _send(writer, {
+                    "key": db_key,
+                    "state": state,
+                    "data": base64.b64encode(dumps_state_data(data)).decode("ascii"),
+                })
+            _send(writer, {"op": "done"})
+            await writer.drain()
+
+            ack = await asyncio.wait_for(_receive(reader), timeout=_ACK_TIMEOUT)
+            if ack.get("op") != "ack":
+                raise ConnectionError(f"Unexpected handoff reply: {ack}")
+            logger.info(f"Handed over {len(records)} FSM records (offset {self._offset})")
+        except Exception as e:
+            logger.error(f"Handoff failed - {type(e).__name__}: {e}")
+        finally:
+            if self.requested.is_set():
+                self.completed.set()
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+
+async def request_handoff(path: Path) -> Optional[HandoffSnapshot]:
+    """
+    Take over from a running instance. Returns None if there is none.
+    Waits as long as the old process drains (bounded by its HANDOFF_DRAIN_TIMEOUT).
+    On success it has stopped processing, closed its ExclusiveResources and
+    FSM storage, and exits by itself: it must not be killed.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(str(path)), timeout=_CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        # Stale socket of a crashed instance
+        return None
+
+    try:
+        _send(writer, {"op": "handoff"})
+        await writer.drain()
+        started = time.monotonic()
+        header = await _receive(reader)
+        snapshot = HandoffSnapshot(pid=header["pid"], offset=header.get("offset"))
+        for _ in range(header.get("records", 0)):
+            item = await _receive(reader)
+            data = loads_state_data(base64.b64decode(item["data"]))
+            snapshot.records.append((item["key"], item.get("state"), data))
+        if (await _receive(reader)).get("op") != "done":
+            raise ConnectionError("Handoff stream ended unexpectedly")
+        _send(writer, {"op": "ack"})
+        await writer.drain()
+    except Exception as e:
+        logger.error(f"Handoff from running instance failed - {type(e).__name__}: {e}")
+        return None
+    finally:
+        writer.close()
+        with suppress(Exception):
+            await writer.wait_closed()
+
+    logger.info(
+        f"Took over from PID {snapshot.pid}: {len(snapshot.records)} FSM records, "
+        f"offset {snapshot.offset} ({time.monotonic() - started:.2f}s)"
+    )
+    return snapshot
@@ -0,0 +1,120 @@
+"""Webhook ingestion - embedded aiohttp server feeding the Dispatcher"""
+import asyncio
+import logging
+import secrets
+import signal
+from contextlib import suppress
+from typing import List
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from bot.config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_SECRET, WEBHOOK_REPLY_IN_RESPONSE
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_webhook_app(
+    bot: Bot, dp: Dispatcher, secret_token: str, reply_in_response: bool = WEBHOOK_REPLY_IN_RESPONSE,
+) -> web.Application:
+    """
+    Build aiohttp application that receives updates on WEBHOOK_PATH.
+
+    Requests without the matching X-Telegram-Bot-Api-Secret-Token header
+    are rejected with 401 by SimpleRequestHandler.
+
+    By default Telegram gets an empty 200 at once and the update is handled
+    in background, so a slow handler (e.g. confirming an application) does not
+    hold the request open and a failing one is not redelivered.
+    With `reply_in_response`, handlers that *return* a Bot API method (e.g.
+    `return message.answer(...)`) are answered inside the HTTP response
+    instead of a separate outbound request; the price is that every update
+    is handled before the response and a handler error returns 500.
+    """
+    app = web.Application()
+    handler = SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=not reply_in_response,
+    )
+    handler.register(app, path=WEBHOOK_PATH)
+    # Wire dispatcher startup/shutdown hooks to the aiohttp app lifecycle
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def build_forwarding_app(pool, secret_token: str) -> web.Application:
+    """
+    Build aiohttp application that only verifies and forwards raw updates
+    to a WorkerPool (supervisor mode). Telegram gets an empty 200 at once.
+    """
+    async def handle(request: web.Request) -> web.Response:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token", "") != secret_token:
+            return web.Response(body="Unauthorized", status=401)
+        pool.dispatch(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    return app
+
+
+async def _serve(bot: Bot, app: web.Application, secret_token: str, allowed_updates: List[str], stop_event: asyncio.Event) -> None:
+    """Start aiohttp server, register webhook and wait until stop_event is set"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}",
+            secret_token=secret_token,
+            allowed_updates=allowed_updates,
+        )
+        logger.info(f"Webhook registered: {WEBHOOK_BASE_URL}{WEBHOOK_PATH}")
+        await stop_event.wait()
+    finally:
+        # Webhook is left registered on purpose: Telegram queues updates
+        # until the next instance comes up, so nothing is lost on restart
+        await runner.cleanup()
+        logger.info("Webhook server stopped.")
+
+
+def _get_secret_token() -> str:
+    if not WEBHOOK_BASE_URL:
+        raise RuntimeError("WEBHOOK_BASE_URL is not set! It is required when BOT_MODE=webhook")
+    return WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, handoff=None) -> None:
+    """Serve updates over webhook until SIGINT/SIGTERM or a handoff request"""
+    secret_token = _get_secret_token()
+    app = build_webhook_app(bot, dp, secret_token)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Signal handlers are not supported on Windows
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+    if handoff is not None:
+        handoff.on_request = stop_event.set
+
+    # Stopping the server waits for in-flight requests and closes FSM storage
+    await _serve(bot, app, secret_token, dp.resolve_used_update_types(), stop_event)
+    if handoff is not None and handoff.requested.is_set():
+        handoff.release(None)
+        await handoff.completed.wait()
+
+
+async def serve_webhook_into_pool(bot: Bot, pool, allowed_updates: List[str], stop_event: asyncio.Event) -> None:
+    """Webhook ingress for supervisor mode (see bot.runtime.workers)"""
+    secret_token = _get_secret_token()
+    await _serve(bot, build_forwarding_app(pool, secret_token), secret_token, allowed_updates, stop_event)
@@ -0,0 +1,280 @@
+"""
+Multi-process worker pool with user-sharded update routing.
+
+One ingress process (long polling or webhook) receives raw updates and fans
+them out to N worker processes over multiprocessing queues. The worker is
+chosen from `from_user.id`, so every update of one applicant lands on the
+same worker and the FSM conversation in ApplicationStates stays ordered.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from bot.config import (
+    BOT_TOKEN, RATE_LIMIT_ENABLED, RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_GROUP_PER_MINUTE
+)
+from bot.middlewares.rate_limiter import RateLimiter
+from bot.services.tracing import TraceLogFilter
+
+logger = logging.getLogger(__name__)
+
+# Update types that carry the applicant in a "from" field
+_USER_EVENT_TYPES = (
+    "message", "callback_query", "edited_message", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+
+def get_shard_key(update: Dict[str, Any]) -> int:
+    """Return the id updates are sharded by: user id, else chat id, else update id"""
+    for event_type in _USER_EVENT_TYPES:
+        event = update.get(event_type)
+        if not event:
+            continue
+        user = event.get("from")
+        if user and "id" in user:
+            return int(user["id"])
+        chat = event.get("chat")
+        if chat and "id" in chat:
+            return int(chat["id"])
+    return int(update.get("update_id", 0))
+
+
+def get_update_shard_key(update: Update) -> int:
+    """get_shard_key for an already parsed Update"""
+    try:
+        event = update.event
+    except Exception:  # update type unknown to this aiogram version
+        return update.update_id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+def get_worker_index(update: Dict[str, Any], worker_count: int) -> int:
+    """Pick the worker for an update (stable for the same user)"""
+    return get_shard_key(update) % worker_count
+
+
+# ============================================
+# WORKER PROCESS
+# ============================================
+
+class UpdateSequencer:
+    """Run updates concurrently across users but strictly in order per user"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher):
+        self.bot = bot
+        self.dp = dp
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    def submit(self, update: Union[Update, Dict[str, Any]]) -> None:
+        """Queue a parsed or raw update behind earlier updates of the same user"""
+        key = get_update_shard_key(update) if isinstance(update, Update) else get_shard_key(update)
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._process(previous, update))
+        self._tails[key] = task
+        task.add_done_callback(lambda t: self._release(key, t))
+
+    def _release(self, key: int, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _process(self, previous: Optional[asyncio.Task], update: Union[Update, Dict[str, Any]]) -> None:
+        if previous is not None:
+            with suppress(Exception):
+                await asyncio.shield(previous)
+        try:
+            if isinstance(update, Update):
+                result = await self.dp.feed_update(self.bot, update)
+            else:
+                result = await self.dp.feed_raw_update(self.bot, update)
+            if isinstance(result, TelegramMethod):
+                await self.dp.silent_call_request(bot=self.bot, result=result)
+        except Exception as e:
+            update_id = update.update_id if isinstance(update, Update) else update.get("update_id")
+            logger.error(f"Failed to process update {update_id}: {e}")
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait until queued updates are handled (at most `timeout` seconds)"""
+        if self._tails:
+            # The last task of a user only finishes after all earlier ones
+            await asyncio.wait(list(self._tails.values()), timeout=timeout)
+
+
+async def _worker_loop(index: int, worker_count: int, updates: multiprocessing.Queue, dispatcher_factory: Callable[[], Dispatcher]):
+    bot = Bot(token=BOT_TOKEN)
+    if RATE_LIMIT_ENABLED:
+        # Global and group limits are shared by all workers; per-chat ones are not (sharded by user)
+        bot.session.middleware(RateLimiter(
+            global_per_second=RATE_LIMIT_GLOBAL_PER_SECOND / worker_count,
+            group_per_minute=RATE_LIMIT_GROUP_PER_MINUTE / worker_count,
+        ))
+    dp = dispatcher_factory()
+    sequencer = UpdateSequencer(bot, dp)
+    loop = asyncio.get_running_loop()
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    logger.info(f"Worker {index} started")
+    try:
+        while True:
+            update = await loop.run_in_executor(None, updates.get)
+            if update is None:  # Shutdown sentinel from supervisor
+                break
+            sequencer.submit(update)
+        await sequencer.drain()
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()
+        logger.info(f"Worker {index} stopped")
+
+
+def _worker_main(index: int, worker_count: int, updates: multiprocessing.Queue, dispatcher_factory: Callable[[], Dispatcher]):
+    """Entry point of a worker process"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s%(trace)s",
+    )
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceLogFilter())
+    # Supervisor owns shutdown; workers stop on the sentinel, not on Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Lets per-process resources (e.g. the outbox journal) get their own files
+    os.environ["BOT_WORKER_INDEX"] = str(index)
+    asyncio.run(_worker_loop(index, worker_count, updates, dispatcher_factory))
+
+
+# ============================================
+# SUPERVISOR (INGRESS) PROCESS
+# ============================================
+
+class WorkerPool:
+    """Spawns worker processes and routes raw updates to them"""
+
+    def __init__(self, worker_count: int, dispatcher_factory: Callable[[], Dispatcher]):
+        self.worker_count = worker_count
+        self.dispatcher_factory = dispatcher_factory
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.worker_count, self._queues[index], self.dispatcher_factory),
+            name=f"hr-bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self) -> None:
+        for index in range(self.worker_count):
+            self._queues.append(self._context.Queue())
+            self._processes.append(self._spawn(index))
+        logger.info(f"Started {self.worker_count} worker processes")
+
+    def dispatch(self, update: Dict[str, Any]) -> None:
+        """Send raw update to the worker that owns its user"""
+        index = get_worker_index(update, self.worker_count)
+        if not self._processes[index].is_alive():
+            # FSM state kept in that worker's memory is lost, but the user keeps being served
+            logger.error(f"Worker {index} died (exit code {self._processes[index].exitcode}). Restarting...")
+            self._processes[index] = self._spawn(index)
+        self._queues[index].put(update)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        for updates in self._queues:
+            with suppress(ValueError, OSError, queue_module.Full):
+                updates.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Worker {process.name} did not stop in time, terminating")
+                process.terminate()
+        logger.info("All workers stopped")
+
+
+async def poll_updates(
+    bot: Bot,
+    handle: Callable[[Update], None],
+    allowed_updates: List[str],
+    stop_event: asyncio.Event,
+    offset: Optional[int] = None,
+) -> Optional[int]:
+    """
+    Long-poll getUpdates and pass every update to `handle` until stop_event is set.
+    Returns the offset of the next unprocessed update.
+    """
+    stop_waiter = asyncio.ensure_future(stop_event.wait())
+    while not stop_event.is_set():
+        fetch = asyncio.ensure_future(
+            bot.get_updates(offset=offset, timeout=10, allowed_updates=allowed_updates)
+        )
+        await asyncio.wait({fetch, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        if not fetch.done():
+            fetch.cancel()
+            break
+        try:
+            updates = fetch.result()
+        except Exception as e:
+            logger.error(f"Failed to fetch updates - {type(e).__name__}: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            handle(update)
+            offset = update.update_id + 1
+    stop_waiter.cancel()
+    if offset is not None:
+        # Confirm the last batch so it is not delivered again after restart
+        with suppress(Exception):
+            await bot.get_updates(offset=offset, timeout=0, limit=1)
+    return offset
+
+
+async def run_supervisor(
+    bot: Bot,
+    dispatcher_factory: Callable[[], Dispatcher],
+    worker_count: int,
+    allowed_updates: List[str],
+    mode: str = "polling",
+):
+    """Run ingress in this process and handle updates in `worker_count` processes"""
+    pool = WorkerPool(worker_count, dispatcher_factory)
+    pool.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Signal handlers are not supported on Windows
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        if mode == "webhook":
+            from bot.runtime.webhook import serve_webhook_into_pool
+            await serve_webhook_into_pool(bot, pool, allowed_updates, stop_event)
+        else:
+            logger.info("Supervisor polling for updates...")
+            await poll_updates(
+                bot,
+                lambda update: pool.dispatch(update.model_dump(mode="json", exclude_none=True, by_alias=True)),
+                allowed_updates,
+                stop_event,
+            )
+    finally:
+        await loop.run_in_executor(None, pool.stop)
@@ -0,0 +1,279 @@
+"""
+Detection of repeat applications in the confirmation path.
+
+An application is a repeat when, for the same position and within the
+position's cooldown, an earlier one had the same
+
+* phone (normalized with format_phone),
+* Telegram user_id, or
+* passport name + surname + date of birth.
+
+Only salted hashes of these values are kept. Every check first asks an
+in-memory Bloom filter: a miss means "certainly new" and needs no disk read,
+which is the common case. A hit is confirmed against the exact index in
+SQLite (one dedicated thread), so false positives never flag anybody.
+
+check() only reads. An application is remembered with record() once it is
+queued for HR (or merged), so a submission that fails is not recorded and its
+retry is not taken for a repeat.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from bot.models.application_draft import ApplicationDraft
+from bot.utils.validators import format_phone
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "flag", "merge")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    key BLOB NOT NULL,
+    position TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    repeats INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, position)
+) WITHOUT ROWID
+"""
+
+# Stored hashes are not plain SHA-256 of a phone number (which is trivially reversible)
+_HASH_SALT = b"proper-hr-dedup"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over bytes (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: bytes) -> List[int]:
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: bytes) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+@dataclass
+class DuplicateMatch:
+    """An earlier application for the same position within the cooldown"""
+    matched_on: List[str]  # "phone", "user", "identity"
+    last_seen: datetime
+    repeats: int  # earlier repeats of that application, this one not counted
+
+
+def _normalize_name(value: Optional[str]) -> str:
+    return re.sub(r"[\W_]+", "", (value or "").casefold())
+
+
+def identity_keys(draft: ApplicationDraft) -> List[Tuple[str, bytes]]:
+    """(kind, hashed key) pairs an application is matched on"""
+    values = []
+    phone = format_phone(draft.phone or "")
+    if phone:
+        values.append(("phone", phone))
+    if draft.user_id:
+        values.append(("user", str(draft.user_id)))
+    name, surname = _normalize_name(draft.passport_name), _normalize_name(draft.passport_surname)
+    if name and surname and draft.date_of_birth:
+        values.append(("identity", f"{name}|{surname}|{draft.date_of_birth.strip()}"))
+    return [
+        (kind, hashlib.blake2b(f"{kind}:{value}".encode("utf-8"), digest_size=16, key=_HASH_SALT).digest())
+        for kind, value in values
+    ]
+
+
+class DuplicateDetector:
+    """Bloom prefilter plus exact SQLite index of recent applications"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = "flag",
+        cooldown_days: float = 30,
+        position_cooldown_days: Optional[Dict[str, float]] = None,
+        capacity: int = 200_000,
+        use_prefilter: bool = True,
+    ):
+        """
+        :param path: SQLite file of the exact index
+        :param mode: "flag" (post repeats with a warning), "merge" (do not post them) or "off"
+        :param cooldown_days: default window in which a second application is a repeat
+        :param position_cooldown_days: per-position overrides of cooldown_days
+        :param capacity: expected number of applications within the longest cooldown
+        :param use_prefilter: disable with several worker processes, whose filters would
+            not see each other's applications
+        """
+        if mode not in MODES:
+            logger.error(f"Unknown DEDUP_MODE '{mode}', using 'flag'")
+            mode = "flag"
+        self.path = Path(path)
+        self.mode = mode
+        self.cooldown_days = cooldown_days
+        self.position_cooldown_days = dict(position_cooldown_days or {})
+        self.capacity = capacity
+        self.use_prefilter = use_prefilter
+
+        # Counters (exported as metrics)
+        self.checks = 0
+        self.prefilter_hits = 0
+        self.duplicates = 0
+
+        self._bloom = BloomFilter(capacity)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def cooldown_for(self, position: Optional[str]) -> float:
+        """Cooldown of a position in seconds"""
+        return self.position_cooldown_days.get(position or "", self.cooldown_days) * 86400
+
+    @staticmethod
+    def _bloom_item(key: bytes, position: str) -> bytes:
+        return key + position.encode("utf-8")
+
+    # ---------- DB thread ----------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(_SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _load(self, since: float) -> int:
+        """Fill the prefilter with entries that can still match"""
+        self._bloom = BloomFilter(self.capacity)
+        loaded = 0
+        for key, position in self._db().execute("SELECT key, position FROM seen WHERE last_seen >= ?", (since,)):
+            self._bloom.add(self._bloom_item(key, position))
+            loaded += 1
+        return loaded
+
+    def _lookup(
+        self, keys: List[Tuple[str, bytes]], position: str, cooldown: float, now: float
+    ) -> Optional[DuplicateMatch]:
+        connection = self._db()
+        matched_on, last_seen, repeats = [], 0.0, 0
+        for kind, key in keys:
+            row = connection.execute(
+                "SELECT last_seen, repeats FROM seen WHERE key = ? AND position = ? AND last_seen >= ?",
+                (key, position, now - cooldown),
+            ).fetchone()
+            if row is not None:
+                matched_on.append(kind)
+                last_seen, repeats = max(last_seen, row[0]), max(repeats, row[1])
+        if not matched_on:
+            return None
+        return DuplicateMatch(matched_on, datetime.fromtimestamp(last_seen), repeats)
+
+    def _record(self, keys: List[Tuple[str, bytes]], position: str, now: float, repeat: bool) -> None:
+        connection = self._db()
+        with connection:
+            if not repeat:
+                connection.executemany(
+                    "INSERT INTO seen (key, position, last_seen, repeats) VALUES (?, ?, ?, 0) "
+                    "ON CONFLICT(key, position) DO UPDATE SET last_seen = excluded.last_seen, repeats = 0",
+                    [(key, position, now) for _, key in keys],
+                )
+            elif self.mode == "flag":
+                # Posted again: the cooldown starts over
+                connection.executemany(
+                    "INSERT INTO seen (key, position, last_seen, repeats) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(key, position) DO UPDATE SET last_seen = excluded.last_seen, repeats = repeats + 1",
+                    [(key, position, now) for _, key in keys],
+                )
+            else:
+                # Merged: not posted, so the cooldown still counts from the posted one
+                connection.executemany(
+                    "INSERT INTO seen (key, position, last_seen, repeats) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(key, position) DO UPDATE SET repeats = repeats + 1",
+                    [(key, position, now) for _, key in keys],
+                )
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # ---------- API ----------
+
+    async def start(self) -> None:
+        """Load recent entries into the prefilter (dispatcher startup hook)"""
+        if not self.enabled or not self.use_prefilter:
+            return
+        longest = max([self.cooldown_days, *self.position_cooldown_days.values()]) * 86400
+        loaded = await self._run(self._load, time.time() - longest)
+        logger.info(f"Duplicate prefilter loaded with {loaded} recent applications")
+
+    async def check(self, draft: ApplicationDraft) -> Optional[DuplicateMatch]:
+        """
+        Tell whether a confirmed application repeats an earlier one. Nothing is written:
+        call record() once the application is queued for HR (or merged).
+        """
+        if not self.enabled:
+            return None
+        keys = identity_keys(draft)
+        if not keys:
+            return None
+        position = draft.position or ""
+        self.checks += 1
+        # Certainly new when no key is in the prefilter: skip the exact lookup
+        if self.use_prefilter and not any(self._bloom_item(key, position) in self._bloom for _, key in keys):
+            return None
+        if self.use_prefilter:
+            self.prefilter_hits += 1
+        match = await self._run(self._lookup, keys, position, self.cooldown_for(position), time.time())
+        if match is not None:
+            self.duplicates += 1
+            logger.info(
+                f"Repeat application of user {draft.user_id} for {position} "
+                f"(matched on {', '.join(match.matched_on)}, {match.repeats + 1} repeat(s))"
+            )
+        return match
+
+    async def record(self, draft: ApplicationDraft, match: Optional[DuplicateMatch] = None) -> None:
+        """Remember an application that was queued for HR, or merged (`match` is what check() returned)"""
+        if not self.enabled:
+            return
+        keys = identity_keys(draft)
+        if not keys:
+            return
+        position = draft.position or ""
+        for _, key in keys:
+            self._bloom.add(self._bloom_item(key, position))
+        await self._run(self._record, keys, position, time.time(), match is not None)
+
+    async def close(self) -> None:
+        """Close the connection (dispatcher shutdown hook); it is reopened on next use"""
+        await self._run(self._close_connection)
@@ -0,0 +1,270 @@
+"""
+Streaming CSV / XLSX export of submitted applications.
+
+Rows come from ApplicationStore.stream() in batches and are written to the
+file batch by batch, so memory use does not depend on the number of rows.
+XLSX is produced directly with zipfile: the sheet uses inline strings
+(no shared strings table to keep in memory) and is deflated while written.
+The whole export runs in a worker thread; the event loop is never blocked.
+
+Applicants type some of the fields themselves. A CSV cell that a spreadsheet
+would run as a formula gets a leading "'"; XLSX cells are inline strings,
+which are never evaluated.
+
+CLI (from the project root):
+    python -m bot.services.export --format xlsx --branch clara --since 2026-03-01 -o clara.xlsx
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import re
+import sys
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from bot.storage.applications import ApplicationStore
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "xlsx")
+
+# (row key, column title)
+COLUMNS: List[Tuple[str, str]] = [
+    ("id", "ID"),
+    ("submission_date", "Sana"),
+    ("branch", "Filial"),
+    ("department", "Bo'lim"),
+    ("position", "Lavozim"),
+    ("passport_surname", "Familiya"),
+    ("passport_name", "Ism"),
+    ("father_name", "Otasining ismi"),
+    ("date_of_birth", "Tug'ilgan sana"),
+    ("phone", "Telefon"),
+    ("address", "Manzil"),
+    ("is_student", "Talaba"),
+    ("education", "Ma'lumoti"),
+    ("gender", "Jinsi"),
+    ("russian_level", "Rus tili"),
+    ("english_level", "Ingliz tili"),
+    ("ielts", "IELTS"),
+    ("work_experience", "Tajriba"),
+    ("last_workplace", "Oxirgi ish joyi"),
+    ("hear_about", "Qayerdan eshitgan"),
+    ("username", "Telegram"),
+    ("user_id", "Telegram ID"),
+]
+
+
+def _values(row: Dict[str, Any]) -> List[Any]:
+    row["ielts"] = "Bor" if row.get("ielts_certificate") else "Yo'q"
+    return [row.get(key) for key, _ in COLUMNS]
+
+
+# ---------- CSV ----------
+
+# Excel and LibreOffice run a CSV cell starting with one of these as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _write_csv(path: Path, batches: Iterable[List[Dict[str, Any]]]) -> int:
+    count = 0
+    # utf-8-sig: Excel detects the encoding from the BOM
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow([title for _, title in COLUMNS])
+        for batch in batches:
+            writer.writerows([_csv_value(value) for value in _values(row)] for row in batch)
+            count += len(batch)
+    return count
+
+
+# ---------- XLSX ----------
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Applications" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 1 = bold, used for the header row
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+# Characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Anything that needs escaping or removing; most cells have none, so they skip the work
+_SPECIAL_XML = re.compile("[&<>\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(value: Any, style: str = "") -> str:
+    # Called for every cell of the sheet (millions per export), so kept cheap
+    if value is None or value == "":
+        return "<c/>"
+    if type(value) is int:
+        return f"<c{style}><v>{value}</v></c>"
+    text = str(value)
+    if _SPECIAL_XML.search(text):
+        text = escape(_INVALID_XML.sub("", text))
+    if text != text.strip():
+        return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c t="inlineStr"{style}><is><t>{text}</t></is></c>'
+
+
+def _sheet_row(values: List[Any], style: str = "") -> str:
+    return "<row>" + "".join(_cell(value, style) for value in values) + "</row>"
+
+
+def _write_xlsx(path: Path, batches: Iterable[List[Dict[str, Any]]]) -> int:
+    count = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(_SHEET_HEAD.encode("utf-8"))
+            sheet.write(_sheet_row([title for _, title in COLUMNS], style=' s="1"').encode("utf-8"))
+            for batch in batches:
+                sheet.write("".join(_sheet_row(_values(row)) for row in batch).encode("utf-8"))
+                count += len(batch)
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+    return count
+
+
+# ---------- API ----------
+
+def write_export(
+    store: ApplicationStore,
+    path: Union[str, Path],
+    fmt: str = "xlsx",
+    batch_size: int = 2000,
+    **filters: Any,
+) -> int:
+    """Blocking export of applications matching `filters` (see ApplicationStore.find) to `path`; returns row count"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    path = Path(path)
+    writer = _write_xlsx if fmt == "xlsx" else _write_csv
+    started = time.perf_counter()
+    count = writer(path, store.stream(batch_size=batch_size, **filters))
+    logger.info(f"Exported {count} applications to {path.name} in {time.perf_counter() - started:.2f}s")
+    return count
+
+
+async def export_applications(
+    store: ApplicationStore,
+    path: Union[str, Path],
+    fmt: str = "xlsx",
+    **filters: Any,
+) -> int:
+    """write_export() in a worker thread"""
+    return await asyncio.to_thread(write_export, store, path, fmt, **filters)
+
+
+def parse_date_range(since: Optional[str], until: Optional[str]) -> Dict[str, datetime]:
+    """Inclusive YYYY-MM-DD bounds typed by a person -> since/until filters of the store"""
+    filters = {}
+    if since:
+        filters["since"] = datetime.strptime(since, "%Y-%m-%d")
+    if until:
+        filters["until"] = datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)
+    return filters
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from bot.config import APPLICATIONS_DB_PATH, BRANCHES, DEPARTMENTS
+
+    parser = argparse.ArgumentParser(description="Export submitted applications to CSV or XLSX")
+    parser.add_argument("-o", "--output", required=True, help="file to write")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output file extension")
+    parser.add_argument("--db", default=str(APPLICATIONS_DB_PATH), help="applications database")
+    parser.add_argument("--branch", choices=list(BRANCHES))
+    parser.add_argument("--department", choices=list(DEPARTMENTS))
+    parser.add_argument("--position", help='e.g. "IELTS Instructor"')
+    parser.add_argument("--since", help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day (inclusive), YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    output = Path(args.output)
+    fmt = args.format or output.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error("use --format or an output file ending in .csv / .xlsx")
+    try:
+        filters = parse_date_range(args.since, args.until)
+    except ValueError:
+        parser.error("dates must be YYYY-MM-DD")
+
+    store = ApplicationStore(args.db)
+    count = write_export(
+        store, output, fmt,
+        branch=args.branch, department=args.department, position=args.position, **filters,
+    )
+    print(f"{count} applications written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Prometheus metrics: a small in-process registry and the /metrics HTTP endpoint.
+
+Counters, gauges and histograms are plain dicts keyed by label values, so
+recording is a dict lookup and a few additions on the event loop; nothing is
+formatted until Prometheus scrapes. Components that already keep counters
+(outbox, rate limiter, FSM storage, ...) are read at scrape time through
+`track()` / `collector()` callbacks instead of being changed to push them.
+
+The text format is https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+import abc
+import bisect
+import inspect
+import logging
+import math
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached FSM read (~µs) up to a slow Bot API call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+# (label values, value) pairs reported by a collector
+Samples = Iterable[Tuple[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _label_text(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abc.abstractmethod
+    def render(self) -> List[str]:
+        """Lines of this metric in the text format"""
+
+
+class Counter(_Metric):
+    """Monotonic counter: counter.inc("sendMessage")"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Bucketed observations: histogram.observe(0.012, "process_phone")"""
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last is +Inf)..., sum]
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return int(sum(counts[:-1])) if counts else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class _Collected(_Metric):
+    """Metric whose samples come from a callback at scrape time"""
+
+    def __init__(
+        self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+        callback: Callable[[], Union[Samples, Awaitable[Samples]]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+        self._samples: List[Tuple[Labels, float]] = []
+
+    async def refresh(self) -> None:
+        samples = self.callback()
+        if inspect.isawaitable(samples):
+            samples = await samples
+        self._samples = list(samples)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._samples:
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """All metrics of one process, rendered together on scrape"""
+
+    def __init__(self, prefix: str = "hrbot_"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(self.prefix + name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def collector(
+        self, name: str, documentation: str, callback: Callable[[], Union[Samples, Awaitable[Samples]]],
+        kind: str = "gauge", labelnames: Sequence[str] = (),
+    ) -> None:
+        """Metric read from `callback` (sync or async, returns (label values, value) pairs) on scrape"""
+        self._add(_Collected(self.prefix + name, documentation, kind, labelnames, callback))
+
+    def track(self, obj: Any, prefix: str, counters: Sequence[str] = (), gauges: Sequence[str] = ()) -> None:
+        """Export numeric attributes of a component, e.g. track(outbox, "outbox", counters=["delivered"])"""
+        for attribute in counters:
+            self.collector(
+                f"{prefix}_{attribute}_total", f"{prefix}.{attribute}",
+                lambda attribute=attribute: [((), getattr(obj, attribute))], kind="counter",
+            )
+        for attribute in gauges:
+            self.collector(
+                f"{prefix}_{attribute}", f"{prefix}.{attribute}",
+                lambda attribute=attribute: [((), getattr(obj, attribute))],
+            )
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(self.prefix + name)
+
+    async def render(self) -> str:
+        """Exposition text of all metrics; a failing collector is logged and left empty"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, _Collected):
+                try:
+                    await metric.refresh()
+                except Exception as e:
+                    logger.error(f"Metrics collector {metric.name} failed: {type(e).__name__}: {e}")
+                    metric._samples = []
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Embedded aiohttp server answering GET /metrics"""
+
+    def __init__(self, registry: Registry, host: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=(await self.registry.render()).encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self) -> None:
+        """Start serving (dispatcher startup hook)"""
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            # Metrics are optional: the bot keeps running without them
+            logger.error(f"Metrics server could not listen on {self.host}:{self.port}: {e}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Metrics available on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        """Stop serving (dispatcher shutdown hook)"""
+        if self._runner is not None:
+            runner, self._runner = self._runner, None
+            await runner.cleanup()
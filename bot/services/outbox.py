@@ -0,0 +1,306 @@
+"""
+Durable outbox for applications on their way to the HR group.
+
+On confirm the finished application is appended to a local JSONL journal
+(fsync'ed) and the applicant is acknowledged right away. Background workers
+deliver it with submit_application(), retrying with exponential backoff and
+honouring Telegram's retry_after.
+
+Journal records, one per line:
+    {"op": "add", "id": ..., "chat_id": ..., "user_id": ..., "summary": ..., "draft": base64}
+    {"op": "step", "id": ..., "step": "header", "message_id": ...}
+    {"op": "done", "id": ...}
+    {"op": "dead", "id": ..., "error": ...}
+
+After a crash the journal is replayed: unfinished applications are resumed
+and steps already posted to the group are skipped, so HR never gets the
+same message twice (at most the one in flight during the crash).
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.keyboards.inline_keyboards import get_hr_decision_keyboard
+from bot.middlewares.rate_limiter import Priority, request_priority
+from bot.models.application_draft import ApplicationDraft
+from bot.services.submission import submit_application
+
+logger = logging.getLogger(__name__)
+
+# Rewrite the journal after this many finished applications
+_COMPACT_AFTER = 500
+
+
+@dataclass
+class _Job:
+    """One application waiting for delivery"""
+    id: str
+    chat_id: int
+    user_id: int
+    summary: str
+    draft: bytes
+    progress: Dict[str, int] = field(default_factory=dict)
+    attempts: int = 0
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Journal records that recreate this job"""
+        records = [{
+            "op": "add", "id": self.id, "chat_id": self.chat_id, "user_id": self.user_id,
+            "summary": self.summary, "draft": base64.b64encode(self.draft).decode("ascii"),
+        }]
+        for step, message_id in self.progress.items():
+            records.append({"op": "step", "id": self.id, "step": step, "message_id": message_id})
+        return records
+
+
+class Outbox:
+    """Persistent queue of HR submissions with background delivery"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        workers: int = 2,
+        base_delay: float = 2.0,
+        max_delay: float = 600.0,
+        max_attempts: int = 12,
+    ):
+        """
+        :param path: journal file
+        :param workers: applications delivered concurrently
+        :param base_delay: first retry delay in seconds, doubled on every failure
+        :param max_delay: upper bound for the retry delay
+        :param max_attempts: failed attempts (not counting flood waits) before giving up
+        """
+        self.path = Path(path)
+        self.worker_count = workers
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+        # Counters (exported as metrics)
+        self.delivered = 0
+        self.retries = 0
+        self.dead = 0
+
+        self._jobs: Dict[str, _Job] = {}
+        self._finished_since_compaction = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._file = None
+        self._bot: Optional[Bot] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+
+    # ---------- journal (executor thread) ----------
+
+    def _write(self, lines: List[str]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rewrite(self, lines: List[str]) -> None:
+        """Atomically replace the journal with `lines` and keep appending to it"""
+        if self._file is not None:
+            self._file.close()
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as tmp:
+            tmp.write("".join(lines))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def _append(self, *records: Dict[str, Any]) -> None:
+        lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, lines)
+
+    async def _compact(self) -> None:
+        lines = [
+            json.dumps(record, ensure_ascii=False) + "\n"
+            for job in self._jobs.values() for record in job.records()
+        ]
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._rewrite, lines)
+        self._finished_since_compaction = 0
+
+    def _replay(self) -> None:
+        """Rebuild unfinished jobs from the journal"""
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as journal:
+            for number, line in enumerate(journal, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash; the record was never acknowledged
+                    logger.warning(f"Skipping unreadable outbox record at line {number}")
+                    continue
+                op, job_id = record.get("op"), record.get("id")
+                if op == "add" and job_id not in self._jobs:
+                    self._jobs[job_id] = _Job(
+                        id=job_id,
+                        chat_id=record["chat_id"],
+                        user_id=record["user_id"],
+                        summary=record["summary"],
+                        draft=base64.b64decode(record["draft"]),
+                    )
+                elif op == "step" and job_id in self._jobs:
+                    self._jobs[job_id].progress[record["step"]] = record["message_id"]
+                elif op in ("done", "dead"):
+                    self._jobs.pop(job_id, None)
+
+    # ---------- lifecycle ----------
+
+    async def start(self, bot: Bot) -> None:
+        """Replay the journal and start delivery workers (dispatcher startup hook)"""
+        self._bot = bot
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._replay)
+        await self._compact()
+
+        self._queue = asyncio.Queue()
+        for job in self._jobs.values():
+            self._queue.put_nowait(job)
+        if self._jobs:
+            logger.info(f"Resuming {len(self._jobs)} undelivered applications from outbox")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def close(self) -> None:
+        """Stop workers; undelivered applications stay in the journal (dispatcher shutdown hook)"""
+        tasks = self._workers + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._workers = []
+        self._retries.clear()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        if self._jobs:
+            logger.info(f"Outbox closed with {len(self._jobs)} applications pending")
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    async def join(self) -> None:
+        """Wait until every queued application is delivered or given up"""
+        while self._jobs:
+            await asyncio.sleep(0.01)
+
+    # ---------- producer ----------
+
+    async def enqueue(self, chat_id: int, draft: ApplicationDraft, summary: str) -> str:
+        """Persist a confirmed application; returns once it is safely on disk"""
+        job = _Job(
+            id=uuid.uuid4().hex,
+            chat_id=chat_id,
+            user_id=draft.user_id,
+            summary=summary,
+            draft=draft.to_bytes(),
+        )
+        # Registered before the write so a concurrent compaction keeps it
+        self._jobs[job.id] = job
+        try:
+            await self._append(*job.records())
+        except Exception:
+            self._jobs.pop(job.id, None)
+            raise
+        if self._queue is not None:
+            self._queue.put_nowait(job)
+        return job.id
+
+    # ---------- delivery ----------
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                # HR group fan-out must never delay replies to applicants
+                with request_priority(Priority.BULK):
+                    await self._attempt(job)
+            except Exception as e:
+                logger.error(f"Outbox worker error for {job.id}: {type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)  # jitter so retries do not align
+
+    async def _attempt(self, job: _Job) -> None:
+        async def record_step(step: str, message_id: int) -> None:
+            job.progress[step] = message_id
+            await self._append({"op": "step", "id": job.id, "step": step, "message_id": message_id})
+
+        draft = ApplicationDraft.from_bytes(job.draft)
+        retry_after = None
+        error = ""
+        try:
+            report = await submit_application(
+                self._bot, job.chat_id, draft, job.summary,
+                get_hr_decision_keyboard(job.user_id),
+                progress=job.progress, on_step=record_step,
+            )
+            if not report.failed:
+                await self._finish(job, {"op": "done", "id": job.id})
+                self.delivered += 1
+                return
+            retry_after = report.retry_after
+            error = f"attachments not sent: {', '.join(report.failed)}"
+        except TelegramRetryAfter as e:
+            retry_after = e.retry_after
+            error = str(e)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if retry_after is not None:
+            # Flood control is not the application's fault: wait exactly as asked
+            delay = float(retry_after)
+        else:
+            job.attempts += 1
+            if job.attempts >= self.max_attempts:
+                logger.error(f"Giving up on application {job.id} of user {job.user_id} after {job.attempts} attempts: {error}")
+                await self._finish(job, {"op": "dead", "id": job.id, "error": error})
+                self.dead += 1
+                return
+            delay = self._backoff(job.attempts)
+        self.retries += 1
+        logger.warning(f"Delivery of application {job.id} failed ({error}), retrying in {delay:.1f}s")
+        self._schedule(job, delay)
+
+    def _schedule(self, job: _Job, delay: float) -> None:
+        task = asyncio.create_task(self._requeue_later(job, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue_later(self, job: _Job, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._queue.put_nowait(job)
+
+    async def _finish(self, job: _Job, record: Dict[str, Any]) -> None:
+        # Dropped before the write so a concurrent compaction cannot resurrect it
+        self._jobs.pop(job.id, None)
+        await self._append(record)
+        self._finished_since_compaction += 1
+        if self._finished_since_compaction >= _COMPACT_AFTER:
+            await self._compact()
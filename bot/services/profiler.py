@@ -0,0 +1,264 @@
+"""
+On-demand sampling profiler of the event-loop thread.
+
+While running, a background thread wakes every `interval` seconds, takes the
+current stack of the thread running the event loop (sys._current_frames) and
+counts it. Nothing is hooked into the code being profiled, so the overhead is
+the sampling thread alone (~1-2% CPU at the default 5 ms) and only while a
+profile is being taken.
+
+Output:
+* collapsed stacks ("frame;frame;frame count" lines) for flamegraph.pl,
+  speedscope or Grafana;
+* a self-contained flamegraph SVG;
+* the handlers of application_handlers.py that had the most samples.
+
+Started by the HR group command /profile or by SIGUSR2 (Linux/macOS), which
+writes the files to PROFILE_DIR.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Dict, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+# Frames of these files are the application handlers reported separately
+HANDLERS_FILE = "application_handlers.py"
+
+# Stack tops meaning "the loop is waiting for I/O", not doing work
+_IDLE_FRAMES = ("selectors:select", "selectors:poll", "selectors:_select")
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+
+@dataclass
+class Profile:
+    """Samples taken by one profiler run"""
+    stacks: Counter  # "root;...;leaf" -> samples
+    handlers: Counter  # application handler name -> samples with it on the stack
+    samples: int
+    interval: float
+    duration: float
+
+    @property
+    def idle_samples(self) -> int:
+        return sum(count for stack, count in self.stacks.items() if stack.endswith(_IDLE_FRAMES))
+
+    def busy_ratio(self) -> float:
+        return 1 - self.idle_samples / self.samples if self.samples else 0.0
+
+    def slowest_handlers(self, limit: int = 5) -> List[Tuple[str, float]]:
+        """(handler, seconds of event-loop time spent inside it) with the most samples first"""
+        return [(name, count * self.interval) for name, count in self.handlers.most_common(limit)]
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def flamegraph_svg(self, title: str = "Event loop") -> str:
+        return render_flamegraph(self.stacks, title)
+
+    def summary(self) -> str:
+        lines = [
+            f"⏱ Profil: {self.duration:.0f}s, {self.samples} ta namuna, "
+            f"event loop band: {self.busy_ratio() * 100:.0f}%"
+        ]
+        slowest = self.slowest_handlers()
+        if slowest:
+            lines.append("Eng sekin handlerlar:")
+            lines.extend(f"  {name}: {seconds * 1000:.0f} ms" for name, seconds in slowest)
+        else:
+            lines.append("Profil vaqtida ariza handlerlari ishlamadi.")
+        return "\n".join(lines)
+
+    def save(self, directory: Union[str, Path], prefix: str = "profile") -> Tuple[Path, Path]:
+        """Write <prefix>-<time>.collapsed and .svg, return both paths"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}"
+        collapsed = directory / f"{stem}.collapsed"
+        svg = directory / f"{stem}.svg"
+        collapsed.write_text(self.collapsed(), encoding="utf-8")
+        svg.write_text(self.flamegraph_svg(), encoding="utf-8")
+        return collapsed, svg
+
+
+class SamplingProfiler:
+    """Samples the stack of the event-loop thread for a fixed time; one run at a time"""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        interval: float = 0.005,
+        signal_seconds: float = 30,
+        max_depth: int = 128,
+    ):
+        """
+        :param directory: where profiles started by the signal are written
+        :param interval: seconds between samples
+        :param signal_seconds: length of a profile started by the signal
+        :param max_depth: frames kept per sample, counted from the stack top
+        """
+        self.directory = Path(directory)
+        self.interval = interval
+        self.signal_seconds = signal_seconds
+        self.max_depth = max_depth
+        self.running = False
+        self._signal: Optional[int] = None
+
+    def _sample(self, thread_id: int, stop: threading.Event, result: Dict[str, Counter]) -> None:
+        stacks, handlers = result["stacks"], result["handlers"]
+        interval, max_depth = self.interval, self.max_depth
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            handler = None
+            while frame is not None and len(names) < max_depth:
+                names.append(_frame_name(frame))
+                if frame.f_code.co_filename.endswith(HANDLERS_FILE):
+                    handler = frame.f_code.co_name  # outermost one wins
+                frame = frame.f_back
+            if not names:
+                continue
+            names.reverse()
+            stacks[";".join(names)] += 1
+            if handler is not None:
+                handlers[handler] += 1
+
+    async def profile(self, seconds: float) -> Profile:
+        """Sample the thread running this coroutine's loop for `seconds`"""
+        if self.running:
+            raise RuntimeError("A profile is already being taken")
+        self.running = True
+        result = {"stacks": Counter(), "handlers": Counter()}
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample, args=(threading.get_ident(), stop, result),
+            name="profiler", daemon=True,
+        )
+        started = time.monotonic()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            # The sampler finishes within one interval; do not block the loop on it
+            await asyncio.to_thread(sampler.join)
+            self.running = False
+        stacks = result["stacks"]
+        return Profile(
+            stacks, result["handlers"], sum(stacks.values()), self.interval, time.monotonic() - started
+        )
+
+    async def profile_to_files(self, seconds: float) -> Optional[Profile]:
+        """profile() and save the result to `directory`; errors are logged"""
+        try:
+            result = await self.profile(seconds)
+            collapsed, svg = result.save(self.directory)
+        except Exception as e:
+            logger.error(f"Profiling failed: {type(e).__name__}: {e}")
+            return None
+        logger.info(f"Profile written to {svg} and {collapsed}\n{result.summary()}")
+        return result
+
+    def _on_signal(self) -> None:
+        if self.running:
+            logger.warning("Profiling signal ignored: a profile is already being taken")
+            return
+        logger.info(f"Profiling the event loop for {self.signal_seconds}s")
+        asyncio.ensure_future(self.profile_to_files(self.signal_seconds))
+
+    async def start(self) -> None:
+        """Profile on SIGUSR2 (dispatcher startup hook; no-op on Windows)"""
+        sig = getattr(signal, "SIGUSR2", None)
+        if sig is None or self._signal is not None:
+            return
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, self._on_signal)
+        except (NotImplementedError, RuntimeError, ValueError):
+            return
+        self._signal = sig
+        logger.info(f"Send SIGUSR2 to PID {os.getpid()} to profile the event loop for {self.signal_seconds}s")
+
+    async def close(self) -> None:
+        """Remove the signal handler (dispatcher shutdown hook)"""
+        if self._signal is not None:
+            asyncio.get_running_loop().remove_signal_handler(self._signal)
+            self._signal = None
+
+
+# ---------- flamegraph ----------
+
+_ROW_HEIGHT = 16
+_WIDTH = 1200
+
+
+def _color(name: str) -> str:
+    # Stable warm colors, like flamegraph.pl
+    value = zlib.crc32(name.encode("utf-8"))
+    return f"rgb({205 + value % 50},{(value >> 8) % 180 + 50},{(value >> 16) % 55})"
+
+
+def render_flamegraph(stacks: Counter, title: str = "Flamegraph") -> str:
+    """Flamegraph SVG (root at the bottom) of collapsed stacks"""
+    # Merge stacks into a tree: node = [samples, {child name: node}]
+    root: List = [0, {}]
+    for stack, count in stacks.items():
+        root[0] += count
+        node = root
+        for name in stack.split(";"):
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += count
+
+    rects = []
+    depth_max = 0
+    total = root[0] or 1
+    pending = [(root, 0.0, -1, "all")]
+    while pending:
+        node, x, depth, name = pending.pop()
+        width = node[0] / total * _WIDTH
+        if width < 0.3:
+            continue  # too narrow to see
+        depth_max = max(depth_max, depth + 1)
+        rects.append((x, depth + 1, width, name, node[0]))
+        child_x = x
+        for child_name, child in sorted(node[1].items()):
+            pending.append((child, child_x, depth + 1, child_name))
+            child_x += child[0] / total * _WIDTH
+
+    height = (depth_max + 1) * _ROW_HEIGHT + 40
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_WIDTH}" height="{height}" '
+        f'font-family="Verdana" font-size="11">',
+        '<rect width="100%" height="100%" fill="#f8f8f8"/>',
+        f'<text x="{_WIDTH / 2}" y="20" text-anchor="middle" font-size="15">{escape(title)}</text>',
+    ]
+    for x, depth, width, name, count in rects:
+        y = height - (depth + 1) * _ROW_HEIGHT
+        label = escape(name)
+        percent = count * 100 / total
+        parts.append(
+            f'<g><title>{label} ({count} samples, {percent:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{_ROW_HEIGHT - 1}" fill="{_color(name)}"/>'
+        )
+        # ~7 px per character at font-size 11
+        if width > 35:
+            text = name if len(name) * 7 < width else name[:max(0, int(width / 7) - 2)] + ".."
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + 11}">{escape(text)}</text>')
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
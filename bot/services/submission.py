@@ -0,0 +1,220 @@
+"""
+Delivery of a confirmed application to the HR group.
+
+Plan for one application:
+
+1. Header: the photo with the full summary as caption and the HR decision
+   keyboard (one call). Falls back to photo + separate summary message when
+   the summary does not fit into a caption, or to the summary alone.
+2. Attachments (Russian voice, English media, IELTS certificate): one call
+   each, one after another in application_attachments() order, each as a
+   reply to the header, so HR always sees them in the same order below it.
+   A failed call does not stop the next ones, except on flood control: the
+   rest is then left for the retry, which sends it in order.
+
+An application has at most one voice note, one audio/video and one document,
+and Telegram allows none of these together in one album, so every attachment
+is its own call. They are not sent concurrently because Telegram would then
+show them in completion order. Every Bot API call is timed and returned in a
+SubmissionReport.
+
+Each finished step ("photo", "header", "attachment:<n>") can be recorded through
+`on_step` and skipped on a later call via `progress`, so a retried
+submission never posts the same message twice.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message, ReplyParameters
+
+from bot.models.application_draft import ApplicationDraft
+
+logger = logging.getLogger(__name__)
+
+# Telegram limit for photo captions (UTF-16 code units)
+CAPTION_LIMIT = 1024
+
+# Awaited with (step, message_id) after every delivered step
+StepCallback = Callable[[str, int], Awaitable[None]]
+
+
+@dataclass
+class Attachment:
+    """File sent to the HR group after the summary"""
+    kind: str  # photo, video, audio, voice, document
+    file_id: str
+    caption: str = ""
+
+
+@dataclass
+class CallTiming:
+    """Latency of one Bot API call"""
+    method: str
+    label: str
+    seconds: float
+    ok: bool
+
+
+@dataclass
+class SubmissionReport:
+    """Outcome of submit_application()"""
+    header_message_id: Optional[int] = None
+    timings: List[CallTiming] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    # Longest flood-control wait requested by Telegram for a failed attachment
+    retry_after: Optional[int] = None
+    total_seconds: float = 0.0
+
+    def format(self) -> str:
+        calls = ", ".join(
+            f"{timing.method}[{timing.label}] {timing.seconds * 1000:.0f}ms{'' if timing.ok else ' FAILED'}"
+            for timing in self.timings
+        )
+        return f"{len(self.timings)} calls in {self.total_seconds * 1000:.0f}ms: {calls}"
+
+
+def application_attachments(draft: ApplicationDraft) -> List[Attachment]:
+    """Attachments of an application in the order HR expects them"""
+    attachments = []
+    if draft.russian_voice:
+        attachments.append(Attachment("voice", draft.russian_voice, "Rus tili audio (≈10s)"))
+    if draft.english_media:
+        attachments.append(Attachment(draft.english_media_type or "audio", draft.english_media, "Ingliz tili media"))
+    if draft.ielts_certificate:
+        attachments.append(Attachment("document", draft.ielts_certificate, "IELTS sertifikati"))
+    return attachments
+
+
+def _caption_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+class _Timer:
+    """Collects CallTiming for every awaited Bot API call"""
+
+    def __init__(self, report: SubmissionReport):
+        self.report = report
+
+    async def call(self, method: str, label: str, request: Awaitable) -> object:
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await request
+            ok = True
+            return result
+        finally:
+            self.report.timings.append(CallTiming(method, label, time.perf_counter() - started, ok))
+
+
+async def _send_single(bot: Bot, chat_id: int, attachment: Attachment, reply: ReplyParameters, timer: _Timer) -> Message:
+    kwargs = dict(caption=attachment.caption, reply_parameters=reply, disable_notification=True)
+    if attachment.kind in ("voice", "audio"):
+        # A voice note cannot be sent as audio file and vice versa; try the other on failure
+        first, second = ("voice", "audio") if attachment.kind == "voice" else ("audio", "voice")
+        try:
+            return await _send_kind(bot, chat_id, first, attachment.file_id, kwargs, timer, attachment.caption)
+        except TelegramRetryAfter:
+            raise
+        except Exception:
+            return await _send_kind(bot, chat_id, second, attachment.file_id, kwargs, timer, attachment.caption)
+    return await _send_kind(bot, chat_id, attachment.kind, attachment.file_id, kwargs, timer, attachment.caption)
+
+
+async def _send_kind(bot: Bot, chat_id: int, kind: str, file_id: str, kwargs: dict, timer: _Timer, label: str) -> Message:
+    senders = {
+        "photo": ("sendPhoto", bot.send_photo),
+        "video": ("sendVideo", bot.send_video),
+        "audio": ("sendAudio", bot.send_audio),
+        "voice": ("sendVoice", bot.send_voice),
+        "document": ("sendDocument", bot.send_document),
+    }
+    method, send = senders.get(kind, senders["document"])
+    return await timer.call(method, label, send(chat_id, file_id, **kwargs))
+
+
+async def _send_header(
+    bot: Bot, chat_id: int, photo: Optional[str], summary: str,
+    reply_markup: InlineKeyboardMarkup, timer: _Timer,
+    progress: Dict[str, int], on_step: StepCallback,
+) -> int:
+    """Send photo and summary, returns id of the message holding the HR keyboard"""
+    if "header" in progress:
+        return progress["header"]
+    if photo and _caption_length(summary) <= CAPTION_LIMIT:
+        header = await timer.call("sendPhoto", "summary", bot.send_photo(
+            chat_id, photo, caption=summary, reply_markup=reply_markup, disable_notification=True
+        ))
+    else:
+        if photo and "photo" not in progress:
+            short_caption = "📄 New Job Application\n⬇️ Full details below"
+            sent = await timer.call("sendPhoto", "photo", bot.send_photo(
+                chat_id, photo, caption=short_caption, disable_notification=True
+            ))
+            await on_step("photo", sent.message_id)
+        header = await timer.call("sendMessage", "summary", bot.send_message(
+            chat_id, summary, reply_markup=reply_markup, disable_notification=True
+        ))
+    await on_step("header", header.message_id)
+    return header.message_id
+
+
+async def _ignore_step(step: str, message_id: int) -> None:
+    pass
+
+
+async def submit_application(
+    bot: Bot,
+    chat_id: int,
+    draft: ApplicationDraft,
+    summary: str,
+    reply_markup: InlineKeyboardMarkup,
+    progress: Optional[Dict[str, int]] = None,
+    on_step: Optional[StepCallback] = None,
+) -> SubmissionReport:
+    """
+    Send an application to the HR group.
+    Raises if the summary could not be delivered; failed attachments are
+    only logged and listed in report.failed.
+
+    :param progress: steps finished by an earlier attempt (step -> message id), skipped
+    :param on_step: awaited after every finished step
+    """
+    progress = progress or {}
+    on_step = on_step or _ignore_step
+    report = SubmissionReport()
+    timer = _Timer(report)
+    started = time.perf_counter()
+    try:
+        header_id = await _send_header(
+            bot, chat_id, draft.photo, summary, reply_markup, timer, progress, on_step
+        )
+        report.header_message_id = header_id
+
+        reply = ReplyParameters(message_id=header_id, allow_sending_without_reply=True)
+        pending = [
+            (f"attachment:{index}", attachment)
+            for index, attachment in enumerate(application_attachments(draft))
+            if f"attachment:{index}" not in progress
+        ]
+
+        for position, (step, attachment) in enumerate(pending):
+            try:
+                sent = await _send_single(bot, chat_id, attachment, reply, timer)
+                await on_step(step, sent.message_id)
+            except TelegramRetryAfter as e:
+                # Later calls would hit the same limit: leave them for the retry
+                report.retry_after = max(report.retry_after or 0, e.retry_after)
+                report.failed.extend(rest.caption for _, rest in pending[position:])
+                logger.error(f"Flood control while sending {attachment.kind} to HR group: retry in {e.retry_after}s")
+                break
+            except Exception as e:
+                report.failed.append(attachment.caption)
+                logger.error(f"Failed to send {attachment.kind} to HR group: {type(e).__name__}: {e}")
+    finally:
+        report.total_seconds = time.perf_counter() - started
+        logger.info(f"HR submission for user {draft.user_id}: {report.format()}")
+    return report
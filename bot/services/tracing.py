@@ -0,0 +1,233 @@
+"""
+Per-update tracing with tail-based sampling.
+
+A trace is started for every incoming update (UpdateTracingMiddleware) and
+kept in a context variable, so everything awaited while handling the update
+(the handler, FSM access, outgoing Bot API calls made through the session)
+can attach spans to it with `span()`:
+
+    with span("dedup.check", position=draft.position):
+        ...
+
+Spans are only collected in memory while the update is handled. When the
+update finishes the whole trace is judged at once (tail sampling): it is
+written to the JSON-lines file if it failed (an exception in any span), was
+slower than `slow_ms`, or was picked by `sample_ratio`; otherwise it is
+dropped. One line per trace:
+
+    {"trace_id": ..., "span_id": ..., "name": "update", "start": "...", "duration_ms": 1234.5,
+     "error": null, "attributes": {...}, "spans": [{"span_id", "parent_id",
+     "name", "offset_ms", "duration_ms", "attributes", "error"}, ...]}
+
+Log lines written during a traced update carry " [trace=<id>]" (TraceLogFilter).
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Trace:
+    """Spans of one update, collected until the update finished"""
+
+    __slots__ = ("trace_id", "started_at", "spans", "failed", "dropped_spans", "max_spans")
+
+    def __init__(self, max_spans: int):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.started_at = time.time()
+        self.spans: List["Span"] = []
+        self.failed = False
+        self.dropped_spans = 0
+        self.max_spans = max_spans
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+        self.trace.failed = True
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one; does nothing (yields None) outside a traced update"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    trace = parent.trace
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped_spans += 1
+        yield None
+        return
+    child = Span(trace, name, parent, attributes)
+    trace.spans.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        if not isinstance(e, asyncio.CancelledError):
+            child.fail(e)
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+class TraceLogFilter(logging.Filter):
+    """Adds `trace` (" [trace=<id>]" or "") to log records: use %(trace)s in the format"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        record.trace = f" [trace={trace_id}]" if trace_id else ""
+        return True
+
+
+class Tracer:
+    """Starts a trace per update and exports the slow or failed ones"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        slow_ms: float = 1000,
+        sample_ratio: float = 0.0,
+        max_spans: int = 256,
+        max_file_bytes: int = 50 * 1024 * 1024,
+    ):
+        """
+        :param path: JSON-lines file kept traces are appended to
+        :param slow_ms: traces at least this long are kept
+        :param sample_ratio: fraction of fast, successful traces kept anyway (0..1)
+        :param max_spans: spans recorded per trace; more are counted, not kept
+        :param max_file_bytes: the file is rotated to <name>.1 when it grows past this
+        """
+        self.path = Path(path)
+        self.slow_seconds = slow_ms / 1000
+        self.sample_ratio = sample_ratio
+        self.max_spans = max_spans
+        self.max_file_bytes = max_file_bytes
+
+        # Counters (exported as metrics)
+        self.traces = 0
+        self.kept = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracing")
+
+    # ---------- traces ----------
+
+    def start(self, name: str, **attributes: Any) -> Tuple[Span, Token]:
+        """Root span of a new trace, made current until finish()"""
+        root = Span(Trace(self.max_spans), name, None, attributes)
+        root.trace.spans.append(root)
+        return root, _current_span.set(root)
+
+    def finish(self, root: Span, token: Token, error: Optional[BaseException] = None) -> bool:
+        """End the trace and keep it if it is slow, failed or sampled. Returns whether it was kept"""
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            root.fail(error)
+        self.traces += 1
+        trace = root.trace
+        keep = (
+            trace.failed
+            or root.duration >= self.slow_seconds
+            or (self.sample_ratio > 0 and random.random() < self.sample_ratio)
+        )
+        if not keep:
+            return False
+        self.kept += 1
+        line = json.dumps(self._to_dict(root), ensure_ascii=False, default=str)
+        future = self._executor.submit(self._append, line)
+        future.add_done_callback(self._log_write_error)
+        return True
+
+    @staticmethod
+    def _to_dict(root: Span) -> Dict[str, Any]:
+        trace = root.trace
+        return {
+            "trace_id": trace.trace_id,
+            "span_id": root.span_id,
+            "name": root.name,
+            "start": datetime.fromtimestamp(trace.started_at).isoformat(timespec="milliseconds"),
+            "duration_ms": round(root.duration * 1000, 3),
+            "error": root.error,
+            "failed": trace.failed,
+            "attributes": root.attributes,
+            "dropped_spans": trace.dropped_spans,
+            "spans": [
+                {
+                    "span_id": item.span_id,
+                    "parent_id": item.parent_id,
+                    "name": item.name,
+                    "offset_ms": round((item.start - root.start) * 1000, 3),
+                    "duration_ms": round(item.duration * 1000, 3),
+                    "attributes": item.attributes,
+                    "error": item.error,
+                }
+                for item in trace.spans if item is not root
+            ],
+        }
+
+    # ---------- file (tracing thread) ----------
+
+    def _append(self, line: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size > self.max_file_bytes:
+            self.path.replace(self.path.with_name(self.path.name + ".1"))
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    @staticmethod
+    def _log_write_error(future) -> None:
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to write trace: {type(error).__name__}: {error}")
+
+    async def flush(self) -> None:
+        """Wait until kept traces are written"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, lambda: None)
+
+    async def close(self) -> None:
+        """Write pending traces (dispatcher shutdown hook)"""
+        await self.flush()
@@ -0,0 +1 @@
+# Storage package (FSM storage backends, applications database)
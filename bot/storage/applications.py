@@ -0,0 +1,491 @@
+"""
+Local database of submitted applications (SQLite).
+
+Every confirmed application is stored here in addition to being posted to
+the HR group, so HR can search, count and export applications later.
+
+Schema (normalized): catalog values live in lookup tables and applications
+reference them by id; Telegram file_ids are kept in application_files.
+
+    branches(id, key, name)             departments(id, key, name)
+    positions(id, department_id, name)  education_levels(id, name)
+    language_levels(id, name)
+    applications(id, user_id, submission_date, branch_id, position_id, ...)
+    application_files(application_id, kind, file_id, media_type)
+
+`submission_date` is stored as sortable text ("YYYY-MM-DD HH:MM"), so
+"position X at branch Y this month" is a range scan of the
+(position_id, submission_date) index. All SQLite calls run on one dedicated
+thread; the async API never blocks the event loop.
+
+Free text of the HR summary (names, address, last workplace, "how did you
+hear about us", position and branch) is indexed in the FTS5 table
+applications_fts (rowid = application id), updated in the same transaction
+as every insert.
+"""
+import asyncio
+import logging
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from bot.models.application_draft import ApplicationDraft
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS departments (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY,
+    department_id INTEGER NOT NULL REFERENCES departments(id),
+    name TEXT NOT NULL,
+    UNIQUE (department_id, name)
+);
+CREATE TABLE IF NOT EXISTS education_levels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS language_levels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS applications (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    submission_date TEXT NOT NULL,
+    user_language TEXT,
+    branch_id INTEGER REFERENCES branches(id),
+    position_id INTEGER REFERENCES positions(id),
+    passport_name TEXT,
+    passport_surname TEXT,
+    father_name TEXT,
+    date_of_birth TEXT,
+    address TEXT,
+    phone TEXT,
+    is_student TEXT,
+    education_id INTEGER REFERENCES education_levels(id),
+    gender TEXT,
+    russian_level_id INTEGER REFERENCES language_levels(id),
+    english_level_id INTEGER REFERENCES language_levels(id),
+    work_experience TEXT,
+    last_workplace TEXT,
+    hear_about TEXT
+);
+CREATE TABLE IF NOT EXISTS application_files (
+    application_id INTEGER NOT NULL REFERENCES applications(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    media_type TEXT,
+    PRIMARY KEY (application_id, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_applications_position_date ON applications (position_id, submission_date);
+CREATE INDEX IF NOT EXISTS idx_applications_branch_date ON applications (branch_id, submission_date);
+CREATE INDEX IF NOT EXISTS idx_applications_phone ON applications (phone);
+CREATE INDEX IF NOT EXISTS idx_applications_user ON applications (user_id);
+CREATE INDEX IF NOT EXISTS idx_applications_date ON applications (submission_date);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5(
+    name, address, last_workplace, hear_about, position, branch,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# Fills applications_fts for rows stored before the index existed
+_FTS_BACKFILL = """
+INSERT INTO applications_fts (rowid, name, address, last_workplace, hear_about, position, branch)
+SELECT a.id,
+       trim(coalesce(a.passport_name, '') || ' ' || coalesce(a.passport_surname, '') || ' ' || coalesce(a.father_name, '')),
+       a.address, a.last_workplace, a.hear_about, p.name, b.name
+FROM applications a
+LEFT JOIN positions p ON p.id = a.position_id
+LEFT JOIN branches b ON b.id = a.branch_id
+"""
+
+# bm25 column weights: a name match matters most, the branch least
+_FTS_RANK = "bm25(applications_fts, 10.0, 3.0, 4.0, 1.0, 2.0, 1.0)"
+
+_INSERT_APPLICATION = """
+INSERT INTO applications (
+    user_id, username, submission_date, user_language, branch_id, position_id,
+    passport_name, passport_surname, father_name, date_of_birth, address, phone,
+    is_student, education_id, gender, russian_level_id, english_level_id,
+    work_experience, last_workplace, hear_about
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Columns returned by queries; names match ApplicationDraft.to_dict()
+_SELECT = """
+SELECT a.id, a.user_id, a.username, a.submission_date, a.user_language,
+       b.key AS branch_key, b.name AS branch,
+       d.key AS department_key, d.name AS department, p.name AS position,
+       a.passport_name, a.passport_surname, a.father_name, a.date_of_birth,
+       a.address, a.phone, a.is_student, e.name AS education, a.gender,
+       rl.name AS russian_level, el.name AS english_level,
+       a.work_experience, a.last_workplace, a.hear_about
+FROM applications a
+LEFT JOIN branches b ON b.id = a.branch_id
+LEFT JOIN positions p ON p.id = a.position_id
+LEFT JOIN departments d ON d.id = p.department_id
+LEFT JOIN education_levels e ON e.id = a.education_id
+LEFT JOIN language_levels rl ON rl.id = a.russian_level_id
+LEFT JOIN language_levels el ON el.id = a.english_level_id
+"""
+
+# Draft attributes kept in application_files
+FILE_KINDS = ("photo", "russian_voice", "english_media", "ielts_certificate")
+
+_DRAFT_DATE_FORMAT = "%d.%m.%Y %H:%M"
+_DB_DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Digits (and a leading +) only, so '+998 90 123-45-67' matches '+998901234567'"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    return f"+{digits}" if phone.strip().startswith("+") else digits
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text typed by HR into an FTS5 query: every word must match,
+    as a prefix ("ali vali" -> '"ali"* "vali"*'). None if there are no words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words[:16])
+
+
+def _db_date(value: Union[datetime, str, None]) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(_DB_DATE_FORMAT)
+    return value
+
+
+def _submission_date(draft: ApplicationDraft) -> str:
+    if draft.submission_date:
+        try:
+            return datetime.strptime(draft.submission_date, _DRAFT_DATE_FORMAT).strftime(_DB_DATE_FORMAT)
+        except ValueError:
+            logger.warning(f"Unexpected submission date {draft.submission_date!r}, using current time")
+    return datetime.now().strftime(_DB_DATE_FORMAT)
+
+
+class ApplicationStore:
+    """Submitted applications in SQLite with an async query API"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        :param path: SQLite database file
+        """
+        self.path = Path(path)
+        # Single DB thread: sqlite3 connection is only ever touched from it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="applications-db")
+        self._connection: Optional[sqlite3.Connection] = None
+        # (table, natural key) -> id of lookup rows, filled lazily on the DB thread
+        self._lookup_ids: Dict[Tuple[str, Tuple[Any, ...]], int] = {}
+
+    # ---------- DB thread ----------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(_SCHEMA)
+            has_fts = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'applications_fts'"
+            ).fetchone()
+            if not has_fts:
+                connection.execute(_FTS_SCHEMA)
+                connection.execute(_FTS_BACKFILL)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._lookup_ids.clear()
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _lookup(self, table: str, columns: Tuple[str, ...], values: Tuple[Any, ...],
+                extra: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Id of a lookup row identified by `columns` = `values`, inserted on first use"""
+        if any(value is None for value in values):
+            return None
+        cache_key = (table, values)
+        row_id = self._lookup_ids.get(cache_key)
+        if row_id is None:
+            connection = self._db()
+            where = " AND ".join(f"{column} = ?" for column in columns)
+            row = connection.execute(f"SELECT id FROM {table} WHERE {where}", values).fetchone()
+            if row is None:
+                names = columns + tuple(extra or {})
+                params = values + tuple((extra or {}).values())
+                placeholders = ", ".join("?" for _ in names)
+                row_id = connection.execute(
+                    f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})", params
+                ).lastrowid
+            else:
+                row_id = row[0]
+            self._lookup_ids[cache_key] = row_id
+        return row_id
+
+    def _insert(self, drafts: List[ApplicationDraft]) -> List[int]:
+        connection = self._db()
+        ids = []
+        try:
+            with connection:  # one transaction for the whole batch
+                for draft in drafts:
+                    ids.append(self._insert_one(connection, draft))
+        except Exception:
+            # Lookup ids created inside the rolled back transaction are gone
+            self._lookup_ids.clear()
+            raise
+        return ids
+
+    def _insert_one(self, connection: sqlite3.Connection, draft: ApplicationDraft) -> int:
+        branch_id = self._lookup("branches", ("key",), (draft.branch_key,), {"name": draft.branch})
+        department_id = self._lookup(
+            "departments", ("key",), (draft.department_key,), {"name": draft.department}
+        )
+        position_id = self._lookup("positions", ("department_id", "name"), (department_id, draft.position))
+        application_id = connection.execute(_INSERT_APPLICATION, (
+            draft.user_id,
+            draft.username,
+            _submission_date(draft),
+            draft.user_language,
+            branch_id,
+            position_id,
+            draft.passport_name,
+            draft.passport_surname,
+            draft.father_name,
+            draft.date_of_birth,
+            draft.address,
+            normalize_phone(draft.phone),
+            draft.is_student,
+            self._lookup("education_levels", ("name",), (draft.education,)),
+            draft.gender,
+            self._lookup("language_levels", ("name",), (draft.russian_level,)),
+            self._lookup("language_levels", ("name",), (draft.english_level,)),
+            draft.work_experience,
+            draft.last_workplace,
+            draft.hear_about,
+        )).lastrowid
+        files = [
+            (application_id, kind, getattr(draft, kind),
+             draft.english_media_type if kind == "english_media" else None)
+            for kind in FILE_KINDS if getattr(draft, kind)
+        ]
+        if files:
+            connection.executemany(
+                "INSERT INTO application_files (application_id, kind, file_id, media_type) VALUES (?, ?, ?, ?)",
+                files,
+            )
+        name = " ".join(part for part in (draft.passport_name, draft.passport_surname, draft.father_name) if part)
+        connection.execute(
+            "INSERT INTO applications_fts (rowid, name, address, last_workplace, hear_about, position, branch) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (application_id, name, draft.address, draft.last_workplace, draft.hear_about,
+             draft.position, draft.branch),
+        )
+        return application_id
+
+    def _ids(self, sql: str, params: Tuple[Any, ...], connection: Optional[sqlite3.Connection] = None) -> List[int]:
+        return [row[0] for row in (connection or self._db()).execute(sql, params)]
+
+    def _where(
+        self,
+        position: Optional[str] = None,
+        branch: Optional[str] = None,
+        department: Optional[str] = None,
+        since: Union[datetime, str, None] = None,
+        until: Union[datetime, str, None] = None,
+        user_id: Optional[int] = None,
+        phone: Optional[str] = None,
+        connection: Optional[sqlite3.Connection] = None,
+    ) -> Tuple[str, List[Any]]:
+        """WHERE clause for the query API; branch/department accept key or display name"""
+        conditions, params = [], []
+        # Catalog names are resolved to ids first: "column = ?" lets SQLite read the
+        # (column, submission_date) index in date order instead of sorting the matches
+        id_filters = []
+        if position is not None:
+            id_filters.append(("a.position_id", self._ids(
+                "SELECT id FROM positions WHERE name = ?", (position,), connection
+            )))
+        if department is not None:
+            id_filters.append(("a.position_id", self._ids(
+                "SELECT p.id FROM positions p JOIN departments d ON d.id = p.department_id "
+                "WHERE d.key = ? OR d.name = ?", (department, department), connection
+            )))
+        if branch is not None:
+            id_filters.append(("a.branch_id", self._ids(
+                "SELECT id FROM branches WHERE key = ? OR name = ?", (branch, branch), connection
+            )))
+        for column, ids in id_filters:
+            if not ids:
+                return "WHERE 0", []
+            if len(ids) == 1:
+                conditions.append(f"{column} = ?")
+            else:
+                conditions.append(f"{column} IN ({', '.join('?' for _ in ids)})")
+            params += ids
+        if since is not None:
+            conditions.append("a.submission_date >= ?")
+            params.append(_db_date(since))
+        if until is not None:
+            conditions.append("a.submission_date < ?")
+            params.append(_db_date(until))
+        if user_id is not None:
+            conditions.append("a.user_id = ?")
+            params.append(user_id)
+        if phone is not None:
+            conditions.append("a.phone = ?")
+            params.append(normalize_phone(phone))
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def _find(self, filters: Dict[str, Any], limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+        where, params = self._where(**filters)
+        return self._select(where, params, limit, offset)
+
+    def _select(
+        self, where: str, params: List[Any], limit: Optional[int], offset: int,
+        connection: Optional[sqlite3.Connection] = None,
+        order: str = "a.submission_date DESC, a.id DESC",
+    ) -> List[Dict[str, Any]]:
+        connection = connection or self._db()
+        sql = f"{_SELECT} {where} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+        rows = [dict(row) for row in connection.execute(sql, params)]
+        if not rows:
+            return rows
+        by_id = {row["id"]: row for row in rows}
+        for row in rows:
+            row.update({kind: None for kind in FILE_KINDS}, english_media_type=None)
+        for start in range(0, len(rows), 500):  # SQLite limits the number of parameters
+            chunk = list(by_id)[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for application_id, kind, file_id, media_type in connection.execute(
+                "SELECT application_id, kind, file_id, media_type FROM application_files "
+                f"WHERE application_id IN ({placeholders})", chunk
+            ):
+                by_id[application_id][kind] = file_id
+                if media_type:
+                    by_id[application_id]["english_media_type"] = media_type
+        return rows
+
+    def _search(self, query: str, limit: int, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        connection = self._db()
+        total = connection.execute(
+            "SELECT COUNT(*) FROM applications_fts WHERE applications_fts MATCH ?", (query,)
+        ).fetchone()[0]
+        ids = self._ids(
+            f"SELECT rowid FROM applications_fts WHERE applications_fts MATCH ? ORDER BY {_FTS_RANK} LIMIT ? OFFSET ?",
+            (query, limit, offset),
+        )
+        if not ids:
+            return total, []
+        rows = self._select(f"WHERE a.id IN ({', '.join('?' for _ in ids)})", ids, None, 0)
+        position = {application_id: index for index, application_id in enumerate(ids)}
+        rows.sort(key=lambda row: position[row["id"]])
+        return total, rows
+
+    def _count(self, filters: Dict[str, Any]) -> int:
+        where, params = self._where(**filters)
+        return self._db().execute(f"SELECT COUNT(*) FROM applications a {where}", params).fetchone()[0]
+
+    # ---------- API ----------
+
+    async def add(self, draft: ApplicationDraft) -> int:
+        """Store a confirmed application, returns its id"""
+        return (await self.add_many([draft]))[0]
+
+    async def add_many(self, drafts: Iterable[ApplicationDraft]) -> List[int]:
+        """Store several applications in one transaction"""
+        return await self._run(self._insert, list(drafts))
+
+    async def find(self, limit: Optional[int] = 100, offset: int = 0, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        Applications matching all given filters, newest first.
+
+        Filters: position, branch, department, since, until (datetime or
+        "YYYY-MM-DD[ HH:MM]", until is exclusive), user_id, phone.
+        Rows are dicts with the keys of ApplicationDraft.to_dict() plus `id`.
+        """
+        return await self._run(self._find, filters, limit, offset)
+
+    async def count(self, **filters: Any) -> int:
+        """Number of applications matching the filters of find()"""
+        return await self._run(self._count, filters)
+
+    async def search(self, text: str, limit: int = 10, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Full-text search over the summary fields, best matches first.
+        Returns (number of matches, rows of the requested page).
+        """
+        query = fts_query(text)
+        if query is None:
+            return 0, []
+        return await self._run(self._search, query, limit, offset)
+
+    async def get(self, application_id: int) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._select, "WHERE a.id = ?", [application_id], None, 0)
+        return rows[0] if rows else None
+
+    def stream(self, batch_size: int = 2000, **filters: Any) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Blocking generator of applications matching the filters of find(), oldest
+        first (by id, i.e. in order of submission), in lists of up to `batch_size`
+        rows. It reads through its own connection and keyset pagination on the
+        rowid, so memory stays at one batch whatever the result size and the table
+        is read sequentially. Run it in a worker thread, not on the event loop.
+        """
+        self._executor.submit(self._db).result()  # schema exists before the read-only open
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        try:
+            where, params = self._where(connection=connection, **filters)
+            last_id = 0
+            while True:
+                batch_where = (f"{where} AND " if where else "WHERE ") + "a.id > ?"
+                rows = self._select(
+                    batch_where, params + [last_id], batch_size, 0, connection=connection, order="a.id",
+                )
+                if not rows:
+                    return
+                yield rows
+                last_id = rows[-1]["id"]
+        finally:
+            connection.close()
+
+    async def close(self) -> None:
+        """Close the connection (dispatcher shutdown hook); it is reopened on next use"""
+        await self._run(self._close_connection)
@@ -0,0 +1,336 @@
+"""
+In-memory FSM storage that evicts idle conversations to disk.
+
+Most applicants who stop halfway (e.g. at waiting_for_english_media or
+waiting_for_photo) never come back, yet MemoryStorage keeps their data
+forever. This storage keeps hot conversations in RAM and spills a record
+to an on-disk SQLite file when either
+
+* it has been idle longer than the TTL of its current state, or
+* the estimated size of all records in RAM exceeds `memory_budget`
+  (least recently used records go first).
+
+A spilled record is loaded back (rehydrated) transparently on the next
+access of that user; the spill file is looked up by key, so nothing about
+spilled records is kept in RAM. On close() everything still in RAM is
+spilled too, so drafts also survive a normal restart. Spilled records older
+than `max_spill_age` (applicants who never came back) are deleted at open
+and on every sweep, so the spill file does not grow over a season.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot.storage.sqlite_storage import build_storage_key
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data BLOB,
+    spilled_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS fsm_spilled_at ON fsm (spilled_at)"
+
+_UPSERT = (
+    "INSERT INTO fsm (key, state, data, spilled_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET "
+    "state = excluded.state, data = excluded.data, spilled_at = excluded.spilled_at"
+)
+
+# Rough per-record overhead in RAM (key, entry object, dict) on top of serialized data
+_RECORD_OVERHEAD = 400
+
+
+class _Entry:
+    """FSM state and data of one storage key held in RAM"""
+
+    __slots__ = ("state", "data", "size", "last_access")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], size: int):
+        self.state = state
+        self.data = data
+        self.size = size
+        self.last_access = time.monotonic()
+
+
+class EvictingMemoryStorage(BaseStorage):
+    """aiogram FSM storage with idle TTL per state, memory budget and disk spill"""
+
+    def __init__(
+        self,
+        spill_path: Union[str, Path],
+        default_ttl: float = 1800,
+        state_ttls: Optional[Dict[str, float]] = None,
+        memory_budget: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60,
+        max_spill_age: Optional[float] = 30 * 24 * 3600,
+        data_dumps: Optional[Callable[[Dict[str, Any]], bytes]] = None,
+        data_loads: Optional[Callable[[bytes], Dict[str, Any]]] = None,
+    ):
+        """
+        :param spill_path: SQLite file evicted records are written to
+        :param default_ttl: seconds of inactivity before a record is spilled
+        :param state_ttls: per-state overrides, e.g. {"ApplicationStates:waiting_for_photo": 600};
+            the part after ":" alone ("waiting_for_photo") is accepted as well
+        :param memory_budget: max estimated bytes of records kept in RAM
+        :param sweep_interval: how often idle records are looked for, in seconds
+        :param max_spill_age: seconds after which a spilled record is deleted (None keeps it forever)
+        :param data_dumps: serializer for FSM data (bytes)
+        :param data_loads: deserializer for FSM data
+        """
+        if data_dumps is None or data_loads is None:
+            from bot.models.application_draft import dumps_state_data, loads_state_data
+            data_dumps = data_dumps or dumps_state_data
+            data_loads = data_loads or loads_state_data
+
+        self.spill_path = Path(spill_path)
+        self.default_ttl = default_ttl
+        self.state_ttls = dict(state_ttls or {})
+        self.memory_budget = memory_budget
+        self.sweep_interval = sweep_interval
+        self.max_spill_age = max_spill_age
+        self.data_dumps = data_dumps
+        self.data_loads = data_loads
+
+        # Counters (exported as metrics)
+        self.evictions = 0
+        self.rehydrations = 0
+        self.purged = 0
+        self.memory_bytes = 0
+
+        self._entries: "OrderedDict[StorageKey, _Entry]" = OrderedDict()
+        self._loading: Dict[str, "asyncio.Future[Optional[Tuple[Optional[str], bytes]]]"] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-spill")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        self._executor.submit(self._open).result()
+        if self.purged:
+            logger.info(f"Deleted {self.purged} FSM records spilled more than {max_spill_age:.0f}s ago")
+
+    # ---------- disk thread ----------
+
+    def _open(self) -> None:
+        connection = sqlite3.connect(str(self.spill_path), timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        connection.execute(_INDEX)
+        connection.commit()
+        self._connection = connection
+        self.purged += self._purge_spill(time.time())
+
+    def _write_spill(self, rows: List[Tuple[str, Optional[str], bytes, float]]) -> None:
+        with self._connection:
+            self._connection.executemany(_UPSERT, rows)
+
+    def _take_spill(self, db_key: str) -> Optional[Tuple[Optional[str], bytes]]:
+        row = self._connection.execute(
+            "SELECT state, data FROM fsm WHERE key = ?", (db_key,)
+        ).fetchone()
+        if row is not None:
+            with self._connection:
+                self._connection.execute("DELETE FROM fsm WHERE key = ?", (db_key,))
+        return row
+
+    def _purge_spill(self, now: float) -> int:
+        if self.max_spill_age is None:
+            return 0
+        with self._connection:
+            return self._connection.execute(
+                "DELETE FROM fsm WHERE spilled_at < ?", (now - self.max_spill_age,)
+            ).rowcount
+
+    def _count_spilled_states(self) -> List[Tuple[str, int]]:
+        return self._connection.execute(
+            "SELECT state, COUNT(*) FROM fsm WHERE state IS NOT NULL GROUP BY state"
+        ).fetchall()
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # ---------- eviction ----------
+
+    def ttl_for(self, state: Optional[str]) -> float:
+        """Idle TTL for a record in `state`"""
+        if state is not None:
+            if state in self.state_ttls:
+                return self.state_ttls[state]
+            short_name = state.rpartition(":")[2]
+            if short_name in self.state_ttls:
+                return self.state_ttls[short_name]
+        return self.default_ttl
+
+    def _pop_entries(self, keys: List[StorageKey]) -> List[Tuple[str, Optional[str], bytes, float]]:
+        rows = []
+        now = time.time()
+        for key in keys:
+            entry = self._entries.pop(key)
+            self.memory_bytes -= entry.size
+            rows.append((build_storage_key(key), entry.state, self.data_dumps(entry.data), now))
+        return rows
+
+    async def _spill(self, keys: List[StorageKey]) -> None:
+        if not keys:
+            return
+        rows = self._pop_entries(keys)
+        await self._run(self._write_spill, rows)
+        self.evictions += len(rows)
+
+    def _over_budget_keys(self) -> List[StorageKey]:
+        keys = []
+        excess = self.memory_bytes - self.memory_budget
+        for key, entry in self._entries.items():  # least recently used first
+            if excess <= 0:
+                break
+            keys.append(key)
+            excess -= entry.size
+        return keys
+
+    def _expired_keys(self, now: float) -> List[StorageKey]:
+        shortest_ttl = min([self.default_ttl, *self.state_ttls.values()])
+        keys = []
+        for key, entry in self._entries.items():  # ordered by last access
+            idle = now - entry.last_access
+            if idle < shortest_ttl:
+                break  # every later entry was used even more recently
+            if idle >= self.ttl_for(entry.state):
+                keys.append(key)
+        return keys
+
+    async def sweep(self) -> int:
+        """
+        Spill idle and over-budget records and delete spilled records older
+        than max_spill_age. Returns number of records spilled
+        """
+        keys = self._expired_keys(time.monotonic())
+        await self._spill(keys)
+        over_budget = self._over_budget_keys()
+        await self._spill(over_budget)
+        purged = await self._run(self._purge_spill, time.time())
+        if purged:
+            self.purged += purged
+            logger.info(f"Deleted {purged} FSM records spilled more than {self.max_spill_age:.0f}s ago")
+        return len(keys) + len(over_budget)
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                spilled = await self.sweep()
+                if spilled:
+                    logger.info(f"Evicted {spilled} idle FSM records to disk ({len(self._entries)} in memory)")
+            except Exception as e:
+                logger.error(f"Failed to evict FSM records: {type(e).__name__}: {e}")
+
+    # ---------- records ----------
+
+    async def _get_entry(self, key: StorageKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            db_key = build_storage_key(key)
+            loading = self._loading.get(db_key)
+            if loading is None:
+                # Concurrent updates of the same user wait for one disk read
+                loading = self._loading[db_key] = asyncio.ensure_future(self._run(self._take_spill, db_key))
+                loading.add_done_callback(lambda _: self._loading.pop(db_key, None))
+            row = await asyncio.shield(loading)
+            # Another coroutine may have written this key while we were reading
+            entry = self._entries.get(key)
+            if entry is None and row is not None:
+                state, raw_data = row
+                self.rehydrations += 1
+                entry = self._put(key, state, self.data_loads(raw_data) if raw_data else {})
+                await self._enforce_budget()
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> Optional[_Entry]:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= old.size
+        if state is None and not data:
+            return None  # nothing to keep, same as a fresh user
+        size = _RECORD_OVERHEAD + len(self.data_dumps(data)) if data else _RECORD_OVERHEAD
+        entry = _Entry(state, data, size)
+        self._entries[key] = entry
+        self.memory_bytes += size
+        return entry
+
+    async def _store(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        self._put(key, state, data)
+        self._ensure_sweeper()
+        await self._enforce_budget()
+
+    async def _enforce_budget(self) -> None:
+        if self.memory_bytes > self.memory_budget:
+            await self._spill(self._over_budget_keys())
+
+    # ---------- BaseStorage API ----------
+
+    async def state_counts(self) -> Dict[str, int]:
+        """Number of records per FSM state, in memory and spilled"""
+        counts = dict(await self._run(self._count_spilled_states))
+        for entry in self._entries.values():
+            if entry.state is not None:
+                counts[entry.state] = counts.get(entry.state, 0) + 1
+        return counts
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._get_entry(key)
+        new_state = state.state if isinstance(state, State) else state
+        await self._store(key, new_state, entry.data if entry else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._get_entry(key)
+        return entry.state if entry else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._get_entry(key)
+        await self._store(key, entry.state if entry else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._get_entry(key)
+        return entry.data.copy() if entry else {}
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        # Not counted as evictions: these are picked up again after restart
+        rows = self._pop_entries(list(self._entries))
+        if rows:
+            await self._run(self._write_spill, rows)
+        await self._run(self._close_connection)
+        self._executor.shutdown(wait=True)
+        logger.info(
+            f"Evicting FSM storage closed ({self.evictions} evictions, {self.rehydrations} rehydrations)"
+        )
@@ -0,0 +1,271 @@
+"""
+Persistent FSM storage on SQLite with write-behind batching.
+
+Reads are served from an in-memory LRU of hot records. Writes only mark the
+record dirty; dirty records are flushed to SQLite (WAL mode) in a single
+transaction every `flush_interval` seconds or as soon as `flush_threshold`
+records are dirty. All disk I/O runs on one dedicated thread so the event
+loop never blocks on SQLite.
+
+Trade-off: a hard crash can lose at most the last `flush_interval` seconds
+of FSM changes. A normal shutdown (dispatcher shutdown -> close()) flushes
+everything.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data BLOB
+) WITHOUT ROWID
+"""
+
+_UPSERT = (
+    "INSERT INTO fsm (key, state, data) VALUES (?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data"
+)
+
+
+class _Record:
+    """Cached FSM state and data of one storage key"""
+
+    __slots__ = ("state", "data")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data if data is not None else {}
+
+
+def build_storage_key(key: StorageKey) -> str:
+    """Flatten StorageKey into the primary key used in the fsm table"""
+    return ":".join((
+        str(key.bot_id),
+        str(key.chat_id),
+        str(key.user_id),
+        str(key.thread_id or ""),
+        key.business_connection_id or "",
+        key.destiny,
+    ))
+
+
+def parse_storage_key(value: str) -> StorageKey:
+    """Inverse of build_storage_key"""
+    bot_id, chat_id, user_id, thread_id, business_connection_id, destiny = value.split(":", 5)
+    return StorageKey(
+        bot_id=int(bot_id),
+        chat_id=int(chat_id),
+        user_id=int(user_id),
+        thread_id=int(thread_id) if thread_id else None,
+        business_connection_id=business_connection_id or None,
+        destiny=destiny,
+    )
+
+
+class SQLiteStorage(BaseStorage):
+    """aiogram FSM storage persisted in SQLite"""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        flush_interval: float = 0.5,
+        flush_threshold: int = 500,
+        cache_size: int = 10_000,
+        data_dumps: Callable[[Dict[str, Any]], Union[str, bytes]] = json.dumps,
+        data_loads: Callable[[Union[str, bytes]], Dict[str, Any]] = json.loads,
+    ):
+        """
+        :param path: SQLite database file
+        :param flush_interval: max seconds a change stays only in memory
+        :param flush_threshold: flush immediately when this many records are dirty
+        :param cache_size: number of clean records kept in the hot LRU
+        :param data_dumps: serializer for FSM data
+        :param data_loads: deserializer for FSM data
+        """
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.cache_size = cache_size
+        self.data_dumps = data_dumps
+        self.data_loads = data_loads
+
+        # Single DB thread: sqlite3 connection is only ever touched from it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._cache: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        self._dirty: Dict[StorageKey, _Record] = {}
+        # Records being written by the running flush (one at a time, see _flush_lock)
+        self._flushing: Dict[StorageKey, _Record] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_now: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._executor.submit(self._open).result()
+
+    # ---------- DB thread ----------
+
+    def _open(self) -> None:
+        connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        connection.commit()
+        self._connection = connection
+
+    def _read(self, db_key: str) -> Optional[Tuple[Optional[str], Any]]:
+        return self._connection.execute(
+            "SELECT state, data FROM fsm WHERE key = ?", (db_key,)
+        ).fetchone()
+
+    def _write_batch(self, upserts: List[Tuple[str, Optional[str], Any]], deletes: List[Tuple[str]]) -> None:
+        with self._connection:  # one transaction per batch
+            if upserts:
+                self._connection.executemany(_UPSERT, upserts)
+            if deletes:
+                self._connection.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+
+    def _count_states(self) -> List[Tuple[str, int]]:
+        return self._connection.execute(
+            "SELECT state, COUNT(*) FROM fsm WHERE state IS NOT NULL GROUP BY state"
+        ).fetchall()
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    # ---------- cache ----------
+
+    def _remember(self, key: StorageKey, record: _Record) -> None:
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            # Dirty records are also referenced from _dirty, so nothing is lost
+            self._cache.popitem(last=False)
+
+    async def _get_record(self, key: StorageKey) -> _Record:
+        record = self._dirty.get(key) or self._flushing.get(key) or self._cache.get(key)
+        if record is not None:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            return record
+
+        row = await self._run(self._read, build_storage_key(key))
+        # Another coroutine may have written this key while we were reading
+        record = self._dirty.get(key) or self._flushing.get(key) or self._cache.get(key)
+        if record is None:
+            if row is None:
+                record = _Record()
+            else:
+                state, raw_data = row
+                record = _Record(state, self.data_loads(raw_data) if raw_data else {})
+            self._remember(key, record)
+        return record
+
+    def _mark_dirty(self, key: StorageKey, record: _Record) -> None:
+        self._remember(key, record)
+        self._dirty[key] = record
+        self._ensure_flusher()
+        if len(self._dirty) >= self.flush_threshold:
+            self._flush_now.set()
+
+    # ---------- write-behind ----------
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flush_now = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush FSM storage: {type(e).__name__}: {e}")
+
+    async def flush(self) -> int:
+        """Write all dirty records in one transaction. Returns number of records written"""
+        # Called from the flush loop, state_counts() and close(): a second flush
+        # waits for the first, which then owns self._flushing alone
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            self._flushing = batch
+            upserts = []
+            deletes = []
+            for key, record in batch.items():
+                db_key = build_storage_key(key)
+                if record.state is None and not record.data:
+                    deletes.append((db_key,))
+                else:
+                    upserts.append((db_key, record.state, self.data_dumps(record.data)))
+            try:
+                await self._run(self._write_batch, upserts, deletes)
+            except Exception:
+                # Put records back so the next flush retries them (newer writes win)
+                for key, record in batch.items():
+                    self._dirty.setdefault(key, record)
+                raise
+            finally:
+                self._flushing = {}
+            return len(batch)
+
+    async def state_counts(self) -> Dict[str, int]:
+        """Number of records per FSM state (flushes pending changes first)"""
+        await self.flush()
+        return dict(await self._run(self._count_states))
+
+    # ---------- BaseStorage API ----------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get_record(key)
+        new_state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, _Record(new_state, record.data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get_record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._get_record(key)
+        self._mark_dirty(key, _Record(record.state, data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get_record(key)).data.copy()
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher is not None:
+            self._flush_now.set()
+            try:
+                await self._flusher
+            except Exception as e:
+                logger.error(f"FSM flusher stopped with error: {e}")
+        await self.flush()
+        await self._run(self._close_connection)
+        self._executor.shutdown(wait=True)
+        logger.info("SQLite FSM storage closed")
@@ -1,36 +1,53 @@
-def format_application_summary(data: dict) -> str:
-    """Format application data into a readable summary for HR group"""
+from bot.models.application_draft import ApplicationDraft
+from bot.services.dedup import DuplicateMatch
+
+# How HR reads DuplicateMatch.matched_on
+_MATCH_LABELS = {"phone": "telefon", "user": "Telegram ID", "identity": "F.I.Sh. + tug'ilgan sana"}
+
+
+def format_application_summary(draft: ApplicationDraft) -> str:
+    """Format application draft into a readable summary for HR group"""
     # Map fields to new format
-    first_name = data.get("passport_name", "N/A")
-    last_name = data.get("passport_surname", "N/A")
-    birth_date = data.get("date_of_birth", "N/A")
-    experience = data.get("work_experience", "N/A")
-    experience_note = data.get("last_workplace", "N/A")
-    ielts_status = "Bor" if data.get("ielts_certificate") else "Yo'q"
+    first_name = draft.passport_name or "N/A"
+    last_name = draft.passport_surname or "N/A"
+    birth_date = draft.date_of_birth or "N/A"
+    experience = draft.work_experience or "N/A"
+    experience_note = draft.last_workplace or "N/A"
+    ielts_status = "Bor" if draft.ielts_certificate else "Yo'q"
 
     summary = f"""📌 YANGI ISH ARIZASI
 
-🏢 Filial: {data.get('branch', 'N/A')}
-📍 Shahar: {data.get('city', 'N/A')}
-💼 Lavozim: {data.get('position', 'N/A')}
-📅 Sana: {data.get('submission_date', 'N/A')}
+🏢 Filial: {draft.branch or 'N/A'}
+📍 Shahar: {draft.city or 'N/A'}
+💼 Lavozim: {draft.position or 'N/A'}
+📅 Sana: {draft.submission_date or 'N/A'}
 
 👤 SHAXSIY MA'LUMOT:
 • Ism: {first_name} {last_name}
 • Tug'ilgan sana: {birth_date}
-• Manzil: {data.get('address', 'N/A')}
-• Telefon: {data.get('phone', 'N/A')}
-• Ma'lumoti: {data.get('education', 'N/A')}
+• Manzil: {draft.address or 'N/A'}
+• Telefon: {draft.phone or 'N/A'}
+• Ma'lumoti: {draft.education or 'N/A'}
 
 🗣 TIL DARAJASI:
-• Rus tili: {data.get('russian_level', 'N/A')}
-• Ingliz tili: {data.get('english_level', 'N/A')}
+• Rus tili: {draft.russian_level or 'N/A'}
+• Ingliz tili: {draft.english_level or 'N/A'}
 • IELTS: {ielts_status}
 
 💼 TAJRIBA:
 • Tajriba: {experience}
 • Izoh: {experience_note}
 
-👤 Telegram: @{data.get('username', 'N/A')}
-🆔 ID: {data.get('user_id', 'N/A')}"""
+👤 Telegram: @{draft.username or 'N/A'}
+🆔 ID: {draft.user_id or 'N/A'}"""
     return summary
+
+
+
+def format_duplicate_note(match: DuplicateMatch) -> str:
+    """Warning put above the summary of a repeat application"""
+    matched_on = ", ".join(_MATCH_LABELS.get(kind, kind) for kind in match.matched_on)
+    return (
+        f"⚠️ TAKRORIY ARIZA ({match.repeats + 1}-marta)\n"
+        f"Mos keldi: {matched_on}; oldingi ariza: {match.last_seen:%d.%m.%Y %H:%M}"
+    )
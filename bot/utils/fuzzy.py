@@ -0,0 +1,146 @@
+"""
+Fuzzy matching of typed text to a fixed set of entries.
+
+Applicants often type an answer instead of pressing its button: "clara",
+"sotuv", "Клара", "akademk". FuzzyMatcher is built once from (value, text)
+pairs and matches such input in three steps:
+
+1. fold(): case, apostrophe variants, emoji and punctuation are dropped and
+   Cyrillic (Uzbek and Russian) is transliterated to Uzbek Latin, so
+   "🧳 Bo‘sh" / "bosh" / "Бош" all become "bosh";
+2. the folded text, or words of an entry, equal to the input: "sotuv" for
+   "💼 Sotuv bo'limi", "general english" for "General English Teacher";
+3. otherwise the entries sharing the most trigrams with the input are
+   compared by edit distance, allowing 1 typo for words of 4-7 letters and
+   2 for longer ones.
+
+A match is accepted only if it points to exactly one value (after the
+caller's filter): "english" fits two teacher positions and matches neither.
+Numbers are never guessed: an entry with a number ("1 year") is matched only
+by text with the same number, so "year" or "2 yil" match nothing.
+"""
+import logging
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=Hashable)
+
+# Uzbek Cyrillic (and the Russian letters it lacks) in Uzbek Latin spelling
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "ғ": "g'", "д": "d", "е": "e", "ё": "yo", "ж": "j", "з": "z",
+    "и": "i", "й": "y", "к": "k", "қ": "q", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ў": "o'", "ф": "f", "х": "x", "ҳ": "h", "ц": "s", "ч": "ch", "ш": "sh",
+    "щ": "sh", "ъ": "'", "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+_FOLD = str.maketrans(_CYRILLIC)
+
+# Shortest word compared by edit distance, and shortest word of an entry usable on its own
+MIN_FUZZY_LENGTH = 4
+MIN_WORD_LENGTH = 3
+
+
+def fold(text: str) -> str:
+    """Lowercase Latin letters and digits separated by single spaces"""
+    latin = text.casefold().translate(_FOLD)
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in latin if ch not in "'ʻʼ’‘`´").split())
+
+
+def _digits(text: str) -> str:
+    return "".join(ch for ch in text if ch.isdigit())
+
+
+def max_typos(length: int) -> int:
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if length < 8 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance of a and b, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMatcher(Generic[T]):
+    """Typed text -> one of the values it was built with (see module docstring)"""
+
+    def __init__(self, entries: Iterable[Tuple[T, str]], candidates: int = 8):
+        self.candidates = candidates
+        self._exact: Dict[str, Set[T]] = defaultdict(set)
+        self._keys: List[Tuple[str, T, str]] = []  # (folded text or word, value, digits of the whole text)
+        self._digits: Dict[T, Set[str]] = defaultdict(set)  # value -> digits of each of its texts
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)  # trigram -> indexes into _keys
+        for value, text in entries:
+            folded = fold(text)
+            if not folded:
+                continue
+            words = [word for word in folded.split() if len(word) >= MIN_WORD_LENGTH and not word.isdigit()]
+            digits = _digits(folded)
+            self._digits[value].add(digits)
+            for key in dict.fromkeys([folded, *words]):
+                self._exact[key].add(value)
+                for trigram in trigrams(key):
+                    self._trigrams[trigram].append(len(self._keys))
+                self._keys.append((key, value, digits))
+        self._exact = dict(self._exact)
+        self._digits = dict(self._digits)
+        self._trigrams = dict(self._trigrams)
+
+    @staticmethod
+    def _unique(values: Iterable[T]) -> Optional[T]:
+        values = set(values)
+        return values.pop() if len(values) == 1 else None
+
+    def match(self, text: str, accept: Callable[[T], bool] = lambda value: True) -> Optional[T]:
+        """The one accepted value `text` means, None if there is none or several"""
+        query = fold(text)
+        if not query:
+            return None
+        digits = _digits(query)
+        # "year" is not "1 year": an entry with a number needs that number typed
+        exact = [value for value in self._exact.get(query, ()) if accept(value) and digits in self._digits[value]]
+        if exact:
+            return self._unique(exact)
+        words = query.split()
+        if len(words) > 1 and all(word in self._exact for word in words):
+            # Several words of one entry: "general english" -> "General English Teacher"
+            common = set.intersection(*(self._exact[word] for word in words))
+            value = self._unique(value for value in common if accept(value) and digits in self._digits[value])
+            if value is not None:
+                return value
+        limit = max_typos(len(query))
+        if limit == 0:
+            return None
+        shared = Counter(index for trigram in trigrams(query) for index in self._trigrams.get(trigram, ()))
+        ranked = sorted((index for index in shared if accept(self._keys[index][1])), key=shared.__getitem__, reverse=True)
+        best, matches = limit + 1, []
+        for index in ranked[:self.candidates]:
+            key, value, key_digits = self._keys[index]
+            if key_digits != digits:
+                # "2 yil" is not a typo of "1 yil"
+                continue
+            key_limit = min(limit, max_typos(len(key)))
+            distance = edit_distance(query, key, key_limit)
+            if distance > key_limit:
+                continue
+            if distance < best:
+                best, matches = distance, [value]
+            elif distance == best:
+                matches.append(value)
+        return self._unique(matches) if best <= limit else None
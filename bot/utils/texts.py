@@ -1,206 +1,239 @@
-"""Text messages for the bot with multi-language support"""
-from bot.config import COMPANY_NAME, BOT_NAME
-
-# Uzbek texts
-TEXTS_UZ = {
-    "start_welcome": f"""👋 Salom!
-
-Xush kelibsiz, **{BOT_NAME}** botiga!
-
-🏢 **{COMPANY_NAME}** ga ish topish uchun ariza berish uchun quyidagi tugmalardan foydalaning.
-
-Kompaniya haqida qisqacha ma'lumot:
-{COMPANY_NAME} - bu professional ta'lim markazi bo'lib, eng yaxshi ta'lim xizmatlarini taklif etamiz.
-
-Boshlash uchun quyidagi tugmani bosing:""",
-    
-    "main_menu": "Bosh menyu",
-    
-    "about_company": f"""🏢 **{COMPANY_NAME} HAQIDA**
-
-{COMPANY_NAME} - bu professional ta'lim markazi bo'lib, eng yaxshi ta'lim xizmatlarini taklif etamiz.
-
-Bizning filiallarimiz:
-• Clara
-• Severniy
-• Business Center
-• Yangi Bozor
-
-Bizning bo'limlarimiz:
-🧠 Akademik bo'lim
-💼 Sotuv bo'limi
-📱 SMM bo'limi
-⚙️ Operational Team
-
-Bizga qo'shiling va professional jamoaning bir qismi bo'ling!""",
-    
-    "contacts": """☎️ **KONTAKTLAR**
-
-Biz bilan bog'lanish uchun:
-• Telegram: @proper_english_school
-• Telefon: +998 XX XXX XX XX
-• Email: info@properenglish.uz
-
-Ish vaqti: Dushanba - Yakshanba, 9:00 - 18:00""",
-    
-    "feedback": """💬 **FIKR-MULOHAZALAR**
-
-Sizning fikr va mulohazalaringiz biz uchun muhim!
-
-Iltimos, fikr-mulohazalaringizni yozib qoldiring:""",
-    
-    "language_change": """🌐 **TILNI O'ZGARTIRISH**
-
-Quyidagi tillardan birini tanlang:""",
-    "language_changed": "✅ Til muvaffaqiyatli o'zgartirildi!",
-    
-    "vacancy_start": """🧳 **BO'SH ISH O'RINLARI**
-
-Ish arizasini to'ldirish uchun quyidagi bosqichlarni bajarishingiz kerak:
-
-1️⃣ Filial tanlash
-2️⃣ Bo'lim tanlash
-3️⃣ Lavozim tanlash (inline tugmalar)
-4️⃣ Shaxsiy ma'lumotlarni kiritish
-5️⃣ Til bilimini ko'rsatish
-6️⃣ Ish tajribasini ko'rsatish
-7️⃣ Qo'shimcha ma'lumotlar
-8️⃣ Tasdiqlash
-
-⚠️ Eslatma: Barcha ma'lumotlarni to'liq va to'g'ri kiriting.
-
-Filialni tanlang:""",
-    
-    "select_branch": "Filialni tanlang:",
-    "select_department": "Bo'limni tanlang:",
-    "select_position": "Lavozimni tanlang (inline tugmalar):",
-    
-    "personal_info": "📝 Endi shaxsiy ma'lumotlarni kiriting (barcha maydonlar majburiy):",
-    "ask_passport_name": "1️⃣ Pasportdagi ismingizni kiriting:",
-    "ask_passport_surname": "2️⃣ Pasportdagi familiyangizni kiriting:",
-    "ask_father_name": "3️⃣ Otangizning ismini kiriting:",
-    "ask_date_of_birth": "4️⃣ Tug'ilgan sanangizni kiriting (DD.MM.YYYY formatida, masalan: 01.01.2000):",
-    "ask_address": "5️⃣ To'liq manzilingizni kiriting:",
-    "ask_phone": """6️⃣ Telefon raqamingizni kiriting:
-
-📱 Kontakt tugmasini bosing yoki raqamni qo'lda kiriting (+998XXXXXXXXX formatida):""",
-    "phone_received": "📱 Telefon raqami qabul qilindi!",
-    "phone_confirmation_question": "Telefon raqamingiz to'g'rimi?",
-    "phone_formatted_display": "📱 Telefon raqami:",
-    "ask_is_student": "7️⃣ Talabamisiz?",
-    "ask_education": "8️⃣ Ma'lumotingizni tanlang:",
-    "ask_gender": "9️⃣ Jinsingizni tanlang:",
-    
-    "ask_russian_level": "🔟 Rus tilidagi darajangizni tanlang:",
-    "ask_russian_voice": """Rus tilida o'zingizni tanishtiring (AUDIO xabar, kamida ≈10 soniya):
-
-Quyidagi mavzular haqida gapiring:
-• O'zingiz haqingizda
-• Ta'lim
-• Ish tajribasi""",
-    
-    "ask_english_level": "1️⃣1️⃣ Ingliz tilidagi darajangizni tanlang:",
-    "ask_english_media": """Ingliz tilida o'zingizni tanishtiring (AUDIO yoki VIDEO xabar):
-
-Quyidagi ma'lumotlarni kiriting:
-• Yoshingiz
-• Shift (ish vaqti)
-• Ta'lim (BA/MA + IELTS bo'lsa)
-• Tajriba
-• Murojaat qilayotgan lavozim""",
-    
-    "ask_ielts": "1️⃣2️⃣ IELTS sertifikatingizni yuklang (PDF, ixtiyoriy):",
-    "ask_work_experience": "1️⃣3️⃣ Ish tajribangizni tanlang:",
-    "ask_last_workplace": "Oxirgi ish joyingiz va ketish sababingizni yozing:",
-    "ask_photo": "1️⃣4️⃣ Rasm yuklang (selfie ruxsat etiladi):",
-    "ask_hear_about": "1️⃣5️⃣ Biz haqimizda qayerdan eshitdingiz? (Matn sifatida yozing):",
-    "ask_cv": "1️⃣6️⃣ CV yuklang (PDF):",
-    
-    "review_title": "📋 **ARIZA TO'LIQ MA'LUMOTLARI:**",
-    "confirm_question": "⚠️ Barcha ma'lumotlar to'g'rimi? Tasdiqlang:",
-    
-    "thank_you": """✅ **Arizangiz muvaffaqiyatli yuborildi!**
-
-Sizning arizangiz HR bo'limiga yuborildi. Tez orada siz bilan bog'lanamiz.
-
-Rahmat!""",
-    
-    "invalid_date": "❌ Noto'g'ri format! Iltimos, DD.MM.YYYY formatida kiriting (masalan: 01.01.2000):",
-    "invalid_phone": """❌ Noto'g'ri telefon raqami!
-
-Iltimos, quyidagi formatlardan birini kiriting:
-• +998901234567
-• 998901234567
-• 901234567
-
-Yoki 📱 Kontakt tugmasini bosing.""",
-    "invalid_yes_no": "❌ Iltimos, 'Ha' yoki 'Yo'q' tugmalaridan birini tanlang:",
-    "audio_too_short": "❌ Audio xabar juda qisqa! Iltimos, kamida ≈10 soniyalik audio yuboring:",
-    "require_audio": "❌ Iltimos, AUDIO xabar yuboring (kamida ≈10 soniya):",
-    "require_media": "❌ Iltimos, AUDIO yoki VIDEO yuboring:",
-    "require_pdf": "❌ Iltimos, PDF fayl yuboring:",
-    "require_photo": "❌ Iltimos, rasm yuboring:",
-    "require_cv": "❌ Iltimos, PDF formatida CV yuboring (majburiy):",
-}
-
-# Russian texts (for future implementation)
-TEXTS_RU = {
-    # Can be added later
-}
-
-# English texts (basic fallback - uses Uzbek if missing)
-TEXTS_EN = {
-    "language_change": "🌐 **CHANGE LANGUAGE**\n\nPlease select a language:",
-    "language_changed": "✅ Language changed successfully!",
-    "main_menu": "Main Menu",
-    "about_company": f"""🏢 **ABOUT {COMPANY_NAME}**
-
-{COMPANY_NAME} is a professional educational center offering the best educational services.
-
-Our branches:
-• Clara
-• Severniy
-• Business Center
-• Yangi Bozor
-
-Our departments:
-🧠 Academic Department
-💼 Sales Department
-📱 SMM Department
-⚙️ Operational Team
-
-Join us and become part of a professional team!""",
-    "contacts": """☎️ **CONTACTS**
-
-To contact us:
-• Telegram: @proper_english_school
-• Phone: +998 XX XXX XX XX
-• Email: info@properenglish.uz
-
-Working hours: Monday - Sunday, 9:00 - 18:00""",
-    "feedback": """💬 **FEEDBACK**
-
-Your opinions and suggestions are important to us!
-
-Please leave your feedback:""",
-    # Other texts will fallback to Uzbek or key name
-}
-
-def get_text(key: str, lang: str = "uz") -> str:
-    """Get text by key and language with fallback"""
-    if lang == "uz":
-        texts = TEXTS_UZ
-    elif lang == "ru":
-        texts = TEXTS_RU
-    elif lang == "en":
-        texts = TEXTS_EN
-    else:
-        texts = TEXTS_UZ  # Default fallback
-    
-    # If text not found in current language, try Uzbek, then return key
-    if key not in texts:
-        if lang != "uz" and key in TEXTS_UZ:
-            return TEXTS_UZ[key]
-        return key
-    
-    return texts.get(key, key)
+"""
+Text messages for the bot with multi-language support.
+
+The texts live in bot/locales/<language>.json (TEXTS_DIR) and are compiled
+once into one flat table per language in SUPPORTED_LANGUAGES:
+
+* a text missing from a language is taken from DEFAULT_LANGUAGE at compile
+  time, so get_text() is a single dict lookup; the missing keys are logged
+  once per build (see TextCatalog.missing);
+* {bot_name} and {company_name} are filled in at compile time; other
+  placeholders are filled per call:
+
+      get_text("branch_selected", lang="uz", branch="Clara")
+
+  A translation whose placeholders differ from the default language's is
+  reported and replaced by the default text.
+
+Edited translation files are picked up without a restart: the catalog
+checks their modification times every TEXTS_RELOAD_INTERVAL seconds. A file
+that does not parse is logged and the previous texts are kept.
+"""
+import asyncio
+import json
+import logging
+from pathlib import Path
+from string import Formatter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from bot.config import (
+    BOT_NAME, COMPANY_NAME, DEFAULT_LANGUAGE, SUPPORTED_LANGUAGES, TEXTS_DIR, TEXTS_RELOAD_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Placeholders filled in when the catalog is compiled
+CONSTANTS = {"bot_name": BOT_NAME, "company_name": COMPANY_NAME}
+
+_formatter = Formatter()
+
+
+class Template:
+    """Text with placeholders filled per call; parsed once, formatted with str.format_map"""
+
+    __slots__ = ("text", "fields")
+
+    def __init__(self, text: str, fields: FrozenSet[str]):
+        self.text = text
+        self.fields = fields
+
+    def format(self, values: Dict[str, Any]) -> str:
+        try:
+            return self.text.format_map(values)
+        except KeyError:
+            # Show the placeholder instead of failing the handler
+            logger.error(f"Text formatted without {sorted(self.fields - values.keys())}: {self.text[:40]!r}")
+            return self.text.format_map({field: values.get(field, f"{{{field}}}") for field in self.fields})
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Template) and other.text == self.text
+
+    def __repr__(self) -> str:
+        return f"Template({self.text!r})"
+
+
+Text = Union[str, Template]
+
+
+def compile_text(source: str) -> Text:
+    """The text with CONSTANTS filled in; a Template if placeholders are left. Raises ValueError on bad syntax"""
+    pieces: List[str] = []
+    fields = set()
+    for literal, field, spec, conversion in _formatter.parse(source):
+        pieces.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field in CONSTANTS and not spec and not conversion:
+            pieces.append(CONSTANTS[field].replace("{", "{{").replace("}", "}}"))
+            continue
+        if not field.isidentifier():
+            raise ValueError(f"placeholder {{{field}}} is not a name")
+        fields.add(field)
+        pieces.append(f"{{{field}{'!' + conversion if conversion else ''}{':' + spec if spec else ''}}}")
+    text = "".join(pieces)
+    return Template(text, frozenset(fields)) if fields else text.format()
+
+
+def _fields(text: Text) -> FrozenSet[str]:
+    return text.fields if isinstance(text, Template) else frozenset()
+
+
+class TextCatalog:
+    """Compiled texts of every language, reloaded when the translation files change"""
+
+    def __init__(
+        self, directory: Path, languages: Tuple[str, ...] = tuple(SUPPORTED_LANGUAGES),
+        default: str = DEFAULT_LANGUAGE, reload_interval: float = 0,
+    ):
+        self.directory = Path(directory)
+        self.languages = languages
+        self.default = default
+        self.reload_interval = reload_interval
+        self._tables: Dict[str, Dict[str, Text]] = {}
+        self._default_table: Dict[str, Text] = {}
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._unknown = set()
+        self._watcher: Optional[asyncio.Task] = None
+        # Keys each language takes from the default language
+        self.missing: Dict[str, List[str]] = {}
+        # Bumped by every load; things built from the texts compare it (see bot/keyboards/registry.py)
+        self.version = 0
+        # Called after a reload, e.g. to rebuild keyboards with the new labels
+        self.listeners: List[Callable[[], Any]] = []
+
+        # Counters (exported as metrics)
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def _path(self, lang: str) -> Path:
+        return self.directory / f"{lang}.json"
+
+    def _stat(self) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for lang in self.languages:
+            try:
+                mtimes[lang] = self._path(lang).stat().st_mtime
+            except OSError:
+                mtimes[lang] = None
+        return mtimes
+
+    def _read(self, lang: str) -> Dict[str, str]:
+        path = self._path(lang)
+        if not path.exists():
+            if lang == self.default:
+                raise FileNotFoundError(f"{path} is missing")
+            return {}
+        with open(path, encoding="utf-8") as f:
+            source = json.load(f)
+        if not isinstance(source, dict) or not all(isinstance(text, str) for text in source.values()):
+            raise ValueError(f"{path} must be an object of strings")
+        return source
+
+    def _compile(self, lang: str, source: Dict[str, str]) -> Dict[str, Text]:
+        compiled = {}
+        for key, text in source.items():
+            try:
+                compiled[key] = compile_text(text)
+            except ValueError as e:
+                raise ValueError(f"{self._path(lang).name}: {key}: {e}") from None
+        return compiled
+
+    def load(self) -> None:
+        """Read and compile every language; raises (keeping the current texts) if a file is invalid"""
+        mtimes = self._stat()
+        default = self._compile(self.default, self._read(self.default))
+        tables = {self.default: default}
+        missing = {self.default: []}
+        for lang in self.languages:
+            if lang == self.default:
+                continue
+            own = self._compile(lang, self._read(lang))
+            for key in own.keys() - default.keys():
+                logger.warning(f"Text {key!r} of {lang} is not in {self.default}")
+            for key in own.keys() & default.keys():
+                if _fields(own[key]) != _fields(default[key]):
+                    logger.error(
+                        f"Text {key!r} of {lang} has placeholders {sorted(_fields(own[key]))}, "
+                        f"{self.default} has {sorted(_fields(default[key]))}; using {self.default}"
+                    )
+                    del own[key]
+            tables[lang] = {**default, **own}
+            missing[lang] = sorted(default.keys() - own.keys())
+            if missing[lang]:
+                logger.info(f"{lang}: {len(missing[lang])} of {len(default)} texts fall back to {self.default}")
+        self._tables = tables
+        self._default_table = default
+        self.missing = missing
+        self._mtimes = mtimes
+        self._unknown = set()
+        self.version += 1
+
+    def reload(self) -> bool:
+        """Load again if a translation file changed; returns whether it did"""
+        if self._stat() == self._mtimes:
+            return False
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            self.reload_errors += 1
+            logger.error(f"Texts not reloaded, keeping the previous ones: {type(e).__name__}: {e}")
+            self._mtimes = self._stat()  # Retry after the next edit
+            return False
+        self.reloads += 1
+        logger.info(f"Reloaded texts from {self.directory}")
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Failed to apply reloaded texts: {type(e).__name__}: {e}")
+        return True
+
+    def table(self, lang: str) -> Dict[str, Text]:
+        """Compiled texts of a language, fallbacks included"""
+        return self._tables.get(lang, self._default_table)
+
+    def get(self, key: str, lang: str = DEFAULT_LANGUAGE, **values: Any) -> str:
+        """Text by key and language (the default language's if not translated); the key itself if unknown"""
+        text = self._tables.get(lang, self._default_table).get(key)
+        if text.__class__ is str:
+            return text
+        if text is None:
+            if key not in self._unknown:
+                self._unknown.add(key)
+                logger.warning(f"Unknown text {key!r}")
+            return key
+        return text.format(values)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload()
+
+    async def start(self) -> None:
+        """Start watching the translation files (dispatcher startup hook)"""
+        if self.reload_interval > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self) -> None:
+        """Stop watching (dispatcher shutdown hook)"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+texts = TextCatalog(TEXTS_DIR, reload_interval=TEXTS_RELOAD_INTERVAL)
+texts.load()
+
+
+# get_text(key, lang="uz", **values): called per reply, so without a wrapper around texts.get
+get_text = texts.get
@@ -9,30 +9,65 @@ import os
 import signal
 import sys
 import time
+from contextlib import suppress
 from pathlib import Path
+from typing import List, Optional
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.exceptions import TelegramNetworkError, TelegramServerError
 from aiohttp import ClientConnectorError, ClientError
-from bot.config import BOT_TOKEN, HR_GROUP_ID, COMPANY_NAME
-from bot.handlers import main_handlers, application_handlers
+from bot.config import (
+    BOT_TOKEN, HR_GROUP_ID, COMPANY_NAME, BOT_MODE, WORKER_PROCESSES,
+    FSM_STORAGE, FSM_DB_PATH, FSM_FLUSH_INTERVAL_MS, FSM_FLUSH_THRESHOLD, FSM_CACHE_SIZE,
+    FSM_SPILL_PATH, FSM_IDLE_TTL_SECONDS, FSM_STATE_IDLE_TTL, FSM_MEMORY_BUDGET_MB,
+    FSM_SPILL_MAX_AGE_DAYS,
+    HANDOFF_ENABLED, HANDOFF_SOCKET, HANDOFF_DRAIN_TIMEOUT,
+    OUTBOX_PATH, OUTBOX_WORKERS, OUTBOX_MAX_ATTEMPTS, RATE_LIMIT_ENABLED, APPLICATIONS_DB_PATH,
+    DEDUP_MODE, DEDUP_DB_PATH, DEDUP_COOLDOWN_DAYS, DEDUP_POSITION_COOLDOWN_DAYS, DEDUP_BLOOM_CAPACITY,
+    FUNNEL_ENABLED, FUNNEL_DB_PATH, FUNNEL_FLUSH_INTERVAL, FUNNEL_BUCKET_SECONDS,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_FSM_COUNT_SECONDS,
+    PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_SIGNAL_SECONDS,
+    TRACE_ENABLED, TRACE_PATH, TRACE_SLOW_MS, TRACE_SAMPLE_PERCENT
+)
+from bot.handlers import main_handlers, application_handlers, hr_handlers
+from bot.keyboards.buttons import buttons
+from bot.keyboards.registry import install_prebuilt_markups, keyboards
+from bot.middlewares.funnel import FunnelTracker
+from bot.middlewares.metrics import (
+    BotMetrics, HandlerMetricsMiddleware, StateCounts, UpdateMetricsMiddleware, instrument_storage
+)
+from bot.middlewares.rate_limiter import RateLimiter
+from bot.middlewares.state_cache import StateCacheMiddleware
+from bot.middlewares.tracing import HandlerTracingMiddleware, UpdateTracingMiddleware, install_api_tracing
+from bot.runtime.handoff import ExclusiveResources
+from bot.services.dedup import DuplicateDetector
+from bot.services.metrics import MetricsServer, Registry
+from bot.services.outbox import Outbox
+from bot.services.profiler import SamplingProfiler
+from bot.services.tracing import TraceLogFilter, Tracer
+from bot.storage.applications import ApplicationStore
+from bot.utils.texts import texts
 
-# Configure logging
+# Configure logging (lines logged while handling an update end with its trace id)
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s%(trace)s",
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(TraceLogFilter())
 logger = logging.getLogger(__name__)
 
 # Lock file path for single-instance mechanism
 LOCK_FILE = Path(__file__).parent / ".bot_instance.lock"
 
 
-def acquire_instance_lock() -> bool:
+def acquire_instance_lock(handed_over_pid: Optional[int] = None) -> bool:
     """
     Acquire single-instance lock.
     Returns True if lock acquired successfully, False otherwise.
-    If another instance is running, it will be terminated.
+    If another instance is running, it will be terminated, unless it is
+    `handed_over_pid`: an instance that handed over to us exits by itself.
     """
     current_pid = os.getpid()
 
@@ -41,55 +76,58 @@ def acquire_instance_lock() -> bool:
         try:
             # Read PID from lock file
             old_pid = int(LOCK_FILE.read_text().strip())
-
-            # Check if the process is still running
-            try:
-                # Signal 0 doesn't kill, just checks if process exists
-                os.kill(old_pid, 0)
-                # Process is still running - terminate it
-                logger.warning(
-                    f"Another bot instance found (PID: {old_pid}). "
-                    f"Terminating old instance..."
-                )
+            if old_pid == handed_over_pid:
+                # Never kill an instance that handed over: it is closing its files and exits by itself
+                logger.info(f"Previous instance (PID: {old_pid}) handed over and is shutting down")
+            else:
+                # Check if the process is still running
                 try:
-                    # Send termination signal
-                    if sys.platform == "win32":
-                        # Windows: use SIGTERM (available in Python 3.7+)
-                        os.kill(old_pid, signal.SIGTERM)
-                    else:
-                        # Unix-like: use SIGTERM
-                        os.kill(old_pid, signal.SIGTERM)
-
-                    # Give it a moment to terminate
-                    time.sleep(0.5)
-
-                    # Check again - if still running, force kill
+                    # Signal 0 doesn't kill, just checks if process exists
+                    os.kill(old_pid, 0)
+                    # Process is still running - terminate it
+                    logger.warning(
+                        f"Another bot instance found (PID: {old_pid}). "
+                        f"Terminating old instance..."
+                    )
                     try:
-                        os.kill(old_pid, 0)
-                        logger.warning(
-                            f"Force killing old instance (PID: {old_pid})..."
-                        )
-                        if sys.platform != "win32":
-                            # SIGKILL only available on Unix
-                            os.kill(old_pid, signal.SIGKILL)
+                        # Send termination signal
+                        if sys.platform == "win32":
+                            # Windows: use SIGTERM (available in Python 3.7+)
+                            os.kill(old_pid, signal.SIGTERM)
                         else:
-                            # On Windows, SIGTERM should be sufficient
-                            # If not, process cleaned up on next start
+                            # Unix-like: use SIGTERM
                             os.kill(old_pid, signal.SIGTERM)
-                    except (ProcessLookupError, OSError):
-                        pass  # Process already terminated
-                except (ProcessLookupError, OSError) as e:
-                    # Process already terminated or doesn't exist
+
+                        # Give it a moment to terminate
+                        time.sleep(0.5)
+
+                        # Check again - if still running, force kill
+                        try:
+                            os.kill(old_pid, 0)
+                            logger.warning(
+                                f"Force killing old instance (PID: {old_pid})..."
+                            )
+                            if sys.platform != "win32":
+                                # SIGKILL only available on Unix
+                                os.kill(old_pid, signal.SIGKILL)
+                            else:
+                                # On Windows, SIGTERM should be sufficient
+                                # If not, process cleaned up on next start
+                                os.kill(old_pid, signal.SIGTERM)
+                        except (ProcessLookupError, OSError):
+                            pass  # Process already terminated
+                    except (ProcessLookupError, OSError) as e:
+                        # Process already terminated or doesn't exist
+                        logger.info(
+                            f"Old instance (PID: {old_pid}) " f"already terminated: {e}"
+                        )
+                except (ProcessLookupError, OSError):
+                    # Process doesn't exist - stale lock file
                     logger.info(
-                        f"Old instance (PID: {old_pid}) " f"already terminated: {e}"
+                        f"Lock file exists but process (PID: {old_pid}) "
+                        f"is not running. Removing stale lock."
                     )
-            except (ProcessLookupError, OSError):
-                # Process doesn't exist - stale lock file
-                logger.info(
-                    f"Lock file exists but process (PID: {old_pid}) "
-                    f"is not running. Removing stale lock."
-                )
-                LOCK_FILE.unlink(missing_ok=True)
+                    LOCK_FILE.unlink(missing_ok=True)
         except (ValueError, OSError) as e:
             # Invalid PID in lock file or read error - remove it
             logger.warning(f"Invalid lock file content: {e}. Removing stale lock.")
@@ -156,41 +194,287 @@ def is_network_error(error: Exception) -> bool:
     return False
 
 
-async def main():
-    """Main function to run the bot"""
+# Routers in the order the dispatcher tries them
+ROUTERS = (main_handlers.router, hr_handlers.router, application_handlers.router)
 
-    # Acquire single-instance lock
-    if not acquire_instance_lock():
-        logger.error("Failed to acquire instance lock. Exiting.")
-        sys.exit(1)
 
-    try:
-        # Check if BOT_TOKEN is set
-        if not BOT_TOKEN:
-            logger.error("BOT_TOKEN is not set! Please set it in .env file")
-            return
+def resolve_allowed_updates() -> List[str]:
+    """Update types the routers handle, without building a dispatcher (supervisor process)"""
+    return sorted({name for router in ROUTERS for name in router.resolve_used_update_types()})
 
-        if not HR_GROUP_ID:
-            logger.warning(
-                f"HR_GROUP_ID is not set! Applications for {COMPANY_NAME} "
-                f"won't be sent to HR group"
-            )
 
-        # Initialize bot and dispatcher
-        bot = Bot(token=BOT_TOKEN)
-        dp = Dispatcher(storage=MemoryStorage())
+def per_worker_path(path: Path) -> Path:
+    """`path` with the worker index before the suffix in worker processes (WORKER_PROCESSES > 1)"""
+    worker_index = os.getenv("BOT_WORKER_INDEX")
+    if worker_index is None:
+        return path
+    return path.with_name(f"{path.stem}.{worker_index}{path.suffix}")
+
 
-        # Register routers
-        dp.include_router(main_handlers.router)
-        dp.include_router(application_handlers.router)
+def create_storage() -> BaseStorage:
+    """Create FSM storage selected by FSM_STORAGE (one file per worker process)"""
+    if FSM_STORAGE == "sqlite":
+        from bot.storage.sqlite_storage import SQLiteStorage
+        from bot.models.application_draft import dumps_state_data, loads_state_data
+        fsm_db_path = per_worker_path(FSM_DB_PATH)
+        logger.info(f"Using SQLite FSM storage: {fsm_db_path}")
+        return SQLiteStorage(
+            fsm_db_path,
+            flush_interval=FSM_FLUSH_INTERVAL_MS / 1000,
+            flush_threshold=FSM_FLUSH_THRESHOLD,
+            cache_size=FSM_CACHE_SIZE,
+            data_dumps=dumps_state_data,
+            data_loads=loads_state_data,
+        )
+    if FSM_STORAGE == "evicting":
+        from bot.storage.evicting_storage import EvictingMemoryStorage
+        spill_path = per_worker_path(FSM_SPILL_PATH)
+        logger.info(f"Using evicting FSM storage, spill file: {spill_path}")
+        return EvictingMemoryStorage(
+            spill_path,
+            default_ttl=FSM_IDLE_TTL_SECONDS,
+            state_ttls=FSM_STATE_IDLE_TTL,
+            memory_budget=FSM_MEMORY_BUDGET_MB * 1024 * 1024,
+            max_spill_age=FSM_SPILL_MAX_AGE_DAYS * 24 * 3600 or None,
+        )
+    if FSM_STORAGE != "memory":
+        logger.warning(f"Unknown FSM_STORAGE '{FSM_STORAGE}', falling back to memory")
+    return MemoryStorage()
 
-        # Start polling
+
+def create_bot() -> Bot:
+    """Create Bot with the outbound rate limiter installed"""
+    bot = Bot(token=BOT_TOKEN)
+    if RATE_LIMIT_ENABLED:
+        bot.session.middleware(RateLimiter())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Create dispatcher with FSM storage and all routers registered"""
+    dp = Dispatcher(storage=create_storage())
+    # Set in worker processes (WORKER_PROCESSES > 1), which get their own files and ports
+    worker_index = os.getenv("BOT_WORKER_INDEX")
+    # What only one instance may hold at a time; on restart with handoff the new
+    # instance starts these once the old one closed its own (see bot/runtime/handoff.py)
+    exclusive = ExclusiveResources()
+    dp["exclusive"] = exclusive
+
+    # Load FSM data once per update and write it back at most once; answers dropped
+    # after a catalog edit are asked again before a later step can use them
+    state_cache = StateCacheMiddleware(on_stale=application_handlers.ask_again)
+    dp.message.middleware(state_cache)
+    dp.callback_query.middleware(state_cache)
+
+    # Step-by-step conversion of the application flow (HR /funnel); inside state_cache to see the draft
+    funnel = FunnelTracker(
+        FUNNEL_DB_PATH, bucket_seconds=FUNNEL_BUCKET_SECONDS, flush_interval=FUNNEL_FLUSH_INTERVAL,
+    )
+    if FUNNEL_ENABLED:
+        dp.message.middleware(funnel)
+        dp.callback_query.middleware(funnel)
+        dp.startup.register(funnel.start)
+    dp["funnel"] = funnel
+    dp.shutdown.register(funnel.close)
+
+    # Prometheus metrics (see bot/services/metrics.py): always recorded, served when METRICS_ENABLED
+    registry = Registry()
+    metrics = BotMetrics(registry)
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    # Inside state_cache and funnel: times only the handler itself
+    dp.message.middleware(HandlerMetricsMiddleware(metrics))
+    dp.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+    instrument_storage(dp.storage, metrics.storage_seconds)
+    registry.collector(
+        "fsm_drafts", "Users per ApplicationStates step",
+        StateCounts(dp.storage, max_age=METRICS_FSM_COUNT_SECONDS), labelnames=["state"],
+    )
+    if hasattr(dp.storage, "evictions"):
+        registry.track(dp.storage, "fsm", counters=["evictions", "rehydrations", "purged"], gauges=["memory_bytes"])
+    registry.track(funnel, "funnel", counters=["transitions", "flushes"])
+    dp["metrics"] = metrics
+    dp.startup.register(metrics.instrument_bot)
+    if METRICS_ENABLED:
+        metrics_server = MetricsServer(
+            registry, METRICS_HOST, METRICS_PORT + (int(worker_index) if worker_index is not None else 0)
+        )
+        exclusive.startup.register(metrics_server.start)
+        exclusive.shutdown.register(metrics_server.close)
+
+    # Trace per update; slow or failed ones are written to TRACE_PATH (see bot/services/tracing.py)
+    tracer = Tracer(
+        per_worker_path(TRACE_PATH),
+        slow_ms=TRACE_SLOW_MS,
+        sample_ratio=TRACE_SAMPLE_PERCENT / 100,
+    )
+    dp["tracer"] = tracer
+    if TRACE_ENABLED:
+        dp.update.outer_middleware(UpdateTracingMiddleware(tracer))
+        dp.message.middleware(HandlerTracingMiddleware())
+        dp.callback_query.middleware(HandlerTracingMiddleware())
+        dp.startup.register(install_api_tracing)
+        dp.shutdown.register(tracer.close)
+        registry.track(tracer, "tracing", counters=["traces", "kept"])
+
+    # Event-loop profiling on demand: HR /profile or SIGUSR2 (see bot/services/profiler.py)
+    profiler = SamplingProfiler(
+        PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000, signal_seconds=PROFILE_SIGNAL_SECONDS,
+    )
+    dp["profiler"] = profiler
+    dp.startup.register(profiler.start)
+    dp.shutdown.register(profiler.close)
+
+    # Confirmed applications are delivered to HR in background (see bot/services/outbox.py)
+    # One journal per worker process
+    outbox = Outbox(per_worker_path(OUTBOX_PATH), workers=OUTBOX_WORKERS, max_attempts=OUTBOX_MAX_ATTEMPTS)
+    dp["outbox"] = outbox
+    exclusive.startup.register(outbox.start)
+    exclusive.shutdown.register(outbox.close)
+    registry.track(outbox, "outbox", counters=["delivered", "retries", "dead"], gauges=["pending"])
+
+    # Every submitted application is also kept in a queryable database
+    applications = ApplicationStore(APPLICATIONS_DB_PATH)
+    dp["applications"] = applications
+    dp.shutdown.register(applications.close)
+
+    # Repeat applications are flagged or kept out of the HR group (see bot/services/dedup.py)
+    duplicates = DuplicateDetector(
+        DEDUP_DB_PATH,
+        mode=DEDUP_MODE,
+        cooldown_days=DEDUP_COOLDOWN_DAYS,
+        position_cooldown_days=DEDUP_POSITION_COOLDOWN_DAYS,
+        capacity=DEDUP_BLOOM_CAPACITY,
+        use_prefilter=WORKER_PROCESSES <= 1,
+    )
+    dp["duplicates"] = duplicates
+    exclusive.startup.register(duplicates.start)
+    exclusive.shutdown.register(duplicates.close)
+    registry.track(duplicates, "dedup", counters=["checks", "prefilter_hits", "duplicates"])
+
+    # Texts are compiled once and reloaded when bot/locales changes (see bot/utils/texts.py)
+    dp.startup.register(texts.start)
+    dp.shutdown.register(texts.close)
+    registry.track(texts, "texts", counters=["reloads", "reload_errors"])
+
+    # Keyboards are built once per catalog version and sent as prebuilt JSON (see bot/keyboards/registry.py)
+    dp.startup.register(keyboards.refresh)
+    dp.startup.register(install_prebuilt_markups)
+    registry.track(keyboards, "keyboards", counters=["builds"])
+
+    # Typed answers matched to a button instead of asking again (see bot/keyboards/buttons.py)
+    registry.track(buttons, "buttons", counters=["typed_matches"])
+
+    # Last startup hook: outbox deliveries start with texts and keyboards ready
+    exclusive.attach(dp)
+
+    # Register routers
+    for router in ROUTERS:
+        dp.include_router(router)
+    return dp
+
+
+async def run_polling(bot: Bot, dp: Dispatcher, handoff=None, offset: Optional[int] = None):
+    """
+    Fetch updates with long polling.
+    With `handoff` the dispatcher was already started by main() and is shut
+    down there as well.
+    """
+    allowed = dp.resolve_used_update_types()
+    if handoff is None:
         # Note: aiogram's start_polling() has built-in retry logic for network
         # errors. This function handles transient network issues automatically.
         logger.info("Bot started! Polling for updates...")
+        await dp.start_polling(bot, allowed_updates=allowed)
+        return
+
+    # Own polling loop: the offset and in-flight handlers must be known
+    # to hand them over to the next instance on restart
+    from bot.runtime.workers import UpdateSequencer, poll_updates
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Signal handlers are not supported on Windows
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+    handoff.on_request = stop_event.set
+
+    sequencer = UpdateSequencer(bot, dp)
+    logger.info("Bot started! Polling for updates...")
+    offset = await poll_updates(bot, sequencer.submit, allowed, stop_event, offset)
+    await sequencer.drain(timeout=HANDOFF_DRAIN_TIMEOUT)
+    if handoff.requested.is_set():
+        # The next instance starts its outbox, metrics server and prefilter once these are closed
+        await dp["exclusive"].close(bot=bot, dispatcher=dp, **dp.workflow_data)
+        handoff.release(offset)
+        await handoff.completed.wait()
+
+
+async def main():
+    """Main function to run the bot"""
+    # Check if BOT_TOKEN is set
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN is not set! Please set it in .env file")
+        return
+
+    if not HR_GROUP_ID:
+        logger.warning(
+            f"HR_GROUP_ID is not set! Applications for {COMPANY_NAME} "
+            f"won't be sent to HR group"
+        )
+
+    # Initialize bot and dispatcher (in supervisor mode only the workers build one)
+    bot = create_bot()
+    dp = create_dispatcher() if WORKER_PROCESSES <= 1 else None
+    use_handoff = HANDOFF_ENABLED and WORKER_PROCESSES <= 1
+    # Polling with handoff runs its own loop: start the dispatcher here, all but its
+    # exclusive resources while a running instance still serves, so updates pause
+    # only while that one drains and hands over (webhook mode starts with the server)
+    started = use_handoff and BOT_MODE != "webhook"
+    locked = False
+    handoff = None
+    try:
+        snapshot = None
+        if started:
+            dp["exclusive"].deferred = True
+            await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+        if use_handoff:
+            # Take over FSM state and polling offset from a running instance, if any
+            from bot.runtime.handoff import request_handoff
+            snapshot = await request_handoff(HANDOFF_SOCKET)
+
+        # Acquire single-instance lock
+        if not acquire_instance_lock(handed_over_pid=snapshot.pid if snapshot else None):
+            logger.error("Failed to acquire instance lock. Exiting.")
+            sys.exit(1)
+        locked = True
+
+        if use_handoff:
+            from bot.runtime.handoff import HandoffServer, import_records
+            if snapshot is not None:
+                await import_records(dp.storage, snapshot.records)
+            if started:
+                # A previous instance has closed its outbox journal, metrics port and prefilter by now
+                await dp["exclusive"].start(bot=bot, dispatcher=dp, **dp.workflow_data)
+            handoff = HandoffServer(HANDOFF_SOCKET, dp.storage)
+            await handoff.start()
+
+        # Start receiving updates (long polling or webhook)
         try:
-            allowed = dp.resolve_used_update_types()
-            await dp.start_polling(bot, allowed_updates=allowed)
+            if WORKER_PROCESSES > 1:
+                # Supervisor mode: this process only ingests, workers handle updates
+                from bot.runtime.workers import run_supervisor
+                await run_supervisor(
+                    bot, create_dispatcher, WORKER_PROCESSES,
+                    allowed_updates=resolve_allowed_updates(), mode=BOT_MODE
+                )
+            elif BOT_MODE == "webhook":
+                from bot.runtime.webhook import run_webhook
+                await run_webhook(bot, dp, handoff=handoff)
+            else:
+                if BOT_MODE != "polling":
+                    logger.warning(f"Unknown BOT_MODE '{BOT_MODE}', falling back to polling")
+                await run_polling(bot, dp, handoff=handoff, offset=snapshot.offset if snapshot else None)
         except (TelegramNetworkError, TelegramServerError) as e:
             # These should be handled internally by aiogram, but if they
             # propagate:
@@ -214,13 +498,17 @@ async def main():
                 f"check network connectivity."
             )
             raise
-        finally:
-            # Ensure clean shutdown
-            await bot.session.close()
-            logger.info("Bot session closed.")
     finally:
-        # Release instance lock on all exit paths
-        release_instance_lock()
+        # Ensure clean shutdown
+        if started:
+            await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        if handoff is not None:
+            await handoff.close()
+        await bot.session.close()
+        logger.info("Bot session closed.")
+        if locked:
+            # Release instance lock on all exit paths
+            release_instance_lock()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+"""
+Shared test fixtures.
+"""
+import itertools
+import os
+import tempfile
+import typing
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, User
+
+# Keep files written by the bot (outbox journal, databases) out of the project's data/ directory
+_TEST_DATA_DIR = tempfile.mkdtemp(prefix="hr-bot-tests-")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(_TEST_DATA_DIR, "outbox.jsonl"))
+os.environ.setdefault("APPLICATIONS_DB_PATH", os.path.join(_TEST_DATA_DIR, "applications.sqlite3"))
+os.environ.setdefault("DEDUP_DB_PATH", os.path.join(_TEST_DATA_DIR, "dedup.sqlite3"))
+os.environ.setdefault("FUNNEL_DB_PATH", os.path.join(_TEST_DATA_DIR, "funnel.sqlite3"))
+os.environ.setdefault("TRACE_PATH", os.path.join(_TEST_DATA_DIR, "traces.jsonl"))
+os.environ.setdefault("PROFILE_DIR", os.path.join(_TEST_DATA_DIR, "profiles"))
+
+
+class FakeSession(BaseSession):
+    """Bot session that records API calls instead of sending them"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: List[Tuple[str, TelegramMethod]] = []
+        self._message_ids = itertools.count(1)
+
+    def _fake_message(self, method: TelegramMethod) -> Message:
+        chat_id = getattr(method, "chat_id", None) or 1
+        return Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(),
+            chat=Chat(id=int(chat_id), type="private"),
+        )
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls.append((method.__api_method__, method))
+        returning = method.__returning__
+        if returning is Message or returning == typing.Union[Message, bool]:
+            return self._fake_message(method)
+        if typing.get_origin(returning) is list:
+            return [self._fake_message(method) for _ in getattr(method, "media", [])]
+        if returning is User:
+            return User(id=42, is_bot=True, first_name="Test bot")
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):  # pragma: no cover
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture(scope="session")
+def dispatcher():
+    """Dispatcher built exactly like run.py does (routers can be attached only once)."""
+    from run import create_dispatcher
+
+    return create_dispatcher()
+
+
+@pytest.fixture
+def fake_bot():
+    """Bot whose API calls are recorded in bot.session.calls"""
+    return Bot(token="42:TEST", session=FakeSession())
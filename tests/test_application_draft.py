@@ -0,0 +1,121 @@
+"""
+Tests for the compact ApplicationDraft model.
+"""
+import asyncio
+import json
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.models import application_draft
+from bot.models.application_draft import (
+    ApplicationDraft, dumps_state_data, loads_state_data
+)
+from bot.storage.sqlite_storage import SQLiteStorage
+
+LEGACY_DATA = {
+    "user_language": "uz",
+    "previous_menu": "main_menu",
+    "branch": "Clara",
+    "city": "Toshkent",
+    "department": "Akademik bo'lim",
+    "department_key": "akademik",
+    "position": "IELTS Instructor",
+    "passport_name": "Ali",
+    "passport_surname": "Valiyev",
+    "phone": "+998901234567",
+    "is_student": "Yo'q",
+    "russian_voice": "AwACAgIAAxkBAAIBZ2Voice",
+    "english_media_type": "voice",
+    "photo": "AgACAgIAAxkBAAIBZ2Photo",
+}
+
+
+def test_legacy_dict_round_trip():
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+    assert not draft.dirty
+    assert draft.department_key == "akademik"
+    assert draft.position == "IELTS Instructor"
+
+    restored = ApplicationDraft.from_bytes(draft.to_bytes())
+    assert restored.to_dict() == draft.to_dict()
+    assert restored.branch == "Clara"
+    assert restored.phone == "+998901234567"
+
+
+def test_blob_is_smaller_than_json_dict():
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+    assert len(draft.to_bytes()) * 2 < len(json.dumps(LEGACY_DATA).encode("utf-8"))
+
+
+def test_rejects_unknown_catalog_value():
+    draft = ApplicationDraft()
+    with pytest.raises(ValueError):
+        draft.branch = "Nowhere"
+    draft.department_key = "akademik"
+    with pytest.raises(ValueError):
+        draft.position = "Not a position"
+
+
+def test_reset_keeps_requested_fields():
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+    draft.reset(user_language="ru")
+    assert draft.dirty
+    assert draft.user_language == "ru"
+    assert draft.branch is None and draft.phone is None
+
+
+def test_state_data_codec():
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+    data = draft.to_state_data()
+    assert loads_state_data(dumps_state_data(data)) == data
+    other = {"something": 1}
+    assert loads_state_data(dumps_state_data(other)) == other
+    assert loads_state_data(json.dumps(other)) == other
+
+
+def test_sqlite_storage_keeps_draft(tmp_path):
+    key = StorageKey(bot_id=1, chat_id=7, user_id=7)
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+
+    async def scenario():
+        storage = SQLiteStorage(
+            tmp_path / "fsm.sqlite3",
+            data_dumps=dumps_state_data, data_loads=loads_state_data,
+        )
+        await storage.set_data(key, draft.to_state_data())
+        await storage.close()
+
+        storage = SQLiteStorage(
+            tmp_path / "fsm.sqlite3",
+            data_dumps=dumps_state_data, data_loads=loads_state_data,
+        )
+        try:
+            return await storage.get_data(key)
+        finally:
+            await storage.close()
+
+    restored = ApplicationDraft.from_state_data(asyncio.run(scenario()))
+    assert restored.to_dict() == draft.to_dict()
+
+
+def _with_changed_catalog(monkeypatch, slot: str) -> None:
+    """Pretend the catalog of `slot` was edited after the draft was saved"""
+    index = application_draft._CODE_SLOTS.index(slot)
+    fingerprints = list(application_draft.SLOT_FINGERPRINTS)
+    fingerprints[index] ^= 1
+    monkeypatch.setattr(application_draft, "SLOT_FINGERPRINTS", tuple(fingerprints))
+
+
+def test_only_answers_of_changed_catalogs_are_dropped(monkeypatch):
+    draft = ApplicationDraft.from_dict(LEGACY_DATA)
+    blob = draft.to_bytes()
+    _with_changed_catalog(monkeypatch, "_branch")
+    restored = ApplicationDraft.from_bytes(blob)
+    assert restored.stale == ("branch",) and restored.dirty
+    assert restored.branch is None
+    assert restored.position == "IELTS Instructor"
+    assert restored.user_language == "uz" and restored.english_media_type == "voice"
+    assert restored.is_student == "Yo'q" and restored.previous_menu == "main_menu"
+    assert not ApplicationDraft.from_bytes(restored.to_bytes()).stale
+
@@ -0,0 +1,146 @@
+"""
+End-to-end walk through the application flow with a recording bot session.
+"""
+import asyncio
+import itertools
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.types import Update
+
+from bot.handlers import application_handlers
+from bot.keyboards.callback_data import encode_callback
+from bot.utils.texts import get_text
+
+USER_ID = 3003
+HR_GROUP = -1009999
+
+_update_ids = itertools.count(100)
+
+
+def _message(text=None, **content) -> dict:
+    message = {
+        "message_id": next(_update_ids),
+        "date": 0,
+        "chat": {"id": USER_ID, "type": "private"},
+        "from": {"id": USER_ID, "is_bot": False, "first_name": "Test", "username": "tester"},
+    }
+    if text is not None:
+        message["text"] = text
+    message.update(content)
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def _callback(kind: str, value: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "chat_instance": "ci",
+            "data": encode_callback(kind, value),
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Test", "username": "tester"},
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": USER_ID, "type": "private"},
+                "text": "prompt",
+            },
+        },
+    }
+
+
+def application_steps():
+    """Raw updates of one applicant walking the whole flow (used by other tests too)"""
+    return [
+        _message("/start", entities=[{"type": "bot_command", "offset": 0, "length": 6}]),
+        _message("▶️ Start"),
+        _message("🧳 Bo'sh ish o'rinlari"),
+        _message("Clara"),
+        _message("🧠 Akademik bo'lim"),
+        _callback("position", "IELTS Instructor"),
+        _message("Ali"),
+        _message("Valiyev"),
+        _message("Vali"),
+        _message("01.01.2000"),
+        _message("Andijon, Navoiy ko'chasi 1"),
+        _message("+998901234567"),
+        _callback("phone_confirm", "yes"),
+        _message("Ha"),
+        _callback("education", "Oliy"),
+        _callback("gender", "Erkak"),
+        _callback("russian_level", "O'rtacha"),
+        _message(voice={"file_id": "voice-1", "file_unique_id": "v1", "duration": 15}),
+        _callback("english_level", "Ilg'or"),
+        _message(video={"file_id": "video-1", "file_unique_id": "e1", "width": 1, "height": 1, "duration": 30}),
+        _message(document={"file_id": "pdf-1", "file_unique_id": "p1", "mime_type": "application/pdf"}),
+        _message("1-3 years"),
+        _message("Proper, relocation"),
+        _message(photo=[{"file_id": "photo-1", "file_unique_id": "ph1", "width": 1, "height": 1}]),
+        _message("Instagram"),
+        _callback("confirm", "yes"),
+    ]
+
+
+def test_full_application_reaches_hr_group(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in application_steps():
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            # Delivery to HR happens in background through the outbox
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    sent_to_hr = [
+        (name, method) for name, method in fake_bot.session.calls
+        if getattr(method, "chat_id", None) == HR_GROUP
+    ]
+    names = [name for name, _ in sent_to_hr]
+    assert {"sendPhoto", "sendVoice", "sendVideo", "sendDocument"} <= set(names)
+    # Summary fits into the photo caption, so photo, summary and keyboard are one message
+    header = next(method for name, method in sent_to_hr if name == "sendPhoto")
+    assert names[0] == "sendPhoto" and header.reply_markup is not None
+    summary = header.caption
+    assert "IELTS Instructor" in summary
+    assert "+998901234567" in summary
+    assert "Clara" in summary
+
+    # ...and kept in the applications database
+    stored = asyncio.run(dispatcher["applications"].find(user_id=USER_ID, limit=1))
+    assert stored[0]["position"] == "IELTS Instructor"
+    assert stored[0]["branch"] == "Clara"
+    assert stored[0]["russian_voice"] == "voice-1"
+
+
+def test_failed_acknowledgement_does_not_report_an_error(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    session = fake_bot.session
+    make_request = session.make_request
+
+    async def blocked_by_applicant(bot, method, timeout=None):
+        if method.__api_method__ == "editMessageText" and method.text == get_text("application_submitted"):
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        return await make_request(bot, method, timeout)
+
+    monkeypatch.setattr(session, "make_request", blocked_by_applicant)
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in application_steps():
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    answers = [method.text for name, method in session.calls if name == "answerCallbackQuery"]
+    assert get_text("submission_error") not in answers
+    assert any(
+        name == "sendPhoto" and getattr(method, "chat_id", None) == HR_GROUP for name, method in session.calls
+    )
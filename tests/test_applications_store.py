@@ -0,0 +1,81 @@
+"""
+Tests for the submitted applications database.
+"""
+import asyncio
+from datetime import datetime
+
+from bot.models.application_draft import ApplicationDraft
+from bot.storage.applications import ApplicationStore
+
+
+def _draft(user_id: int, position: str = "IELTS Instructor", branch: str = "clara",
+           date: str = "15.03.2026 10:00", **extra) -> ApplicationDraft:
+    data = {
+        "department_key": "akademik", "position": position, "branch_key": branch,
+        "passport_name": "Ali", "phone": "+998 90 123-45-67", "education": "Oliy",
+        "russian_level": "O'rtacha", "english_level": "Ilg'or", "submission_date": date,
+        "photo": f"photo-{user_id}",
+    }
+    data.update(extra)
+    draft = ApplicationDraft.from_dict(data)
+    draft.user_id = user_id
+    return draft
+
+
+def test_round_trip_keeps_catalog_values_and_files(tmp_path):
+    async def scenario():
+        store = ApplicationStore(tmp_path / "applications.sqlite3")
+        application_id = await store.add(_draft(1, english_media="video-1", english_media_type="video"))
+        row = await store.get(application_id)
+        await store.close()
+        return row
+
+    row = asyncio.run(scenario())
+    assert row["position"] == "IELTS Instructor"
+    assert row["department_key"] == "akademik"
+    assert row["branch"] == "Clara"
+    assert row["english_level"] == "Ilg'or"
+    assert row["phone"] == "+998901234567"
+    assert row["submission_date"] == "2026-03-15 10:00"
+    assert (row["photo"], row["english_media"], row["english_media_type"]) == ("photo-1", "video-1", "video")
+    assert row["ielts_certificate"] is None
+    # Rows can be turned back into drafts
+    assert ApplicationDraft.from_dict(row).position == "IELTS Instructor"
+
+
+def test_filters_by_position_branch_and_month(tmp_path):
+    async def scenario():
+        store = ApplicationStore(tmp_path / "applications.sqlite3")
+        await store.add_many([
+            _draft(1),
+            _draft(2, branch="severniy"),
+            _draft(3, position="SAT Teacher"),
+            _draft(4, date="28.02.2026 23:59"),
+            _draft(5, date="31.03.2026 18:30"),
+        ])
+        month = dict(since=datetime(2026, 3, 1), until=datetime(2026, 4, 1))
+        found = await store.find(position="IELTS Instructor", branch="Clara", **month)
+        total = await store.count(branch="clara", **month)
+        by_phone = await store.find(phone="+998901234567", department="akademik")
+        by_user = await store.find(user_id=4)
+        await store.close()
+        return found, total, by_phone, by_user
+
+    found, total, by_phone, by_user = asyncio.run(scenario())
+    assert [row["user_id"] for row in found] == [5, 1]  # newest first
+    assert total == 3
+    assert len(by_phone) == 5
+    assert by_user[0]["submission_date"] == "2026-02-28 23:59"
+
+
+def test_month_query_uses_position_index(tmp_path):
+    store = ApplicationStore(tmp_path / "applications.sqlite3")
+    asyncio.run(store.add(_draft(1)))
+    where, params = store._where(position="IELTS Instructor", since="2026-03-01")
+    plan = " ".join(
+        row[-1] for row in store._connection.execute(
+            f"EXPLAIN QUERY PLAN SELECT a.id FROM applications a {where}", params
+        )
+    )
+    asyncio.run(store.close())
+    assert "idx_applications_position_date (position_id=? AND submission_date>?)" in plan
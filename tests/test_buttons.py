@@ -0,0 +1,74 @@
+"""
+Tests for the reply-button index.
+"""
+import asyncio
+import json
+
+import pytest
+from aiogram.types import Chat, Message
+
+from bot.config import SUPPORTED_LANGUAGES
+from bot.keyboards import buttons as buttons_module
+from bot.keyboards import reply_keyboards
+from bot.keyboards.buttons import BACK, Button, ButtonIndex, ReplyButton, buttons
+from bot.utils.texts import TextCatalog
+
+REPLY_KEYBOARDS = [
+    reply_keyboards.get_main_menu_keyboard, reply_keyboards.get_start_keyboard, reply_keyboards.get_branch_keyboard,
+    reply_keyboards.get_department_keyboard, reply_keyboards.get_yes_no_keyboard, reply_keyboards.get_back_keyboard,
+    reply_keyboards.get_main_menu_back_keyboard, reply_keyboards.get_cancel_keyboard,
+    reply_keyboards.get_work_experience_keyboard_reply, reply_keyboards.get_phone_keyboard,
+]
+
+
+def test_every_reply_button_resolves():
+    for factory in REPLY_KEYBOARDS:
+        for lang in SUPPORTED_LANGUAGES:
+            for row in factory(lang=lang).keyboard:
+                for button in row:
+                    assert buttons.resolve(button.text) is not None, button.text
+    assert buttons.resolve("Business Center") == Button("branch", "business_center")
+    assert buttons.resolve("1-3 years") == Button("work_experience", "1-3 years")
+
+
+@pytest.mark.parametrize("text, button", [
+    ("🔙 Orqaga", BACK),
+    ("  🔙   ORQAGA ", BACK),
+    ("🧳 Bo‘sh ish o‘rinlari", Button("vacancies")),
+    ("yo`q", Button("no")),
+    ("Orqaga", None),
+    ("", None),
+    (None, None),
+])
+def test_resolve_normalizes_labels(text, button):
+    assert buttons.resolve(text) == button
+
+
+def test_match_accepts_typed_text_for_the_step():
+    assert buttons.match("clara", ("back", "branch")) == Button("branch", "clara")
+    assert buttons.match("sotuv bo'limi", ("back", "department")) == Button("department", "sotuv")
+    assert buttons.match("orqaga", ("back", "branch")) == BACK
+    # Not one of the step's actions, or ambiguous between them
+    assert buttons.match("clara", ("back", "department")) is None
+    assert buttons.match("🏢 Kompaniya haqida", ("back", "branch")) is None
+    assert buttons.match("orqaga", ("back", "menu_back")) is None
+
+
+def test_labels_of_every_language_are_indexed(tmp_path, monkeypatch):
+    (tmp_path / "uz.json").write_text(json.dumps({"button_back": "🔙 Orqaga"}), encoding="utf-8")
+    (tmp_path / "en.json").write_text(json.dumps({"button_back": "🔙 Back"}), encoding="utf-8")
+    catalog = TextCatalog(tmp_path, languages=("uz", "en"), default="uz")
+    catalog.load()
+    monkeypatch.setattr(buttons_module, "texts", catalog)
+    index = ButtonIndex()
+    index.build()
+    assert index.resolve("🔙 Orqaga") == index.resolve("🔙 back") == BACK
+    assert index.match("back", ("back",)) == BACK
+
+
+def test_filter_passes_the_button():
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type="private"), text="☎️ Kontaktlar")
+    assert asyncio.run(ReplyButton("contacts", "about")(message)) == {"button": Button("contacts")}
+    assert asyncio.run(ReplyButton("about")(message)) is False
+    with pytest.raises(ValueError):
+        ReplyButton("teleport")
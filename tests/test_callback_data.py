@@ -0,0 +1,86 @@
+"""
+Tests for the compact callback_data codec.
+"""
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, User
+
+from bot.config import POSITIONS
+from bot.keyboards import inline_keyboards
+from bot.keyboards.callback_data import (
+    MAX_CALLBACK_BYTES, CallbackKind, CallbackPayload, decode_callback, encode_callback
+)
+
+
+def _buttons(markup):
+    return [button for row in markup.inline_keyboard for button in row]
+
+
+def test_every_inline_button_round_trips():
+    keyboards = [
+        inline_keyboards.get_education_keyboard(), inline_keyboards.get_gender_keyboard(),
+        inline_keyboards.get_language_level_keyboard("russian"), inline_keyboards.get_language_level_keyboard("english"),
+        inline_keyboards.get_confirmation_keyboard(), inline_keyboards.get_skip_keyboard(),
+        inline_keyboards.get_language_selection_keyboard(), inline_keyboards.get_phone_confirmation_keyboard(),
+        inline_keyboards.get_hr_decision_keyboard(7_123_456_789),
+    ] + [inline_keyboards.get_position_keyboard(department) for department in POSITIONS]
+    for markup in keyboards:
+        for button in _buttons(markup):
+            assert decode_callback(button.callback_data) is not None, button.callback_data
+            assert len(button.callback_data) <= 8
+
+    positions = _buttons(inline_keyboards.get_position_keyboard("akademik"))
+    decoded = [decode_callback(button.callback_data) for button in positions]
+    assert [payload.value for payload in decoded] == [*POSITIONS["akademik"], "back"]
+    hr = [decode_callback(button.callback_data) for button in _buttons(inline_keyboards.get_hr_decision_keyboard(42))]
+    assert hr == [CallbackPayload("approve", id=42), CallbackPayload("interview", id=42), CallbackPayload("reject", id=42)]
+
+
+@pytest.mark.parametrize("data, payload", [
+    ("position:IELTS Instructor", CallbackPayload("position", value="IELTS Instructor")),
+    ("russian_level:O'rtacha", CallbackPayload("russian_level", value="O'rtacha")),
+    ("approve_123", CallbackPayload("approve", id=123)),
+    ("reject_5", CallbackPayload("reject", id=5)),
+    ("hr_search:10", CallbackPayload("hr_search", id=10)),
+    ("skip", CallbackPayload("skip")),
+    ("lang:ru", CallbackPayload("lang", value="ru")),
+])
+def test_buttons_sent_before_the_compact_format_still_decode(data, payload):
+    assert decode_callback(data) == payload
+
+
+@pytest.mark.parametrize("data", [
+    "", "position:Astronaut", "approve_x", "hr_search:-5", "lang:de", "unknown:1", "s1", "zz",
+])
+def test_invalid_data_decodes_to_none(data):
+    assert decode_callback(data) is None
+
+
+def test_changed_catalog_invalidates_old_buttons():
+    data = encode_callback("education", "Oliy")
+    stale = data[:-1] + ("0" if data[-1] != "0" else "1")  # checksum of another catalog
+    assert decode_callback(data) == CallbackPayload("education", value="Oliy")
+    assert decode_callback(stale) is None
+
+
+def test_encode_rejects_unknown_values():
+    with pytest.raises(ValueError):
+        encode_callback("gender", "Robot")
+    with pytest.raises(ValueError):
+        encode_callback("approve")
+    assert len(encode_callback("approve", id=2 ** 63).encode()) <= MAX_CALLBACK_BYTES
+
+
+def test_filter_passes_decoded_payload():
+    user = User(id=1, is_bot=False, first_name="A")
+
+    def callback(data):
+        return CallbackQuery(id="1", from_user=user, chat_instance="ci", data=data)
+
+    position = CallbackKind("position")
+    result = asyncio.run(position(callback(encode_callback("position", "SAT Teacher"))))
+    assert result == {"payload": CallbackPayload("position", value="SAT Teacher")}
+    assert asyncio.run(position(callback(encode_callback("education", "Oliy")))) is False
+    with pytest.raises(ValueError):
+        CallbackKind("nonsense")
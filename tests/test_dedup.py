@@ -0,0 +1,166 @@
+"""
+Tests for repeat application detection.
+"""
+import asyncio
+
+from aiogram.types import Update
+
+from bot.handlers import application_handlers
+from bot.models.application_draft import ApplicationDraft
+from bot.services import dedup
+from bot.services.dedup import BloomFilter, DuplicateDetector
+from tests.test_application_flow import HR_GROUP, application_steps
+
+
+def _draft(user_id: int, phone: str = "+998901112233", position: str = "IELTS Instructor",
+           name: str = "Ali", dob: str = "01.01.2000") -> ApplicationDraft:
+    draft = ApplicationDraft.from_dict({
+        "department_key": "akademik", "position": position, "phone": phone,
+        "passport_name": name, "passport_surname": "Valiyev", "date_of_birth": dob,
+    })
+    draft.user_id = user_id
+    return draft
+
+
+async def _submit(detector: DuplicateDetector, draft: ApplicationDraft):
+    """What the confirmation handler does for an application that is queued"""
+    match = await detector.check(draft)
+    await detector.record(draft, match)
+    return match
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    items = [f"item-{i}".encode() for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}".encode() in bloom for i in range(10_000))
+    assert false_positives < 300  # ~1% expected
+
+
+def test_repeats_are_matched_per_position_and_cooldown(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(dedup.time, "time", lambda: now[0])
+
+    async def scenario():
+        detector = DuplicateDetector(tmp_path / "dedup.sqlite3", position_cooldown_days={"SAT Teacher": 1})
+        results = [
+            await _submit(detector, _draft(1)),
+            # Other Telegram account, same phone written differently
+            await _submit(detector, _draft(2, phone="90 111 22 33")),
+            # Same person (name in other case), other position
+            await _submit(detector, _draft(3, phone="+998907770000", name="ALI", position="SAT Teacher")),
+        ]
+        now[0] += 2 * 86400  # past the SAT Teacher cooldown, within the default 30 days
+        results.append(await _submit(detector, _draft(3, phone="+998907770000", position="SAT Teacher")))
+        results.append(await _submit(detector, _draft(4, phone="+998905550000", name="Ali")))
+        await detector.close()
+        return detector, results
+
+    detector, (first, by_phone, other_position, after_cooldown, by_identity) = asyncio.run(scenario())
+    assert first is None
+    assert by_phone.matched_on == ["phone", "identity"]
+    assert other_position is None
+    assert after_cooldown is None
+    assert by_identity.matched_on == ["identity"] and by_identity.repeats == 1
+    assert detector.duplicates == 2
+
+
+def test_prefilter_survives_restart_and_skips_lookups_for_new_applicants(tmp_path):
+    path = tmp_path / "dedup.sqlite3"
+
+    async def first_run():
+        detector = DuplicateDetector(path)
+        await detector.start()
+        for user_id in range(50):
+            await _submit(detector, _draft(user_id, phone=f"+9989012{user_id:05d}", name=f"N{user_id}"))
+        await detector.close()
+        return detector
+
+    async def second_run():
+        detector = DuplicateDetector(path, mode="merge")
+        await detector.start()
+        match = await detector.check(_draft(7, phone="+998900000000", name="Other"))
+        await detector.close()
+        return detector, match
+
+    first = asyncio.run(first_run())
+    assert first.prefilter_hits <= 2  # only Bloom false positives reach the disk
+    second, match = asyncio.run(second_run())
+    assert match.matched_on == ["user"]
+    assert second.prefilter_hits == 1
+
+
+def test_merged_repeat_is_not_posted_to_hr(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    monkeypatch.setattr(dispatcher["duplicates"], "mode", "merge")
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for _ in range(2):
+                for raw in application_steps():
+                    update = Update.model_validate(raw, context={"bot": fake_bot})
+                    await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    headers = [
+        method for name, method in fake_bot.session.calls
+        if name == "sendPhoto" and getattr(method, "chat_id", None) == HR_GROUP and method.reply_markup
+    ]
+    assert len(headers) <= 1
+    edits = [method.text for name, method in fake_bot.session.calls if name == "editMessageText"]
+    assert any("yaqinda ariza topshirgansiz" in text for text in edits)
+
+
+def _other_applicant(steps, user_id: int, phone: str, name: str):
+    """application_steps() of an applicant nobody has matched before"""
+    for step in steps:
+        update = step.get("message") or step["callback_query"]
+        update["from"]["id"] = user_id
+        (update.get("chat") or update["message"]["chat"])["id"] = user_id
+        if update.get("text") == "+998901234567":
+            update["text"] = phone
+        elif update.get("text") == "Ali":
+            update["text"] = name
+    return steps
+
+
+def test_failed_enqueue_is_not_recorded(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    monkeypatch.setattr(dispatcher["duplicates"], "mode", "merge")
+    outbox = dispatcher["outbox"]
+    enqueue = outbox.enqueue
+    attempts = []
+
+    async def failing_once(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise OSError("disk full")
+        return await enqueue(*args, **kwargs)
+
+    monkeypatch.setattr(outbox, "enqueue", failing_once)
+    steps = _other_applicant(application_steps(), user_id=4004, phone="+998904004004", name="Bobur")
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in steps + steps[-1:]:  # the applicant presses "yes" again
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(outbox.join(), timeout=5)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+    headers = [
+        method for name, method in fake_bot.session.calls
+        if name == "sendPhoto" and getattr(method, "chat_id", None) == HR_GROUP and method.reply_markup
+    ]
+    assert len(headers) == 1
+    assert "TAKRORIY" not in (headers[0].caption or "")
@@ -0,0 +1,104 @@
+"""
+Tests for the evicting in-memory FSM storage.
+"""
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.storage import evicting_storage
+from bot.storage.evicting_storage import EvictingMemoryStorage
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_idle_records_are_spilled_and_rehydrated(tmp_path):
+    async def scenario():
+        storage = EvictingMemoryStorage(
+            tmp_path / "spill.sqlite3",
+            default_ttl=3600,
+            state_ttls={"waiting_for_photo": 0},
+        )
+        try:
+            await storage.set_state(_key(1), "ApplicationStates:waiting_for_photo")
+            await storage.set_data(_key(1), {"draft": b"\x01abc"})
+            await storage.set_state(_key(2), "ApplicationStates:waiting_for_phone")
+
+            assert await storage.sweep() == 1
+            assert storage.evictions == 1
+            assert _key(1) not in storage._entries
+
+            assert await storage.get_state(_key(1)) == "ApplicationStates:waiting_for_photo"
+            assert await storage.get_data(_key(1)) == {"draft": b"\x01abc"}
+            assert storage.rehydrations == 1
+            assert await storage.get_state(_key(3)) is None
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_memory_budget_evicts_least_recently_used(tmp_path):
+    async def scenario():
+        storage = EvictingMemoryStorage(tmp_path / "spill.sqlite3", memory_budget=2000)
+        try:
+            for user_id in range(10):
+                await storage.set_data(_key(user_id), {"note": "x" * 100})
+            await storage.get_data(_key(0))  # recently used again
+
+            assert storage.memory_bytes <= 2000
+            assert storage.evictions > 0
+            assert _key(0) in storage._entries
+            assert _key(1) not in storage._entries
+            assert await storage.get_data(_key(1)) == {"note": "x" * 100}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_records_survive_restart(tmp_path):
+    path = tmp_path / "spill.sqlite3"
+
+    async def scenario():
+        storage = EvictingMemoryStorage(path)
+        await storage.set_state(_key(5), "ApplicationStates:waiting_for_address")
+        await storage.close()
+
+        storage = EvictingMemoryStorage(path)
+        try:
+            return await storage.get_state(_key(5))
+        finally:
+            await storage.close()
+
+    assert asyncio.run(scenario()) == "ApplicationStates:waiting_for_address"
+
+
+def test_old_spilled_records_are_purged(tmp_path, monkeypatch):
+    path = tmp_path / "spill.sqlite3"
+    clock = [1_000_000.0]
+    monkeypatch.setattr(evicting_storage.time, "time", lambda: clock[0])
+
+    async def scenario():
+        storage = EvictingMemoryStorage(path, default_ttl=0, max_spill_age=3600)
+        await storage.set_state(_key(1), "ApplicationStates:waiting_for_photo")
+        await storage.sweep()
+        clock[0] += 1800
+        await storage.set_state(_key(2), "ApplicationStates:waiting_for_photo")
+        await storage.sweep()
+        clock[0] += 2400  # user 1 spilled 70 minutes ago, user 2 40 minutes ago
+        await storage.sweep()
+        assert storage.purged == 1
+        assert await storage.get_state(_key(1)) is None
+        await storage.close()
+
+        clock[0] += 3600  # user 2 spilled 100 minutes ago: purged at open
+        storage = EvictingMemoryStorage(path, max_spill_age=3600)
+        try:
+            assert storage.purged == 1
+            return await storage.get_state(_key(2))
+        finally:
+            await storage.close()
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,104 @@
+"""
+Tests for CSV/XLSX export of applications.
+"""
+import asyncio
+import csv
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+import pytest
+
+from bot.handlers.hr_handlers import parse_export_args
+from bot.models.application_draft import ApplicationDraft
+from bot.services.export import COLUMNS, export_applications, main
+from bot.storage.applications import ApplicationStore
+
+_NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def _fill(store: ApplicationStore, rows: int) -> None:
+    drafts = []
+    for index in range(rows):
+        draft = ApplicationDraft.from_dict({
+            "department_key": "akademik",
+            "position": "IELTS Instructor" if index % 2 else "SAT Teacher",
+            "branch_key": "clara",
+            "passport_name": f"Ali <{index}> & \x01co",
+            "submission_date": f"{index % 28 + 1:02d}.03.2026 10:00",
+            "ielts_certificate": "pdf" if index == 1 else None,
+        })
+        draft.user_id = index
+        drafts.append(draft)
+    asyncio.run(store.add_many(drafts))
+
+
+def test_csv_export_streams_all_matching_rows(tmp_path):
+    store = ApplicationStore(tmp_path / "applications.sqlite3")
+    _fill(store, 25)
+    path = tmp_path / "out.csv"
+    count = asyncio.run(export_applications(
+        store, path, "csv", position="IELTS Instructor", since=datetime(2026, 3, 1), batch_size=4,
+    ))
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        rows = list(csv.reader(file))
+    assert count == 12
+    assert rows[0] == [title for _, title in COLUMNS]
+    assert len(rows) == 13
+    assert len({row[0] for row in rows[1:]}) == 12  # keyset pages do not repeat rows
+    assert rows[1][COLUMNS.index(("position", "Lavozim"))] == "IELTS Instructor"
+
+
+def test_xlsx_export_is_valid_spreadsheet(tmp_path):
+    store = ApplicationStore(tmp_path / "applications.sqlite3")
+    _fill(store, 5)
+    path = tmp_path / "out.xlsx"
+    count = asyncio.run(export_applications(store, path, "xlsx", branch="clara"))
+    with zipfile.ZipFile(path) as archive:
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        ElementTree.fromstring(archive.read("[Content_Types].xml"))
+    rows = sheet.findall(".//x:row", _NS)
+    assert count == 5 and len(rows) == 6
+    texts = [t.text for t in rows[1].findall(".//x:t", _NS)]
+    assert any(text.startswith("Ali <") and "&" in text for text in texts)
+
+
+def test_csv_cells_never_run_as_formulas(tmp_path):
+    store = ApplicationStore(tmp_path / "applications.sqlite3")
+    draft = ApplicationDraft.from_dict({
+        "passport_name": "-Ali",
+        "phone": "+998901234567",
+        "last_workplace": '=HYPERLINK("http://evil.example","x")',
+        "hear_about": "@SUM(1+1)",
+        "address": "Toshkent = markaz",
+    })
+    asyncio.run(store.add_many([draft]))
+    path = tmp_path / "out.csv"
+    asyncio.run(export_applications(store, path, "csv"))
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        header, row = list(csv.reader(file))
+    cells = dict(zip(header, row))
+    assert cells["Ism"] == "'-Ali"
+    assert cells["Telefon"] == "'+998901234567"
+    assert cells["Oxirgi ish joyi"] == '\'=HYPERLINK("http://evil.example","x")'
+    assert cells["Qayerdan eshitgan"] == "'@SUM(1+1)"
+    assert cells["Manzil"] == "Toshkent = markaz"
+
+
+def test_cli_export(tmp_path, capsys):
+    db = tmp_path / "applications.sqlite3"
+    _fill(ApplicationStore(db), 3)
+    assert main(["--db", str(db), "-o", str(tmp_path / "all.csv"), "--until", "2026-03-02"]) == 0
+    assert "2 applications written" in capsys.readouterr().out
+
+
+def test_export_arguments():
+    fmt, filters = parse_export_args('csv branch=clara position=“IELTS Instructor” from=2026-03-01 to=2026-03-31')
+    assert fmt == "csv"
+    assert filters == {
+        "branch": "clara", "position": "IELTS Instructor",
+        "since": datetime(2026, 3, 1), "until": datetime(2026, 4, 1),
+    }
+    for bad in ("branch=Tashkent", "from=01.03.2026", 'position="IELTS'):
+        with pytest.raises(ValueError):
+            parse_export_args(bad)
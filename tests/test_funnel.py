@@ -0,0 +1,117 @@
+"""
+Tests for funnel analytics.
+"""
+import asyncio
+import time
+
+from aiogram.types import Update
+
+from bot.handlers import application_handlers
+from bot.handlers.hr_handlers import format_funnel, parse_funnel_args
+from bot.middlewares import funnel as funnel_module
+from bot.middlewares.funnel import STEPS, SUBMITTED, FunnelTracker
+from tests.test_application_flow import HR_GROUP, application_steps
+
+BRANCH = "waiting_for_branch"
+DEPARTMENT = "waiting_for_department"
+
+
+def _state(step: str) -> str:
+    return f"ApplicationStates:{step}"
+
+
+def test_rollups_add_up_across_flushes_and_trackers(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(funnel_module.time, "monotonic", lambda: clock[0])
+
+    async def scenario():
+        first = FunnelTracker(tmp_path / "funnel.sqlite3")
+        second = FunnelTracker(tmp_path / "funnel.sqlite3")  # another worker process
+        for user_id in range(3):
+            first.record(user_id, None, _state(BRANCH), "clara", None)
+        clock[0] += 20
+        first.record(0, _state(BRANCH), _state(DEPARTMENT), "clara", None)
+        first.record(1, _state(BRANCH), None, "clara", None)  # cancelled
+        await first.flush()
+        second.record(5, None, _state(BRANCH), "dilmurod", None)
+        # Going back does not count as reaching the earlier step again
+        first.record(0, _state(DEPARTMENT), _state(BRANCH), "clara", None)
+        await second.close()
+        everything = await first.report(0)
+        clara = await first.report(0, branch="clara")
+        await first.close()
+        return everything, clara
+
+    everything, clara = asyncio.run(scenario())
+    steps = {stats.step: stats for stats in everything}
+    assert [stats.step for stats in everything] == STEPS
+    assert steps[BRANCH].entries == 4 and steps[BRANCH].exits == 2
+    assert steps[DEPARTMENT].entries == 1 and steps[DEPARTMENT].exits == 1
+    assert steps[BRANCH].dwell_percentile(0.5) == 30  # 20 s falls in the 15-30 s bucket
+    assert {stats.step: stats.entries for stats in clara}[BRANCH] == 3
+
+
+def test_submitted_application_reaches_the_last_step(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    tracker: FunnelTracker = dispatcher["funnel"]
+    since = time.time() - 60
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            before = {stats.step: stats.entries for stats in await tracker.report(since, branch="clara")}
+            for raw in application_steps():
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+            after = await tracker.report(since, branch="clara", position="IELTS Instructor")
+            return before, after
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    before, after = asyncio.run(scenario())
+    reached = {stats.step: stats.entries for stats in after}
+    assert reached[SUBMITTED] == before.get(SUBMITTED, 0) + 1
+    assert reached["waiting_for_confirmation"] >= 1
+    text = format_funnel(after, 1, {"branch": "clara"})
+    assert "submitted" in text and "(branch=clara)" in text
+
+
+def test_funnel_does_not_read_the_state_again(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    storage = dispatcher.fsm.storage
+    reads = []
+    get_state = storage.get_state
+
+    async def counting_get_state(key):
+        reads.append(key)
+        return await get_state(key)
+
+    monkeypatch.setattr(storage, "get_state", counting_get_state)
+    steps = application_steps()
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in steps:
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    # Only aiogram's own read of raw_state before the filters
+    assert len(reads) == len(steps)
+
+
+def test_funnel_args():
+    assert parse_funnel_args('days=30 branch=clara position="IELTS Instructor"') == (
+        30, {"branch": "clara", "position": "IELTS Instructor"}
+    )
+    assert parse_funnel_args(None) == (7, {})
+    for bad in ("days=0", "branch=nowhere", 'position="'):
+        try:
+            parse_funnel_args(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
@@ -0,0 +1,52 @@
+"""
+Tests for fuzzy matching of typed answers.
+"""
+import pytest
+
+from bot.keyboards.buttons import BACK, Button, buttons
+from bot.utils.fuzzy import FuzzyMatcher, edit_distance, fold
+
+
+def test_fold_transliterates_and_drops_punctuation():
+    assert fold("🧳 Bo‘sh ish O'rinlari") == "bosh ish orinlari"
+    assert fold("Сотув бўлими") == "sotuv bolimi"
+    assert fold("Videographer / Editor") == "videographer editor"
+
+
+def test_edit_distance_stops_at_limit():
+    assert edit_distance("supervisr", "supervisor", 2) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("abc", "xyzuvw", 1) == 2
+
+
+def test_match_is_unique_or_nothing():
+    matcher = FuzzyMatcher([(1, "General English Teacher"), (2, "Kids English Teacher"), (3, "1 year"), (4, "2 years")])
+    assert matcher.match("general english") == 1
+    assert matcher.match("kids engl") is None
+    assert matcher.match("english") is None
+    assert matcher.match("Genral English Teacher") == 1
+    assert matcher.match("2 year") == 4
+    assert matcher.match("english", accept=lambda value: value == 2) == 2
+
+
+@pytest.mark.parametrize("text, actions, button", [
+    ("Клара", ("back", "branch"), Button("branch", "clara")),
+    ("biznes markaz", ("back", "branch"), Button("branch", "business_center")),
+    ("akademk", ("back", "department"), Button("department", "akademik")),
+    ("tajribasiz", ("back", "work_experience"), Button("work_experience", "No experience")),
+    ("1-3 yil", ("back", "work_experience"), Button("work_experience", "1-3 years")),
+    ("3 yil", ("back", "work_experience"), None),
+    ("year", ("back", "work_experience"), None),
+    ("yeer", ("back", "work_experience"), None),
+    ("1 yer", ("back", "work_experience"), Button("work_experience", "1 year")),
+    ("orqga", ("back", "branch"), BACK),
+    ("xyz", ("back", "branch"), None),
+])
+def test_typed_catalog_answers(text, actions, button):
+    assert buttons.match(text, actions) == button
+
+
+def test_positions_are_limited_to_the_department():
+    assert buttons.match("supervisr", ("back", "position"), ids=["Supervisor", "HR"]) == Button("position", "Supervisor")
+    assert buttons.match("supervisr", ("back", "position"), ids=["Administrator"]) is None
+    assert buttons.match("ielts", ("back", "position"), ids=["IELTS Instructor"]) == Button("position", "IELTS Instructor")
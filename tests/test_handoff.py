@@ -0,0 +1,93 @@
+"""
+Tests for the restart handoff protocol.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from aiogram import Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import run
+from bot.runtime.handoff import ExclusiveResources, HandoffServer, import_records, request_handoff
+
+KEY = StorageKey(bot_id=42, chat_id=3003, user_id=3003)
+
+
+def test_state_and_offset_are_handed_over(tmp_path):
+    socket_path = tmp_path / "handoff.sock"
+
+    async def scenario():
+        old_storage = MemoryStorage()
+        await old_storage.set_state(KEY, "ApplicationStates:waiting_for_photo")
+        await old_storage.set_data(KEY, {"draft": b"\x01\x02"})
+
+        server = HandoffServer(socket_path, old_storage)
+        await server.start()
+        stopped = asyncio.Event()
+        server.on_request = stopped.set
+
+        async def old_update_loop():
+            await stopped.wait()
+            server.release(offset=77)
+            await server.completed.wait()
+
+        loop_task = asyncio.create_task(old_update_loop())
+        snapshot = await request_handoff(socket_path)
+        await loop_task
+        await server.close()
+
+        new_storage = MemoryStorage()
+        await import_records(new_storage, snapshot.records)
+        return snapshot, await new_storage.get_state(KEY), await new_storage.get_data(KEY)
+
+    snapshot, state, data = asyncio.run(scenario())
+    assert snapshot.offset == 77
+    assert state == "ApplicationStates:waiting_for_photo"
+    assert data == {"draft": b"\x01\x02"}
+
+
+def test_no_running_instance(tmp_path):
+    assert asyncio.run(request_handoff(tmp_path / "missing.sock")) is None
+
+
+def test_exclusive_resources_wait_for_the_previous_instance():
+    calls = []
+    exclusive = ExclusiveResources()
+
+    async def start_outbox(bot):
+        calls.append(("start", bot))
+
+    async def close_outbox():
+        calls.append(("close", None))
+
+    exclusive.startup.register(start_outbox)
+    exclusive.shutdown.register(close_outbox)
+    dp = Dispatcher()
+    exclusive.attach(dp)
+
+    async def scenario():
+        exclusive.deferred = True
+        await dp.emit_startup(bot="new")
+        assert calls == []
+        await exclusive.start(bot="new")
+        await dp.emit_shutdown(bot="new")
+        await exclusive.close()
+
+    asyncio.run(scenario())
+    assert calls == [("start", "new"), ("close", None)]
+
+
+def test_instance_that_handed_over_is_not_killed(tmp_path, monkeypatch):
+    monkeypatch.setattr(run, "LOCK_FILE", tmp_path / "bot.lock")
+    old = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        run.LOCK_FILE.write_text(str(old.pid))
+        assert run.acquire_instance_lock(handed_over_pid=old.pid)
+        assert old.poll() is None
+        assert run.LOCK_FILE.read_text() == str(os.getpid())
+    finally:
+        old.kill()
+        old.wait()
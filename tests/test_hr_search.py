@@ -0,0 +1,102 @@
+"""
+Tests for the HR /search command.
+"""
+import asyncio
+import itertools
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from bot.handlers import hr_handlers
+from bot.models.application_draft import ApplicationDraft
+from bot.storage.applications import ApplicationStore, fts_query
+
+HR_GROUP = -1007777
+
+_ids = itertools.count(5000)
+
+
+def _draft(user_id: int, name: str, workplace: str = "Cambridge school") -> ApplicationDraft:
+    draft = ApplicationDraft.from_dict({
+        "department_key": "akademik", "position": "IELTS Instructor", "branch_key": "clara",
+        "passport_name": name, "passport_surname": "Karimov", "address": "Andijon, Bobur shoh ko'chasi",
+        "last_workplace": workplace, "hear_about": "Instagram", "submission_date": "01.04.2026 09:00",
+    })
+    draft.user_id = user_id
+    return draft
+
+
+def _hr_update(text: str, chat_id: int = HR_GROUP) -> dict:
+    return {"update_id": next(_ids), "message": {
+        "message_id": next(_ids), "date": 0, "text": text,
+        "chat": {"id": chat_id, "type": "supergroup", "title": "HR"},
+        "from": {"id": 77, "is_bot": False, "first_name": "HR"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+    }}
+
+
+def _page_update(text: str, offset: int) -> dict:
+    results = {
+        "message_id": next(_ids), "date": 0, "text": "results",
+        "chat": {"id": HR_GROUP, "type": "supergroup", "title": "HR"},
+        "reply_to_message": {
+            "message_id": next(_ids), "date": 0, "text": text,
+            "chat": {"id": HR_GROUP, "type": "supergroup", "title": "HR"},
+        },
+    }
+    return {"update_id": next(_ids), "callback_query": {
+        "id": str(next(_ids)), "chat_instance": "ci", "data": f"hr_search:{offset}",
+        "from": {"id": 77, "is_bot": False, "first_name": "HR"}, "message": results,
+    }}
+
+
+def test_fts_query_quotes_words_as_prefixes():
+    assert fts_query("Ali  Vali-ev") == '"ali"* "vali"* "ev"*'
+    assert fts_query('" * -') is None
+
+
+def test_search_ranks_name_matches_first(tmp_path):
+    async def scenario():
+        store = ApplicationStore(tmp_path / "applications.sqlite3")
+        await store.add_many([
+            _draft(1, "Bekzod", workplace="Sardor cafe"),
+            _draft(2, "Sardor"),
+            _draft(3, "Jasur"),
+        ])
+        result = await store.search("sardor")
+        prefix = await store.search("kari bobur")
+        await store.close()
+        return result, prefix
+
+    (total, rows), (prefix_total, _) = asyncio.run(scenario())
+    assert total == 2
+    assert [row["user_id"] for row in rows] == [2, 1]
+    assert prefix_total == 3
+
+
+def test_search_command_is_paged_and_limited_to_hr_group(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(hr_handlers, "HR_GROUP_ID", HR_GROUP)
+    applications = dispatcher["applications"]
+
+    async def scenario():
+        await applications.add_many(_draft(8000 + i, "Zebiniso") for i in range(7))
+        results = []
+        for raw in (
+            _hr_update("/search zebiniso"),
+            _hr_update("/search zebiniso", chat_id=12345),  # not the HR group: ignored
+            _page_update("/search zebiniso", hr_handlers.PAGE_SIZE),
+        ):
+            results.append(await dispatcher.feed_update(fake_bot, Update.model_validate(raw, context={"bot": fake_bot})))
+        return results
+
+    first_page, ignored, _ = asyncio.run(scenario())
+    # The first page is returned as reply method (sent by polling/webhook), later pages edit it
+    assert first_page.__api_method__ == "sendMessage"
+    assert ignored is UNHANDLED
+    calls = fake_bot.session.calls
+    assert [name for name, _ in calls] == ["editMessageText", "answerCallbackQuery"]
+    second_page = calls[0][1]
+    assert first_page.text.startswith('🔎 "zebiniso": 7 ta natija (1-5)')
+    assert [button.text for button in first_page.reply_markup.inline_keyboard[0]] == ["➡️"]
+    assert "(6-7)" in second_page.text
+    assert [button.text for button in second_page.reply_markup.inline_keyboard[0]] == ["⬅️"]
@@ -0,0 +1,84 @@
+"""
+Tests for the prebuilt keyboard registry.
+"""
+import asyncio
+import json
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import POSITIONS, SUPPORTED_LANGUAGES
+from bot.keyboards import inline_keyboards, reply_keyboards
+from bot.keyboards import registry as keyboard_registry
+from bot.keyboards.callback_data import CallbackPayload, decode_callback
+from bot.keyboards.registry import KeyboardRegistry, install_prebuilt_markups, keyboards, to_json
+
+TOKEN = "42:TEST"
+
+
+def _form_fields(form):
+    return {options["name"]: value for options, _, value in form._fields}
+
+
+def test_factories_return_the_same_prebuilt_markup():
+    keyboards.refresh()
+    for lang in SUPPORTED_LANGUAGES:
+        # Built per language when the factory takes `lang`, shared otherwise
+        assert reply_keyboards.get_main_menu_keyboard(lang=lang) is reply_keyboards.get_main_menu_keyboard(lang=lang)
+        assert inline_keyboards.get_education_keyboard(lang=lang) is inline_keyboards.get_education_keyboard()
+    for department in POSITIONS:
+        markup = inline_keyboards.get_position_keyboard(department)
+        assert markup is inline_keyboards.get_position_keyboard(department_key=department)
+        assert markup._json == to_json(inline_keyboards.get_position_keyboard.build(department))
+    assert reply_keyboards.get_phone_keyboard().model_dump() == reply_keyboards.get_phone_keyboard.build().model_dump()
+
+
+def test_template_renders_ids_into_buttons_and_json():
+    markup = inline_keyboards.get_hr_decision_keyboard(123456789)
+    built = inline_keyboards.get_hr_decision_keyboard.build(123456789)
+    assert markup.inline_keyboard == built.inline_keyboard
+    assert markup._json == to_json(built)
+    decoded = [decode_callback(button.callback_data) for row in markup.inline_keyboard for button in row]
+    assert decoded == [CallbackPayload(kind, id=123456789) for kind in ("approve", "interview", "reject")]
+    assert inline_keyboards.get_hr_decision_keyboard(0).inline_keyboard[0][0].callback_data == "a0"
+
+
+def test_refresh_rebuilds_only_after_a_catalog_change(monkeypatch):
+    registry = KeyboardRegistry()
+    catalog = ["one", "two"]
+
+    def build():
+        return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=item, callback_data=item)] for item in catalog])
+
+    registry.register("items", build)
+    monkeypatch.setattr(keyboard_registry, "catalog_version", lambda: len(catalog))
+    assert registry.refresh() is True
+    first = registry.get("items")
+    assert registry.refresh() is False and registry.get("items") is first
+
+    catalog.append("three")
+    assert registry.refresh() is True and registry.builds == 2
+    assert [row[0].text for row in registry.get("items").inline_keyboard] == catalog
+    with pytest.raises(ValueError):
+        registry.register("items", build)
+
+
+def test_session_sends_the_prebuilt_json():
+    async def run():
+        session = AiohttpSession()
+        bot = Bot(TOKEN, session=session)
+        markup = reply_keyboards.get_phone_keyboard()
+        plain = _form_fields(session.build_form_data(bot, SendMessage(chat_id=1, text="hi", reply_markup=markup)))
+        await install_prebuilt_markups(bot)
+        await install_prebuilt_markups(bot)  # installs once
+        prebuilt = _form_fields(session.build_form_data(bot, SendMessage(chat_id=1, text="hi", reply_markup=markup)))
+        await session.close()
+        return plain, prebuilt
+
+    plain, prebuilt = asyncio.run(run())
+    assert prebuilt["reply_markup"] == reply_keyboards.get_phone_keyboard()._json
+    assert json.loads(prebuilt.pop("reply_markup")) == json.loads(plain.pop("reply_markup"))
+    assert prebuilt == plain
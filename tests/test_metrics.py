@@ -0,0 +1,102 @@
+"""
+Tests for Prometheus metrics.
+"""
+import asyncio
+import socket
+
+from aiogram.types import Update
+from aiohttp import ClientSession
+
+from bot.handlers import application_handlers
+from bot.middlewares.metrics import StateCounts
+from bot.services.metrics import MetricsServer, Registry
+from tests.test_application_flow import HR_GROUP, application_steps
+
+
+def test_histogram_exposition_is_cumulative():
+    registry = Registry(prefix="")
+    histogram = registry.histogram("latency_seconds", "Latency", ["handler"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, "process_phone")
+    registry.counter("errors_total", "Errors", ["method"]).inc('say "hi"')
+    text = asyncio.run(registry.render())
+    assert 'latency_seconds_bucket{handler="process_phone",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{handler="process_phone",le="1"} 3' in text
+    assert 'latency_seconds_bucket{handler="process_phone",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{handler="process_phone"} 4' in text
+    assert 'latency_seconds_sum{handler="process_phone"} 4.05' in text
+    assert 'errors_total{method="say \\"hi\\""} 1' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_application_flow_is_measured(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    metrics = dispatcher["metrics"]
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in application_steps():
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+            return await metrics.registry.render()
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    text = asyncio.run(scenario())
+    assert metrics.handler_seconds.count("process_confirmation") >= 1
+    assert metrics.api_seconds.count("sendMessage") >= 1
+    assert metrics.storage_seconds.count("get_data") >= 1
+    assert metrics.updates_in_flight.value() == 0
+    assert 'hrbot_handler_duration_seconds_count{handler="process_phone"}' in text
+    assert "hrbot_outbox_delivered_total" in text
+    assert "# TYPE hrbot_fsm_drafts gauge" in text
+
+
+def test_metrics_endpoint_serves_text_format():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    async def scenario():
+        registry = Registry()
+        registry.counter("updates_total", "Updates", ["type"]).inc("message")
+        server = MetricsServer(registry, "127.0.0.1", port)
+        await server.start()
+        try:
+            async with ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    return response.status, response.headers["Content-Type"], await response.text()
+        finally:
+            await server.close()
+
+    status, content_type, body = asyncio.run(scenario())
+    assert status == 200 and content_type.startswith("text/plain")
+    assert 'hrbot_updates_total{type="message"} 1' in body
+
+
+class _CountingStorage:
+    def __init__(self):
+        self.counts = 0
+
+    async def state_counts(self):
+        self.counts += 1
+        return {"ApplicationStates:waiting_for_photo": self.counts}
+
+
+def test_fsm_drafts_are_not_recounted_on_every_scrape():
+    storage = _CountingStorage()
+    registry = Registry(prefix="")
+    registry.collector("fsm_drafts", "Drafts", StateCounts(storage, max_age=3600), labelnames=["state"])
+
+    async def scenario():
+        return [await registry.render() for _ in range(3)]
+
+    texts = asyncio.run(scenario())
+    assert storage.counts == 1
+    assert all('fsm_drafts{state="waiting_for_photo"} 1' in text for text in texts)
+
+    recounting = StateCounts(storage, max_age=0)
+    asyncio.run(recounting())
+    assert asyncio.run(recounting()) == [(("waiting_for_photo",), 3)]
@@ -0,0 +1,92 @@
+"""
+Tests for the durable HR submission outbox.
+"""
+import asyncio
+import json
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.models.application_draft import ApplicationDraft
+from bot.services.outbox import Outbox
+
+HR_GROUP = -1008888
+
+
+def _draft() -> ApplicationDraft:
+    draft = ApplicationDraft.from_dict({"photo": "photo-1", "ielts_certificate": "pdf-1"})
+    draft.user_id = 6006
+    return draft
+
+
+def _sent(fake_bot):
+    return [name for name, _ in fake_bot.session.calls]
+
+
+def test_application_is_delivered_and_journaled(tmp_path, fake_bot):
+    path = tmp_path / "outbox.jsonl"
+
+    async def scenario():
+        outbox = Outbox(path)
+        await outbox.start(fake_bot)
+        await outbox.enqueue(HR_GROUP, _draft(), "summary")
+        await asyncio.wait_for(outbox.join(), timeout=5)
+        await outbox.close()
+        return outbox
+
+    outbox = asyncio.run(scenario())
+    assert _sent(fake_bot) == ["sendPhoto", "sendDocument"]
+    assert outbox.delivered == 1
+    ops = [json.loads(line)["op"] for line in path.read_text().splitlines()]
+    assert ops == ["add", "step", "step", "done"]
+
+
+def test_resume_skips_steps_already_posted(tmp_path, fake_bot):
+    path = tmp_path / "outbox.jsonl"
+
+    async def crashed_before_attachments():
+        outbox = Outbox(path)
+        await outbox.enqueue(HR_GROUP, _draft(), "summary")  # not started: nothing delivered
+        await outbox._append({"op": "step", "id": next(iter(outbox._jobs)), "step": "header", "message_id": 55})
+        await outbox.close()
+
+    async def restart():
+        outbox = Outbox(path)
+        await outbox.start(fake_bot)
+        await asyncio.wait_for(outbox.join(), timeout=5)
+        await outbox.close()
+
+    asyncio.run(crashed_before_attachments())
+    with open(path, "a") as journal:
+        journal.write('{"op": "st')  # torn write
+    asyncio.run(restart())
+
+    assert _sent(fake_bot) == ["sendDocument"]
+    assert fake_bot.session.calls[0][1].reply_parameters.message_id == 55
+
+
+def test_failures_are_retried_with_backoff(tmp_path, fake_bot):
+    session = fake_bot.session
+    original = session.make_request
+    failures = {"sendPhoto": 2}
+
+    async def flaky_request(bot, method, timeout=None):
+        if failures.get(method.__api_method__):
+            failures[method.__api_method__] -= 1
+            if failures[method.__api_method__] == 0:
+                raise TelegramRetryAfter(method=method, message="Flood control", retry_after=0)
+            raise RuntimeError("network down")
+        return await original(bot, method, timeout)
+
+    session.make_request = flaky_request
+
+    async def scenario():
+        outbox = Outbox(tmp_path / "outbox.jsonl", base_delay=0.01)
+        await outbox.start(fake_bot)
+        await outbox.enqueue(HR_GROUP, _draft(), "summary")
+        await asyncio.wait_for(outbox.join(), timeout=5)
+        await outbox.close()
+        return outbox
+
+    outbox = asyncio.run(scenario())
+    assert outbox.retries == 2 and outbox.delivered == 1
+    assert _sent(fake_bot) == ["sendPhoto", "sendDocument"]
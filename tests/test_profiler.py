@@ -0,0 +1,73 @@
+"""
+Tests for the event-loop sampling profiler.
+"""
+import asyncio
+import time
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from bot.services.profiler import SamplingProfiler, render_flamegraph
+
+# A function that looks like it lives in bot/handlers/application_handlers.py
+_HANDLER_SOURCE = """
+def busy_handler(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+"""
+_namespace = {"time": time}
+exec(compile(_HANDLER_SOURCE, "bot/handlers/application_handlers.py", "exec"), _namespace)
+busy_handler = _namespace["busy_handler"]
+
+
+def test_profile_finds_the_busy_handler(tmp_path):
+    profiler = SamplingProfiler(tmp_path, interval=0.002)
+
+    async def scenario():
+        async def work():
+            await asyncio.sleep(0.05)
+            busy_handler(0.3)
+
+        task = asyncio.create_task(work())
+        result = await profiler.profile(0.5)
+        await task
+        return result
+
+    result = asyncio.run(scenario())
+    assert not profiler.running
+    assert result.samples > 50
+    assert result.slowest_handlers()[0][0] == "busy_handler"
+    assert any(stack.endswith("application_handlers:busy_handler") for stack in result.stacks)
+    assert 0.2 < result.busy_ratio() < 1
+    assert "busy_handler" in result.summary()
+
+    collapsed, svg = result.save(tmp_path)
+    first_line = collapsed.read_text().splitlines()[0]
+    assert first_line.rsplit(" ", 1)[1].isdigit()
+    assert ElementTree.parse(svg).getroot().tag.endswith("svg")
+
+
+def test_only_one_profile_at_a_time(tmp_path):
+    profiler = SamplingProfiler(tmp_path)
+
+    async def scenario():
+        first = asyncio.create_task(profiler.profile(0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            await profiler.profile(0.1)
+        await first
+
+    asyncio.run(scenario())
+
+
+def test_flamegraph_widths_follow_samples():
+    svg = render_flamegraph({"main;a": 3, "main;b": 1}, title="t & t")
+    root = ElementTree.fromstring(svg)
+    widths = {
+        group.find("{http://www.w3.org/2000/svg}title").text.split(" ")[0]:
+            float(group.find("{http://www.w3.org/2000/svg}rect").get("width"))
+        for group in root.iter("{http://www.w3.org/2000/svg}g")
+    }
+    assert widths["all"] == widths["main"] == 1200
+    assert widths["a"] == 3 * widths["b"]
@@ -0,0 +1,77 @@
+"""
+Tests for the outbound Bot API rate limiter.
+"""
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.middlewares.rate_limiter import Priority, RateLimiter, TokenBucket, request_priority
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=2, capacity=2, now=0)
+    bucket.consume(0)
+    bucket.consume(0)
+    assert bucket.delay(0) == 0.5
+    assert bucket.delay(0.5) == 0
+    bucket.pause(0.5, 3)
+    assert bucket.delay(1) == 2.5
+
+
+def test_interactive_requests_overtake_bulk_fan_out():
+    limiter = RateLimiter(global_per_second=20, chat_per_second=100, group_per_minute=6000)
+    order = []
+
+    async def send(chat_id, priority, label):
+        await limiter.acquire(chat_id, priority)
+        order.append(label)
+
+    async def scenario():
+        # Drain the global burst so everything below has to queue
+        for _ in range(20):
+            await limiter.acquire(-100, Priority.BULK)
+        bulk = [asyncio.create_task(send(-100, Priority.BULK, f"bulk{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth()["bulk"] == 3
+        interactive = asyncio.create_task(send(7, Priority.INTERACTIVE, "reply"))
+        await asyncio.gather(interactive, *bulk)
+
+    asyncio.run(scenario())
+    assert order[0] == "reply"
+    assert order[1:] == ["bulk0", "bulk1", "bulk2"]
+
+
+def test_group_bucket_limits_per_minute():
+    limiter = RateLimiter(global_per_second=1000, chat_per_second=1000, group_per_minute=60)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(17):  # burst of 15, then 1 per second
+            await limiter.acquire(-100, Priority.BULK)
+        return loop.time() - started
+
+    assert 1.5 < asyncio.run(scenario()) < 3
+
+
+def test_retry_after_pauses_chat_and_retries(fake_bot):
+    limiter = RateLimiter(max_retry_wait=5)
+    fake_bot.session.middleware(limiter)
+    original = fake_bot.session.make_request
+    attempts = []
+
+    async def flood_once(bot, method, timeout=None):
+        attempts.append(method.__api_method__)
+        if len(attempts) == 1:
+            raise TelegramRetryAfter(method=method, message="Flood control", retry_after=0)
+        return await original(bot, method, timeout)
+
+    fake_bot.session.make_request = flood_once
+
+    async def scenario():
+        with request_priority(Priority.NOTIFY):
+            await fake_bot.send_message(5, "hello")
+
+    asyncio.run(scenario())
+    assert attempts == ["sendMessage", "sendMessage"]
+    assert limiter.throttled == 1
@@ -0,0 +1,89 @@
+"""
+Tests for the SQLite FSM storage.
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.states.application_states import ApplicationStates
+from bot.storage.sqlite_storage import SQLiteStorage, build_storage_key, parse_storage_key
+
+KEY = StorageKey(bot_id=42, chat_id=1001, user_id=1001)
+
+
+def test_storage_key_roundtrip():
+    key = StorageKey(bot_id=1, chat_id=-100, user_id=5, thread_id=7, destiny="x")
+    assert parse_storage_key(build_storage_key(key)) == key
+
+
+def test_state_and_data_survive_reopen(tmp_path):
+    async def scenario():
+        storage = SQLiteStorage(tmp_path / "fsm.sqlite3", flush_interval=60)
+        await storage.set_state(KEY, ApplicationStates.waiting_for_phone)
+        await storage.update_data(KEY, {"passport_name": "Ali", "user_language": "uz"})
+        # Served from memory before any flush
+        assert await storage.get_state(KEY) == ApplicationStates.waiting_for_phone.state
+        await storage.close()
+
+        reopened = SQLiteStorage(tmp_path / "fsm.sqlite3")
+        state = await reopened.get_state(KEY)
+        data = await reopened.get_data(KEY)
+        await reopened.close()
+        return state, data
+
+    state, data = asyncio.run(scenario())
+    assert state == ApplicationStates.waiting_for_phone.state
+    assert data == {"passport_name": "Ali", "user_language": "uz"}
+
+
+def test_threshold_triggers_batched_flush(tmp_path):
+    async def scenario():
+        storage = SQLiteStorage(tmp_path / "fsm.sqlite3", flush_interval=60, flush_threshold=10)
+        for user_id in range(10):
+            await storage.set_data(StorageKey(42, user_id, user_id), {"n": user_id})
+        await asyncio.sleep(0.2)
+        pending = len(storage._dirty)
+        await storage.close()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_failed_flush_keeps_its_records_while_another_flush_runs(tmp_path):
+    other = StorageKey(bot_id=42, chat_id=2002, user_id=2002)
+
+    async def scenario():
+        storage = SQLiteStorage(tmp_path / "fsm.sqlite3", flush_interval=60)
+        write_batch = storage._write_batch
+        calls = []
+
+        def failing_first(upserts, deletes):
+            calls.append(len(upserts))
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise sqlite3.OperationalError("database is locked")
+            write_batch(upserts, deletes)
+
+        storage._write_batch = failing_first
+        await storage.get_state(other)  # cached: the change below needs no read behind the first flush
+        await storage.set_state(KEY, ApplicationStates.waiting_for_phone)
+        first = asyncio.create_task(storage.flush())
+        await asyncio.sleep(0.01)
+        await storage.set_state(other, ApplicationStates.waiting_for_photo)
+        second = await storage.flush()
+        with pytest.raises(sqlite3.OperationalError):
+            await first
+        assert second == 2
+        await storage.close()
+
+        reopened = SQLiteStorage(tmp_path / "fsm.sqlite3")
+        states = await reopened.get_state(KEY), await reopened.get_state(other)
+        await reopened.close()
+        return states
+
+    assert asyncio.run(scenario()) == (
+        ApplicationStates.waiting_for_phone.state, ApplicationStates.waiting_for_photo.state
+    )
@@ -0,0 +1,95 @@
+"""
+Tests for the request-scoped FSM draft middleware.
+"""
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Update
+
+from bot.keyboards.callback_data import encode_callback
+from bot.models import application_draft
+from bot.models.application_draft import ApplicationDraft
+from bot.states.application_states import ApplicationStates
+from bot.utils.texts import get_text
+
+USER_ID = 2002
+
+
+def _text_update(update_id: int, text: str, bot) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }, context={"bot": bot})
+
+
+def test_draft_tracks_changes():
+    draft = ApplicationDraft.from_dict({"user_language": "uz"})
+    draft.user_language = "uz"
+    assert not draft.dirty
+    draft.branch = "Clara"
+    assert draft.dirty
+
+
+def test_flow_writes_data_once_per_update(dispatcher, fake_bot):
+    storage = dispatcher.storage
+    writes = []
+    original_set_data = storage.set_data
+
+    async def counting_set_data(key, data):
+        writes.append(dict(data))
+        await original_set_data(key, data)
+
+    async def scenario():
+        storage.set_data = counting_set_data
+        try:
+            await dispatcher.feed_update(fake_bot, _text_update(1, "🧳 Bo'sh ish o'rinlari", fake_bot))
+            await dispatcher.feed_update(fake_bot, _text_update(2, "Clara", fake_bot))
+        finally:
+            del storage.set_data
+        key = StorageKey(bot_id=fake_bot.id, chat_id=USER_ID, user_id=USER_ID)
+        return await storage.get_data(key)
+
+    draft = ApplicationDraft.from_state_data(asyncio.run(scenario()))
+    assert len(writes) == 2
+    assert draft.branch == "Clara"
+    assert draft.previous_menu == "main_menu"
+
+
+def test_dropped_answer_is_asked_again_before_submitting(dispatcher, fake_bot, monkeypatch):
+    key = StorageKey(bot_id=fake_bot.id, chat_id=USER_ID, user_id=USER_ID)
+    draft = ApplicationDraft.from_dict({
+        "branch": "Clara", "department_key": "akademik", "position": "IELTS Instructor", "phone": "+998901234567",
+    })
+    confirm = Update.model_validate({
+        "update_id": 10,
+        "callback_query": {
+            "id": "10", "chat_instance": "ci", "data": encode_callback("confirm", "yes"),
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Test"},
+            "message": {"message_id": 1, "date": 0, "chat": {"id": USER_ID, "type": "private"}, "text": "summary"},
+        },
+    }, context={"bot": fake_bot})
+
+    async def scenario():
+        await dispatcher.storage.set_state(key, ApplicationStates.waiting_for_confirmation)
+        await dispatcher.storage.set_data(key, draft.to_state_data())
+        # The branches in config.py were edited since
+        fingerprints = list(application_draft.SLOT_FINGERPRINTS)
+        fingerprints[application_draft._CODE_SLOTS.index("_branch")] ^= 1
+        monkeypatch.setattr(application_draft, "SLOT_FINGERPRINTS", tuple(fingerprints))
+        await dispatcher.feed_update(fake_bot, confirm)
+        return await dispatcher.storage.get_state(key), await dispatcher.storage.get_data(key)
+
+    state, data = asyncio.run(scenario())
+    assert state == ApplicationStates.waiting_for_branch.state
+    restored = ApplicationDraft.from_state_data(data)
+    assert restored.branch is None and not restored.stale
+    assert restored.position == "IELTS Instructor"
+    sent = [method.text for name, method in fake_bot.session.calls if name == "sendMessage"]
+    assert sent[-1] == get_text("select_branch")
+    assert not any(name == "sendPhoto" for name, _ in fake_bot.session.calls)
@@ -0,0 +1,116 @@
+"""
+Tests for the HR group submission engine.
+"""
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.keyboards.inline_keyboards import get_hr_decision_keyboard
+from bot.models.application_draft import ApplicationDraft
+from bot.services.submission import submit_application
+
+HR_GROUP = -1007777
+
+
+def _draft(**fields) -> ApplicationDraft:
+    draft = ApplicationDraft.from_dict(fields)
+    draft.user_id = 5005
+    return draft
+
+
+def test_attachments_reply_to_the_summary(fake_bot):
+    draft = _draft(
+        photo="photo-1", russian_voice="voice-1", english_media="video-1",
+        english_media_type="video", ielts_certificate="pdf-1",
+    )
+    report = asyncio.run(submit_application(
+        fake_bot, HR_GROUP, draft, "summary", get_hr_decision_keyboard(draft.user_id)
+    ))
+
+    calls = fake_bot.session.calls
+    assert calls[0][0] == "sendPhoto" and calls[0][1].caption == "summary"
+    assert [name for name, _ in calls[1:]] == ["sendVoice", "sendVideo", "sendDocument"]
+    assert all(method.reply_parameters.message_id == report.header_message_id for _, method in calls[1:])
+    assert len(report.timings) == 4 and not report.failed
+
+
+def test_long_summary_is_sent_as_separate_message(fake_bot):
+    draft = _draft(photo="photo-1")
+    summary = "x" * 2000
+    asyncio.run(submit_application(fake_bot, HR_GROUP, draft, summary, get_hr_decision_keyboard(1)))
+    assert [name for name, _ in fake_bot.session.calls] == ["sendPhoto", "sendMessage"]
+    assert fake_bot.session.calls[1][1].text == summary
+
+
+def test_failed_attachment_does_not_fail_submission(fake_bot):
+    session = fake_bot.session
+    original = session.make_request
+
+    async def make_request(bot, method, timeout=None):
+        if method.__api_method__ == "sendDocument":
+            raise RuntimeError("boom")
+        return await original(bot, method, timeout)
+
+    session.make_request = make_request
+    draft = _draft(ielts_certificate="pdf-1")
+    report = asyncio.run(submit_application(fake_bot, HR_GROUP, draft, "summary", get_hr_decision_keyboard(1)))
+    assert report.failed == ["IELTS sertifikati"]
+    assert report.header_message_id is not None
+
+
+def test_attachments_keep_their_order_when_calls_are_slow(fake_bot):
+    session = fake_bot.session
+    original = session.make_request
+    delays = {"sendVoice": 0.03, "sendVideo": 0.02, "sendDocument": 0.0}
+    posted = []
+
+    async def make_request(bot, method, timeout=None):
+        await asyncio.sleep(delays.get(method.__api_method__, 0))
+        posted.append(method.__api_method__)
+        return await original(bot, method, timeout)
+
+    session.make_request = make_request
+    draft = _draft(
+        photo="photo-1", russian_voice="voice-1", english_media="video-1", english_media_type="video",
+        ielts_certificate="pdf-1",
+    )
+    asyncio.run(submit_application(fake_bot, HR_GROUP, draft, "summary", get_hr_decision_keyboard(1)))
+    assert posted == ["sendPhoto", "sendVoice", "sendVideo", "sendDocument"]
+
+
+def test_flood_control_leaves_the_rest_for_the_retry(fake_bot):
+    session = fake_bot.session
+    original = session.make_request
+    limited = []
+
+    async def make_request(bot, method, timeout=None):
+        if method.__api_method__ == "sendVideo" and not limited:
+            limited.append(method)
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=5)
+        return await original(bot, method, timeout)
+
+    session.make_request = make_request
+    draft = _draft(
+        photo="photo-1", russian_voice="voice-1", english_media="video-1", english_media_type="video",
+        ielts_certificate="pdf-1",
+    )
+    progress = {}
+
+    async def record_step(step, message_id):
+        progress[step] = message_id
+
+    async def scenario():
+        first = await submit_application(
+            fake_bot, HR_GROUP, draft, "summary", get_hr_decision_keyboard(1), progress, record_step
+        )
+        sent_before_retry = len(session.calls)
+        await submit_application(
+            fake_bot, HR_GROUP, draft, "summary", get_hr_decision_keyboard(1), dict(progress), record_step
+        )
+        return first, [name for name, _ in session.calls[sent_before_retry:]]
+
+    first, retried = asyncio.run(scenario())
+    assert first.retry_after == 5
+    assert first.failed == ["Ingliz tili media", "IELTS sertifikati"]
+    assert retried == ["sendVideo", "sendDocument"]
+    assert set(progress) == {"header", "attachment:0", "attachment:1", "attachment:2"}
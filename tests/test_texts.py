@@ -0,0 +1,72 @@
+"""
+Tests for the compiled text catalog.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from bot.config import BOT_NAME, COMPANY_NAME
+from bot.utils.texts import Template, TextCatalog, compile_text, get_text, texts
+
+HANDLERS = Path(__file__).parent.parent / "bot" / "handlers"
+
+
+def _write(directory: Path, lang: str, source: dict, mtime: float = None) -> None:
+    path = directory / f"{lang}.json"
+    path.write_text(json.dumps(source, ensure_ascii=False), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    _write(tmp_path, "uz", {"hello": "Salom, {name}!", "bye": "Xayr", "brand": "{company_name} {{x}}"}, mtime=1)
+    _write(tmp_path, "en", {"hello": "Hello, {name}!", "bye": "Bye {name}"}, mtime=1)
+    catalog = TextCatalog(tmp_path, languages=("uz", "ru", "en"), default="uz")
+    catalog.load()
+    return catalog
+
+
+def test_fallbacks_are_resolved_when_compiled(catalog):
+    assert catalog.get("hello", "en", name="Ann") == "Hello, Ann!"
+    # "bye" of en has a placeholder uz does not: the uz text is used instead
+    assert catalog.get("bye", "en") == "Xayr"
+    assert catalog.get("hello", "ru", name="Olga") == "Salom, Olga!"
+    assert catalog.get("hello", "de", name="X") == "Salom, X!"
+    assert catalog.get("brand", "ru") == f"{COMPANY_NAME} {{x}}"
+    assert catalog.missing == {"uz": [], "ru": ["brand", "bye", "hello"], "en": ["brand", "bye"]}
+    assert catalog.get("nope", "en") == "nope"
+    # A missing value leaves its placeholder visible instead of raising
+    assert catalog.get("hello", "uz") == "Salom, {name}!"
+
+
+def test_compile_text():
+    assert compile_text("{bot_name}") == BOT_NAME
+    assert compile_text("a {b} {c!r:>4}") == Template("a {b} {c!r:>4}", frozenset({"b", "c"}))
+    with pytest.raises(ValueError):
+        compile_text("{0}")
+    with pytest.raises(ValueError):
+        compile_text("{broken")
+
+
+def test_edited_files_are_reloaded(catalog, tmp_path):
+    assert catalog.reload() is False
+    _write(tmp_path, "en", {"hello": "Hi, {name}!"}, mtime=2)
+    assert catalog.reload() is True and catalog.reloads == 1
+    assert catalog.get("hello", "en", name="Ann") == "Hi, Ann!"
+
+    (tmp_path / "en.json").write_text("{not json", encoding="utf-8")
+    os.utime(tmp_path / "en.json", (3, 3))
+    assert catalog.reload() is False and catalog.reload_errors == 1
+    assert catalog.get("hello", "en", name="Ann") == "Hi, Ann!"
+
+
+def test_every_text_used_by_handlers_exists():
+    used = set()
+    for path in HANDLERS.glob("*.py"):
+        used.update(re.findall(r'get_text\(\s*"(\w+)"', path.read_text(encoding="utf-8")))
+    assert used and not used - texts._default_table.keys()
+    assert get_text("branch_selected", lang="en", branch="Clara").startswith("✅ Filial: Clara")
@@ -0,0 +1,102 @@
+"""
+Tests for per-update tracing.
+"""
+import asyncio
+import json
+import logging
+
+import pytest
+from aiogram.types import Update
+
+from bot.handlers import application_handlers
+from bot.services.tracing import TraceLogFilter, Tracer, current_trace_id, span
+from tests.test_application_flow import HR_GROUP, application_steps
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_only_slow_or_failed_traces_are_kept(tmp_path):
+    tracer = Tracer(tmp_path / "traces.jsonl", slow_ms=50)
+
+    async def traced(name, seconds=0.0, fail=False):
+        root, token = tracer.start("update", label=name)
+        error = None
+        try:
+            with span("handler", step=1):
+                with span("bot_api sendMessage"):
+                    await asyncio.sleep(seconds)
+                if fail:
+                    raise ValueError("boom")
+        except ValueError as e:
+            error = e
+        finally:
+            tracer.finish(root, token, error)
+
+    async def scenario():
+        await traced("fast")
+        await traced("slow", seconds=0.06)
+        await traced("failed", fail=True)
+        await tracer.close()
+
+    asyncio.run(scenario())
+    traces = _read(tmp_path / "traces.jsonl")
+    assert [trace["attributes"]["label"] for trace in traces] == ["slow", "failed"]
+    assert tracer.traces == 3 and tracer.kept == 2
+    slow, failed = traces
+    handler, api = slow["spans"]
+    assert api["parent_id"] == handler["span_id"] and handler["parent_id"] == slow["span_id"]
+    assert api["duration_ms"] >= 50 and slow["duration_ms"] >= api["duration_ms"]
+    assert failed["failed"] and failed["spans"][0]["error"] == "ValueError: boom"
+    assert failed["error"] == "ValueError: boom"
+
+
+def test_span_outside_a_trace_is_a_no_op():
+    with span("anything") as current:
+        assert current is None
+    assert current_trace_id() is None
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "message", None, None)
+    TraceLogFilter().filter(record)
+    assert record.trace == ""
+
+
+def test_confirmation_trace_contains_handler_and_api_calls(dispatcher, fake_bot, monkeypatch):
+    monkeypatch.setattr(application_handlers, "HR_GROUP_ID", HR_GROUP)
+    tracer: Tracer = dispatcher["tracer"]
+    monkeypatch.setattr(tracer, "slow_seconds", 0)  # keep everything
+    monkeypatch.setattr(tracer, "path", tracer.path.with_name("flow-traces.jsonl"))
+
+    async def scenario():
+        await dispatcher.emit_startup(bot=fake_bot)
+        try:
+            for raw in application_steps():
+                update = Update.model_validate(raw, context={"bot": fake_bot})
+                await dispatcher.feed_update(fake_bot, update)
+            await asyncio.wait_for(dispatcher["outbox"].join(), timeout=5)
+        finally:
+            await dispatcher.emit_shutdown(bot=fake_bot)
+
+    asyncio.run(scenario())
+    traces = _read(tracer.path)
+    confirmation = next(
+        trace for trace in traces
+        if any(item["name"] == "handler process_confirmation" for item in trace["spans"])
+    )
+    assert confirmation["attributes"]["type"] == "callback_query"
+    names = [item["name"] for item in confirmation["spans"]]
+    assert "outbox.enqueue" in names and "applications.add" in names
+    handler = next(item for item in confirmation["spans"] if item["name"] == "handler process_confirmation")
+    api_calls = [item for item in confirmation["spans"] if item["name"].startswith("bot_api ")]
+    assert api_calls and all(item["parent_id"] == handler["span_id"] for item in api_calls)
+    assert handler["attributes"]["state"] == "waiting_for_confirmation"
+
+
+@pytest.mark.parametrize("ratio, kept", [(0.0, 0), (1.0, 5)])
+def test_sample_ratio_keeps_fast_traces(tmp_path, ratio, kept):
+    tracer = Tracer(tmp_path / "traces.jsonl", slow_ms=10_000, sample_ratio=ratio)
+    for _ in range(5):
+        root, token = tracer.start("update")
+        tracer.finish(root, token)
+    asyncio.run(tracer.close())
+    assert tracer.kept == kept
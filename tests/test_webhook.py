@@ -0,0 +1,75 @@
+"""
+Tests for webhook ingestion mode.
+"""
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.runtime.webhook import build_webhook_app
+
+SECRET = "test-secret"
+HEADERS = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+USER_ID = 1001
+
+
+def _start_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Test"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def _post(dispatcher, bot, headers: dict, reply_in_response: bool = False):
+    app = build_webhook_app(bot, dispatcher, SECRET, reply_in_response=reply_in_response)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post("/webhook", json=_start_update(1), headers=headers)
+        body = await response.read()
+        # Updates handled in background finish while the server is still up
+        for _ in range(100):
+            if bot.session.calls or reply_in_response:
+                break
+            await asyncio.sleep(0.01)
+    return response.status, body
+
+
+def _sent_messages(bot) -> list:
+    return [method for name, method in bot.session.calls if name == "sendMessage" and method.chat_id == USER_ID]
+
+
+def test_webhook_rejects_wrong_secret(dispatcher, fake_bot):
+    status, _ = asyncio.run(_post(dispatcher, fake_bot, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}))
+    assert status == 401
+    assert not fake_bot.session.calls
+
+
+def test_webhook_acknowledges_at_once_and_replies_in_background(dispatcher, fake_bot):
+    status, body = asyncio.run(_post(dispatcher, fake_bot, HEADERS))
+    assert status == 200 and b"sendMessage" not in body
+    assert len(_sent_messages(fake_bot)) == 1
+
+
+def test_webhook_answers_inside_response_when_enabled(dispatcher, fake_bot):
+    status, body = asyncio.run(_post(dispatcher, fake_bot, HEADERS, reply_in_response=True))
+    assert status == 200
+    # /start reply is returned as a sendMessage method in the multipart body, not sent separately
+    assert b"sendMessage" in body
+    assert not _sent_messages(fake_bot)
+
+
+def test_handler_error_is_not_redelivered_by_default(dispatcher, fake_bot, monkeypatch):
+    async def broken_set_state(*args, **kwargs):
+        raise RuntimeError("storage is down")
+
+    monkeypatch.setattr(dispatcher.storage, "set_state", broken_set_state)
+    status, _ = asyncio.run(_post(dispatcher, fake_bot, HEADERS))
+    assert status == 200
+    # With the reply in the response the error reaches Telegram, which retries the update
+    status, _ = asyncio.run(_post(dispatcher, fake_bot, HEADERS, reply_in_response=True))
+    assert status == 500
@@ -0,0 +1,168 @@
+"""
+Tests for user-sharded update routing and the update loop.
+"""
+import asyncio
+import queue
+import time
+from pathlib import Path
+
+from aiogram import Dispatcher
+from aiogram.types import Message, Update
+
+from bot.keyboards.callback_data import encode_callback
+from bot.runtime.workers import (
+    UpdateSequencer, WorkerPool, get_shard_key, get_worker_index, poll_updates
+)
+
+
+def test_updates_of_one_user_go_to_same_worker():
+    message = {"update_id": 1, "message": {"from": {"id": 777}, "chat": {"id": 777}}}
+    callback = {"update_id": 2, "callback_query": {"from": {"id": 777}, "data": encode_callback("confirm", "yes")}}
+    assert get_shard_key(message) == get_shard_key(callback) == 777
+    assert get_worker_index(message, 4) == get_worker_index(callback, 4)
+
+
+def test_shard_key_falls_back_to_chat_and_update_id():
+    channel_post = {"update_id": 5, "my_chat_member": {"chat": {"id": -100}}}
+    assert get_shard_key(channel_post) == -100
+    assert get_shard_key({"update_id": 9}) == 9
+
+
+def _raw_message(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def test_sequencer_keeps_order_per_user_and_runs_users_concurrently(fake_bot):
+    events = []
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handle(message: Message):
+        events.append(("start", message.text))
+        if message.text == "slow":
+            await asyncio.sleep(0.05)
+        events.append(("end", message.text))
+
+    async def scenario():
+        sequencer = UpdateSequencer(fake_bot, dp)
+        sequencer.submit(_raw_message(1, user_id=1, text="slow"))
+        sequencer.submit(_raw_message(2, user_id=1, text="after slow"))
+        sequencer.submit(_raw_message(3, user_id=2, text="other user"))
+        await sequencer.drain()
+        assert not sequencer._tails
+
+    asyncio.run(scenario())
+    assert events.index(("end", "slow")) < events.index(("start", "after slow"))
+    assert events.index(("end", "other user")) < events.index(("end", "slow"))
+    assert len(events) == 6
+
+
+def test_sequencer_drain_gives_up_after_timeout(fake_bot):
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handle(message: Message):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        sequencer = UpdateSequencer(fake_bot, dp)
+        sequencer.submit(_raw_message(1, user_id=1, text="stuck"))
+        started = time.monotonic()
+        await sequencer.drain(timeout=0.05)
+        elapsed = time.monotonic() - started
+        for task in sequencer._tails.values():
+            task.cancel()
+        return elapsed
+
+    assert asyncio.run(scenario()) < 1
+
+
+class _FakeProcess:
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.exitcode = None if alive else 1
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+def test_pool_routes_by_user_and_respawns_dead_worker(monkeypatch):
+    pool = WorkerPool(3, dispatcher_factory=None)
+    pool._queues = [queue.Queue() for _ in range(3)]
+    pool._processes = [_FakeProcess(), _FakeProcess(alive=False), _FakeProcess()]
+    respawned = []
+    monkeypatch.setattr(pool, "_spawn", lambda index: respawned.append(index) or _FakeProcess())
+
+    pool.dispatch(_raw_message(1, user_id=4, text="a"))  # 4 % 3 == 1: dead worker
+    pool.dispatch(_raw_message(2, user_id=4, text="b"))
+    pool.dispatch(_raw_message(3, user_id=6, text="c"))
+
+    assert respawned == [1]
+    assert pool._processes[1].is_alive()
+    assert [pool._queues[1].get_nowait()["update_id"] for _ in range(2)] == [1, 2]
+    assert pool._queues[0].get_nowait()["update_id"] == 3
+    assert pool._queues[2].empty()
+
+
+class _UpdateFeed:
+    """Bot stand-in answering getUpdates from prepared batches"""
+
+    def __init__(self, *batches):
+        self.batches = [[Update(update_id=update_id) for update_id in batch] for batch in batches]
+        self.offsets = []
+
+    async def get_updates(self, offset=None, timeout=None, allowed_updates=None, limit=None):
+        self.offsets.append(offset)
+        if self.batches:
+            return self.batches.pop(0)
+        if timeout:
+            await asyncio.sleep(timeout)  # long poll without new updates
+        return []
+
+
+def test_poll_updates_advances_and_confirms_offset():
+    feed = _UpdateFeed([1, 2], [3])
+    handled = []
+    stop_event = asyncio.Event()
+
+    def handle(update: Update) -> None:
+        handled.append(update.update_id)
+        if update.update_id == 3:
+            stop_event.set()
+
+    offset = asyncio.run(poll_updates(feed, handle, ["message"], stop_event))
+    assert handled == [1, 2, 3]
+    assert offset == 4
+    # Last call only confirms the final batch so it is not fetched again after restart
+    assert feed.offsets == [None, 3, 4]
+
+
+def test_poll_updates_stops_during_long_poll():
+    feed = _UpdateFeed()
+
+    async def scenario():
+        stop_event = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.05, stop_event.set)
+        return await poll_updates(feed, lambda update: None, ["message"], stop_event, offset=10)
+
+    assert asyncio.run(scenario()) == 10
+    assert feed.offsets == [10, 10]
+
+
+def test_worker_files_and_allowed_updates(dispatcher, monkeypatch):
+    import run
+
+    assert run.resolve_allowed_updates() == dispatcher.resolve_used_update_types()
+    monkeypatch.setenv("BOT_WORKER_INDEX", "2")
+    assert run.per_worker_path(Path("data/fsm.sqlite3")) == Path("data/fsm.2.sqlite3")
+    monkeypatch.delenv("BOT_WORKER_INDEX")
+    assert run.per_worker_path(Path("data/fsm.sqlite3")) == Path("data/fsm.sqlite3")